@@ -2,6 +2,10 @@ import os
 import sys
 import threading
 import time
+
+# Référence pour mesurer le démarrage à froid (avant les imports lourds)
+LAUNCH_TIME = time.perf_counter()
+
 import subprocess
 import webview
 import socket
@@ -28,9 +32,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger('FoodFlex')
 
+# Mode du serveur : 'embedded' (serveur WSGI multi-thread dans ce processus)
+# ou 'runserver' (ancien mode, sous-processus manage.py runserver)
+SERVER_MODE = os.environ.get('FOODFLEX_SERVER_MODE', 'embedded')
+
 # Variable globale pour garder une référence au processus du serveur
 django_process = None
 
+# Serveur intégré (mode 'embedded')
+embedded_server = None
+
+# Templates compilés dès que le serveur intégré est prêt (cache des templates)
+WARM_TEMPLATES = [
+    'foodapp/base.html',
+    'foodapp/accueil.html',
+    'foodapp/restaurants.html',
+    'foodapp/dish_list.html',
+]
+
 # Fonction pour vérifier si le port est disponible
 def is_port_available(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -104,6 +123,112 @@ def start_django_server():
         logger.error(f"Exception lors du démarrage du serveur: {str(e)}")
         return None, None
 
+class EmbeddedServer(threading.Thread):
+    """
+    Serveur WSGI multi-thread exécuté dans un thread du lanceur.
+
+    Le port est attribué par le système (port 0) et ``ready`` est positionné
+    dès que l'application Django est chargée et que le socket écoute : plus
+    de scan de ports ni de polling HTTP.
+    """
+
+    def __init__(self, host='127.0.0.1'):
+        super().__init__(name='foodflex-server', daemon=True)
+        self.host = host
+        self.port = None
+        self.httpd = None
+        self.error = None
+        self.ready = threading.Event()
+        self.timings = {}
+        self.workers = None
+
+    def run(self):
+        try:
+            self.httpd = self.load()
+        except Exception as e:
+            logger.exception("Erreur au chargement de l'application Django")
+            self.error = e
+            self.ready.set()
+            return
+
+        self.ready.set()
+        # Pendant l'ouverture de la fenêtre : vues et templates de la page d'accueil
+        threading.Thread(target=self.warm_up, name='foodflex-warmup', daemon=True).start()
+        # Pas de processus run_workers séparé sur le poste : la file (emails) est
+        # dépilée par un thread du lanceur
+        from foodapp.task_queue import WorkerPool
+        self.workers = WorkerPool(threads=1).start()
+        self.httpd.serve_forever()
+
+    def load(self):
+        start = time.perf_counter()
+        django_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'foodproject')
+        if django_dir not in sys.path:
+            sys.path.insert(0, django_dir)
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'foodproject.settings'
+
+        import django
+        from django.conf import settings
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.wsgi import get_wsgi_application
+        from django.urls import get_resolver
+        self.timings['import'] = time.perf_counter() - start
+
+        application = get_wsgi_application()  # appelle django.setup()
+        if settings.DEBUG:
+            # Comme runserver : fichiers statiques servis par l'application
+            from django.contrib.staticfiles.handlers import StaticFilesHandler
+            application = StaticFilesHandler(application)
+        self.timings['setup'] = time.perf_counter() - start - sum(self.timings.values())
+
+        # Charger les URLs (et donc les vues) avant la première requête
+        get_resolver().url_patterns
+        self.timings['urls'] = time.perf_counter() - start - sum(self.timings.values())
+
+        httpd = ThreadedWSGIServer((self.host, 0), WSGIRequestHandler, ipv6=False)
+        httpd.set_app(application)
+        self.port = httpd.server_address[1]
+        return httpd
+
+    def warm_up(self):
+        start = time.perf_counter()
+        try:
+            from django.template.loader import get_template
+            from django.utils.module_loading import import_string
+            import_string('foodapp.views.accueil')
+            for name in WARM_TEMPLATES:
+                get_template(name)
+        except Exception as e:
+            logger.warning(f"Préchargement incomplet : {e}")
+            return
+        logger.info(f"Vues et templates préchargés en {time.perf_counter() - start:.2f} s")
+
+    def shutdown(self):
+        if self.workers:
+            self.workers.stop()
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+
+def start_embedded_server(timeout=60):
+    """Démarre le serveur intégré et attend qu'il soit prêt."""
+    global embedded_server
+
+    embedded_server = EmbeddedServer()
+    embedded_server.start()
+    if not embedded_server.ready.wait(timeout) or embedded_server.error:
+        logger.error("Le serveur intégré n'a pas pu démarrer")
+        return None
+
+    timings = embedded_server.timings
+    logger.info(
+        f"Serveur intégré prêt sur le port {embedded_server.port} - démarrage à froid "
+        f"{time.perf_counter() - LAUNCH_TIME:.2f} s (imports {timings['import']:.2f} s, "
+        f"django.setup {timings['setup']:.2f} s, URLs {timings['urls']:.2f} s)"
+    )
+    return embedded_server.port
+
 def create_window(url, title="FoodFlex - Cuisine Marocaine"):
     # Créer la fenêtre principale avec les contrôles natifs de Windows
     logger.info(f"Création de la fenêtre principale avec URL: {url}")
@@ -132,6 +257,10 @@ def cleanup():
     
     logger.info("Nettoyage des ressources...")
     
+    if embedded_server:
+        logger.info("Arrêt du serveur intégré...")
+        embedded_server.shutdown()
+    
     if django_process:
         logger.info(f"Arrêt du serveur Django (PID: {django_process.pid})...")
         try:
@@ -371,22 +500,31 @@ if __name__ == '__main__':
         def startup():
             global main_window
             
-            # Démarrer le serveur Django
-            process, port = start_django_server()
-            
-            # Vérifier si le serveur a bien démarré
-            if not process or not port:
-                splash_window.destroy()
-                show_error_and_exit("Le serveur Django n'a pas pu démarrer. Veuillez vérifier le fichier journal pour plus d'informations.")
-                return
-            
-            url = f"http://127.0.0.1:{port}/accueil/"
-            
-            # Vérifier si le serveur répond
-            if not is_server_running(url):
-                splash_window.destroy()
-                show_error_and_exit("Le serveur Django a démarré mais ne répond pas. Veuillez vérifier le fichier journal pour plus d'informations.")
-                return
+            if SERVER_MODE == 'embedded':
+                port = start_embedded_server()
+                if not port:
+                    splash_window.destroy()
+                    show_error_and_exit("Le serveur Django n'a pas pu démarrer. Veuillez vérifier le fichier journal pour plus d'informations.")
+                    return
+                url = f"http://127.0.0.1:{port}/accueil/"
+            else:
+                # Démarrer le serveur Django
+                process, port = start_django_server()
+                
+                # Vérifier si le serveur a bien démarré
+                if not process or not port:
+                    splash_window.destroy()
+                    show_error_and_exit("Le serveur Django n'a pas pu démarrer. Veuillez vérifier le fichier journal pour plus d'informations.")
+                    return
+                
+                url = f"http://127.0.0.1:{port}/accueil/"
+                
+                # Vérifier si le serveur répond
+                if not is_server_running(url):
+                    splash_window.destroy()
+                    show_error_and_exit("Le serveur Django a démarré mais ne répond pas. Veuillez vérifier le fichier journal pour plus d'informations.")
+                    return
+                logger.info(f"Serveur prêt - démarrage à froid {time.perf_counter() - LAUNCH_TIME:.2f} s")
             
             # Créer la fenêtre principale
             main_window = create_window(url)
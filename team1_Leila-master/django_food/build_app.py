@@ -2,8 +2,42 @@ import os
 import sys
 import subprocess
 import shutil
+import compileall
+import py_compile
 import pkg_resources
 
+def precompile_bytecode(directory='foodproject'):
+    """
+    Précompile le projet Django copié dans l'exécutable.
+
+    Le dossier 'foodproject' est embarqué comme données : sans .pyc fournis,
+    chaque lancement recompilerait les modules dans le répertoire temporaire
+    d'extraction. Les .pyc « unchecked-hash » sont utilisés sans comparer la
+    date du fichier source (modifiée à l'extraction).
+    """
+    print("Précompilation du bytecode...")
+    ok = compileall.compile_dir(
+        directory,
+        force=True,
+        quiet=1,
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+    if not ok:
+        print("⚠️ Certains fichiers n'ont pas pu être compilés (voir ci-dessus)")
+
+def build_native_libraries(directory='foodproject'):
+    """
+    Compile la bibliothèque C++ du tri des plats avant l'empaquetage.
+
+    Elle est installée dans 'foodproject/build/native', embarqué avec le
+    projet : l'application ne lance jamais de compilateur. Sans compilateur,
+    le tri des plats utilise le repli Python.
+    """
+    print("Compilation des bibliothèques natives...")
+    result = subprocess.run([sys.executable, 'manage.py', 'build_native'], cwd=directory)
+    if result.returncode != 0:
+        print("⚠️ Bibliothèques natives non compilées : le tri des plats utilisera le repli Python")
+
 def build_app():
     print("Préparation de la création de l'application FoodFlex...")
     
@@ -43,6 +77,9 @@ def build_app():
     if os.path.exists("requirements.txt"):
         subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
     
+    build_native_libraries()
+    precompile_bytecode()
+    
     # Préparation du fichier spec pour PyInstaller
     spec_content = f"""# -*- mode: python ; coding: utf-8 -*-
 
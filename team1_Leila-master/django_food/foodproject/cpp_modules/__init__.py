@@ -0,0 +1 @@
+"""Modules accélérés en C++ (avec repli NumPy / Python pur)."""
@@ -0,0 +1,23 @@
+"""Tri et classement des plats (C++ via ctypes, repli NumPy / Python)."""
+from .dish_sort import (
+    BACKENDS,
+    SORT_KEYS,
+    DishColumns,
+    available_backends,
+    build_native,
+    collation_key,
+    fast_sort_dishes,
+    position_map,
+    price_key,
+    rank_dishes,
+    reorder,
+    sort_order,
+    sorted_dishes,
+    sorted_ids,
+)
+
+__all__ = [
+    'BACKENDS', 'SORT_KEYS', 'DishColumns', 'available_backends', 'build_native', 'collation_key',
+    'fast_sort_dishes', 'position_map', 'price_key', 'rank_dishes', 'reorder', 'sort_order', 'sorted_dishes',
+    'sorted_ids',
+]
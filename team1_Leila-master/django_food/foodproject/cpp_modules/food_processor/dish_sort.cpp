@@ -0,0 +1,67 @@
+// Multi-key sort of dishes stored as parallel columns, called through ctypes
+// from food_processor/dish_sort.py.
+//
+// Keys are either numeric columns (price, rating) or the name collation keys,
+// given as one UTF-8 buffer plus offsets. Byte-wise comparison of UTF-8 gives
+// code point order, the same order as Python's str comparison. NaN (missing
+// value) always sorts last, whatever the direction. The sort is stable.
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <numeric>
+
+namespace {
+
+const int32_t KEY_NUMERIC = 0;
+const int32_t KEY_NAME = 1;
+// Returned by compare_numbers when exactly one side is NaN
+const int NAN_LAST = 2;
+
+int compare_numbers(double a, double b) {
+    bool a_nan = std::isnan(a), b_nan = std::isnan(b);
+    if (a_nan || b_nan) {
+        if (a_nan == b_nan) return 0;
+        return a_nan ? NAN_LAST : -NAN_LAST;
+    }
+    return a < b ? -1 : (a > b ? 1 : 0);
+}
+
+int compare_names(const char* names, const int64_t* offsets, int64_t a, int64_t b) {
+    int64_t a_len = offsets[a + 1] - offsets[a];
+    int64_t b_len = offsets[b + 1] - offsets[b];
+    int c = std::memcmp(names + offsets[a], names + offsets[b], static_cast<size_t>(std::min(a_len, b_len)));
+    if (c != 0) return c < 0 ? -1 : 1;
+    return a_len < b_len ? -1 : (a_len > b_len ? 1 : 0);
+}
+
+}  // namespace
+
+extern "C" {
+
+// Writes into out[0..n) the positions of the rows in sorted order.
+// kinds[k] is KEY_NUMERIC (column columns[k]) or KEY_NAME (names/offsets);
+// descending[k] reverses key k. Returns 0, or -1 on invalid arguments.
+int food_sort(int64_t n, int32_t key_count, const int32_t* kinds, const int32_t* descending,
+              const double* const* columns, const char* names, const int64_t* offsets, int64_t* out) {
+    if (n < 0 || key_count < 0 || out == nullptr) return -1;
+    for (int32_t k = 0; k < key_count; k++) {
+        if (kinds[k] == KEY_NAME && (names == nullptr || offsets == nullptr)) return -1;
+        if (kinds[k] == KEY_NUMERIC && columns[k] == nullptr) return -1;
+    }
+
+    std::iota(out, out + n, int64_t{0});
+    std::stable_sort(out, out + n, [&](int64_t a, int64_t b) {
+        for (int32_t k = 0; k < key_count; k++) {
+            int c = kinds[k] == KEY_NAME
+                ? compare_names(names, offsets, a, b)
+                : compare_numbers(columns[k][a], columns[k][b]);
+            if (c == NAN_LAST || c == -NAN_LAST) return c < 0;
+            if (c != 0) return descending[k] ? c > 0 : c < 0;
+        }
+        return false;
+    });
+    return 0;
+}
+
+}
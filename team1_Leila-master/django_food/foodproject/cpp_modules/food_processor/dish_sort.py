@@ -0,0 +1,307 @@
+"""
+Tri multi-clés des plats sur des colonnes parallèles.
+
+Les plats sont chargés en colonnes (``DishColumns`` : ids, prix, note, clé de
+collation du nom) par une seule requête ``values_list``, triés, puis les objets
+sont remis dans l'ordre avec une table id -> position (``reorder``, O(n)).
+
+Trois implémentations donnent le même ordre (tri stable, valeur manquante
+toujours en dernier) :
+
+- ``native`` : ``dish_sort.cpp`` compilé à l'avance en bibliothèque partagée
+  (``build_native``, appelé par ``manage.py build_native`` et ``build_app.py``)
+  et appelé avec ctypes ; jamais compilé pendant une requête ;
+- ``numpy`` : ``numpy.lexsort`` ;
+- ``python`` : tris stables successifs (toujours disponible).
+
+Le prix vient de ``Dish.price_range`` (``L``/``M``/``H``, ``$$``, ou un
+nombre) ; la note est la moyenne des avis du restaurant du plat.
+"""
+import array
+import ctypes
+import itertools
+import math
+import os
+import threading
+import unicodedata
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dish_sort.cpp')
+
+# Clés de tri (champ, décroissant) par valeur du paramètre ``sort`` des vues
+SORT_KEYS = {
+    'name': [('name', False)],
+    'price_asc': [('price', False), ('name', False)],
+    'price_desc': [('price', True), ('name', False)],
+    'rating': [('rating', True), ('name', False)],
+}
+
+# Niveaux de Dish.PRICE_RANGE_CHOICES
+PRICE_LEVELS = {'L': 1.0, 'M': 2.0, 'H': 3.0}
+
+KEY_NUMERIC = 0
+KEY_NAME = 1
+
+BACKENDS = ('native', 'numpy', 'python')
+
+
+def collation_key(name):
+    """Clé de comparaison du nom : sans accents ni casse (« Éclair » ~ « eclair »)."""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def price_key(price_range):
+    """Valeur numérique de ``price_range`` ; NaN si elle n'est pas interprétable."""
+    value = (price_range or '').strip()
+    if value.upper() in PRICE_LEVELS:
+        return PRICE_LEVELS[value.upper()]
+    if value and len(set(value)) == 1 and not value[0].isalnum():
+        return float(len(value))  # '$$', '€€€'
+    try:
+        return float(value.replace(',', '.'))
+    except ValueError:
+        return math.nan
+
+
+class DishColumns:
+    """Colonnes parallèles d'un ensemble de plats."""
+
+    __slots__ = ('ids', 'price', 'rating', 'names', '_encoded_names')
+
+    def __init__(self, ids, price, rating, names):
+        self.ids = array.array('q', ids)
+        self.price = array.array('d', price)
+        self.rating = array.array('d', rating)
+        self.names = list(names)
+        self._encoded_names = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encoded_names(self):
+        """Noms en un seul buffer UTF-8 + offsets (calculés une fois)."""
+        if self._encoded_names is None:
+            encoded = [name.encode('utf-8') for name in self.names]
+            offsets = array.array('q', itertools.accumulate(map(len, encoded), initial=0))
+            self._encoded_names = (b''.join(encoded), offsets)
+        return self._encoded_names
+
+    @classmethod
+    def from_rows(cls, rows):
+        """``rows`` : tuples ``(id, nom, price_range, note ou None)``."""
+        ids, price, rating, names = [], [], [], []
+        for dish_id, name, price_range, dish_rating in rows:
+            ids.append(dish_id)
+            price.append(price_key(price_range))
+            rating.append(math.nan if dish_rating is None else float(dish_rating))
+            names.append(collation_key(name))
+        return cls(ids, price, rating, names)
+
+    @classmethod
+    def from_records(cls, records):
+        """``records`` : dicts avec ``id``, ``name``, ``price_range`` et éventuellement ``rating``."""
+        return cls.from_rows(
+            (r['id'], r.get('name'), r.get('price_range'), r.get('rating')) for r in records
+        )
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Une requête : id, nom, prix et note moyenne du restaurant."""
+        from django.db.models import Avg
+        rows = (
+            queryset.order_by('id')
+            .annotate(sort_rating=Avg('restaurant__reviews__rating'))
+            .values_list('id', 'name', 'price_range', 'sort_rating')
+        )
+        return cls.from_rows(rows)
+
+
+def _keys(sort_by):
+    return SORT_KEYS.get(sort_by, SORT_KEYS['name'])
+
+
+# --- Implémentation native ------------------------------------------------
+
+_native_lock = threading.Lock()
+_native_library = None
+_native_error = None
+
+
+def build_native(force=False):
+    """
+    Compile et installe la bibliothèque native (au déploiement). Renvoie
+    ``(chemin, compilé)`` ; lève ``foodapp.native.NativeError`` en cas d'échec.
+    """
+    global _native_library, _native_error
+    from foodapp import native
+    result = native.install(SOURCE, force=force, shared=True)
+    with _native_lock:
+        # Prise en compte au prochain tri (un processus ne recharge pas une bibliothèque déjà chargée)
+        if _native_library is None:
+            _native_error = None
+    return result
+
+
+def _load_native():
+    """Charge la bibliothèque installée par ``build_native`` ; None si elle manque (repli NumPy/Python)."""
+    global _native_library, _native_error
+    if _native_library is not None or _native_error is not None:
+        return _native_library
+    with _native_lock:
+        if _native_library is None and _native_error is None:
+            try:
+                from foodapp import native
+                path = native.installed(SOURCE, shared=True)
+                if path is None:
+                    raise native.NativeError('Bibliothèque non compilée : lancer manage.py build_native')
+                library = ctypes.CDLL(path)
+                library.food_sort.restype = ctypes.c_int
+                library.food_sort.argtypes = [
+                    ctypes.c_int64, ctypes.c_int32,
+                    ctypes.POINTER(ctypes.c_int32), ctypes.POINTER(ctypes.c_int32),
+                    ctypes.POINTER(ctypes.POINTER(ctypes.c_double)),
+                    ctypes.c_char_p, ctypes.POINTER(ctypes.c_int64), ctypes.POINTER(ctypes.c_int64),
+                ]
+                _native_library = library
+            except Exception as e:  # non compilée, bibliothèque invalide, Django non configuré...
+                _native_error = e
+    return _native_library
+
+
+def _address(buffer, ctype):
+    return ctypes.cast(buffer.buffer_info()[0], ctypes.POINTER(ctype))
+
+
+def _native_order(columns, keys):
+    library = _load_native()
+    n = len(columns)
+    kinds = (ctypes.c_int32 * len(keys))()
+    descending = (ctypes.c_int32 * len(keys))()
+    pointers = (ctypes.POINTER(ctypes.c_double) * len(keys))()
+    names = offsets = None
+
+    for k, (field, desc) in enumerate(keys):
+        descending[k] = desc
+        if field == 'name':
+            kinds[k] = KEY_NAME
+            names, offsets = columns.encoded_names()
+        else:
+            kinds[k] = KEY_NUMERIC
+            pointers[k] = _address(getattr(columns, field), ctypes.c_double)
+
+    out = array.array('q', bytes(8 * n))
+    status = library.food_sort(
+        n, len(keys), kinds, descending, pointers,
+        names, _address(offsets, ctypes.c_int64) if offsets is not None else None,
+        _address(out, ctypes.c_int64),
+    )
+    if status != 0:
+        raise ValueError('food_sort : arguments invalides')
+    return out.tolist()
+
+
+# --- Repli NumPy et Python ------------------------------------------------
+
+def _numpy_order(columns, keys):
+    sort_keys = []
+    # lexsort : la dernière clé est la clé primaire
+    for field, desc in reversed(keys):
+        if field == 'name':
+            _, values = numpy.unique(numpy.array(columns.names, dtype=str), return_inverse=True)
+            values = values.reshape(-1).astype(numpy.int64)
+        else:
+            values = numpy.frombuffer(getattr(columns, field), dtype=numpy.float64)
+        sort_keys.append(-values if desc else values)
+    return numpy.lexsort(sort_keys).tolist()
+
+
+def _python_order(columns, keys):
+    order = list(range(len(columns)))
+    # Tris stables successifs, de la clé secondaire à la clé primaire
+    for field, desc in reversed(keys):
+        if field == 'name':
+            order.sort(key=columns.names.__getitem__, reverse=desc)
+            continue
+        column = getattr(columns, field)
+        present = [i for i in order if not math.isnan(column[i])]
+        present.sort(key=column.__getitem__, reverse=desc)
+        order = present + [i for i in order if math.isnan(column[i])]
+    return order
+
+
+def available_backends():
+    backends = []
+    if _load_native() is not None:
+        backends.append('native')
+    if numpy is not None:
+        backends.append('numpy')
+    backends.append('python')
+    return backends
+
+
+def sort_order(columns, sort_by='name', backend=None):
+    """
+    Positions (dans ``columns``) des plats dans l'ordre demandé. ``backend``
+    force une implémentation ; par défaut la plus rapide disponible.
+    """
+    keys = _keys(sort_by)
+    if not len(columns):
+        return []
+    backend = backend or os.getenv('FOOD_PROCESSOR_BACKEND') or available_backends()[0]
+    if backend == 'native' and _load_native() is not None:
+        return _native_order(columns, keys)
+    if backend in ('native', 'numpy') and numpy is not None:
+        return _numpy_order(columns, keys)
+    return _python_order(columns, keys)
+
+
+def rank_dishes(columns, sort_by='name', backend=None):
+    """Rang (0 = premier) de chaque plat de ``columns``, dans l'ordre des colonnes."""
+    ranks = [0] * len(columns)
+    for rank, position in enumerate(sort_order(columns, sort_by, backend)):
+        ranks[position] = rank
+    return ranks
+
+
+def sorted_ids(columns, sort_by='name', backend=None):
+    ids = columns.ids
+    return [ids[position] for position in sort_order(columns, sort_by, backend)]
+
+
+def position_map(ids):
+    """Table id -> position, pour remettre des objets dans l'ordre en O(n)."""
+    return {dish_id: position for position, dish_id in enumerate(ids)}
+
+
+def reorder(objects, ids):
+    """Objets (``.pk``) rangés dans l'ordre de ``ids`` ; les ids absents sont ignorés."""
+    positions = position_map(ids)
+    slots = [None] * len(positions)
+    for obj in objects:
+        position = positions.get(obj.pk)
+        if position is not None:
+            slots[position] = obj
+    return [obj for obj in slots if obj is not None]
+
+
+def fast_sort_dishes(dishes, sort_by='name', backend=None):
+    """Trie une liste de dicts de plats (``id``, ``name``, ``price_range``, ``rating``)."""
+    columns = DishColumns.from_records(dishes)
+    return [dishes[position] for position in sort_order(columns, sort_by, backend)]
+
+
+def sorted_dishes(queryset, sort_by='name', start=0, stop=None, backend=None):
+    """
+    Plats de ``queryset`` triés par ``sort_by``. Deux requêtes : les colonnes de
+    tri, puis les objets de la tranche ``[start:stop]`` seulement.
+    """
+    ids = sorted_ids(DishColumns.from_queryset(queryset), sort_by, backend)[start:stop]
+    if not ids:
+        return []
+    objects = queryset.filter(id__in=ids) if start or stop is not None else queryset
+    return reorder(objects, ids)
@@ -1,7 +1,10 @@
+import json
+
 from django.contrib import admin
 from .models import (
     City, 
     Dish, 
+    Ingredient,
     Restaurant, 
     Reservation, 
     RestaurantAccount, 
@@ -9,18 +12,23 @@ from .models import (
     Review,
     ForumTopic,
     ForumMessage,
-    RestaurantDraft
+    RestaurantDraft,
+    Task,
+    SpooledEmail
 )
+from django.utils import timezone
 from django.utils.html import format_html
+from django.db.models import Count
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.crypto import get_random_string
 from django.shortcuts import redirect, render
 from django.urls import path
 from django import forms
 from django.contrib import messages
 from django.contrib.admin.widgets import AdminDateWidget
-from django.core.mail import send_mail
+from .tasks import send_email, send_password_setup_email
+from .mail_spool import render_message, spool_many
+from . import allergens, task_queue
 
 # Register your models here.
 class DishInline(admin.TabularInline):
@@ -45,7 +53,7 @@ class DishAdmin(admin.ModelAdmin):
     list_filter = ('type', 'price_range', 'city', 'is_vegetarian', 'is_vegan', 'is_tourist_recommended', 'origin', 'created_at',
                   'has_sugar', 'has_cholesterol', 'has_gluten', 'has_lactose', 'has_nuts', 'is_diabetic_friendly', 'is_low_calorie')
     search_fields = ('name', 'description', 'ingredients')
-    readonly_fields = ('created_at', 'viewed_by')
+    readonly_fields = ('created_at', 'viewed_by', 'allergens_display')
     
     fieldsets = (
         ('Informations de base', {
@@ -62,7 +70,7 @@ class DishAdmin(admin.ModelAdmin):
             'description': 'Informations sur les restrictions alimentaires et la santé'
         }),
         ('Détails de la recette', {
-            'fields': ('ingredients', 'preparation_steps', 'history', 'cultural_notes')
+            'fields': ('ingredients', 'allergens_display', 'preparation_steps', 'history', 'cultural_notes')
         }),
         ('Métadonnées', {
             'fields': ('created_at', 'viewed_by'),
@@ -78,6 +86,10 @@ class DishAdmin(admin.ModelAdmin):
         return format_html('<span style="color: gray;">✗</span>')
     is_newly_added.short_description = "Nouveau"
     
+    def allergens_display(self, obj):
+        return ", ".join(obj.allergen_list()) or "—"
+    allergens_display.short_description = "Allergènes détectés"
+    
     def mark_as_tourist_recommended(self, request, queryset):
         queryset.update(is_tourist_recommended=True)
         self.message_user(request, f"{queryset.count()} plat(s) marqué(s) comme recommandé(s) aux touristes.")
@@ -100,6 +112,7 @@ class DishAdmin(admin.ModelAdmin):
     
     def mark_as_gluten_free(self, request, queryset):
         queryset.update(has_gluten=False)
+        Dish.refresh_allergen_masks(queryset.values_list('id', flat=True))
         self.message_user(request, f"{queryset.count()} plat(s) marqué(s) comme sans gluten.")
     mark_as_gluten_free.short_description = "Marquer comme sans gluten"
 
@@ -225,15 +238,12 @@ class RestaurantAdmin(admin.ModelAdmin):
                 username = f"{base_username}_{counter}"
                 counter += 1
             
-            # Générer un mot de passe aléatoire
-            password = get_random_string(12)
-            
             try:
-                # Créer l'utilisateur
+                # Créer l'utilisateur (mot de passe choisi via le lien envoyé)
                 user = User.objects.create_user(
                     username=username,
                     email=restaurant.email,
-                    password=password
+                    password=None
                 )
                 
                 # Créer le compte restaurant
@@ -246,6 +256,12 @@ class RestaurantAdmin(admin.ModelAdmin):
                 # Créer un profil utilisateur
                 UserProfile.objects.create(user=user)
                 
+                # Envoyer le nom d'utilisateur et un lien pour choisir le mot de passe ;
+                # le jeton du lien n'est créé qu'à l'envoi (rien de secret en base)
+                subject, body, _ = render_message(
+                    'restaurant_account_created', {'restaurant': restaurant, 'username': username, 'link': '{link}'})
+                send_password_setup_email.delay(user.id, subject, body)
+                
                 success_count += 1
             except Exception as e:
                 error_count += 1
@@ -272,12 +288,31 @@ class ReservationAdmin(admin.ModelAdmin):
     
     actions = ['mark_as_confirmed', 'mark_as_canceled', 'mark_as_completed']
     
+    def update_status_and_notify(self, request, queryset, status):
+        """
+        Met à jour le statut puis prévient chaque client par le spool d'emails.
+        La clé de déduplication inclut le ``updated_at`` d'avant le changement :
+        une action rejouée ne renvoie rien, mais confirmée -> annulée -> confirmée
+        envoie bien une seconde confirmation.
+        """
+        reservations = list(queryset.exclude(status=status).select_related('restaurant'))
+        Reservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).update(
+            status=status, updated_at=timezone.now())
+        status_display = dict(Reservation.STATUS_CHOICES)[status]
+        count = spool_many('reservation_status', [
+            (reservation.email,
+             {'reservation': reservation, 'status_display': status_display},
+             f'reservation:{reservation.id}:{status}:{reservation.updated_at.isoformat()}')
+            for reservation in reservations
+        ])
+        self.message_user(request, f"{len(reservations)} réservation(s) mise(s) à jour, {count} email(s) en file.")
+    
     def mark_as_confirmed(self, request, queryset):
-        queryset.update(status=Reservation.STATUS_CONFIRMED)
+        self.update_status_and_notify(request, queryset, Reservation.STATUS_CONFIRMED)
     mark_as_confirmed.short_description = "Confirmer les réservations sélectionnées"
     
     def mark_as_canceled(self, request, queryset):
-        queryset.update(status=Reservation.STATUS_CANCELED)
+        self.update_status_and_notify(request, queryset, Reservation.STATUS_CANCELED)
     mark_as_canceled.short_description = "Annuler les réservations sélectionnées"
     
     def mark_as_completed(self, request, queryset):
@@ -308,13 +343,63 @@ class ReviewAdmin(admin.ModelAdmin):
     actions = ['publish_reviews', 'unpublish_reviews']
     
     def publish_reviews(self, request, queryset):
+        reviews = list(queryset.filter(is_published=False).select_related('user', 'restaurant'))
         queryset.update(is_published=True)
+        spool_many('review_published', [
+            (review.user.email, {'review': review}, f'review:{review.id}:published')
+            for review in reviews
+        ])
     publish_reviews.short_description = "Publier les avis sélectionnés"
     
     def unpublish_reviews(self, request, queryset):
         queryset.update(is_published=False)
     unpublish_reviews.short_description = "Masquer les avis sélectionnés"
 
+# Formulaire des ingrédients : allergènes en cases à cocher plutôt que le masque brut
+class IngredientAdminForm(forms.ModelForm):
+    allergens = forms.MultipleChoiceField(
+        label="Allergènes", required=False, widget=forms.CheckboxSelectMultiple,
+        choices=[(key, label) for key, label in UserProfile.ALLERGY_CHOICES if key in allergens.BITS],
+        help_text="Modifier les allergènes marque l'ingrédient comme vérifié : ils ne seront plus recalculés")
+    
+    class Meta:
+        model = Ingredient
+        fields = ('name', 'allergens', 'is_verified')
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['allergens'] = allergens.allergen_names(self.instance.allergen_mask)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        # Sinon Ingredient.save() remplacerait la saisie par les allergènes détectés
+        if 'allergens' in self.changed_data:
+            cleaned_data['is_verified'] = True
+        return cleaned_data
+    
+    def save(self, commit=True):
+        self.instance.allergen_mask = allergens.mask_for(self.cleaned_data['allergens'])
+        return super().save(commit)
+
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+    form = IngredientAdminForm
+    list_display = ('name', 'allergens_display', 'is_verified', 'dishes_count')
+    list_filter = ('is_verified',)
+    search_fields = ('name',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(dishes_total=Count('dishes'))
+    
+    def allergens_display(self, obj):
+        return ", ".join(obj.allergen_list()) or "—"
+    allergens_display.short_description = "Allergènes"
+    
+    def dishes_count(self, obj):
+        return obj.dishes_total
+    dishes_count.short_description = "Plats"
+
 @admin.register(ForumTopic)
 class ForumTopicAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'author', 'created_at', 'views_count', 'messages_count', 'is_pinned')
@@ -365,11 +450,11 @@ class RestaurantDraftAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if 'status' in form.changed_data:
             if obj.status == 'approved':
-                # Créer le restaurant et le compte utilisateur
+                # Créer le restaurant et le compte utilisateur (mot de passe choisi via le lien envoyé)
                 user = User.objects.create_user(
                     username=f"{obj.owner_first_name.lower()}{obj.owner_last_name.lower()}",
                     email=obj.owner_email,
-                    password=get_random_string(12),  # Mot de passe temporaire
+                    password=None,
                     first_name=obj.owner_first_name,
                     last_name=obj.owner_last_name
                 )
@@ -392,37 +477,81 @@ class RestaurantDraftAdmin(admin.ModelAdmin):
                     is_active=True
                 )
                 
-                # Envoyer un email au propriétaire avec ses identifiants
-                send_mail(
+                # Envoyer au propriétaire un lien pour choisir son mot de passe
+                send_password_setup_email.delay(
+                    user.id,
                     'Votre compte restaurant a été approuvé',
                     f'Félicitations ! Votre restaurant a été approuvé.\n\n'
-                    f'Vous pouvez vous connecter avec les identifiants suivants :\n'
-                    f'Email : {obj.owner_email}\n'
-                    f'Mot de passe temporaire : {password}\n\n'
-                    f'Veuillez changer votre mot de passe lors de votre première connexion.',
-                    'noreply@foodflex.com',
-                    [obj.owner_email],
-                    fail_silently=False,
+                    f'Nom d\'utilisateur : {user.username}\n'
+                    f'Choisissez votre mot de passe en suivant ce lien :\n{{link}}\n\n'
+                    f'Ce lien n\'est valable qu\'une fois et expire après quelques jours.',
+                    from_email='noreply@foodflex.com',
                 )
                 
                 messages.success(request, f"Le restaurant {obj.name} a été approuvé et le compte a été créé.")
             
             elif obj.status == 'rejected':
                 # Envoyer un email de rejet
-                send_mail(
+                send_email.delay(
                     'Statut de votre demande de restaurant',
                     f'Malheureusement, votre demande pour {obj.name} n\'a pas été approuvée.\n\n'
                     f'Raison : {obj.admin_notes}\n\n'
                     f'Vous pouvez nous contacter pour plus d\'informations.',
-                    'noreply@foodflex.com',
                     [obj.owner_email],
-                    fail_silently=False,
+                    from_email='noreply@foodflex.com',
                 )
                 
                 messages.warning(request, f"Le restaurant {obj.name} a été rejeté.")
         
         super().save_model(request, obj, form, change)
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at', 'short_error')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    fields = readonly_fields = ('name', 'redacted_payload', 'status', 'priority', 'attempts', 'max_attempts',
+                                'run_at', 'locked_by', 'locked_until', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry_tasks']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def redacted_payload(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(task_queue.redact(obj.payload), ensure_ascii=False, indent=2))
+    redacted_payload.short_description = "Arguments"
+    
+    def short_error(self, obj):
+        lines = obj.last_error.strip().splitlines()
+        return lines[-1][:120] if lines else '-'
+    short_error.short_description = "Dernière erreur"
+    
+    def retry_tasks(self, request, queryset):
+        count = task_queue.retry(queryset)
+        self.message_user(request, f"{count} tâche(s) remise(s) en file.")
+    retry_tasks.short_description = "Relancer les tâches sélectionnées"
+
+@admin.register(SpooledEmail)
+class SpooledEmailAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'subject', 'template', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'template')
+    search_fields = ('to_email', 'subject')
+    readonly_fields = ('template', 'to_email', 'from_email', 'subject', 'body', 'html_body', 'dedup_key', 'status',
+                       'attempts', 'next_attempt_at', 'batch_token', 'claimed_at', 'last_error', 'created_at',
+                       'sent_at')
+    actions = ['requeue_emails']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def requeue_emails(self, request, queryset):
+        count = queryset.filter(status=SpooledEmail.STATUS_FAILED).update(
+            status=SpooledEmail.STATUS_QUEUED, attempts=0, last_error='', next_attempt_at=None)
+        if count:
+            task_queue.enqueue('foodapp.tasks.flush_mail_spool')
+        self.message_user(request, f"{count} email(s) remis en file.")
+    requeue_emails.short_description = "Remettre en file les emails en échec"
+
 # Modifier RestaurantAdmin pour ajouter l'action de changement de type de compte
 class RestaurantAccountChangeTypeForm(forms.Form):
     ACCOUNT_TYPE_CHOICES = RestaurantAccount.ACCOUNT_TYPE_CHOICES
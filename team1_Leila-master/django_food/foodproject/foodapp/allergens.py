@@ -0,0 +1,171 @@
+"""
+Ingrédients et allergènes des plats.
+
+Le texte libre ``Dish.ingredients`` est découpé en ingrédients normalisés
+(table Ingredient) ; chaque ingrédient reçoit un masque de bits des allergènes
+de ``UserProfile.ALLERGY_CHOICES`` détectés par synonymes français/anglais, et
+chaque plat le OU de ceux de ses ingrédients dans ``Dish.allergen_mask``.
+Exclure les plats contenant du sésame ou des fruits à coque devient un seul
+prédicat SQL : ``allergen_mask & masque = 0``.
+
+Ce module ne dépend pas des modèles (il est importé par ``models.py``).
+"""
+import re
+
+from django.db.models import F
+
+from .text_search import light_stem, normalize
+
+# Ordre des bits : ne jamais réordonner (les masques sont stockés en base), ajouter à la fin
+ALLERGENS = (
+    'peanuts', 'tree_nuts', 'milk', 'eggs', 'fish', 'shellfish', 'soy',
+    'wheat', 'sesame', 'mustard', 'celery', 'lupin', 'molluscs',
+)
+BITS = {allergen: 1 << position for position, allergen in enumerate(ALLERGENS)}
+
+# Termes (normalisés, au singulier) qui signalent chaque allergène ; une
+# expression de plusieurs mots doit apparaître telle quelle dans l'ingrédient
+SYNONYMS = {
+    'peanuts': ['arachide', 'cacahuete', 'peanut'],
+    'tree_nuts': ['amande', 'almond', 'noix', 'walnut', 'noisette', 'hazelnut', 'pistache', 'pistachio',
+                  'cajou', 'cashew', 'pecan', 'noix de pecan', 'pignon', 'pine nut', 'macadamia',
+                  'fruits a coque', 'fruit a coque', 'nut', 'nuts'],
+    'milk': ['lait', 'milk', 'beurre', 'butter', 'smen', 'fromage', 'cheese', 'creme', 'cream', 'yaourt',
+             'yogurt', 'yoghurt', 'lben', 'raib', 'ghee', 'mascarpone', 'ricotta', 'mozzarella', 'lactose'],
+    'eggs': ['oeuf', 'egg', 'jaune d oeuf', 'blanc d oeuf', 'mayonnaise'],
+    'fish': ['poisson', 'fish', 'sardine', 'thon', 'tuna', 'merlu', 'colin', 'hake', 'saumon', 'salmon',
+             'anchois', 'anchovy', 'dorade', 'sea bream', 'loup', 'sole', 'cabillaud', 'cod'],
+    'shellfish': ['crevette', 'shrimp', 'prawn', 'gambas', 'crabe', 'crab', 'homard', 'lobster',
+                  'langouste', 'langoustine', 'fruits de mer', 'seafood'],
+    'soy': ['soja', 'soy', 'soya', 'tofu', 'sauce soja', 'soy sauce', 'edamame'],
+    'wheat': ['ble', 'wheat', 'farine', 'flour', 'semoule', 'semolina', 'couscous', 'pain', 'bread',
+              'vermicelle', 'vermicelli', 'pate', 'pasta', 'warqa', 'feuille de brick', 'brick', 'malsouka',
+              'msemen', 'gluten', 'chapelure', 'breadcrumb', 'boulgour', 'bulgur', 'orge', 'barley'],
+    'sesame': ['sesame', 'tahini', 'tahina', 'graine de sesame', 'sesame seed'],
+    'mustard': ['moutarde', 'mustard'],
+    'celery': ['celeri', 'celery', 'celeriac'],
+    'lupin': ['lupin', 'tourmous'],
+    'molluscs': ['moule', 'mussel', 'calamar', 'calamari', 'squid', 'poulpe', 'octopus', 'seiche',
+                 'cuttlefish', 'huitre', 'oyster', 'palourde', 'clam', 'escargot', 'snail', 'coquille saint jacques',
+                 'scallop'],
+}
+
+# Expressions dont les mots ne doivent pas être lus séparément (« beurre de
+# cacahuète » ne contient pas de lait) : elles remplacent les synonymes de leurs mots
+COMPOUNDS = {
+    'beurre de cacahuete': ['peanuts'],
+    'peanut butter': ['peanuts'],
+    'lait de coco': [],
+    'coconut milk': [],
+    'creme de coco': [],
+    'coconut cream': [],
+    'lait d amande': ['tree_nuts'],
+    'almond milk': ['tree_nuts'],
+    'lait de soja': ['soy'],
+    'soy milk': ['soy'],
+    'beurre de cacao': [],
+    'cocoa butter': [],
+}
+
+# Les ingrédients sont séparés par des virgules, points-virgules, retours à la
+# ligne, puces ou « et »/« and »
+SEPARATOR_RE = re.compile(r'[,;\n•·]|\s+(?:et|and)\s+', re.IGNORECASE)
+# Quantités et unités en tête d'ingrédient : « 200 g de », « 2 c. à soupe d' », « 1/2 cup »
+QUANTITY_RE = re.compile(
+    r"^[\s\-*]*(?:[\d/.,½¼¾]+\s*)?"
+    r"(?:(?:kg|g|gr|grammes?|mg|l|cl|ml|litres?|cups?|tasses?|verres?|tbsp|tsp|c\.?\s*a\.?\s*(?:soupe|cafe)|"
+    r"cuilleres?\s+a\s+(?:soupe|cafe)|pincees?|bottes?|gousses?|tranches?|morceaux?|poignees?|pinch)\b\.?\s*)?"
+    r"(?:(?:de|d|du|des|of)\b\s*)?",
+)
+MAX_NAME_LENGTH = 100
+
+
+def _stems(text):
+    return ' '.join(light_stem(word) for word in re.findall(r'\w+', normalize(text)))
+
+
+def _phrases(words):
+    """Termes et suites de 2 à 4 termes de ``words``, pour les synonymes composés."""
+    phrases = set(words)
+    for size in (2, 3, 4):
+        phrases.update(' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return phrases
+
+
+_SYNONYM_BITS = {}
+for _allergen, _terms in SYNONYMS.items():
+    for _term in _terms:
+        _SYNONYM_BITS[_stems(_term)] = _SYNONYM_BITS.get(_stems(_term), 0) | BITS[_allergen]
+_COMPOUND_BITS = {
+    _stems(_compound): sum(BITS[allergen] for allergen in _allergens)
+    for _compound, _allergens in COMPOUNDS.items()
+}
+
+
+def normalize_ingredient(text):
+    """Nom canonique d'un ingrédient : sans quantité, minuscules, sans accents (« 200 g d'Amandes » -> « amandes »)."""
+    name = normalize(text).replace('œ', 'oe').replace("'", ' ').replace('’', ' ')
+    name = QUANTITY_RE.sub('', name)
+    name = re.sub(r'\([^)]*\)', ' ', name)
+    return ' '.join(name.split())[:MAX_NAME_LENGTH]
+
+
+def parse_ingredients(text):
+    """Noms canoniques des ingrédients de ``text``, sans doublons, dans l'ordre."""
+    names = (normalize_ingredient(part) for part in SEPARATOR_RE.split(text or ''))
+    return list(dict.fromkeys(name for name in names if len(name) > 1))
+
+
+def detect_allergens(name):
+    """Masque des allergènes dont un synonyme apparaît dans l'ingrédient ``name``."""
+    stems = f' {_stems(name)} '
+    mask = 0
+    for compound, bits in _COMPOUND_BITS.items():
+        if f' {compound} ' in stems:
+            mask |= bits
+            stems = stems.replace(f' {compound} ', ' | ')
+    for phrase in _phrases(stems.split()):
+        mask |= _SYNONYM_BITS.get(phrase, 0)
+    return mask
+
+
+def flag_mask(has_gluten=False, has_lactose=False, has_nuts=False):
+    """Allergènes déclarés par les cases du plat (saisie manuelle, prioritaire sur le texte)."""
+    return ((BITS['wheat'] if has_gluten else 0)
+            | (BITS['milk'] if has_lactose else 0)
+            | (BITS['peanuts'] | BITS['tree_nuts'] if has_nuts else 0))
+
+
+def mask_for(allergies):
+    """Masque d'une liste de clés d'allergies (clés inconnues et 'none' ignorées)."""
+    mask = 0
+    for allergy in allergies or []:
+        mask |= BITS.get(allergy, 0)
+    return mask
+
+
+def profile_mask(profile):
+    """Allergènes à exclure pour un profil : allergies déclarées, maladie cœliaque, intolérance au lactose."""
+    mask = mask_for(profile.allergies)
+    if profile.has_celiac_disease or profile.dietary_preference == 'gluten_free':
+        mask |= BITS['wheat']
+    if profile.has_lactose_intolerance or profile.dietary_preference == 'lactose_free':
+        mask |= BITS['milk']
+    return mask
+
+
+def parse_allergen_param(values):
+    """Masque des paramètres GET ``allergens`` (répétés ou séparés par des virgules)."""
+    return mask_for(key.strip() for value in values for key in value.split(','))
+
+
+def allergen_names(mask):
+    """Clés des allergènes de ``mask``, dans l'ordre de ``ALLERGENS``."""
+    return [allergen for allergen in ALLERGENS if mask & BITS[allergen]]
+
+
+def exclude_allergens(queryset, mask):
+    """Plats de ``queryset`` ne contenant aucun des allergènes de ``mask``."""
+    if not mask:
+        return queryset
+    return queryset.alias(allergen_conflicts=F('allergen_mask').bitand(mask)).filter(allergen_conflicts=0)
@@ -0,0 +1,97 @@
+"""
+Cache des réponses du chatbot pour les questions répétées.
+
+La clé est la question normalisée (minuscules, sans accents, sans mots vides
+français et anglais, pluriels ramenés au singulier, termes triés), la langue,
+la ville choisie et la version de la base de connaissances : « Qu'est-ce que
+la pastilla ? » et « pastilla » donnent la même entrée, et toute modification
+d'une fiche rend les anciennes réponses inaccessibles. Éviction LRU, un cache
+par processus ; les accès sont comptés dans ``foodapp_cache_requests_total``
+(cache ``chatbot_answer``) et dans ``stats()``.
+"""
+import copy
+import threading
+from collections import OrderedDict
+
+from . import chatbot
+from .metrics import record_cache
+from .text_search import light_stem, tokenize
+
+METRIC_NAME = 'chatbot_answer'
+
+
+def normalize_question(question):
+    """Forme canonique d'une question : « Les meilleurs TAJINES ? » -> « meilleur tajine »."""
+    return ' '.join(sorted({light_stem(term) for term in tokenize(question)}))
+
+
+class AnswerCache:
+    """Cache LRU borné à ``max_size`` entrées, sûr entre threads."""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or chatbot.get_config()['ANSWER_CACHE_SIZE']
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        record_cache(METRIC_NAME, value is not None)
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+answer_cache = AnswerCache()
+
+
+def cached_answer(question, language='en', city_id=None, engine=None, cache=None):
+    """
+    Réponse à ``question`` via ``engine`` (``chatbot.answer`` par défaut), lue
+    en cache si la même question normalisée a déjà été posée dans le même
+    contexte. Renvoie ``(réponse, trouvée_en_cache)``.
+    """
+    engine = engine or chatbot.answer
+    cache = cache or answer_cache
+    normalized = normalize_question(question)
+    if not normalized:
+        return engine(question, language=language, city_id=city_id), False
+
+    # La version ne change qu'après resynchronisation de l'index avec la base
+    chatbot.knowledge_index.refresh()
+    key = (normalized, language, city_id, chatbot.knowledge_index.version_key)
+    result = cache.get(key)
+    if result is not None:
+        return copy.deepcopy(result), True
+
+    result = engine(question, language=language, city_id=city_id)
+    cache.set(key, copy.deepcopy(result))
+    return result, False
@@ -0,0 +1,374 @@
+"""
+Historique du chat : chargement par fenêtre et archivage à froid.
+
+La page du chat n'affiche que les ``PAGE_SIZE`` derniers messages ; les plus
+anciens sont demandés page par page avec un curseur (timestamp, id). Le
+compactage (commande ``chat_retention``) déplace hors de la base les messages
+au-delà des ``KEEP_MESSAGES`` plus récents ou plus vieux que
+``ARCHIVE_AFTER_DAYS`` jours, ainsi que les clés de contexte en trop.
+
+Chaque session archivée a deux fichiers dans ``ARCHIVE_DIR``, hors des
+fichiers servis (``MEDIA_ROOT``, ``STATIC_ROOT``) :
+``<session_id>.segments.gz``, des membres gzip concaténés de ``SEGMENT_SIZE``
+messages au plus, ajoutés en fin de fichier à chaque compactage, et
+``<session_id>.index.json``, la position, la taille et les bornes (timestamp,
+id) de chaque membre ainsi que le contexte archivé. Une page ancienne ne
+décompresse que les membres qui la contiennent.
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import ChatMessage, ChatSession
+
+DEFAULTS = {
+    'PAGE_SIZE': 50,
+    'KEEP_MESSAGES': 200,
+    'ARCHIVE_AFTER_DAYS': 30,
+    # Nombre maximal de clés de ChatSession.context (les plus anciennes sont archivées)
+    'CONTEXT_MAX_KEYS': 20,
+    # Sessions sans interaction depuis ce délai supprimées avec leur archive
+    'RETENTION_DAYS': 365,
+    'ANONYMOUS_RETENTION_DAYS': 30,
+    'ARCHIVE_DIR': None,    # None : BASE_DIR/var/chat_archive
+    # Messages par membre gzip de l'archive (unité de lecture d'une page ancienne)
+    'SEGMENT_SIZE': 200,
+}
+
+# Clé de contexte réservée au résumé de l'archive
+ARCHIVE_KEY = 'archive'
+
+# Ancien emplacement (sous MEDIA_ROOT, donc public) et ancien format : un seul
+# fichier gzip par session, contexte compris. Converti par convert_legacy_archives.
+LEGACY_DIR_NAME = 'chat_archive'
+LEGACY_SUFFIX = '.jsonl.gz'
+
+DELETE_BATCH_SIZE = 500
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_HISTORY', {})}
+
+
+def _is_within(path, directory):
+    if not directory:
+        return False
+    path, directory = os.path.realpath(path), os.path.realpath(directory)
+    return path == directory or path.startswith(directory + os.sep)
+
+
+def archive_dir(config=None):
+    """Répertoire des archives ; refusé s'il est servi publiquement."""
+    config = config or get_config()
+    directory = str(config['ARCHIVE_DIR'] or os.path.join(settings.BASE_DIR, 'var', 'chat_archive'))
+    for public in (settings.MEDIA_ROOT, getattr(settings, 'STATIC_ROOT', None)):
+        if _is_within(directory, public):
+            raise ImproperlyConfigured(
+                f"CHAT_HISTORY['ARCHIVE_DIR'] ({directory}) ne doit pas être servi publiquement ({public})"
+            )
+    return directory
+
+
+def segments_path(session_id, config=None):
+    return os.path.join(archive_dir(config), f'{session_id}.segments.gz')
+
+
+def index_path(session_id, config=None):
+    return os.path.join(archive_dir(config), f'{session_id}.index.json')
+
+
+def legacy_dir():
+    return os.path.join(settings.MEDIA_ROOT, LEGACY_DIR_NAME)
+
+
+def legacy_path(session_id):
+    return os.path.join(legacy_dir(), f'{session_id}{LEGACY_SUFFIX}')
+
+
+def encode_cursor(message):
+    return urlsafe_base64_encode(f"{message['timestamp'].isoformat()}|{message['id']}".encode())
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def message_record(message):
+    return {
+        'id': message.id,
+        'role': message.role,
+        'content': message.content,
+        'timestamp': message.timestamp,
+        'metadata': message.metadata,
+    }
+
+
+def _position(bound):
+    """Bornes ``[timestamp iso, id]`` de l'index -> position comparable aux curseurs."""
+    return datetime.fromisoformat(bound[0]), bound[1]
+
+
+def _replace_file(path, data):
+    """Écrit ``data`` dans ``path`` de façon atomique (fichier temporaire puis renommage)."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def empty_index():
+    return {'segments': [], 'context': {}}
+
+
+def read_index(session_id, config=None):
+    """Index de l'archive d'une session (converti depuis l'ancien format au besoin)."""
+    try:
+        with open(index_path(session_id, config), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    if os.path.exists(legacy_path(session_id)):
+        return convert_legacy_archive(session_id, config)
+    return empty_index()
+
+
+def read_segment(session_id, segment, config=None):
+    """Messages d'un membre de l'archive (du plus ancien au plus récent), seul décompressé."""
+    with open(segments_path(session_id, config), 'rb') as f:
+        f.seek(segment['offset'])
+        data = gzip.decompress(f.read(segment['length']))
+    messages = []
+    for line in data.decode('utf-8').splitlines():
+        record = json.loads(line)
+        record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+        messages.append(record)
+    return messages
+
+
+def read_archive(session_id, config=None):
+    """Messages archivés d'une session (du plus ancien au plus récent) et contexte archivé."""
+    index = read_index(session_id, config)
+    messages = []
+    for segment in index['segments']:
+        messages.extend(read_segment(session_id, segment, config))
+    return messages, index['context']
+
+
+def archived_before(session_id, position=None, count=1, config=None):
+    """
+    Jusqu'à ``count`` messages archivés antérieurs à ``position`` (tous si
+    None), du plus récent au plus ancien, et s'il en reste d'autres avant eux.
+    Seuls les membres nécessaires sont décompressés : la suite se lit dans l'index.
+    """
+    segments = read_index(session_id, config)['segments']
+    result = []
+    for number in range(len(segments) - 1, -1, -1):
+        segment = segments[number]
+        if position and _position(segment['first']) >= position:
+            continue
+        messages = read_segment(session_id, segment, config)
+        if position:
+            messages = [m for m in messages if (m['timestamp'], m['id']) < position]
+        result.extend(reversed(messages))
+        if len(result) >= count:
+            return result[:count], len(result) > count or number > 0
+    return result, False
+
+
+def write_archive(session_id, messages, context, config=None, index=None):
+    """
+    Ajoute des messages (plus récents que ceux déjà archivés) en nouveaux
+    membres de l'archive et des clés de contexte à son index. Les membres sont
+    écrits avant l'index : des octets non indexés (échec entre les deux) sont
+    tronqués à l'écriture suivante. Renvoie le nouvel index.
+    """
+    config = config or get_config()
+    index = read_index(session_id, config) if index is None else index
+    segments = index['segments']
+    if segments:
+        # Messages déjà archivés (nouvel essai après un échec de suppression) ignorés
+        last = _position(segments[-1]['last'])
+        messages = [m for m in messages if (m['timestamp'], m['id']) > last]
+    index['context'].update(context)
+
+    directory = archive_dir(config)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if messages:
+        path = segments_path(session_id, config)
+        end = segments[-1]['offset'] + segments[-1]['length'] if segments else 0
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+b') as f:
+            f.seek(end)
+            f.truncate()
+            size = config['SEGMENT_SIZE']
+            for start in range(0, len(messages), size):
+                chunk = messages[start:start + size]
+                data = gzip.compress(''.join(
+                    json.dumps({**m, 'timestamp': m['timestamp'].isoformat()}, ensure_ascii=False) + '\n'
+                    for m in chunk
+                ).encode('utf-8'))
+                f.write(data)
+                segments.append({
+                    'offset': end,
+                    'length': len(data),
+                    'count': len(chunk),
+                    'first': [chunk[0]['timestamp'].isoformat(), chunk[0]['id']],
+                    'last': [chunk[-1]['timestamp'].isoformat(), chunk[-1]['id']],
+                })
+                end += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+    _replace_file(index_path(session_id, config), json.dumps(index, ensure_ascii=False).encode('utf-8'))
+    return index
+
+
+def convert_legacy_archive(session_id, config=None):
+    """Réécrit une archive de l'ancien format dans ``ARCHIVE_DIR`` puis supprime l'ancien fichier."""
+    path = legacy_path(session_id)
+    messages, context = [], {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('type') == 'context':
+                context.update(record['values'])
+            else:
+                record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+                messages.append(record)
+    # Réécriture complète : d'éventuels octets d'une conversion interrompue sont tronqués
+    index = write_archive(session_id, messages, context, config, index=empty_index())
+    os.unlink(path)
+    return index
+
+
+def convert_legacy_archives(config=None):
+    """Convertit toutes les archives restées sous ``MEDIA_ROOT`` ; renvoie leur nombre."""
+    directory = legacy_dir()
+    if not os.path.isdir(directory):
+        return 0
+    converted = 0
+    for name in os.listdir(directory):
+        if name.endswith(LEGACY_SUFFIX):
+            convert_legacy_archive(name[:-len(LEGACY_SUFFIX)], config)
+            converted += 1
+    if not os.listdir(directory):
+        os.rmdir(directory)
+    return converted
+
+
+def history_page(chat_session, before=None, limit=None):
+    """
+    Messages qui précèdent le curseur ``before`` (ou les derniers), du plus
+    ancien au plus récent, et le curseur de la page précédente (None au début
+    de l'historique). La base est lue en premier, puis l'archive.
+    """
+    limit = limit or get_config()['PAGE_SIZE']
+    position = decode_cursor(before) if before else None
+
+    rows = ChatMessage.objects.filter(session=chat_session).order_by('-timestamp', '-id')
+    if position:
+        timestamp, pk = position
+        rows = rows.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+    page = [message_record(message) for message in rows[:limit + 1]]
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    if chat_session.context.get(ARCHIVE_KEY):
+        if len(page) < limit:
+            archived, has_more = archived_before(chat_session.session_id, position, limit - len(page))
+            page.extend(archived)
+        elif not has_more:
+            # Base épuisée pile à la fin de la page : l'archive suit
+            has_more = bool(read_index(chat_session.session_id)['segments'])
+    page.reverse()
+    return page, encode_cursor(page[0]) if has_more else None
+
+
+def compact_session(chat_session, now=None, config=None):
+    """Archive les messages anciens et les clés de contexte en trop ; renvoie le nombre de messages archivés."""
+    config = config or get_config()
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+
+    messages = ChatMessage.objects.filter(session=chat_session)
+    old = Q(timestamp__lt=cutoff)
+    keep = config['KEEP_MESSAGES']
+    boundary = messages.order_by('-timestamp', '-id').values_list('timestamp', 'id')[keep:keep + 1].first()
+    if boundary:
+        old |= Q(timestamp__lt=boundary[0]) | Q(timestamp=boundary[0], id__lte=boundary[1])
+    to_archive = [message_record(message) for message in messages.filter(old).order_by('timestamp', 'id')]
+
+    context = dict(chat_session.context)
+    summary = context.pop(ARCHIVE_KEY, None) or {}
+    extra_keys = list(context)[:max(len(context) - config['CONTEXT_MAX_KEYS'], 0)]
+    if not to_archive and not extra_keys:
+        return 0
+
+    # Le fichier est écrit avant la suppression : en cas d'échec, rien n'est perdu
+    write_archive(chat_session.session_id, to_archive, {key: context.pop(key) for key in extra_keys}, config)
+    if to_archive:
+        summary = {
+            'messages': summary.get('messages', 0) + len(to_archive),
+            'first': summary.get('first') or to_archive[0]['timestamp'].isoformat(),
+            'last': to_archive[-1]['timestamp'].isoformat(),
+        }
+    context[ARCHIVE_KEY] = summary or {'messages': 0}
+    archived_ids = [message['id'] for message in to_archive]
+    with transaction.atomic():
+        for start in range(0, len(archived_ids), DELETE_BATCH_SIZE):
+            ChatMessage.objects.filter(id__in=archived_ids[start:start + DELETE_BATCH_SIZE]).delete()
+        ChatSession.objects.filter(pk=chat_session.pk).update(context=context)
+    chat_session.context = context
+    return len(to_archive)
+
+
+def sessions_to_compact(now=None, config=None):
+    """Sessions ayant des messages à archiver."""
+    config = config or get_config()
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+    return ChatSession.objects.annotate(
+        message_total=Count('messages'),
+        old_messages=Count('messages', filter=Q(messages__timestamp__lt=cutoff)),
+    ).filter(Q(old_messages__gt=0) | Q(message_total__gt=config['KEEP_MESSAGES'])).order_by('id')
+
+
+def expired_sessions(now=None, config=None):
+    """Sessions sans interaction depuis le délai de conservation (plus court pour les anonymes)."""
+    config = config or get_config()
+    now = now or timezone.now()
+    return ChatSession.objects.filter(
+        Q(last_interaction__lt=now - timedelta(days=config['RETENTION_DAYS']))
+        | Q(user__isnull=True, last_interaction__lt=now - timedelta(days=config['ANONYMOUS_RETENTION_DAYS']))
+    ).order_by('id')
+
+
+def delete_sessions(session_ids, config=None):
+    """Supprime des sessions, leurs messages et leurs archives ; renvoie le nombre de sessions supprimées."""
+    uuids = list(ChatSession.objects.filter(id__in=session_ids).values_list('session_id', flat=True))
+    deleted, by_model = ChatSession.objects.filter(id__in=session_ids).delete()
+    for session_id in uuids:
+        for path in (segments_path(session_id, config), index_path(session_id, config), legacy_path(session_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    return by_model.get(ChatSession._meta.label, 0)
@@ -0,0 +1,214 @@
+"""
+Moteur de réponse du chatbot, sans API externe : index BM25 en mémoire sur
+ChatbotKnowledge (titre, mots-clés, contenu anglais et français).
+
+L'index est chargé au premier appel, puis tenu à jour par différence : au plus
+toutes les ``REFRESH_INTERVAL`` secondes, une requête agrégée (nombre de
+lignes, dernier ``last_updated``) indique si la base a changé ; seules les
+lignes modifiées sont alors relues, et les lignes supprimées retirées. Chaque
+processus a son propre index.
+"""
+import heapq
+import re
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import ChatbotKnowledge
+from .text_search import BM25_B, BM25_K1, idf, light_stem, tokenize
+
+DEFAULTS = {
+    'TOP_K': 3,
+    # Multiplicateur du score des fiches liées à la ville choisie dans la session
+    'CITY_BOOST': 1.5,
+    'REFRESH_INTERVAL': 5,
+    # Poids de chaque champ dans la fréquence des termes (BM25F simplifié)
+    'FIELD_WEIGHTS': {'title': 3, 'keywords': 3, 'content': 1, 'content_fr': 1},
+    'MAX_PASSAGE_CHARS': 400,
+    # Entrées du cache des réponses (foodapp.answer_cache)
+    'ANSWER_CACHE_SIZE': 1024,
+}
+
+FIELDS = ('id', 'category', 'title', 'keywords', 'content', 'content_fr', 'related_city_id', 'related_dish_id')
+
+NO_ANSWER = {
+    'en': "Sorry, I don't have information about that yet. Try asking about a Moroccan dish, an ingredient or a city.",
+    'fr': "Désolé, je n'ai pas encore d'information à ce sujet. Essayez de demander un plat marocain, un ingrédient ou une ville.",
+}
+SEE_ALSO = {'en': 'See also: ', 'fr': 'Voir aussi : '}
+
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+Passage = namedtuple('Passage', 'id title text score category city_id dish_id')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHATBOT', {})}
+
+
+def terms_of(text):
+    return [light_stem(term) for term in tokenize(text)]
+
+
+def best_passage(text, terms, max_chars):
+    """Phrases consécutives de ``text`` les plus riches en ``terms``, dans la limite de ``max_chars``."""
+    sentences = [sentence for sentence in SENTENCE_RE.split(text.strip()) if sentence]
+    if not sentences:
+        return ''
+    terms = set(terms)
+    hits = [len(terms.intersection(terms_of(sentence))) for sentence in sentences]
+    start = max(range(len(sentences)), key=lambda i: (hits[i], -i))
+    passage = sentences[start]
+    for sentence in sentences[start + 1:]:
+        if len(passage) + 1 + len(sentence) > max_chars:
+            break
+        passage = f'{passage} {sentence}'
+    if len(passage) > max_chars:
+        passage = passage[:max_chars].rsplit(' ', 1)[0] + '…'
+    return passage
+
+
+class KnowledgeIndex:
+    """Index inversé BM25 des fiches de connaissances, en mémoire."""
+
+    def __init__(self, field_weights=None):
+        self.field_weights = field_weights or get_config()['FIELD_WEIGHTS']
+        self.postings = defaultdict(dict)   # terme -> {id: fréquence pondérée}
+        self.lengths = {}
+        self.terms = {}                      # id -> termes indexés (pour la suppression)
+        self.documents = {}
+        self.total_length = 0
+        self.version = None
+        self.checked_at = 0.0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    @property
+    def version_key(self):
+        """Identifiant de l'état de la base indexée (change à chaque modification)."""
+        if self.version is None:
+            return 'empty'
+        count, latest = self.version
+        return f"{count}:{latest.timestamp() if latest else 0}"
+
+    def add(self, row):
+        """Indexe (ou réindexe) une fiche : dict avec les clés de ``FIELDS``."""
+        weighted = Counter()
+        for field, weight in self.field_weights.items():
+            text = (row.get(field) or '').replace(',', ' ')
+            for term in terms_of(text):
+                weighted[term] += weight
+        with self.lock:
+            self.remove(row['id'])
+            for term, frequency in weighted.items():
+                self.postings[term][row['id']] = frequency
+            self.terms[row['id']] = list(weighted)
+            self.lengths[row['id']] = sum(weighted.values())
+            self.total_length += self.lengths[row['id']]
+            self.documents[row['id']] = row
+
+    def remove(self, doc_id):
+        with self.lock:
+            row = self.documents.pop(doc_id, None)
+            if row is None:
+                return
+            self.total_length -= self.lengths.pop(doc_id)
+            for term in self.terms.pop(doc_id):
+                postings = self.postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query, k=3, city_id=None, language='en', city_boost=1.0, max_chars=400):
+        """Les ``k`` meilleurs passages pour ``query``, dans la langue demandée."""
+        terms = terms_of(query)
+        with self.lock:
+            if not terms or not self.documents:
+                return []
+            average = self.total_length / len(self.documents) or 1
+            scores = defaultdict(float)
+            for term in set(terms):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                term_idf = idf(len(self.documents), len(postings))
+                for doc_id, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / average)
+                    scores[doc_id] += term_idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            if city_id and city_boost != 1.0:
+                for doc_id in scores:
+                    if self.documents[doc_id]['related_city_id'] == city_id:
+                        scores[doc_id] *= city_boost
+            top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+            rows = [(self.documents[doc_id], score) for doc_id, score in top]
+
+        passages = []
+        for row, score in rows:
+            text = row['content_fr'] if language == 'fr' and row['content_fr'] else row['content']
+            passages.append(Passage(
+                row['id'], row['title'], best_passage(text or '', terms, max_chars), score,
+                row['category'], row['related_city_id'], row['related_dish_id'],
+            ))
+        return passages
+
+    def refresh(self, force=False, interval=None):
+        """Recharge les fiches modifiées depuis la base si elle a changé."""
+        interval = get_config()['REFRESH_INTERVAL'] if interval is None else interval
+        now = time.monotonic()
+        if not force and self.version is not None and now - self.checked_at < interval:
+            return False
+        self.checked_at = now
+
+        state = ChatbotKnowledge.objects.aggregate(count=Count('id'), latest=Max('last_updated'))
+        version = (state['count'], state['latest'])
+        if version == self.version:
+            return False
+
+        with self.lock:
+            rows = ChatbotKnowledge.objects.order_by('id').values(*FIELDS)
+            if self.version is not None and self.version[1] is not None:
+                rows = rows.filter(last_updated__gte=self.version[1])
+            for row in rows.iterator():
+                self.add(row)
+            if len(self.documents) != version[0]:
+                # Des fiches ont été supprimées
+                existing = set(ChatbotKnowledge.objects.values_list('id', flat=True))
+                for doc_id in set(self.documents) - existing:
+                    self.remove(doc_id)
+            self.version = version
+        return True
+
+
+# Index partagé par les requêtes du processus
+knowledge_index = KnowledgeIndex()
+
+
+def search(query, language='en', city_id=None, k=None):
+    config = get_config()
+    knowledge_index.refresh()
+    return knowledge_index.search(
+        query, k=k or config['TOP_K'], city_id=city_id, language=language,
+        city_boost=config['CITY_BOOST'], max_chars=config['MAX_PASSAGE_CHARS'],
+    )
+
+
+def answer(question, language='en', city_id=None):
+    """Réponse du chatbot : meilleur passage, puis les titres des autres fiches trouvées."""
+    language = language if language in NO_ANSWER else 'en'
+    passages = search(question, language=language, city_id=city_id)
+    if not passages:
+        return {'response': NO_ANSWER[language], 'sources': []}
+
+    best = passages[0]
+    response = f'{best.title}\n\n{best.text}'
+    if len(passages) > 1:
+        response += '\n\n' + SEE_ALSO[language] + ', '.join(passage.title for passage in passages[1:])
+    return {
+        'response': response,
+        'sources': [{'id': passage.id, 'title': passage.title, 'score': round(passage.score, 3)} for passage in passages],
+    }
@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib.auth.models import User
-from .models import City, Dish, Reservation, RestaurantDraft, Category, Restaurant
+from .models import City, Dish, Reservation, RestaurantDraft, Category, Restaurant, ForumTopic, ForumMessage
 from django.utils import timezone
 import datetime
 
@@ -332,3 +332,25 @@ class RestaurantPhotosForm(forms.ModelForm):
             'interior_image2': forms.FileInput(attrs={'accept': 'image/*'}),
             'menu_sample': forms.FileInput(attrs={'accept': '.pdf,image/*'})
         }
+
+
+class ForumTopicForm(forms.ModelForm):
+    """Formulaire pour créer un nouveau sujet"""
+    class Meta:
+        model = ForumTopic
+        fields = ['title', 'category', 'content']
+        widgets = {
+            'title': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Titre du sujet'}),
+            'category': forms.Select(attrs={'class': 'form-control'}),
+            'content': forms.Textarea(attrs={'class': 'form-control', 'rows': 5, 'placeholder': 'Contenu du sujet'}),
+        }
+
+
+class ForumMessageForm(forms.ModelForm):
+    """Formulaire pour créer ou modifier un message"""
+    class Meta:
+        model = ForumMessage
+        fields = ['content']
+        widgets = {
+            'content': forms.Textarea(attrs={'class': 'form-control', 'rows': 5, 'placeholder': 'Votre message'}),
+        }
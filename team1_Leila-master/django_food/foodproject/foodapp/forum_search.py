@@ -0,0 +1,85 @@
+"""
+Recherche plein texte du forum sur l'index ForumSearchTerm.
+
+Un sujet correspond si chacun des termes de la requête apparaît dans son titre,
+son contenu ou un de ses messages. Le score est la somme des poids BM25 des
+termes (calculés à l'indexation) multipliés par leur IDF, calculé à la requête
+sur le nombre de sujets contenant le terme. Le filtre par catégorie porte
+directement sur l'index (colonne ``category``, index ``(term, category)``).
+"""
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from .models import ForumCategoryStats, ForumMessage, ForumSearchTerm, ForumTopic
+from .text_search import highlight, idf, tokenize
+
+# Termes au-delà ignorés (requêtes collées depuis un message)
+MAX_QUERY_TERMS = 8
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def search_topics(terms, category=None):
+    """
+    Identifiants des sujets contenant tous les ``terms``, du plus pertinent au
+    moins pertinent : QuerySet de ``{'topic': id, 'score': float}``, paginable.
+    """
+    rows = ForumSearchTerm.objects.filter(term__in=terms)
+    if category:
+        rows = rows.filter(category=category)
+
+    matching = dict(
+        rows.order_by().values('term').annotate(topics=Count('topic', distinct=True)).values_list('term', 'topics')
+    )
+    if len(matching) < len(terms):
+        return ForumSearchTerm.objects.none().values('topic')
+
+    stats = ForumCategoryStats.objects.filter(category=category) if category else ForumCategoryStats.objects.all()
+    documents = max(sum(stats.values_list('topic_count', flat=True)), 1)
+    term_idf = Case(
+        *[When(term=term, then=Value(idf(documents, count))) for term, count in matching.items()],
+        output_field=FloatField(),
+    )
+    return (
+        rows.order_by().values('topic')
+        .annotate(score=Sum(F('weight') * term_idf), matched=Count('term', distinct=True))
+        .filter(matched=len(terms))
+        .order_by('-score', '-topic')
+    )
+
+
+def load_results(results, terms):
+    """
+    Sujets des résultats ``results`` (une page de ``search_topics``), dans
+    l'ordre, avec ``search_score`` et ``search_snippet`` : extrait surligné du
+    document (sujet ou message) qui correspond le mieux.
+    """
+    scores = {row['topic']: row['score'] for row in results}
+    topics = ForumTopic.objects.select_related('author', 'last_message_author').in_bulk(list(scores))
+
+    # Meilleur document par sujet : une requête pour toute la page
+    best = {}
+    documents = (
+        ForumSearchTerm.objects.filter(topic_id__in=list(scores), term__in=terms)
+        .order_by().values('topic', 'message').annotate(score=Sum('weight'))
+    )
+    for row in documents:
+        if row['topic'] not in best or row['score'] > best[row['topic']][1]:
+            best[row['topic']] = (row['message'], row['score'])
+    messages = dict(
+        ForumMessage.objects.filter(id__in=[message for message, _ in best.values() if message])
+        .values_list('id', 'content')
+    )
+
+    page = []
+    for topic_id, score in scores.items():
+        topic = topics.get(topic_id)
+        if topic is None:
+            continue
+        message_id = best.get(topic_id, (None, 0))[0]
+        text = messages.get(message_id, '') if message_id else topic.content
+        topic.search_score = score
+        topic.search_snippet = highlight(text, terms)
+        page.append(topic)
+    return page
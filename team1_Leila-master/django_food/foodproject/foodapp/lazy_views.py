@@ -0,0 +1,68 @@
+"""
+Chargement paresseux des vues.
+
+``urls.py`` référence les vues via ``LazyModule('foodapp.views')`` : le module
+n'est importé qu'à la première requête qui en a besoin, ce qui retire
+``views.py`` (et ``formtools``, les formulaires...) du démarrage.
+
+Les vues asynchrones doivent rester importées normalement : Django détecte
+``async def`` sur l'objet enregistré dans l'URLconf.
+"""
+import threading
+
+from django.utils.module_loading import import_string
+
+
+class LazyView:
+    """Vue importée (ou construite par ``loader``) au premier appel."""
+
+    def __init__(self, dotted_path, loader=None):
+        module, _, name = dotted_path.rpartition('.')
+        # Utilisés par ResolverMatch et URLPattern.lookup_str sans importer la vue
+        self.__module__ = module
+        self.__name__ = self.__qualname__ = name
+        self._dotted_path = dotted_path
+        self._loader = loader
+        self._view = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._view is None:
+            with self._lock:
+                if self._view is None:
+                    self._view = self._loader() if self._loader else import_string(self._dotted_path)
+        return self._view
+
+    @property
+    def loaded(self):
+        return self._view is not None
+
+    def __call__(self, request, *args, **kwargs):
+        return self.resolve()(request, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Attributs posés par les décorateurs (csrf_exempt, ...) que lisent les
+        # middlewares juste avant l'appel. ``view_class`` est exclu pour que
+        # le calcul des chemins de vues n'importe rien.
+        if name.startswith('__') or name in ('view_class', '_view', '_loader', '_dotted_path'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        state = 'chargée' if self.loaded else 'non chargée'
+        return f'<LazyView {self._dotted_path} ({state})>'
+
+
+class LazyModule:
+    """``LazyModule('foodapp.views').index`` renvoie une ``LazyView``."""
+
+    def __init__(self, module_path):
+        self._module_path = module_path
+        self._views = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._views:
+            self._views[name] = LazyView(f'{self._module_path}.{name}')
+        return self._views[name]
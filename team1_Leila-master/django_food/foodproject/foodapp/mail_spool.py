@@ -0,0 +1,267 @@
+"""
+Spool des emails sortants.
+
+Les messages sont rendus depuis des templates (``foodapp/emails/<nom>_subject.txt``,
+``<nom>.txt`` et éventuellement ``<nom>.html``), enregistrés dans la table
+``SpooledEmail`` puis envoyés par lots sur une seule connexion
+(``get_connection().send_messages``) par la tâche ``flush_mail_spool``.
+
+- Déduplication : une clé (ex. ``review:12:published``) combinée au
+  destinataire est unique ; remettre le même message en file est sans effet.
+- Débit : ``RATE_PER_MINUTE`` limite le nombre de messages envoyés.
+- Échecs : chaque message est envoyé séparément sur la connexion partagée,
+  de sorte qu'un échec au milieu d'un lot ne renvoie pas les messages déjà
+  partis ; le message fautif est rejoué après un délai exponentiel
+  (``next_attempt_at``), puis marqué en échec après ``MAX_ATTEMPTS`` essais.
+- Conservation : le contenu des messages envoyés est effacé après
+  ``SENT_RETENTION_DAYS`` jours (la clé de déduplication est conservée).
+- Tests : ``BACKEND`` / ``FILE_PATH`` permettent d'écrire les messages dans des
+  fichiers (backend ``filebased``) au lieu de les envoyer.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import SpooledEmail
+from .task_queue import backoff_delay, schedule
+
+logger = logging.getLogger('foodapp.mail')
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    # 0 : pas de limite
+    'RATE_PER_MINUTE': 600,
+    'MAX_ATTEMPTS': 3,
+    # Délai avant le n-ième nouvel essai d'un message : RETRY_BACKOFF * 2**(n-1), plafonné
+    'RETRY_BACKOFF': 60,
+    'RETRY_BACKOFF_MAX': 3600,
+    'SENT_RETENTION_DAYS': 7,
+    # None : EMAIL_BACKEND
+    'BACKEND': None,
+    'FILE_PATH': None,
+    # Lot réservé par un worker arrêté brutalement : remis en file après ce délai
+    'STALE_SECONDS': 600,
+    'TEMPLATE_DIR': 'foodapp/emails',
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'MAIL_SPOOL', {})}
+
+
+def render_message(template, context):
+    """Rend le sujet, le texte et le HTML (optionnel) d'un template d'email."""
+    directory = get_config()['TEMPLATE_DIR']
+    subject = render_to_string(f'{directory}/{template}_subject.txt', context)
+    body = render_to_string(f'{directory}/{template}.txt', context)
+    try:
+        html_body = render_to_string(f'{directory}/{template}.html', context)
+    except TemplateDoesNotExist:
+        html_body = ''
+    # Un sujet sur plusieurs lignes casserait l'en-tête
+    return ' '.join(subject.split()), body, html_body
+
+
+def dedup_hash(key, recipient):
+    return hashlib.sha256(f'{key}:{recipient.strip().lower()}'.encode()).hexdigest()
+
+
+def spool_many(template, items, from_email=None):
+    """
+    Met en file un message par élément ``(destinataire, contexte, clé de déduplication)``.
+    Les doublons (même clé, même destinataire) sont ignorés. L'envoi est
+    déclenché après le commit de la transaction courante. Renvoie le nombre de
+    messages réellement mis en file.
+    """
+    items = [(recipient, context, dedup_hash(key, recipient) if key else None)
+             for recipient, context, key in items if recipient]
+    keys = [key for _, _, key in items if key]
+    seen = set(SpooledEmail.objects.filter(dedup_key__in=keys).values_list('dedup_key', flat=True))
+    rows = []
+    for recipient, context, dedup_key in items:
+        if dedup_key:
+            if dedup_key in seen:
+                continue
+            seen.add(dedup_key)
+        subject, body, html_body = render_message(template, context or {})
+        rows.append(SpooledEmail(
+            template=template,
+            to_email=recipient,
+            from_email=from_email or '',
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            dedup_key=dedup_key,
+        ))
+    if not rows:
+        return 0
+
+    # ignore_conflicts : mise en file concurrente du même message
+    SpooledEmail.objects.bulk_create(rows, ignore_conflicts=True)
+    transaction.on_commit(lambda: schedule('foodapp.tasks.flush_mail_spool'))
+    return len(rows)
+
+
+def spool_mail(template, recipient, context=None, dedup_key=None, from_email=None):
+    """Met en file un seul message (voir ``spool_many``)."""
+    return spool_many(template, [(recipient, context, dedup_key)], from_email=from_email)
+
+
+class RateLimiter:
+    """Espace les envois pour ne pas dépasser ``per_minute`` messages par minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self.next_slot = time.monotonic()
+
+    def wait(self, count=1):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_slot > now:
+            time.sleep(self.next_slot - now)
+        self.next_slot = max(self.next_slot, now) + self.interval * count
+
+
+def open_connection(config=None):
+    config = config or get_config()
+    kwargs = {'file_path': config['FILE_PATH']} if config['FILE_PATH'] else {}
+    return get_connection(config['BACKEND'], **kwargs)
+
+
+def claim(batch_size, template=None):
+    """Réserve un lot de messages en file (UPDATE conditionnel, sûr entre workers)."""
+    queued = SpooledEmail.objects.filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()),
+        status=SpooledEmail.STATUS_QUEUED,
+    )
+    if template is not None:
+        queued = queued.filter(template=template)
+    ids = list(queued.order_by('id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return None
+    token = uuid.uuid4().hex
+    SpooledEmail.objects.filter(id__in=ids, status=SpooledEmail.STATUS_QUEUED).update(
+        status=SpooledEmail.STATUS_SENDING, batch_token=token, claimed_at=timezone.now(),
+    )
+    return list(SpooledEmail.objects.filter(batch_token=token, status=SpooledEmail.STATUS_SENDING).order_by('id'))
+
+
+def _build(row, connection):
+    message = EmailMultiAlternatives(
+        row.subject, row.body, row.from_email or settings.DEFAULT_FROM_EMAIL, [row.to_email],
+        connection=connection,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts, config):
+    return backoff_delay(attempts, {'BACKOFF_BASE': config['RETRY_BACKOFF'], 'BACKOFF_MAX': config['RETRY_BACKOFF_MAX']})
+
+
+def _mark_sent(rows):
+    SpooledEmail.objects.filter(id__in=[row.id for row in rows]).update(
+        status=SpooledEmail.STATUS_SENT, sent_at=timezone.now(), batch_token='',
+    )
+
+
+def _mark_failed(row, error, config):
+    """Compte l'essai raté ; renvoie la date du prochain essai (None si le message est abandonné)."""
+    attempts = row.attempts + 1
+    retry_at = None
+    if attempts < config['MAX_ATTEMPTS']:
+        retry_at = timezone.now() + timedelta(seconds=retry_delay(attempts, config))
+    SpooledEmail.objects.filter(id=row.id).update(
+        status=SpooledEmail.STATUS_QUEUED if retry_at else SpooledEmail.STATUS_FAILED,
+        attempts=attempts, last_error=str(error), batch_token='', next_attempt_at=retry_at,
+    )
+    return retry_at
+
+
+def _release(rows):
+    """Remet en file, sans compter d'essai, des messages réservés mais pas tentés."""
+    SpooledEmail.objects.filter(id__in=[row.id for row in rows]).update(
+        status=SpooledEmail.STATUS_QUEUED, batch_token='',
+    )
+
+
+def purge_sent_bodies(config=None):
+    """Efface le contenu des messages envoyés depuis plus de ``SENT_RETENTION_DAYS`` jours."""
+    config = config or get_config()
+    cutoff = timezone.now() - timedelta(days=config['SENT_RETENTION_DAYS'])
+    return SpooledEmail.objects.filter(status=SpooledEmail.STATUS_SENT, sent_at__lt=cutoff).exclude(
+        body='', html_body='').update(body='', html_body='')
+
+
+def flush(batch_size=None, max_batches=None, limiter=None, config=None, template=None):
+    """
+    Envoie les messages en file, par lots, sur une seule connexion.
+    ``config`` complète ``MAIL_SPOOL`` et ``template`` restreint l'envoi à un
+    type de message. Renvoie ``{'sent', 'failed', 'batches', 'seconds'}``
+    (``failed`` : essais ratés, rejoués plus tard ou abandonnés).
+    """
+    config = {**get_config(), **(config or {})}
+    batch_size = batch_size or config['BATCH_SIZE']
+    limiter = limiter or RateLimiter(config['RATE_PER_MINUTE'])
+    stats = {'sent': 0, 'failed': 0, 'batches': 0}
+    start = time.perf_counter()
+    next_retry = None
+
+    stale = timezone.now() - timedelta(seconds=config['STALE_SECONDS'])
+    SpooledEmail.objects.filter(status=SpooledEmail.STATUS_SENDING, claimed_at__lt=stale).update(
+        status=SpooledEmail.STATUS_QUEUED, batch_token='',
+    )
+
+    connection = open_connection(config)
+    with connection:
+        while max_batches is None or stats['batches'] < max_batches:
+            rows = claim(batch_size, template)
+            if rows is None:
+                break
+            if not rows:
+                continue  # lot pris par un autre worker
+            stats['batches'] += 1
+            limiter.wait(len(rows))
+
+            sent = []
+            for position, row in enumerate(rows):
+                try:
+                    connection.send_messages([_build(row, connection)])
+                except Exception as e:
+                    logger.warning("Échec de l'envoi à %s (%s)", row.to_email, e)
+                    # Les messages déjà partis sont marqués avant de rouvrir la connexion
+                    _mark_sent(sent)
+                    stats['sent'] += len(sent)
+                    sent = []
+                    retry_at = _mark_failed(row, e, config)
+                    stats['failed'] += 1
+                    if retry_at and (next_retry is None or retry_at < next_retry):
+                        next_retry = retry_at
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception:
+                        _release(rows[position + 1:])
+                        raise
+                else:
+                    sent.append(row)
+            _mark_sent(sent)
+            stats['sent'] += len(sent)
+
+    if next_retry:
+        schedule('foodapp.tasks.flush_mail_spool', countdown=(next_retry - timezone.now()).total_seconds())
+    purge_sent_bodies(config)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
@@ -0,0 +1,214 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from foodapp.models import Restaurant, RestaurantAccount, Dish, Order, OrderItem, Review, Reservation
+from foodapp.query_inspector import QueryRecorder
+from collections import Counter
+import json
+import os
+import platform
+import statistics
+import time
+
+
+def percentile(values, pct):
+    """Percentile par interpolation linéaire (values doit être non vide)."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class ScenarioSkipped(Exception):
+    """Scénario impossible à mesurer (données ou page manquantes)."""
+
+
+class Command(BaseCommand):
+    help = 'Mesure la latence (p50/p95) et le nombre de requêtes SQL des vues principales'
+
+    SCENARIOS = ['accueil', 'dish_list', 'get_dishes', 'get_restaurants',
+                 'restaurant_stats', 'kitchen_dashboard', 'create_order']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help='Mesures par scénario')
+        parser.add_argument('--warmup', type=int, default=3, help='Requêtes de chauffe ignorées')
+        parser.add_argument('--only', nargs='+', choices=self.SCENARIOS, help='Scénarios à exécuter')
+        parser.add_argument('--output', type=str, help='Fichier JSON de résultats (défaut : logs/bench/...)')
+        parser.add_argument('--compare', type=str, help='Fichier JSON d\'une exécution précédente à comparer')
+
+    def handle(self, *args, **options):
+        owner_account = self.pick_owner_account()
+        self.client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        self.owner_client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        if owner_account:
+            self.owner_client.force_login(owner_account.user)
+        self.owner_account = owner_account
+
+        results = {}
+        for name in options['only'] or self.SCENARIOS:
+            try:
+                scenario = getattr(self, f'scenario_{name}')()
+                if scenario is None:
+                    raise ScenarioSkipped('données manquantes, lancez seed_bench')
+            except ScenarioSkipped as e:
+                self.stdout.write(self.style.WARNING(f'{name}: ignoré ({e})'))
+                continue
+            results[name] = self.run(name, scenario, options['iterations'], options['warmup'])
+
+        report = {'meta': self.metadata(options), 'results': results}
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'logs', 'bench', f"bench_{timezone.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'Résultats enregistrés dans {output}'))
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+        failed = [name for name, result in results.items() if 'error' in result]
+        if failed:
+            raise CommandError(f"Réponses en erreur, scénarios non mesurés : {', '.join(failed)}")
+
+    # Préparation
+
+    def pick_owner_account(self):
+        """Compte propriétaire actif du restaurant ayant le plus de commandes."""
+        restaurant = (Restaurant.objects.filter(account__is_active=True)
+                      .annotate(order_count=Count('orders')).order_by('-order_count').first())
+        if restaurant is None:
+            return None
+        return RestaurantAccount.objects.select_related('user', 'restaurant').get(restaurant=restaurant)
+
+    def metadata(self, options):
+        return {
+            'date': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'dataset': {
+                'restaurants': Restaurant.objects.count(),
+                'dishes': Dish.objects.count(),
+                'orders': Order.objects.count(),
+                'order_items': OrderItem.objects.count(),
+                'reviews': Review.objects.count(),
+                'reservations': Reservation.objects.count(),
+            },
+        }
+
+    # Scénarios : chacun retourne une fonction sans argument qui exécute une requête
+
+    def scenario_accueil(self):
+        url = reverse('accueil')
+        return lambda: self.client.get(url)
+
+    def scenario_dish_list(self):
+        url = reverse('dish_list')
+        return lambda: self.client.get(url, {'sort': 'name'})
+
+    def scenario_get_dishes(self):
+        url = reverse('api_dishes')
+        return lambda: self.client.get(url, {'limit': 50})
+
+    def scenario_get_restaurants(self):
+        url = reverse('api_restaurants')
+        return lambda: self.client.get(url, {'limit': 50})
+
+    def scenario_restaurant_stats(self):
+        if not self.owner_account:
+            return None
+        url = reverse('restaurant_stats')
+        return lambda: self.owner_client.get(url)
+
+    def scenario_kitchen_dashboard(self):
+        if not self.owner_account:
+            return None
+        try:
+            get_template('foodapp/kitchen_dashboard.html')
+        except TemplateDoesNotExist:
+            raise ScenarioSkipped('template foodapp/kitchen_dashboard.html absent')
+        url = reverse('kitchen_dashboard', args=[self.owner_account.restaurant_id])
+        return lambda: self.owner_client.get(url)
+
+    def scenario_create_order(self):
+        if not self.owner_account:
+            return None
+        dish_ids = list(Dish.objects.filter(restaurant_id=self.owner_account.restaurant_id)
+                        .values_list('id', flat=True)[:3])
+        if not dish_ids:
+            return None
+        url = reverse('create_order')
+        payload = json.dumps({
+            'restaurant_id': self.owner_account.restaurant_id,
+            'items': [{'dish_id': dish_id, 'quantity': 1} for dish_id in dish_ids],
+            'table_number': 'B1',
+        })
+        return lambda: self.owner_client.post(url, payload, content_type='application/json')
+
+    # Exécution
+
+    def run(self, name, request, iterations, warmup):
+        """
+        Mesure ``iterations`` requêtes après ``warmup`` requêtes de chauffe.
+        Une seule réponse hors 2xx/3xx invalide le scénario : seuls les statuts
+        sont enregistrés, pas de temps comparables à une page d'erreur.
+        """
+        statuses = Counter()
+        for _ in range(warmup):
+            statuses[str(request().status_code)] += 1
+
+        timings, query_counts = [], []
+        for _ in range(iterations):
+            recorder = QueryRecorder(capture_stack=False)
+            with recorder.install():
+                start = time.perf_counter()
+                response = request()
+                timings.append((time.perf_counter() - start) * 1000)
+            query_counts.append(len(recorder.queries))
+            statuses[str(response.status_code)] += 1
+
+        if not all(code.startswith(('2', '3')) for code in statuses):
+            self.stdout.write(self.style.ERROR(f"{name:20} réponses en erreur, non mesuré  statuts {dict(statuses)}"))
+            return {'error': 'réponses hors 2xx/3xx', 'statuses': dict(statuses)}
+
+        result = {
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries_p50': percentile(query_counts, 50),
+            'queries_max': max(query_counts),
+            'statuses': dict(statuses),
+        }
+        line = (f"{name:20} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                f"requêtes {result['queries_p50']:6.0f} (max {result['queries_max']})  statuts {dict(statuses)}")
+        self.stdout.write(line)
+        return result
+
+    def compare(self, path, results):
+        try:
+            with open(path, encoding='utf-8') as f:
+                previous = json.load(f)['results']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Impossible de lire {path}: {e}')
+
+        self.stdout.write(f'\nComparaison avec {path}')
+        for name, current in results.items():
+            before = previous.get(name)
+            # Scénario absent ou en erreur dans l'une des deux exécutions
+            if not before or 'error' in before or 'error' in current:
+                continue
+            deltas = []
+            for key in ('p50_ms', 'p95_ms', 'queries_p50'):
+                if before[key]:
+                    change = (current[key] - before[key]) / before[key] * 100
+                    deltas.append(f'{key} {before[key]:.1f} -> {current[key]:.1f} ({change:+.0f}%)')
+            self.stdout.write(f'{name:20} ' + '  '.join(deltas))
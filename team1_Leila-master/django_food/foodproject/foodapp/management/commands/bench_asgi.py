@@ -0,0 +1,150 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# Même jeu de données, même pagination : seule la pile de service change
+TARGETS = {
+    'wsgi': {
+        'app': 'foodproject.wsgi:application',
+        'worker_class': 'gthread',
+        'paths': {'dishes': '/api/dishes/?limit=50', 'restaurants': '/api/restaurants/?limit=50'},
+    },
+    'asgi': {
+        'app': 'foodproject.asgi:application',
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'paths': {'dishes': '/api/async/dishes/?limit=50', 'restaurants': '/api/async/restaurants/?limit=50'},
+    },
+}
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Compare le débit WSGI (gthread) et ASGI (uvicorn) des API JSON sous charge concurrente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Workers gunicorn par serveur')
+        parser.add_argument('--threads', type=int, default=4, help='Threads par worker WSGI')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64],
+                            help='Nombres de clients simultanés à tester')
+        parser.add_argument('--duration', type=float, default=10.0, help='Durée de chaque palier (s)')
+        parser.add_argument('--endpoint', choices=['dishes', 'restaurants'], default='dishes')
+        parser.add_argument('--output', type=str, help='Fichier JSON de résultats')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, target in TARGETS.items():
+            port = free_port()
+            server = self.start_server(target, port, options)
+            try:
+                self.wait_ready(port, target['paths'][options['endpoint']], server)
+                results[name] = {}
+                for clients in options['concurrency']:
+                    stats = self.load(port, target['paths'][options['endpoint']], clients, options['duration'])
+                    results[name][str(clients)] = stats
+                    self.stdout.write(
+                        f"{name} {clients:>4} clients : {stats['rps']:8.1f} req/s  "
+                        f"p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms  erreurs {stats['errors']}"
+                    )
+            finally:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'logs', 'bench', f"asgi_vs_wsgi_{timezone.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'options': {k: options[k] for k in ('workers', 'threads', 'duration', 'endpoint')},
+                       'results': results}, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Résultats enregistrés dans {output}'))
+
+    def start_server(self, target, port, options):
+        cmd = [
+            sys.executable, '-m', 'gunicorn', target['app'],
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(options['workers']),
+            '--worker-class', target['worker_class'],
+            '--threads', str(options['threads']),
+            '--log-level', 'warning',
+        ]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'foodproject.settings'))
+        try:
+            return subprocess.Popen(cmd, cwd=settings.BASE_DIR, env=env)
+        except OSError as e:
+            raise CommandError(f'Impossible de lancer gunicorn ({e}) : pip install -r requirements-server.txt')
+
+    def wait_ready(self, port, path, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('Le serveur s\'est arrêté au démarrage (gunicorn/uvicorn installés ?)')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                conn.request('GET', path)
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Serveur injoignable sur le port {port}')
+
+    def load(self, port, path, clients, duration):
+        """Chaque client réutilise sa connexion keep-alive et enchaîne les requêtes."""
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client():
+            local, local_errors = [], 0
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    conn.request('GET', path)
+                    response = conn.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        local_errors += 1
+                except (OSError, http.client.HTTPException):
+                    local_errors += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                    continue
+                local.append((time.perf_counter() - start) * 1000)
+            conn.close()
+            with lock:
+                latencies.extend(local)
+                errors[0] += local_errors
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            for _ in range(clients):
+                executor.submit(client)
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+            'p50_ms': round(statistics.median(latencies), 2) if latencies else 0,
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 2) if latencies else 0,
+            'errors': errors[0],
+        }
@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, F
+from foodapp.models import Dish
+from cpp_modules import food_processor
+import random
+import time
+
+# Équivalent ORM de chaque tri (price_range est trié comme du texte : H < L < M)
+ORM_ORDERING = {
+    'name': ['name'],
+    'price_asc': ['price_range', 'name'],
+    'price_desc': ['-price_range', 'name'],
+    'rating': [F('sort_rating').desc(nulls_last=True), 'name'],
+}
+
+SYNTHETIC_NAMES = ['Tajine', 'Couscous', 'Pastilla', 'Harira', 'Éclair', 'Zaalouk', 'Rfissa', 'Msemen', 'Briouate']
+SYNTHETIC_PRICES = ['L', 'M', 'H', '$$', '45', None]
+
+
+class SyntheticDish:
+    __slots__ = ('pk',)
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class Command(BaseCommand):
+    help = 'Compare le tri des plats (C++, NumPy, Python) avec order_by de l\'ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=list(food_processor.SORT_KEYS), default=None,
+                            help='Tri mesuré (défaut : tous)')
+        parser.add_argument('--repeat', type=int, default=5, help='Répétitions (meilleur temps retenu)')
+        parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                            help='Mesurer aussi sur N plats générés en mémoire')
+
+    def handle(self, *args, **options):
+        sorts = [options['sort']] if options['sort'] else list(food_processor.SORT_KEYS)
+        backends = food_processor.available_backends()
+        self.repeat = options['repeat']
+        self.stdout.write(f"Implémentations disponibles : {', '.join(backends)}")
+
+        count = Dish.objects.count()
+        self.stdout.write(f'\nTable Dish ({count} plats) : objets triés, requêtes comprises')
+        for sort_by in sorts:
+            self.row(sort_by, 'ORM order_by', self.best(lambda: self.orm_sorted(sort_by)))
+            for backend in backends:
+                self.row(sort_by, backend, self.best(
+                    lambda: food_processor.sorted_dishes(Dish.objects.all(), sort_by, backend=backend)
+                ))
+
+        if options['synthetic']:
+            self.synthetic(options['synthetic'], sorts, backends)
+
+    def best(self, func):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def row(self, sort_by, label, seconds):
+        self.stdout.write(f'  {sort_by:12} {label:14} {seconds * 1000:10.2f} ms')
+
+    def orm_sorted(self, sort_by):
+        queryset = Dish.objects.all()
+        if sort_by == 'rating':
+            queryset = queryset.annotate(sort_rating=Avg('restaurant__reviews__rating'))
+        return list(queryset.order_by(*ORM_ORDERING[sort_by]))
+
+    def synthetic(self, n, sorts, backends):
+        rng = random.Random(42)
+        columns = food_processor.DishColumns.from_rows(
+            (i, f'{rng.choice(SYNTHETIC_NAMES)} {rng.randint(0, n)}', rng.choice(SYNTHETIC_PRICES),
+             rng.choice([None, 1, 2, 3, 4, 5]))
+            for i in range(n)
+        )
+        self.stdout.write(f'\n{n} plats en mémoire : tri seul')
+        for sort_by in sorts:
+            reference = None
+            for backend in backends:
+                order = food_processor.sort_order(columns, sort_by, backend=backend)
+                if reference is None:
+                    reference = order
+                elif order != reference:
+                    self.stderr.write(f'{backend} : ordre différent pour {sort_by}')
+                self.row(sort_by, backend, self.best(lambda: food_processor.sort_order(columns, sort_by, backend)))
+
+        # Remise en ordre des objets : table id -> position contre list.index (O(n²))
+        ids = food_processor.sorted_ids(columns, sorts[0])
+        objects = [SyntheticDish(pk) for pk in columns.ids]
+        self.stdout.write('\nRemise en ordre des objets')
+        self.row('', 'position_map', self.best(lambda: food_processor.reorder(objects, ids)))
+        sample = min(n, 5000)
+        sample_ids, sample_objects = ids[:sample], [SyntheticDish(pk) for pk in ids[:sample]]
+        rng.shuffle(sample_objects)
+        seconds = self.best(lambda: sorted(sample_objects, key=lambda x: sample_ids.index(x.pk)))
+        self.row('', 'list.index', seconds)
+        self.stdout.write(f'  (list.index mesuré sur {sample} objets seulement)')
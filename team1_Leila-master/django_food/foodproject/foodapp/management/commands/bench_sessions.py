@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.test import Client
+from django.urls import reverse
+from foodapp.query_inspector import QueryRecorder
+import re
+
+WRITE_RE = re.compile(r'^\s*(INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+def session_io(queries, table=None):
+    """Nombre de lectures et d'écritures SQL touchant la table des sessions."""
+    table = (table or Session._meta.db_table).lower()
+    reads = writes = 0
+    for query in queries:
+        sql = query['sql']
+        if table not in sql.lower():
+            continue
+        if WRITE_RE.match(sql):
+            writes += 1
+        else:
+            reads += 1
+    return reads, writes
+
+
+class Command(BaseCommand):
+    help = 'Compte les lectures/écritures de la table des sessions par page vue (anonyme et connectée)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=1000, help='Nombre de pages vues par scénario')
+        parser.add_argument('--url', type=str, default=None, help='Chemin à charger (défaut : accueil)')
+        parser.add_argument('--user', type=str, default=None,
+                            help='Utilisateur du scénario connecté (défaut : premier utilisateur actif)')
+
+    def handle(self, *args, **options):
+        url = options['url'] or reverse('accueil')
+        views = options['views']
+
+        # Nouveau visiteur à chaque page (sans cookies) puis visiteur qui revient
+        returning = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        scenarios = {
+            'nouveaux visiteurs': lambda: Client(HTTP_HOST='localhost', raise_request_exception=False),
+            'visiteur récurrent': lambda: returning,
+        }
+
+        users = User.objects.filter(is_active=True)
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.order_by('id').first()
+        if user:
+            logged_in = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            logged_in.force_login(user)
+            scenarios['utilisateur connecté'] = lambda: logged_in
+        elif options['user']:
+            raise CommandError(f"Utilisateur introuvable : {options['user']}")
+
+        self.stdout.write(f'Moteur de sessions : {settings.SESSION_ENGINE}')
+
+        sessions_before = Session.objects.count()
+        for name, get_client in scenarios.items():
+            reads = writes = 0
+            statuses = set()
+            for _ in range(views):
+                client = get_client()
+                recorder = QueryRecorder(capture_stack=False)
+                with recorder.install():
+                    response = client.get(url)
+                statuses.add(response.status_code)
+                r, w = session_io(recorder.queries)
+                reads += r
+                writes += w
+
+            per_thousand = 1000 / views if views else 0
+            self.stdout.write(
+                f'{name:20} {views} vues : {writes} écritures, {reads} lectures de session '
+                f'({writes * per_thousand:.1f} écritures et {reads * per_thousand:.1f} lectures / 1000 vues, '
+                f'{(reads + writes) / views if views else 0:.2f} accès / requête)  statuts {sorted(statuses)}'
+            )
+
+        created = Session.objects.count() - sessions_before
+        self.stdout.write(self.style.SUCCESS(f'Lignes de session créées : {created}'))
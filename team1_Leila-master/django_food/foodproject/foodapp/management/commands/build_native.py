@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from foodapp.native import NativeError
+from cpp_modules import food_processor
+
+
+class Command(BaseCommand):
+    help = "Compile à l'avance les bibliothèques C++ chargées pendant les requêtes (tri des plats)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Recompiler même si le binaire est en cache')
+
+    def handle(self, *args, **options):
+        try:
+            path, compiled = food_processor.build_native(force=options['force'])
+        except NativeError as e:
+            raise CommandError(f'{e}\n{e.output}'.strip())
+        state = 'compilée' if compiled else 'déjà en cache'
+        self.stdout.write(self.style.SUCCESS(f'Tri des plats : bibliothèque {state}, installée dans {path}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from foodapp import pairings
+from foodapp.models import Dish
+
+
+class Command(BaseCommand):
+    help = "Recalcule les plats souvent commandés ensemble à partir des commandes payées ou livrées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None, help="Nombre de voisins gardés par plat")
+        parser.add_argument('--min-support', type=int, default=None,
+                            help="Nombre minimal de commandes communes pour retenir une paire")
+        parser.add_argument('--dish', type=int, default=None,
+                            help="Afficher ensuite les plats associés à ce plat")
+
+    def handle(self, *args, **options):
+        config = pairings.get_config()
+        if options['top_k']:
+            config['TOP_K'] = options['top_k']
+        if options['min_support']:
+            config['MIN_SUPPORT'] = options['min_support']
+
+        scopes, rows = pairings.rebuild(config)
+        self.stdout.write(self.style.SUCCESS(f'{rows} association(s) écrite(s) pour {scopes} restaurant(s)/ville(s)'))
+
+        if options['dish']:
+            dish = Dish.objects.get(pk=options['dish'])
+            self.stdout.write(f'Souvent commandés avec « {dish.name} » :')
+            for paired in pairings.paired_dishes(dish, limit=config['TOP_K']):
+                self.stdout.write(f'  #{paired.id} {paired.name}')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from foodapp import similar_dishes
+from foodapp.models import Dish
+
+
+class Command(BaseCommand):
+    help = "Met à jour les plats similaires (plats modifiés seulement, ou tout le catalogue avec --full)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Tout recalculer, IDF comprises (après un import massif par exemple)")
+        parser.add_argument('--dish', type=int, default=None,
+                            help="Afficher ensuite les plats similaires à ce plat")
+
+    def handle(self, *args, **options):
+        if options['full']:
+            dishes = similar_dishes.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'{dishes} plat(s) recalculé(s)'))
+        else:
+            changed, recomputed = similar_dishes.refresh()
+            self.stdout.write(self.style.SUCCESS(
+                f'{changed} plat(s) modifié(s), {recomputed} liste(s) de voisins recalculée(s)'
+            ))
+
+        if options['dish']:
+            dish = Dish.objects.get(pk=options['dish'])
+            self.stdout.write(f'Plats similaires à « {dish.name} » :')
+            for similar in similar_dishes.similar_dishes(dish):
+                self.stdout.write(f'  #{similar.id} {similar.name}')
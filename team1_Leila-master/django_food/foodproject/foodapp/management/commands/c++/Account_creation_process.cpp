@@ -118,11 +118,42 @@ namespace Account {
     };
 }
 
+// Read one JSON account per line on stdin and write one JSON result per line
+// on stdout, followed by a {"summary": ...} line. Memory use does not grow
+// with the number of records.
+int run_stream() {
+    std::ios::sync_with_stdio(false);
+    std::string line;
+    long long processed = 0;
+    long long without_name = 0;
+
+    while (std::getline(std::cin, line)) {
+        if (line.empty()) continue;
+        Account::Account account = Account::Account::from_json(nlohmann::json::parse(line));
+        if (account.get_first_name().empty() && account.get_last_name().empty()) without_name++;
+        std::cout << account.to_json().dump() << '\n';
+        processed++;
+    }
+
+    nlohmann::json summary;
+    summary["processed"] = processed;
+    summary["without_name"] = without_name;
+    nlohmann::json response;
+    response["summary"] = summary;
+    std::cout << response.dump() << std::endl;
+    return 0;
+}
+
 int main(int argc, char* argv[]) {
     try {
+        // Streaming mode: NDJSON records on stdin, one result per line on stdout
+        if (argc >= 2 && std::string(argv[1]) == "--stream") {
+            return run_stream();
+        }
+
         // Check if a file path was provided
         if (argc < 2) {
-            std::cerr << "Usage: " << argv[0] << " <json_file_path>" << std::endl;
+            std::cerr << "Usage: " << argv[0] << " <json_file_path> | --stream" << std::endl;
             return 1;
         }
         
@@ -2,6 +2,9 @@
 #include <string>
 #include <vector>
 #include <fstream>
+#include <map>
+#include <algorithm>
+#include <cmath>
 
 // Include JSON library if available, otherwise use a simplified placeholder
 #ifndef NLOHMANN_JSON_VERSION_MAJOR
@@ -29,6 +32,22 @@ namespace nlohmann {
 using namespace std;
 
 namespace Order {
+    struct OrderItem {
+        string dish_name;
+        int quantity;
+        double price;
+
+        double subtotal() const { return quantity * price; }
+
+        static OrderItem from_json(const nlohmann::json& j) {
+            return OrderItem{
+                j.contains("dish_name") ? j["dish_name"].get<string>() : "",
+                j.contains("quantity") ? j["quantity"].get<int>() : 0,
+                j.contains("price") ? j["price"].get<double>() : 0.0
+            };
+        }
+    };
+
     class Order {
     private:
         int order_id;
@@ -44,6 +63,7 @@ namespace Order {
         bool is_takeaway;
         string created_at;
         string special_instructions;
+        vector<OrderItem> items;
 
     public:
         Order() {}
@@ -98,6 +118,24 @@ namespace Order {
         bool is_paid() const { return status == "paid"; }
         bool is_completed() const { return is_delivered() || is_paid(); }
 
+        // Items
+        const vector<OrderItem>& get_items() const { return items; }
+        void set_items(const vector<OrderItem>& items) { this->items = items; }
+        int item_count() const {
+            int count = 0;
+            for (const auto& item : items) count += item.quantity;
+            return count;
+        }
+        double items_total() const {
+            double total = 0.0;
+            for (const auto& item : items) total += item.subtotal();
+            return total;
+        }
+        // Total stored on the order differs from the sum of its items
+        bool has_total_mismatch() const {
+            return !items.empty() && std::fabs(items_total() - total_price) > 0.005;
+        }
+
         string to_string() const {
             return "Order ID: " + std::to_string(order_id) +
                 "\nUser ID: " + std::to_string(user_id) +
@@ -138,12 +176,15 @@ namespace Order {
             j["is_cancelled"] = is_cancelled();
             j["is_paid"] = is_paid();
             j["is_completed"] = is_completed();
+            j["item_count"] = item_count();
+            j["items_total"] = items_total();
+            j["total_mismatch"] = has_total_mismatch();
             return j;
         }
 
         // Create from JSON
         static Order from_json(const nlohmann::json& j) {
-            return Order(
+            Order order(
                 j.contains("order_id") ? j["order_id"].get<int>() : 0,
                 j.contains("user_id") ? j["user_id"].get<int>() : 0,
                 j.contains("restaurant_id") ? j["restaurant_id"].get<int>() : 0,
@@ -158,15 +199,89 @@ namespace Order {
                 j.contains("created_at") ? j["created_at"].get<string>() : "",
                 j.contains("special_instructions") ? j["special_instructions"].get<string>() : ""
             );
+            if (j.contains("items") && j["items"].is_array()) {
+                vector<OrderItem> items;
+                items.reserve(j["items"].size());
+                for (const auto& item_json : j["items"]) {
+                    items.push_back(OrderItem::from_json(item_json));
+                }
+                order.set_items(items);
+            }
+            return order;
         }
     };
 }
 
+// Read one JSON order per line on stdin and write one JSON result per line on
+// stdout, followed by a {"summary": ...} line with status counts, revenue and
+// the most ordered dishes. Only the per-dish totals are kept in memory.
+const size_t TOP_DISHES = 10;
+
+int run_stream() {
+    std::ios::sync_with_stdio(false);
+    std::string line;
+    long long processed = 0;
+    long long cancelled = 0;
+    long long items_processed = 0;
+    long long total_mismatches = 0;
+    double total_revenue = 0.0;
+    std::map<std::string, long long> dish_quantities;
+    std::map<std::string, long long> status_counts = {
+        {"new", 0}, {"pending", 0}, {"preparing", 0}, {"ready", 0},
+        {"delivered", 0}, {"cancelled", 0}, {"paid", 0}
+    };
+
+    while (std::getline(std::cin, line)) {
+        if (line.empty()) continue;
+        Order::Order order = Order::Order::from_json(nlohmann::json::parse(line));
+        status_counts[order.get_status()]++;
+        if (order.is_cancelled()) {
+            cancelled++;
+        } else {
+            total_revenue += order.get_total_price();
+        }
+        for (const auto& item : order.get_items()) {
+            dish_quantities[item.dish_name] += item.quantity;
+            items_processed++;
+        }
+        if (order.has_total_mismatch()) total_mismatches++;
+        std::cout << order.to_json().dump() << '\n';
+        processed++;
+    }
+
+    std::vector<std::pair<std::string, long long>> top_dishes(dish_quantities.begin(), dish_quantities.end());
+    size_t top = std::min(TOP_DISHES, top_dishes.size());
+    std::partial_sort(top_dishes.begin(), top_dishes.begin() + top, top_dishes.end(),
+                      [](const auto& a, const auto& b) { return a.second > b.second; });
+    top_dishes.resize(top);
+
+    nlohmann::json summary;
+    summary["processed"] = processed;
+    summary["status_counts"] = status_counts;
+    summary["total_revenue"] = total_revenue;
+    summary["average_order_value"] = processed > cancelled ? total_revenue / (processed - cancelled) : 0.0;
+    summary["items_processed"] = items_processed;
+    summary["total_mismatches"] = total_mismatches;
+    summary["top_dishes"] = nlohmann::json::array();
+    for (const auto& dish : top_dishes) {
+        summary["top_dishes"].push_back({{"dish_name", dish.first}, {"quantity", dish.second}});
+    }
+    nlohmann::json response;
+    response["summary"] = summary;
+    std::cout << response.dump() << std::endl;
+    return 0;
+}
+
 int main(int argc, char* argv[]) {
     try {
+        // Streaming mode: NDJSON records on stdin, one result per line on stdout
+        if (argc >= 2 && std::string(argv[1]) == "--stream") {
+            return run_stream();
+        }
+
         // Check if a file path was provided
         if (argc < 2) {
-            std::cerr << "Usage: " << argv[0] << " <json_file_path>" << std::endl;
+            std::cerr << "Usage: " << argv[0] << " <json_file_path> | --stream" << std::endl;
             return 1;
         }
         
@@ -2,6 +2,7 @@
 #include <string>
 #include <vector>
 #include <fstream>
+#include <map>
 #include <nlohmann/json.hpp>
 
 // If nlohmann/json.hpp is not available, use this simplified version
@@ -150,11 +151,43 @@ namespace Restaurant {
     };
 }
 
+// Read one JSON restaurant account per line on stdin and write one JSON result
+// per line on stdout, followed by a {"summary": ...} line with status counts.
+int run_stream() {
+    std::ios::sync_with_stdio(false);
+    std::string line;
+    long long processed = 0;
+    std::map<std::string, long long> status_counts = {
+        {"pending", 0}, {"approved", 0}, {"sanctioned", 0}, {"banned", 0}, {"rejected", 0}
+    };
+
+    while (std::getline(std::cin, line)) {
+        if (line.empty()) continue;
+        Restaurant::RestaurantAccount account = Restaurant::RestaurantAccount::from_json(nlohmann::json::parse(line));
+        status_counts[account.get_status()]++;
+        std::cout << account.to_json().dump() << '\n';
+        processed++;
+    }
+
+    nlohmann::json summary;
+    summary["processed"] = processed;
+    summary["status_counts"] = status_counts;
+    nlohmann::json response;
+    response["summary"] = summary;
+    std::cout << response.dump() << std::endl;
+    return 0;
+}
+
 int main(int argc, char* argv[]) {
     try {
+        // Streaming mode: NDJSON records on stdin, one result per line on stdout
+        if (argc >= 2 && std::string(argv[1]) == "--stream") {
+            return run_stream();
+        }
+
         // Check if a file path was provided
         if (argc < 2) {
-            std::cerr << "Usage: " << argv[0] << " <json_file_path>" << std::endl;
+            std::cerr << "Usage: " << argv[0] << " <json_file_path> | --stream" << std::endl;
             return 1;
         }
         
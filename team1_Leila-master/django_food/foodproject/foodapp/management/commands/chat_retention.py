@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from foodapp import chat_history
+from foodapp.models import ChatSession
+
+
+class Command(BaseCommand):
+    help = "Archive l'historique ancien des sessions de chat et supprime les sessions expirées (CHAT_HISTORY)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions traitées par lot')
+        parser.add_argument('--all', action='store_true',
+                            help='Compacter toutes les sessions (contexte trop long compris), pas seulement celles '
+                                 'dont des messages sont à archiver')
+        parser.add_argument('--skip-compaction', action='store_true', help='Ne pas archiver les messages')
+        parser.add_argument('--skip-purge', action='store_true', help='Ne pas supprimer les sessions expirées')
+        parser.add_argument('--dry-run', action='store_true', help='Compter sans rien modifier')
+
+    def handle(self, *args, **options):
+        config = chat_history.get_config()
+        batch_size = options['batch_size']
+
+        if not options['skip_compaction']:
+            if not options['dry_run']:
+                converted = chat_history.convert_legacy_archives(config)
+                if converted:
+                    self.stdout.write(f'{converted} archive(s) déplacée(s) hors de MEDIA_ROOT')
+            sessions = ChatSession.objects.order_by('id') if options['all'] else chat_history.sessions_to_compact(config=config)
+            if options['dry_run']:
+                self.stdout.write(f'{sessions.count()} session(s) à compacter')
+            else:
+                compacted = archived = 0
+                last_id = 0
+                while True:
+                    # Pagination par id : les sessions compactées sortent de la requête
+                    batch = list(sessions.filter(id__gt=last_id)[:batch_size])
+                    if not batch:
+                        break
+                    for chat_session in batch:
+                        count = chat_history.compact_session(chat_session, config=config)
+                        archived += count
+                        compacted += bool(count)
+                    last_id = batch[-1].id
+                self.stdout.write(self.style.SUCCESS(
+                    f'{archived} message(s) de {compacted} session(s) archivé(s) dans {chat_history.archive_dir(config)}'
+                ))
+
+        if not options['skip_purge']:
+            expired = chat_history.expired_sessions(config=config)
+            if options['dry_run']:
+                self.stdout.write(f'{expired.count()} session(s) expirée(s) à supprimer')
+                return
+            deleted = 0
+            while True:
+                ids = list(expired.values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                deleted += chat_history.delete_sessions(ids, config=config)
+            self.stdout.write(self.style.SUCCESS(f'{deleted} session(s) expirée(s) supprimée(s)'))
@@ -0,0 +1,130 @@
+from django.core.management.base import BaseCommand, CommandError
+from foodapp import chatbot
+from foodapp.answer_cache import AnswerCache, cached_answer
+from foodapp.models import ChatbotKnowledge
+from foodapp.text_search import normalize
+import json
+import os
+import random
+import statistics
+import time
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot_eval.json')
+
+SYNTHETIC_WORDS = ['tajine', 'couscous', 'harira', 'pastilla', 'souk', 'épices', 'menthe', 'citron', 'amandes',
+                   'agneau', 'poulet', 'safran', 'cumin', 'pain', 'miel', 'dattes', 'olive', 'argan', 'thé',
+                   'marché', 'fête', 'ramadan', 'recette', 'cuisson', 'four', 'feu', 'famille', 'tradition']
+
+
+class Command(BaseCommand):
+    help = 'Évalue le moteur de réponse du chatbot (pertinence et latence) sur un jeu de questions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=str, default=DEFAULT_QUERIES,
+                            help='Fichier JSON : [{"query", "language", "expected": [termes]}]')
+        parser.add_argument('--k', type=int, default=None, help='Nombre de passages (défaut : CHATBOT TOP_K)')
+        parser.add_argument('--repeat', type=int, default=20, help='Répétitions de chaque question pour la latence')
+        parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                            help='Ajouter N fiches générées à l\'index (mesure de latence à plus grande échelle)')
+        parser.add_argument('--verbose', action='store_true', help='Afficher les résultats de chaque question')
+        parser.add_argument('--cache', action='store_true',
+                            help='Rejouer les questions et des variantes (casse, accents, ponctuation) '
+                                 'à travers le cache des réponses')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['queries'], encoding='utf-8') as f:
+                queries = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Jeu de questions illisible : {e}')
+
+        k = options['k'] or chatbot.get_config()['TOP_K']
+        index = chatbot.KnowledgeIndex()
+        start = time.perf_counter()
+        index.refresh(force=True)
+        self.stdout.write(f'Index construit : {len(index)} fiche(s), {len(index.postings)} terme(s) '
+                          f'en {(time.perf_counter() - start) * 1000:.1f} ms')
+        if not len(index):
+            self.stdout.write(self.style.WARNING('Aucune fiche ChatbotKnowledge : seule la latence est significative'))
+
+        relevant = self.relevant_documents(queries)
+        if options['synthetic']:
+            self.add_synthetic(index, options['synthetic'])
+            self.stdout.write(f"{options['synthetic']} fiche(s) générée(s) ajoutée(s) : {len(index)} fiche(s)")
+
+        hits_at_1 = hits_at_k = 0
+        reciprocal_ranks = []
+        timings = []
+        evaluated = 0
+        for position, item in enumerate(queries):
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                passages = index.search(item['query'], k=k, language=item.get('language', 'en'))
+                timings.append(time.perf_counter() - started)
+
+            expected = relevant[position]
+            ranks = [rank for rank, passage in enumerate(passages, 1) if passage.id in expected]
+            if expected:
+                evaluated += 1
+                hits_at_1 += bool(ranks and ranks[0] == 1)
+                hits_at_k += bool(ranks)
+                reciprocal_ranks.append(1 / ranks[0] if ranks else 0)
+            if options['verbose']:
+                found = ', '.join(f'{p.title} ({p.score:.2f})' for p in passages) or '—'
+                self.stdout.write(f"  {item['query']!r} -> {found}")
+
+        self.stdout.write(f'\nQuestions avec une fiche attendue en base : {evaluated}/{len(queries)}')
+        if evaluated:
+            self.stdout.write(f'  Précision@1 : {hits_at_1 / evaluated:.2%}')
+            self.stdout.write(f'  Rappel@{k}   : {hits_at_k / evaluated:.2%}')
+            self.stdout.write(f'  MRR         : {sum(reciprocal_ranks) / evaluated:.3f}')
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f'Latence ({len(timings)} recherches) : médiane {statistics.median(timings) * 1000:.3f} ms, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.3f} ms, max {timings[-1] * 1000:.3f} ms'
+        ))
+
+        if options['cache']:
+            self.replay_with_cache(index, queries, k)
+
+    def replay_with_cache(self, index, queries, k):
+        """Chaque question et trois reformulations passent par un cache neuf."""
+        def engine(question, language='en', city_id=None):
+            passages = index.search(question, k=k, city_id=city_id, language=language)
+            return {'response': passages[0].text if passages else '', 'sources': [p.id for p in passages]}
+
+        cache = AnswerCache()
+        timings = {True: [], False: []}
+        for item in queries:
+            question = item['query']
+            for variant in (question, question.upper(), normalize(question), f'{question.rstrip(" ?")} ??'):
+                started = time.perf_counter()
+                _, hit = cached_answer(variant, language=item.get('language', 'en'), engine=engine, cache=cache)
+                timings[hit].append(time.perf_counter() - started)
+
+        stats = cache.stats()
+        self.stdout.write(f"\nCache des réponses : {stats['hits']} succès / {stats['misses']} échecs "
+                          f"(taux {stats['hit_ratio']:.1%}, {stats['size']} entrée(s))")
+        for hit, label in ((False, 'calculée'), (True, 'en cache')):
+            if timings[hit]:
+                self.stdout.write(f'  Réponse {label} : médiane {statistics.median(timings[hit]) * 1000:.3f} ms')
+
+    def relevant_documents(self, queries):
+        """Pour chaque question, les fiches dont le titre ou les mots-clés contiennent un terme attendu."""
+        rows = [(pk, normalize(f'{title} {keywords}')) for pk, title, keywords
+                in ChatbotKnowledge.objects.values_list('id', 'title', 'keywords')]
+        return [
+            {pk for pk, text in rows if any(normalize(term) in text for term in item.get('expected', []))}
+            for item in queries
+        ]
+
+    def add_synthetic(self, index, count):
+        rng = random.Random(42)
+        next_id = max(index.documents, default=0) + 1
+        for doc_id in range(next_id, next_id + count):
+            words = rng.choices(SYNTHETIC_WORDS, k=60)
+            index.add({
+                'id': doc_id, 'category': 'custom', 'title': ' '.join(words[:3]),
+                'keywords': ', '.join(words[3:6]), 'content': ' '.join(words[6:40]) + '.',
+                'content_fr': ' '.join(words[20:]) + '.', 'related_city_id': None, 'related_dish_id': None,
+            })
@@ -1,19 +1,94 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from foodapp.models import User, Restaurant, RestaurantAccount, Order, OrderItem
-import subprocess
-import os
+from foodapp.models import User, RestaurantAccount, Order, OrderItem
+from foodapp import native
+from collections import defaultdict
+import itertools
 import json
-import tempfile
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Sources of the C++ programs, per action
+SOURCES = {
+    'account': 'Account_creation_process.cpp',
+    'restaurant': 'Restaurant_account_creation_process.cpp',
+    'order': 'Order_Process.cpp',
+}
+
+
+def isoformat(value):
+    return value.isoformat() if value else ''
+
+
+def order_records(orders, chunk_size):
+    """
+    Yield the orders of ``orders`` as dicts with their items. Orders are read
+    with ``iterator(chunk_size)`` and the items (with dish names) are fetched
+    in one query per chunk, so memory stays bounded to one chunk whatever the
+    size of the order history.
+    """
+    rows = orders.values_list(
+        'id', 'user_id', 'restaurant_id', 'total_amount', 'status', 'payment_method', 'delivery_time',
+        'order_code', 'customer_name', 'is_takeaway', 'order_time', 'special_instructions',
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        items = defaultdict(list)
+        for order_id, dish_name, quantity, price in (
+            OrderItem.objects.filter(order_id__in=[row[0] for row in chunk])
+            .order_by('order_id', 'id')
+            .values_list('order_id', 'dish__name', 'quantity', 'price')
+        ):
+            items[order_id].append({'dish_name': dish_name, 'quantity': quantity, 'price': float(price)})
+
+        for (order_id, user_id, restaurant_id, total_amount, status, payment_method, delivery_time,
+             order_code, customer_name, is_takeaway, order_time, special_instructions) in chunk:
+            yield {
+                'order_id': order_id,
+                'user_id': user_id or 0,
+                'restaurant_id': restaurant_id,
+                'total_price': float(total_amount),
+                'status': status,
+                'payment_method': payment_method,
+                'delivery_time': isoformat(delivery_time),
+                'order_code': order_code or '',
+                'customer_name': customer_name or '',
+                'is_takeaway': is_takeaway,
+                'created_at': isoformat(order_time),
+                'special_instructions': special_instructions or '',
+                'items': items.pop(order_id, []),
+            }
+
 
 class Command(BaseCommand):
-    help = 'Integrates C++ code with Django models for demonstration purposes'
+    help = 'Integrates C++ code with Django models: compiled once, records streamed as NDJSON'
 
     def add_arguments(self, parser):
-        parser.add_argument('--action', type=str, choices=['account', 'restaurant', 'order'], 
+        parser.add_argument('--action', type=str, choices=list(SOURCES),
                            help='Type of C++ integration to run')
+        parser.add_argument('--limit', type=int, default=None, help='Process at most N records (default: whole table)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Records per database fetch and per write to the C++ process')
+        parser.add_argument('--show', type=int, default=3, help='Number of processed records to print')
+        parser.add_argument('--progress', type=int, default=100000,
+                            help='Print progress every N processed records (0: never)')
+        parser.add_argument('--rebuild', action='store_true', help='Recompile even if a cached binary exists')
+        parser.add_argument('--clear-cache', action='store_true', help='Delete all cached binaries')
 
     def handle(self, *args, **options):
+        if options['clear_cache']:
+            removed = native.clear_cache()
+            self.stdout.write(self.style.SUCCESS(f'{removed} cached binary(ies) removed'))
+            if not options['action']:
+                return
+
         action = options.get('action')
         if not action:
             self.stdout.write(self.style.WARNING('Please specify an action: --action=account|restaurant|order'))
@@ -21,7 +96,8 @@ class Command(BaseCommand):
 
         # Get the directory where the C++ files are located
         cpp_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'c++')
-        
+        self.options = options
+
         if action == 'account':
             self.run_account_integration(cpp_dir)
         elif action == 'restaurant':
@@ -29,191 +105,115 @@ class Command(BaseCommand):
         elif action == 'order':
             self.run_order_integration(cpp_dir)
 
+    def chunk_size(self):
+        return self.options['chunk_size'] or native.get_config()['CHUNK_SIZE']
+
+    def limited(self, queryset):
+        return queryset[:self.options['limit']] if self.options['limit'] else queryset
+
+    def run_native(self, cpp_dir, action, records, label, collect=None):
+        """
+        Compile (or reuse) the program for ``action`` and stream ``records``
+        through it. ``collect(result)`` is called for each result as it arrives.
+        """
+        try:
+            binary, compiled = native.build(os.path.join(cpp_dir, SOURCES[action]), force=self.options['rebuild'])
+            self.stdout.write(f"{'Compiled' if compiled else 'Using cached binary'}: {binary}")
+
+            shown = []
+            received = itertools.count(1)
+            progress = self.options['progress']
+
+            def on_result(result):
+                if len(shown) < self.options['show']:
+                    shown.append(result)
+                if collect:
+                    collect(result)
+                count = next(received)
+                if progress and count % progress == 0:
+                    self.stdout.write(f'  {count} {label} processed...')
+
+            stats = native.stream(binary, records, on_result, chunk_size=self.chunk_size())
+        except native.NativeError as e:
+            self.stdout.write(self.style.ERROR(f'{e}\n{e.output}'))
+            return None
+
+        if not stats['sent']:
+            self.stdout.write(self.style.WARNING(f'No {label} found in the database'))
+            return stats
+
+        for result in shown:
+            self.stdout.write(json.dumps(result, indent=2, ensure_ascii=False))
+        if stats['summary'] is not None:
+            self.stdout.write(f"Summary: {json.dumps(stats['summary'], indent=2)}")
+        rate = stats['received'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {stats['received']}/{stats['sent']} {label} in {stats['seconds']:.2f} s ({rate:.0f} records/s)"
+        ))
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux, bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+            self.stdout.write(f'Peak memory (this process): {peak_mb:.0f} MB')
+        return stats
+
     def run_account_integration(self, cpp_dir):
         self.stdout.write(self.style.SUCCESS('Running Account C++ integration'))
-        
-        # Get sample user data
-        users = User.objects.filter(is_staff=False)[:5]
-        if not users:
-            self.stdout.write(self.style.WARNING('No users found in the database'))
-            return
-            
-        # Create a temporary file to store user data
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.json') as temp_file:
-            user_data = [{
-                'user_id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'date_joined': user.date_joined.isoformat()
-            } for user in users]
-            json.dump(user_data, temp_file)
-            temp_file_path = temp_file.name
-        
-        # Compile and run the C++ code
-        try:
-            # Compile the C++ code
-            cpp_file = os.path.join(cpp_dir, 'Account_creation_process.cpp')
-            output_file = os.path.join(cpp_dir, 'account_process.exe')
-            
-            # Check if the C++ file exists
-            if not os.path.exists(cpp_file):
-                self.stdout.write(self.style.ERROR(f'C++ file not found: {cpp_file}'))
-                return
-                
-            # Compile the C++ code
-            compile_cmd = f'g++ -std=c++17 "{cpp_file}" -o "{output_file}"'
-            self.stdout.write(f'Compiling: {compile_cmd}')
-            compile_process = subprocess.run(compile_cmd, shell=True, capture_output=True, text=True)
-            
-            if compile_process.returncode != 0:
-                self.stdout.write(self.style.ERROR(f'Compilation failed: {compile_process.stderr}'))
-                return
-                
-            # Run the compiled C++ program
-            run_cmd = f'"{output_file}" "{temp_file_path}"'
-            self.stdout.write(f'Running: {run_cmd}')
-            run_process = subprocess.run(run_cmd, shell=True, capture_output=True, text=True)
-            
-            if run_process.returncode != 0:
-                self.stdout.write(self.style.ERROR(f'Execution failed: {run_process.stderr}'))
-            else:
-                self.stdout.write(self.style.SUCCESS(f'C++ output: {run_process.stdout}'))
-                
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+
+        users = self.limited(User.objects.filter(is_staff=False).order_by('id').values_list(
+            'id', 'username', 'email', 'first_name', 'last_name', 'date_joined'
+        ))
+        records = ({
+            'user_id': user_id,
+            'username': username,
+            'email': email,
+            'first_name': first_name,
+            'last_name': last_name,
+            'date_joined': isoformat(date_joined),
+        } for user_id, username, email, first_name, last_name, date_joined
+            in users.iterator(chunk_size=self.chunk_size()))
+        self.run_native(cpp_dir, 'account', records, 'accounts')
 
     def run_restaurant_integration(self, cpp_dir):
         self.stdout.write(self.style.SUCCESS('Running Restaurant C++ integration'))
-        
-        # Get sample restaurant data
-        restaurant_accounts = RestaurantAccount.objects.all()[:5]
-        if not restaurant_accounts:
-            self.stdout.write(self.style.WARNING('No restaurant accounts found in the database'))
-            return
-            
-        # Create a temporary file to store restaurant data
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.json') as temp_file:
-            restaurant_data = [{
-                'id': ra.id,
-                'restaurant_name': ra.restaurant.name,
-                'owner_username': ra.user.username,
-                'status': ra.status,
-                'account_type': ra.account_type,
-                'created_at': ra.created_at.isoformat(),
-                'city': ra.restaurant.city.name,
-                'address': ra.restaurant.address,
-                'phone': ra.restaurant.phone,
-                'email': ra.restaurant.email
-            } for ra in restaurant_accounts]
-            json.dump(restaurant_data, temp_file)
-            temp_file_path = temp_file.name
-        
-        # Compile and run the C++ code
-        try:
-            # Compile the C++ code
-            cpp_file = os.path.join(cpp_dir, 'Restaurant_account_creation_process.cpp')
-            output_file = os.path.join(cpp_dir, 'restaurant_process.exe')
-            
-            # Check if the C++ file exists
-            if not os.path.exists(cpp_file):
-                self.stdout.write(self.style.ERROR(f'C++ file not found: {cpp_file}'))
-                return
-                
-            # Compile the C++ code
-            compile_cmd = f'g++ -std=c++17 "{cpp_file}" -o "{output_file}"'
-            self.stdout.write(f'Compiling: {compile_cmd}')
-            compile_process = subprocess.run(compile_cmd, shell=True, capture_output=True, text=True)
-            
-            if compile_process.returncode != 0:
-                self.stdout.write(self.style.ERROR(f'Compilation failed: {compile_process.stderr}'))
-                return
-                
-            # Run the compiled C++ program
-            run_cmd = f'"{output_file}" "{temp_file_path}"'
-            self.stdout.write(f'Running: {run_cmd}')
-            run_process = subprocess.run(run_cmd, shell=True, capture_output=True, text=True)
-            
-            if run_process.returncode != 0:
-                self.stdout.write(self.style.ERROR(f'Execution failed: {run_process.stderr}'))
-            else:
-                self.stdout.write(self.style.SUCCESS(f'C++ output: {run_process.stdout}'))
-                
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+
+        accounts = self.limited(RestaurantAccount.objects.order_by('id').values_list(
+            'id', 'restaurant__name', 'user__username', 'status', 'account_type', 'created_at',
+            'restaurant__city__name', 'restaurant__address', 'restaurant__phone', 'restaurant__email',
+        ))
+        records = ({
+            'id': account_id,
+            'restaurant_name': name,
+            'owner_username': owner,
+            'status': status,
+            'account_type': account_type,
+            'created_at': isoformat(created_at),
+            'city': city or '',
+            'address': address or '',
+            'phone': phone or '',
+            'email': email or '',
+        } for account_id, name, owner, status, account_type, created_at, city, address, phone, email
+            in accounts.iterator(chunk_size=self.chunk_size()))
+        self.run_native(cpp_dir, 'restaurant', records, 'restaurant accounts')
 
     def run_order_integration(self, cpp_dir):
         self.stdout.write(self.style.SUCCESS('Running Order C++ integration'))
-        
-        # Get sample order data
-        orders = Order.objects.all()[:5]
-        if not orders:
-            self.stdout.write(self.style.WARNING('No orders found in the database'))
-            return
-            
-        # Create a temporary file to store order data
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.json') as temp_file:
-            order_data = [{
-                'order_id': order.id,
-                'restaurant_name': order.restaurant.name,
-                'user_id': order.user.id if order.user else None,
-                'user_name': order.user.username if order.user else order.customer_name,
-                'status': order.status,
-                'total_amount': float(order.total_amount),
-                'payment_method': order.payment_method,
-                'order_time': order.order_time.isoformat(),
-                'delivery_time': order.delivery_time.isoformat() if order.delivery_time else None,
-                'items': [{
-                    'dish_name': item.dish.name,
-                    'quantity': item.quantity,
-                    'price': float(item.price)
-                } for item in order.items.all()]
-            } for order in orders]
-            json.dump(order_data, temp_file)
-            temp_file_path = temp_file.name
-        
-        # Compile and run the C++ code
-        try:
-            # Compile the C++ code
-            cpp_file = os.path.join(cpp_dir, 'Order_Process.cpp')
-            output_file = os.path.join(cpp_dir, 'order_process.exe')
-            
-            # Check if the C++ file exists
-            if not os.path.exists(cpp_file):
-                self.stdout.write(self.style.ERROR(f'C++ file not found: {cpp_file}'))
-                return
-                
-            # Compile the C++ code
-            compile_cmd = f'g++ -std=c++17 "{cpp_file}" -o "{output_file}"'
-            self.stdout.write(f'Compiling: {compile_cmd}')
-            compile_process = subprocess.run(compile_cmd, shell=True, capture_output=True, text=True)
-            
-            if compile_process.returncode != 0:
-                self.stdout.write(self.style.ERROR(f'Compilation failed: {compile_process.stderr}'))
-                return
-                
-            # Run the compiled C++ program
-            run_cmd = f'"{output_file}" "{temp_file_path}"'
-            self.stdout.write(f'Running: {run_cmd}')
-            run_process = subprocess.run(run_cmd, shell=True, capture_output=True, text=True)
-            
-            if run_process.returncode != 0:
-                self.stdout.write(self.style.ERROR(f'Execution failed: {run_process.stderr}'))
-            else:
-                self.stdout.write(self.style.SUCCESS(f'C++ output: {run_process.stdout}'))
-                
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
\ No newline at end of file
+
+        # Collected as results arrive: only counters and a few ids stay in memory
+        totals = {'completed': 0, 'items': 0}
+        mismatched = []
+
+        def collect(result):
+            totals['completed'] += result['is_completed']
+            totals['items'] += result['item_count']
+            if result['total_mismatch'] and len(mismatched) < 20:
+                mismatched.append(result['order_id'])
+
+        orders = self.limited(Order.objects.order_by('id'))
+        stats = self.run_native(cpp_dir, 'order', order_records(orders, self.chunk_size()), 'orders', collect)
+        if stats and stats['received']:
+            self.stdout.write(f"Completed orders: {totals['completed']}, dishes ordered: {totals['items']}")
+            if mismatched:
+                self.stdout.write(self.style.WARNING(
+                    f"Orders whose total differs from their items (first {len(mismatched)}): {mismatched}"
+                ))
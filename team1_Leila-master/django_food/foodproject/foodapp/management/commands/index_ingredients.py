@@ -0,0 +1,50 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from foodapp import allergens
+from foodapp.models import Dish, Ingredient
+
+
+class Command(BaseCommand):
+    help = "Réextrait les ingrédients des plats et recalcule leurs masques d'allergènes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--text', type=str, default=None,
+                            help="Afficher le découpage d'un texte d'ingrédients sans rien modifier")
+        parser.add_argument('--prune', action='store_true',
+                            help="Supprimer les ingrédients qui ne sont plus utilisés par aucun plat")
+
+    def handle(self, *args, **options):
+        if options['text'] is not None:
+            for name in allergens.parse_ingredients(options['text']):
+                found = allergens.allergen_names(allergens.detect_allergens(name))
+                self.stdout.write(f"  {name:40} {', '.join(found) or '-'}")
+            return
+
+        with transaction.atomic():
+            # Synonymes éventuellement enrichis : les masques non vérifiés sont recalculés
+            by_mask = {}
+            for pk, name in Ingredient.objects.filter(is_verified=False).values_list('id', 'name'):
+                by_mask.setdefault(allergens.detect_allergens(name), []).append(pk)
+            for mask, ids in by_mask.items():
+                Ingredient.objects.filter(id__in=ids).exclude(allergen_mask=mask).update(allergen_mask=mask)
+
+            dish_ids = []
+            for dish in Dish.objects.only('id', 'ingredients').iterator(chunk_size=200):
+                dish.ingredient_items.set(Ingredient.for_text(dish.ingredients))
+                dish_ids.append(dish.id)
+            Dish.refresh_allergen_masks(dish_ids)
+
+            if options['prune']:
+                pruned, _ = Ingredient.objects.filter(dishes__isnull=True).delete()
+                self.stdout.write(f'{pruned} ingrédient(s) inutilisé(s) supprimé(s)')
+
+        counts = Counter()
+        for mask in Dish.objects.values_list('allergen_mask', flat=True):
+            counts.update(allergens.allergen_names(mask))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(dish_ids)} plat(s) indexé(s), {Ingredient.objects.count()} ingrédient(s)'
+        ))
+        for allergen in allergens.ALLERGENS:
+            self.stdout.write(f'  {allergen:12} {counts[allergen]} plat(s)')
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.core.mail import EmailMessage
+from django.db.models import Count
+from foodapp.models import SpooledEmail
+from foodapp import mail_spool
+import tempfile
+import time
+
+BENCHMARK_TEMPLATE = '__benchmark__'
+FILE_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+
+class Command(BaseCommand):
+    help = 'État du spool d\'emails, envoi des messages en file et mesure du débit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flush', action='store_true', help='Envoyer les messages en file')
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages par lot (défaut : MAIL_SPOOL)')
+        parser.add_argument('--benchmark', type=int, metavar='N',
+                            help='Mesurer le débit sur N messages fictifs (backend fichier par défaut)')
+        parser.add_argument('--backend', type=str, default=None, help='Backend email du benchmark')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['batch_size'], options['backend'])
+
+        if options['flush']:
+            stats = mail_spool.flush(batch_size=options['batch_size'])
+            self.report('Spool', stats)
+
+        counts = dict(SpooledEmail.objects.values_list('status').annotate(n=Count('id')))
+        for status, label in SpooledEmail.STATUS_CHOICES:
+            self.stdout.write(f'{label:20} {counts.get(status, 0)}')
+
+    def report(self, label, stats):
+        rate = stats['sent'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{label:28} {stats['sent']} envoyé(s), {stats['failed']} échec(s), "
+            f"{stats['batches']} lot(s) en {stats['seconds']:.2f} s ({rate:.0f} messages/s)"
+        ))
+
+    def benchmark(self, count, batch_size, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            config = {'BACKEND': backend or FILE_BACKEND, 'FILE_PATH': None if backend else directory}
+            messages = [(f'bench{i}@example.com', f'Message de test {i}', 'Corps du message de test.\n')
+                        for i in range(count)]
+
+            # Référence : une connexion par message, comme send_mail
+            start = time.perf_counter()
+            for to_email, subject, body in messages:
+                connection = mail_spool.open_connection(config)
+                EmailMessage(subject, body, to=[to_email], connection=connection).send()
+            elapsed = time.perf_counter() - start
+            self.report('Une connexion par message', {'sent': count, 'failed': 0, 'batches': count, 'seconds': elapsed})
+
+            # Spool : lots sur une connexion réutilisée, sans limite de débit
+            SpooledEmail.objects.bulk_create([
+                SpooledEmail(template=BENCHMARK_TEMPLATE, to_email=to_email, subject=subject, body=body)
+                for to_email, subject, body in messages
+            ], batch_size=500)
+            try:
+                stats = mail_spool.flush(batch_size=batch_size, config=dict(config, RATE_PER_MINUTE=0),
+                                         template=BENCHMARK_TEMPLATE)
+            finally:
+                SpooledEmail.objects.filter(template=BENCHMARK_TEMPLATE).delete()
+            self.report('Spool (connexion partagée)', stats)
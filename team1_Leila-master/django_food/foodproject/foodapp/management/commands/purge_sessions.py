@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+import time
+
+
+class Command(BaseCommand):
+    help = 'Supprime les sessions expirées par lots (sans verrouiller longtemps la table)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Sessions supprimées par transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Pause entre deux lots (secondes)')
+        parser.add_argument('--dry-run', action='store_true', help='Compter sans supprimer')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} session(s) expirée(s) à supprimer')
+            return
+
+        total, batches = 0, 0
+        start = time.perf_counter()
+        while True:
+            with transaction.atomic():
+                keys = list(expired.values_list('session_key', flat=True)[:options['batch_size']])
+                if not keys:
+                    break
+                deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} session(s) expirée(s) supprimée(s) en {batches} lot(s) ({elapsed:.2f} s)'
+        ))
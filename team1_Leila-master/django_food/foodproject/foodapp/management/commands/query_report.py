@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from foodapp.query_inspector import get_config
+from collections import defaultdict
+import json
+import os
+
+
+class Command(BaseCommand):
+    help = 'Affiche le rapport agrégé des requêtes SQL par vue (QueryBudgetMiddleware)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', type=str, help='Fichier JSONL à lire (défaut : QUERY_INSPECTOR["REPORT_FILE"])')
+        parser.add_argument('--limit', type=int, default=20, help='Nombre de vues à afficher')
+        parser.add_argument('--json', action='store_true', help='Sortie au format JSON')
+        parser.add_argument('--reset', action='store_true', help='Vider le fichier après lecture')
+
+    def handle(self, *args, **options):
+        path = options['file'] or get_config()['REPORT_FILE']
+        if not path:
+            raise CommandError('Aucun fichier de rapport configuré (QUERY_INSPECTOR["REPORT_FILE"])')
+        if not os.path.exists(path):
+            self.stdout.write(self.style.WARNING(f'Aucune donnée dans {path}'))
+            return
+
+        views = defaultdict(lambda: {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'time_ms': 0.0,
+            'over_budget': 0, 'budget': None, 'n_plus_one': defaultdict(int),
+        })
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                stats = views[entry['view']]
+                stats['requests'] += 1
+                stats['queries'] += entry['count']
+                stats['max_queries'] = max(stats['max_queries'], entry['count'])
+                stats['time_ms'] += entry['time_ms']
+                stats['budget'] = entry.get('budget')
+                if stats['budget'] is not None and entry['count'] > stats['budget']:
+                    stats['over_budget'] += 1
+                for suspect in entry.get('n_plus_one', []):
+                    stats['n_plus_one'][suspect['origin'] or suspect['fingerprint'][:80]] += 1
+
+        rows = sorted(views.items(), key=lambda item: item[1]['queries'] / item[1]['requests'], reverse=True)
+        rows = rows[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                view: dict(stats, avg_queries=round(stats['queries'] / stats['requests'], 1),
+                           n_plus_one=dict(stats['n_plus_one']))
+                for view, stats in rows
+            }, indent=2, ensure_ascii=False))
+        else:
+            self.stdout.write(f"{'Vue':40} {'Req.':>6} {'Moy.':>6} {'Max':>5} {'Budget':>7} {'Dépass.':>8} {'ms moy.':>8}")
+            for view, stats in rows:
+                avg = stats['queries'] / stats['requests']
+                line = (f"{view[:40]:40} {stats['requests']:>6} {avg:>6.1f} {stats['max_queries']:>5} "
+                        f"{stats['budget'] if stats['budget'] is not None else '-':>7} {stats['over_budget']:>8} "
+                        f"{stats['time_ms'] / stats['requests']:>8.1f}")
+                self.stdout.write(self.style.ERROR(line) if stats['over_budget'] else line)
+                for origin, count in sorted(stats['n_plus_one'].items(), key=lambda x: -x[1]):
+                    self.stdout.write(self.style.WARNING(f"    N+1 ({count} requêtes HTTP) : {origin}"))
+
+        if options['reset']:
+            open(path, 'w').close()
+            self.stdout.write(self.style.SUCCESS('Rapport réinitialisé'))
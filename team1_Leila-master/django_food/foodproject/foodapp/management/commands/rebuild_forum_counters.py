@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from foodapp.models import ForumTopic, ForumCategoryStats
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs dénormalisés du forum (messages par sujet, statistiques par catégorie)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Lister les sujets dont le compteur est faux, sans corriger')
+
+    def handle(self, *args, **options):
+        drift = list(
+            ForumTopic.objects.annotate(actual=Count('messages'))
+            .values_list('id', 'title', 'message_count', 'actual')
+        )
+        drift = [row for row in drift if row[2] != row[3]]
+        for topic_id, title, stored, actual in drift[:20]:
+            self.stdout.write(f'  #{topic_id} {title[:50]} : {stored} enregistré(s), {actual} réel(s)')
+        self.stdout.write(f'{len(drift)} sujet(s) avec un compteur de messages faux')
+
+        if options['check']:
+            return
+
+        with transaction.atomic():
+            updated = ForumTopic.rebuild_counters()
+            ForumCategoryStats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated} sujet(s) et {len(ForumTopic.CATEGORY_CHOICES)} catégorie(s) recalculés'
+        ))
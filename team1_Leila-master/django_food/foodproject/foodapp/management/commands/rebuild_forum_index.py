@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from foodapp.forum_search import load_results, query_terms, search_topics
+from foodapp.models import ForumSearchTerm
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche du forum (sujets et messages)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', type=str, default=None,
+                            help="Afficher les 10 premiers résultats d'une recherche après reconstruction")
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help="Ne pas reconstruire l'index (avec --query)")
+
+    def handle(self, *args, **options):
+        if not options['no_rebuild']:
+            with transaction.atomic():
+                documents = ForumSearchTerm.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'{documents} document(s) indexé(s), {ForumSearchTerm.objects.count()} terme(s)'
+            ))
+
+        if options['query']:
+            terms = query_terms(options['query'])
+            self.stdout.write(f'Termes : {terms}')
+            for topic in load_results(search_topics(terms)[:10], terms) if terms else []:
+                self.stdout.write(f'  {topic.search_score:6.2f}  #{topic.id} {topic.title[:60]}')
+                self.stdout.write(f'          {topic.search_snippet}')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from foodapp import popularity
+from foodapp.models import Dish, Restaurant
+
+
+class Command(BaseCommand):
+    help = "Recalcule les scores de popularité et de tendance depuis l'historique (commandes, avis, réservations, vues)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=0,
+                            help="Afficher ensuite les N plats et restaurants les plus populaires et en tendance")
+        parser.add_argument('--city', type=int, default=None, help="Classements limités à cette ville (avec --top)")
+        parser.add_argument('--type', type=str, default=None, help="Classement des plats limité à ce type (avec --top)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            dishes, restaurants = popularity.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{dishes} plat(s) et {restaurants} restaurant(s) mis à jour'))
+
+        if not options['top']:
+            return
+        epoch = popularity.current_epoch(cached=True)
+        for sort in popularity.SORTS:
+            trending = sort == 'trending'
+            field = popularity.SORTS[sort]
+            for label, queryset, dish_type in (('Plats', Dish.objects.all(), options['type']),
+                                               ('Restaurants', Restaurant.objects.all(), None)):
+                self.stdout.write(f'{label} ({sort}) :')
+                for obj in popularity.leaderboard(queryset, sort, options['city'], dish_type, options['top']):
+                    score = popularity.current_value(getattr(obj, field), epoch, trending=trending)
+                    self.stdout.write(f'  {score:8.2f}  #{obj.id} {obj.name}')
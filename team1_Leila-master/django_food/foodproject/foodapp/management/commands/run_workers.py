@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from foodapp.models import Task
+from foodapp.task_queue import WorkerPool
+from datetime import timedelta
+import signal
+import subprocess
+import sys
+import time
+
+
+class Command(BaseCommand):
+    help = 'Exécute les tâches en file (emails, traitements lents) avec un pool de threads ou de processus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Threads par processus')
+        parser.add_argument('--processes', type=int, default=1, help='Processus workers (chacun avec --threads threads)')
+        parser.add_argument('--batch-size', type=int, default=1, help='Tâches réservées à la fois par thread')
+        parser.add_argument('--once', action='store_true', help='Vider la file puis s\'arrêter')
+        parser.add_argument('--purge-days', type=int, default=None,
+                            help='Supprimer au démarrage les tâches terminées depuis plus de N jours')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            limit = timezone.now() - timedelta(days=options['purge_days'])
+            deleted, _ = Task.objects.filter(status=Task.STATUS_DONE, finished_at__lt=limit).delete()
+            self.stdout.write(f'{deleted} tâche(s) terminée(s) supprimée(s)')
+
+        if options['processes'] > 1:
+            return self.run_processes(options)
+
+        pool = WorkerPool(threads=options['threads'], batch_size=options['batch_size'], once=options['once'])
+        stop = lambda signum, frame: pool.stop()
+        signal.signal(signal.SIGINT, stop)
+        if hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, stop)
+
+        start = time.perf_counter()
+        self.stdout.write(f"Workers démarrés : {options['threads']} thread(s)")
+        pool.start()
+        while pool.is_alive():
+            pool.join(timeout=0.5)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{pool.processed} tâche(s) traitée(s), {pool.failed} échec(s) en {elapsed:.1f} s'
+        ))
+
+    def run_processes(self, options):
+        """Lance N processus enfants (même commande, un pool de threads chacun)."""
+        cmd = [sys.executable, sys.argv[0], 'run_workers',
+               '--threads', str(options['threads']), '--batch-size', str(options['batch_size'])]
+        if options['once']:
+            cmd.append('--once')
+        children = [subprocess.Popen(cmd) for _ in range(options['processes'])]
+        self.stdout.write(f"{len(children)} processus workers démarrés")
+
+        def stop(signum, frame):
+            for child in children:
+                if child.poll() is None:
+                    child.terminate()
+
+        signal.signal(signal.SIGINT, stop)
+        if hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, stop)
+
+        codes = [child.wait() for child in children]
+        if any(codes):
+            self.stderr.write(f'Codes de sortie des workers : {codes}')
@@ -0,0 +1,371 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from foodapp.models import (
+    City, Restaurant, RestaurantAccount, Dish, Reservation, Review, Order, OrderItem, UserProfile
+)
+from contextlib import contextmanager
+from decimal import Decimal
+import datetime
+import random
+import string
+import time
+
+BENCH_PREFIX = 'bench_'
+
+CITIES = ['Marrakech', 'Fès', 'Rabat', 'Casablanca', 'Essaouira', 'Tanger', 'Agadir', 'Meknès', 'Chefchaouen', 'Ouarzazate']
+
+DISH_NAMES = [
+    ('Tajine', Dish.SALTY), ('Couscous', Dish.SALTY), ('Pastilla', Dish.SALTY), ('Harira', Dish.SALTY),
+    ('Tanjia', Dish.SALTY), ('Méchoui', Dish.SALTY), ('Rfissa', Dish.SALTY), ('Zaalouk', Dish.SALTY),
+    ('Briouates', Dish.SALTY), ('Kefta', Dish.SALTY), ('Bissara', Dish.SALTY), ('Taktouka', Dish.SALTY),
+    ('Chebakia', Dish.SWEET), ('Sellou', Dish.SWEET), ('Cornes de gazelle', Dish.SWEET), ('Msemen', Dish.SWEET),
+    ('Baghrir', Dish.SWEET), ('Ghriba', Dish.SWEET), ('Thé à la menthe', Dish.DRINK), ('Jus d\'orange', Dish.DRINK),
+    ('Lben', Dish.DRINK), ('Café nous-nous', Dish.DRINK), ('Jus d\'avocat', Dish.DRINK),
+]
+VARIANTS = ['au poulet', 'aux légumes', 'royal', 'de la maison', 'aux pruneaux', 'au citron confit',
+            'aux amandes', 'traditionnel', 'fassi', 'berbère', 'au poisson', 'aux fruits secs']
+INGREDIENTS = ['poulet', 'agneau', 'boeuf', 'semoule', 'pois chiches', 'amandes', 'miel', 'sésame', 'lait',
+               'oeufs', 'farine de blé', 'citron confit', 'olives', 'safran', 'cannelle', 'menthe', 'poisson',
+               'crevettes', 'tomates', 'oignons', 'lentilles', 'dattes', 'beurre', 'huile d\'argan']
+PRICES = {Dish.PRICE_LOW: (15, 45), Dish.PRICE_MEDIUM: (45, 110), Dish.PRICE_HIGH: (110, 300)}
+
+# Statuts de commandes observés en production (pondérés)
+ORDER_STATUSES = [
+    (Order.STATUS_PAID, 55), (Order.STATUS_DELIVERED, 30), (Order.STATUS_CANCELLED, 6),
+    (Order.STATUS_NEW, 3), (Order.STATUS_PREPARING, 3), (Order.STATUS_READY, 3),
+]
+PAYMENT_METHODS = [(Order.PAYMENT_CASH, 50), (Order.PAYMENT_CARD, 35), (Order.PAYMENT_ONLINE, 15)]
+# Répartition des commandes dans la journée : pics du déjeuner et du dîner
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 2, 2, 2, 4, 10, 14, 9, 4, 3, 4, 6, 10, 14, 12, 7, 3]
+RATING_WEIGHTS = [4, 6, 15, 35, 40]
+
+
+def dish_price(dish):
+    """Prix unitaire déterministe d'un plat, dérivé de sa gamme de prix."""
+    low, high = PRICES.get(dish.price_range, PRICES[Dish.PRICE_MEDIUM])
+    return Decimal(low + (dish.id * 7919) % (high - low + 1))
+
+
+@contextmanager
+def historical_timestamps(*fields):
+    """Désactive temporairement auto_now_add pour pouvoir antidater les lignes."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class Command(BaseCommand):
+    help = 'Génère un jeu de données volumineux et réaliste pour les benchmarks (bulk_create par lots)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=2000, help='Nombre de restaurants')
+        parser.add_argument('--dishes', type=int, default=200000, help='Nombre de plats')
+        parser.add_argument('--users', type=int, default=20000, help='Nombre de clients')
+        parser.add_argument('--reservations', type=int, default=200000, help='Nombre de réservations')
+        parser.add_argument('--reviews', type=int, default=100000, help='Nombre d\'avis')
+        parser.add_argument('--orders', type=int, default=1000000, help='Nombre de commandes')
+        parser.add_argument('--days', type=int, default=365, help='Historique couvert (jours)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Taille des lots bulk_create')
+        parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire (reproductibilité)')
+        parser.add_argument('--clear', action='store_true', help='Supprimer les données de benchmark existantes')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+
+        if options['clear']:
+            self.clear()
+
+        started = time.perf_counter()
+        cities = self.create_cities()
+        users = self.create_users(options['users'])
+        restaurants = self.create_restaurants(options['restaurants'], cities)
+        self.create_owner_accounts(restaurants)
+        dishes_by_restaurant = self.create_dishes(options['dishes'], restaurants)
+        self.create_reservations(options['reservations'], restaurants, users)
+        self.create_reviews(options['reviews'], restaurants, users)
+        self.create_orders(options['orders'], restaurants, users, dishes_by_restaurant)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Jeu de données de benchmark généré en {time.perf_counter() - started:.1f} s'
+        ))
+
+    # Utilitaires
+
+    def weighted(self, choices):
+        values, weights = zip(*choices)
+        return self.rng.choices(values, weights=weights)[0]
+
+    def popularity_weights(self, count):
+        """Popularité de type Zipf : quelques restaurants concentrent l'activité."""
+        return [1.0 / (rank + 1) ** 0.9 for rank in range(count)]
+
+    def random_datetime(self):
+        day = self.now - datetime.timedelta(days=int(self.rng.triangular(0, self.days, 0)))
+        hour = self.rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        return day.replace(hour=hour, minute=self.rng.randrange(60), second=self.rng.randrange(60), microsecond=0)
+
+    def unique_codes(self, count, length, used):
+        alphabet = string.ascii_uppercase + string.digits
+        codes = []
+        while len(codes) < count:
+            code = ''.join(self.rng.choices(alphabet, k=length))
+            if code not in used:
+                used.add(code)
+                codes.append(code)
+        return codes
+
+    def bulk_insert(self, model, rows, label, keep=None):
+        """
+        Insère ``rows`` (itérable) par lots et retourne les objets créés avec
+        leurs ids, ou ``keep(obj)`` pour chacun afin de borner la mémoire.
+        """
+        keep = keep or (lambda obj: obj)
+        created = []
+        batch = []
+        total = 0
+        started = time.perf_counter()
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                created.extend(keep(obj) for obj in self._flush(model, batch))
+                total += len(batch)
+                batch = []
+        if batch:
+            created.extend(keep(obj) for obj in self._flush(model, batch))
+            total += len(batch)
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(f'  {label}: {total} lignes en {elapsed:.1f} s ({rate:,.0f}/s)')
+        return created
+
+    def _flush(self, model, batch):
+        with transaction.atomic():
+            return model.objects.bulk_create(batch, batch_size=self.batch_size)
+
+    # Générateurs
+
+    def clear(self):
+        self.stdout.write('Suppression des données de benchmark existantes...')
+        Restaurant.objects.filter(name__startswith='Bench ').delete()
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def create_cities(self):
+        cities = []
+        for name in CITIES:
+            city, _ = City.objects.get_or_create(name=name, defaults={'description': f'Ville de {name}'})
+            cities.append(city)
+        return cities
+
+    def create_users(self, count):
+        password = make_password(None)
+        start = User.objects.filter(username__startswith=BENCH_PREFIX).count()
+        users = self.bulk_insert(User, (
+            User(username=f'{BENCH_PREFIX}user_{start + i}', email=f'user{start + i}@bench.foodflex.ma',
+                 password=password, date_joined=self.random_datetime())
+            for i in range(count)
+        ), 'Utilisateurs', keep=lambda user: user.id)
+        self.bulk_insert(UserProfile, (
+            UserProfile(user_id=user_id, language=self.rng.choice(['fr', 'en']))
+            for user_id in users
+        ), 'Profils')
+        return users
+
+    def create_restaurants(self, count, cities):
+        city_weights = [1.0 / (i + 1) ** 0.6 for i in range(len(cities))]
+        with historical_timestamps(Restaurant._meta.get_field('created_at')):
+            restaurants = self.bulk_insert(Restaurant, (
+                Restaurant(
+                    name=f'Bench {self.rng.choice(["Dar", "Riad", "Café", "Le", "Chez"])} {i}',
+                    city=self.rng.choices(cities, weights=city_weights)[0],
+                    address=f'{self.rng.randint(1, 300)} rue de la Médina',
+                    phone=f'+2126{self.rng.randint(10000000, 99999999)}',
+                    email=f'resto{i}@bench.foodflex.ma',
+                    description='Restaurant généré pour les benchmarks',
+                    is_open=self.rng.random() < 0.85,
+                    capacity=self.rng.choice([20, 40, 60, 80, 120]),
+                    created_at=self.now - datetime.timedelta(days=self.rng.randint(self.days, self.days * 3)),
+                )
+                for i in range(count)
+            ), 'Restaurants')
+        return restaurants
+
+    def create_owner_accounts(self, restaurants):
+        """Un compte propriétaire actif par restaurant (utilisé par la commande bench)."""
+        password = make_password(None)
+        owners = self.bulk_insert(User, (
+            User(username=f'{BENCH_PREFIX}owner_{restaurant.id}', email=restaurant.email, password=password)
+            for restaurant in restaurants
+        ), 'Propriétaires', keep=lambda user: user.id)
+        self.bulk_insert(RestaurantAccount, (
+            RestaurantAccount(user_id=owner_id, restaurant=restaurant,
+                              is_active=True, pending_approval=False, status='approved')
+            for restaurant, owner_id in zip(restaurants, owners)
+        ), 'Comptes restaurant')
+        return owners
+
+    def create_dishes(self, count, restaurants):
+        weights = self.popularity_weights(len(restaurants))
+        created_field = Dish._meta.get_field('created_at')
+
+        def rows():
+            for i in range(count):
+                restaurant = self.rng.choices(restaurants, weights=weights)[0] if restaurants else None
+                base, dish_type = self.rng.choice(DISH_NAMES)
+                is_vegan = self.rng.random() < 0.08
+                ingredients = self.rng.sample(INGREDIENTS, self.rng.randint(3, 7))
+                calories = int(self.rng.gauss(550 if dish_type == Dish.SALTY else 320, 150))
+                yield Dish(
+                    name=f'{base} {self.rng.choice(VARIANTS)}',
+                    description=f'{base} préparé selon la recette {self.rng.choice(VARIANTS)}.',
+                    price_range=self.weighted([(Dish.PRICE_LOW, 40), (Dish.PRICE_MEDIUM, 45), (Dish.PRICE_HIGH, 15)]),
+                    type=dish_type,
+                    is_vegan=is_vegan,
+                    is_vegetarian=is_vegan or self.rng.random() < 0.2,
+                    ingredients=', '.join(ingredients),
+                    city_id=restaurant.city_id if restaurant else None,
+                    restaurant=restaurant,
+                    origin=self.weighted([(Dish.MOROCCAN, 80), (Dish.FUSION, 12), (Dish.INTERNATIONAL, 8)]),
+                    is_tourist_recommended=self.rng.random() < 0.1,
+                    has_gluten='farine de blé' in ingredients or 'semoule' in ingredients,
+                    has_nuts='amandes' in ingredients,
+                    has_lactose='lait' in ingredients or 'beurre' in ingredients,
+                    has_sugar=dish_type == Dish.SWEET or 'miel' in ingredients,
+                    calories=max(calories, 5),
+                    is_low_calorie=calories < 350,
+                    is_admin_created=False,
+                    created_at=self.now - datetime.timedelta(days=self.rng.randint(0, self.days)),
+                )
+
+        with historical_timestamps(created_field):
+            dishes = self.bulk_insert(Dish, rows(), 'Plats',
+                                      keep=lambda dish: (dish.restaurant_id, dish.id, dish_price(dish)))
+
+        dishes_by_restaurant = {}
+        for restaurant_id, dish_id, price in dishes:
+            dishes_by_restaurant.setdefault(restaurant_id, []).append((dish_id, price))
+        return dishes_by_restaurant
+
+    def create_reservations(self, count, restaurants, users):
+        weights = self.popularity_weights(len(restaurants))
+        used_codes = set(Reservation.objects.exclude(confirmation_code=None).values_list('confirmation_code', flat=True))
+
+        def rows():
+            remaining = count
+            while remaining > 0:
+                chunk = min(self.batch_size, remaining)
+                codes = self.unique_codes(chunk, 10, used_codes)
+                for code in codes:
+                    when = self.random_datetime() + datetime.timedelta(days=self.rng.randint(-3, 30))
+                    yield Reservation(
+                        restaurant=self.rng.choices(restaurants, weights=weights)[0],
+                        user_id=self.rng.choice(users) if users and self.rng.random() < 0.7 else None,
+                        name='Client benchmark', email='client@bench.foodflex.ma', phone='+212600000000',
+                        date=when.date(), time=when.time(),
+                        guests=max(1, int(self.rng.gauss(3, 1.5))),
+                        status=self.weighted([
+                            (Reservation.STATUS_COMPLETED, 55), (Reservation.STATUS_CONFIRMED, 25),
+                            (Reservation.STATUS_CANCELED, 12), (Reservation.STATUS_PENDING, 8),
+                        ]),
+                        confirmation_code=code,
+                        created_at=when - datetime.timedelta(days=self.rng.randint(0, 14)),
+                    )
+                remaining -= chunk
+
+        with historical_timestamps(Reservation._meta.get_field('created_at')):
+            self.bulk_insert(Reservation, rows(), 'Réservations')
+
+    def create_reviews(self, count, restaurants, users):
+        if not users or not restaurants:
+            return
+        weights = self.popularity_weights(len(restaurants))
+        count = min(count, len(users) * len(restaurants))
+        seen = set(Review.objects.values_list('user_id', 'restaurant_id'))
+
+        def rows():
+            produced = 0
+            while produced < count:
+                pair = (self.rng.choice(users), self.rng.choices(restaurants, weights=weights)[0].id)
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                produced += 1
+                yield Review(
+                    user_id=pair[0], restaurant_id=pair[1],
+                    rating=self.rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0],
+                    comment='Avis généré pour les benchmarks',
+                    created_at=self.random_datetime(),
+                )
+
+        with historical_timestamps(Review._meta.get_field('created_at')):
+            self.bulk_insert(Review, rows(), 'Avis')
+
+    def create_orders(self, count, restaurants, users, dishes_by_restaurant):
+        candidates = [r for r in restaurants if dishes_by_restaurant.get(r.id)]
+        if not candidates:
+            return
+        weights = self.popularity_weights(len(candidates))
+        used_codes = set(Order.objects.exclude(order_code=None).values_list('order_code', flat=True))
+        order_time_field = Order._meta.get_field('order_time')
+
+        started = time.perf_counter()
+        created_orders = created_items = 0
+        with historical_timestamps(order_time_field):
+            while created_orders < count:
+                chunk = min(self.batch_size, count - created_orders)
+                codes = self.unique_codes(chunk, 10, used_codes)
+                orders, baskets = [], []
+                for code in codes:
+                    restaurant = self.rng.choices(candidates, weights=weights)[0]
+                    menu = dishes_by_restaurant[restaurant.id]
+                    # Panier : 1 à 6 plats, les plus petits paniers étant les plus fréquents
+                    basket = [(self.rng.choice(menu), min(4, int(self.rng.expovariate(1.5)) + 1))
+                              for _ in range(min(6, int(self.rng.expovariate(0.6)) + 1))]
+                    order_time = self.random_datetime()
+                    status = self.weighted(ORDER_STATUSES)
+                    orders.append(Order(
+                        restaurant=restaurant,
+                        user_id=self.rng.choice(users) if users and self.rng.random() < 0.6 else None,
+                        customer_name=f'Client {self.rng.randint(1, 50000)}',
+                        table_number=str(self.rng.randint(1, 40)),
+                        status=status,
+                        total_amount=sum(price * quantity for (_, price), quantity in basket),
+                        payment_method=self.weighted(PAYMENT_METHODS),
+                        is_takeaway=self.rng.random() < 0.25,
+                        order_time=order_time,
+                        delivery_time=order_time + datetime.timedelta(minutes=self.rng.randint(10, 60))
+                        if status in (Order.STATUS_PAID, Order.STATUS_DELIVERED) else None,
+                        order_code=code,
+                    ))
+                    baskets.append(basket)
+
+                with transaction.atomic():
+                    orders = Order.objects.bulk_create(orders)
+                    items = [
+                        OrderItem(order_id=order.id, dish_id=dish_id, quantity=quantity, price=price,
+                                  is_completed=order.status in (Order.STATUS_PAID, Order.STATUS_DELIVERED))
+                        for order, basket in zip(orders, baskets)
+                        for (dish_id, price), quantity in basket
+                    ]
+                    OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+
+                created_orders += len(orders)
+                created_items += len(items)
+                self.stdout.write(f'\r  Commandes: {created_orders}/{count}', ending='')
+                self.stdout.flush()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'\n  Commandes: {created_orders} commandes / {created_items} lignes en {elapsed:.1f} s '
+            f'({created_orders / elapsed if elapsed else 0:,.0f} commandes/s)'
+        )
@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import json
+import os
+import subprocess
+import sys
+
+# Exécuté dans un interpréteur neuf (python -X importtime) : rien n'est déjà importé
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodproject.settings')
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+from django.test import Client
+client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+ready = time.perf_counter()
+first = client.get(sys.argv[1])
+first_done = time.perf_counter()
+second = client.get(sys.argv[1])
+second_done = time.perf_counter()
+print('STARTUP_PROFILE ' + json.dumps({
+    'setup': setup - start,
+    'urls': urls - setup,
+    'first_response': first_done - ready,
+    'second_response': second_done - first_done,
+    'time_to_first_response': first_done - start - (ready - urls),
+    'status': first.status_code,
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Lignes ``import time: self [us] | cumulative | module`` de ``-X importtime``."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            modules.append({
+                'module': name.strip(),
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Mesure le temps d\'import par module et le délai jusqu\'à la première réponse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', type=str, default='/accueil/', help='Page de la première requête')
+        parser.add_argument('--limit', type=int, default=25, help='Nombre de modules affichés')
+        parser.add_argument('--project-only', action='store_true', help='N\'afficher que les modules du projet')
+        parser.add_argument('--json', action='store_true', help='Sortie JSON')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'foodproject.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, options['url']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        marker = [line for line in result.stdout.splitlines() if line.startswith('STARTUP_PROFILE ')]
+        if result.returncode != 0 or not marker:
+            raise CommandError(f'Échec de la sonde de démarrage :\n{result.stderr[-2000:]}')
+
+        timings = json.loads(marker[-1][len('STARTUP_PROFILE '):])
+        modules = parse_importtime(result.stderr)
+        if options['project_only']:
+            modules = [m for m in modules if m['module'].split('.')[0] in ('foodapp', 'foodproject')]
+        modules.sort(key=lambda m: m['cumulative_ms'], reverse=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'timings': timings, 'modules': modules[:options['limit']]}, indent=2))
+            return
+
+        self.stdout.write(f"{'Module':60} {'propre':>10} {'cumulé':>10}")
+        for m in modules[:options['limit']]:
+            self.stdout.write(f"{m['module'][:60]:60} {m['self_ms']:8.1f} ms {m['cumulative_ms']:8.1f} ms")
+
+        self.stdout.write('')
+        self.stdout.write(f"django.setup()          {timings['setup'] * 1000:8.1f} ms")
+        self.stdout.write(f"Chargement des URLs     {timings['urls'] * 1000:8.1f} ms")
+        self.stdout.write(f"Première réponse        {timings['first_response'] * 1000:8.1f} ms (statut {timings['status']})")
+        self.stdout.write(f"Deuxième réponse        {timings['second_response'] * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Délai jusqu'à la première réponse : {timings['time_to_first_response'] * 1000:.1f} ms"
+        ))
@@ -0,0 +1,416 @@
+"""
+Métriques de production au format Prometheus.
+
+Chaque processus écrit ses valeurs dans un fichier mmap qui lui est propre
+(``METRICS['DIRECTORY']``) ; l'endpoint ``/metrics`` relit tous les fichiers et
+additionne les valeurs, ce qui donne des agrégats corrects avec plusieurs
+workers gunicorn/uvicorn. Sans répertoire configuré, les valeurs restent en
+mémoire (serveur de développement, tests).
+
+Une mise à jour coûte un ``struct.pack_into`` sous un verrou propre au
+processus : on peut laisser la collecte active en charge.
+"""
+import atexit
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIRECTORY': None,       # Répertoire partagé entre workers (mode multi-processus)
+    'TOKEN': None,           # Jeton Bearer accepté par /metrics (sinon réservé au staff)
+    'CLIENT_KINDS': {},      # {'url_name': 'sse'} pour la jauge des clients connectés
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_INITIAL_MMAP_SIZE = 1 << 20
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+class _MmapDict:
+    """
+    Dictionnaire clé -> float stocké dans un fichier mmap.
+
+    Format : 4 octets (taille utilisée) + 4 octets de remplissage, puis une
+    suite d'entrées ``<longueur clé:int32><clé alignée sur 8><valeur:double>``.
+    """
+
+    def __init__(self, filename):
+        self._f = open(filename, 'a+b')
+        if os.fstat(self._f.fileno()).st_size == 0:
+            self._f.truncate(_INITIAL_MMAP_SIZE)
+        self._capacity = os.fstat(self._f.fileno()).st_size
+        self._m = mmap.mmap(self._f.fileno(), self._capacity)
+        self._positions = {}
+        self._used = struct.unpack_from('i', self._m, 0)[0]
+        if self._used == 0:
+            self._used = 8
+            struct.pack_into('i', self._m, 0, self._used)
+        else:
+            for key, _, pos in self._read_entries(self._m, self._used):
+                self._positions[key] = pos
+
+    @staticmethod
+    def _read_entries(data, used):
+        pos = 8
+        while pos < used:
+            key_length = struct.unpack_from('i', data, pos)[0]
+            key_end = pos + 4 + key_length
+            key = data[pos + 4:key_end].decode('utf-8')
+            padded_end = key_end + (-(4 + key_length) % 8)
+            value = struct.unpack_from('d', data, padded_end)[0]
+            yield key, value, padded_end
+            pos = padded_end + 8
+
+    @classmethod
+    def read_file(cls, filename):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if len(data) < 8:
+            return []
+        used = struct.unpack_from('i', data, 0)[0]
+        return [(key, value) for key, value, _ in cls._read_entries(data, used)]
+
+    def _init_value(self, key):
+        encoded = key.encode('utf-8')
+        padding = b' ' * (-(4 + len(encoded)) % 8)
+        entry = struct.pack('i', len(encoded)) + encoded + padding + struct.pack('d', 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._m.close()
+            self._f.truncate(self._capacity)
+            self._m = mmap.mmap(self._f.fileno(), self._capacity)
+        self._m[self._used:self._used + len(entry)] = entry
+        self._positions[key] = self._used + len(entry) - 8
+        self._used += len(entry)
+        struct.pack_into('i', self._m, 0, self._used)
+
+    def read(self, key):
+        if key not in self._positions:
+            return 0.0
+        return struct.unpack_from('d', self._m, self._positions[key])[0]
+
+    def write(self, key, value):
+        if key not in self._positions:
+            self._init_value(key)
+        struct.pack_into('d', self._m, self._positions[key], value)
+
+    def close(self):
+        self._m.close()
+        self._f.close()
+
+
+class _MemoryStore:
+    """Stockage en mémoire pour un seul processus."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def collect(self):
+        with self._lock:
+            return [list(self._values.items())]
+
+
+class _MmapStore:
+    """Stockage mmap : un fichier par processus et par famille (compteurs / jauges)."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._counters = _MmapDict(os.path.join(directory, f'counter_{self.pid}.db'))
+        self._gauges = _MmapDict(os.path.join(directory, f'gauge_{self.pid}.db'))
+        atexit.register(mark_process_dead, self.pid, directory)
+
+    def _file_for(self, key):
+        return self._gauges if key.startswith('["foodapp_active_') else self._counters
+
+    def inc(self, key, amount):
+        store = self._file_for(key)
+        with self._lock:
+            store.write(key, store.read(key) + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            self._file_for(key).write(key, value)
+
+    def collect(self):
+        samples = []
+        for filename in glob.glob(os.path.join(self.directory, '*.db')):
+            try:
+                samples.append(_MmapDict.read_file(filename))
+            except (OSError, struct.error, UnicodeDecodeError):
+                continue
+        return samples
+
+
+def mark_process_dead(pid, directory=None):
+    """
+    Supprime les jauges d'un worker terminé (à appeler depuis le hook
+    ``child_exit`` de gunicorn). Les compteurs sont conservés.
+    """
+    directory = directory or get_config()['DIRECTORY']
+    if directory:
+        try:
+            os.remove(os.path.join(directory, f'gauge_{pid}.db'))
+        except OSError:
+            pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _get_store():
+    global _store
+    # Un worker forké hérite du store du parent : on en recrée un par pid
+    if _store is None or getattr(_store, 'pid', os.getpid()) != os.getpid():
+        with _store_lock:
+            if _store is None or getattr(_store, 'pid', os.getpid()) != os.getpid():
+                directory = get_config()['DIRECTORY']
+                _store = _MmapStore(directory) if directory else _MemoryStore()
+    return _store
+
+
+def _key(name, labels):
+    return json.dumps([name, labels], sort_keys=True, separators=(',', ':'))
+
+
+REGISTRY = {}
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def _labels(self, labels):
+        return {name: str(labels.get(name, '')) for name in self.labelnames}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        _get_store().inc(_key(self.name, self._labels(labels)), amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        _get_store().inc(_key(self.name, self._labels(labels)), amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        _get_store().set(_key(self.name, self._labels(labels)), value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        store = _get_store()
+        # Un seul seau incrémenté ; le cumul est calculé à l'export
+        for bound in self.buckets:
+            if value <= bound:
+                store.inc(_key(f'{self.name}_bucket', dict(labels, le=_format_bound(bound))), 1)
+                break
+        store.inc(_key(f'{self.name}_sum', labels), value)
+        store.inc(_key(f'{self.name}_count', labels), 1)
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+# Métriques de l'application
+REQUEST_LATENCY = Histogram('foodapp_request_duration_seconds', 'Durée des requêtes HTTP par vue', ('view', 'method'))
+REQUESTS = Counter('foodapp_requests_total', 'Requêtes HTTP par vue et statut', ('view', 'method', 'status'))
+DB_TIME = Histogram('foodapp_db_duration_seconds', 'Temps passé en base par requête HTTP', ('view',))
+DB_QUERIES = Histogram('foodapp_db_queries', 'Nombre de requêtes SQL par requête HTTP', ('view',), QUERY_COUNT_BUCKETS)
+TEMPLATE_TIME = Histogram('foodapp_template_render_seconds', 'Temps de rendu des templates par requête HTTP', ('view',))
+CACHE_REQUESTS = Counter('foodapp_cache_requests_total', 'Accès aux caches applicatifs (hit/miss)', ('cache', 'result'))
+SESSION_OPERATIONS = Counter('foodapp_session_operations_total', 'Lectures/écritures de session par stockage',
+                             ('backend', 'operation'))
+ACTIVE_CLIENTS = Gauge('foodapp_active_clients', 'Clients connectés (flux SSE, caisses POS)', ('kind',))
+
+
+def record_cache(cache, hit):
+    """Comptabilise un accès cache ; le ratio se calcule côté Prometheus."""
+    if get_config()['ENABLED']:
+        CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def record_session(backend, operation):
+    """Comptabilise une lecture ou écriture de session (cookie, cache, base)."""
+    if get_config()['ENABLED']:
+        SESSION_OPERATIONS.inc(backend=backend, operation=operation)
+
+
+@contextmanager
+def track_client(kind):
+    """Incrémente la jauge des clients connectés pendant la durée du bloc."""
+    ACTIVE_CLIENTS.inc(kind=kind)
+    try:
+        yield
+    finally:
+        ACTIVE_CLIENTS.dec(kind=kind)
+
+
+def tracked_stream(iterator, kind):
+    """Enveloppe le contenu d'une réponse en streaming pour suivre le client."""
+    with track_client(kind):
+        yield from iterator
+
+
+async def tracked_stream_async(iterator, kind):
+    """Variante asynchrone de ``tracked_stream`` pour les réponses ASGI."""
+    with track_client(kind):
+        async for chunk in iterator:
+            yield chunk
+
+
+# Temps de rendu des templates, cumulé par thread pendant une requête
+_request_state = threading.local()
+
+
+def start_request_timing():
+    _request_state.template_time = 0.0
+
+
+def pop_template_time():
+    value = getattr(_request_state, 'template_time', 0.0)
+    _request_state.template_time = 0.0
+    return value
+
+
+def instrument_templates():
+    """
+    Chronomètre ``Template.render`` du backend Django. Appelé à l'initialisation
+    de ``MetricsMiddleware`` ; le temps n'est compté qu'entre
+    ``start_request_timing`` et ``pop_template_time``, dans le même thread.
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_foodapp_timed', False):
+        return
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            if hasattr(_request_state, 'template_time'):
+                _request_state.template_time += time.perf_counter() - start
+
+    render._foodapp_timed = True
+    Template.render = render
+
+
+def generate_latest():
+    """Rend toutes les métriques au format texte Prometheus 0.0.4."""
+    totals = {}
+    for samples in _get_store().collect():
+        for key, value in samples:
+            totals[key] = totals.get(key, 0.0) + value
+
+    by_metric = {}
+    for key, value in totals.items():
+        name, labels = json.loads(key)
+        base = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in REGISTRY:
+                base = name[:-len(suffix)]
+        by_metric.setdefault(base, []).append((name, labels, value))
+
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        samples = by_metric.get(name, [])
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        if metric.kind == 'histogram':
+            samples = _cumulate_buckets(metric, samples)
+        else:
+            samples.sort(key=lambda s: sorted(s[1].items()))
+        for sample_name, labels, value in samples:
+            lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _cumulate_buckets(metric, samples):
+    """Regroupe les échantillons par jeu de labels : seaux cumulés, puis _sum et _count."""
+    series = {}
+    for sample_name, labels, value in samples:
+        le = labels.pop('le', None)
+        entry = series.setdefault(tuple(sorted(labels.items())), {'buckets': {}, 'sum': 0.0, 'count': 0.0})
+        if le is not None:
+            entry['buckets'][le] = value
+        elif sample_name.endswith('_sum'):
+            entry['sum'] = value
+        else:
+            entry['count'] = value
+
+    result = []
+    for label_items in sorted(series):
+        entry = series[label_items]
+        cumulative = 0.0
+        for bound in metric.buckets:
+            le = _format_bound(bound)
+            cumulative += entry['buckets'].get(le, 0.0)
+            result.append((f'{metric.name}_bucket', dict(label_items, le=le), cumulative))
+        result.append((f'{metric.name}_sum', dict(label_items), entry['sum']))
+        result.append((f'{metric.name}_count', dict(label_items), entry['count']))
+    return result
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for k, v in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
@@ -2,18 +2,68 @@ from django.utils import translation
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 from django.conf.locale import LANG_INFO
+from django.db import connections
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from contextlib import asynccontextmanager, contextmanager
+import time
+
+from . import metrics
+
+from .query_inspector import (
+    QueryRecorder, QueryBudgetExceeded, get_config, write_report_entry, logger as query_logger
+)
+
+LANGUAGE_SESSION_KEY = 'django_language'
+PROFILE_LANGUAGE_COOKIE = 'foodapp_profile_lang'
+PROFILE_LANGUAGE_SALT = 'foodapp.profile_language'
+
+
+@asynccontextmanager
+async def in_request_thread(context_manager):
+    """
+    Sous ASGI, entre dans ``context_manager`` (puis en sort) dans le thread où
+    la requête exécute son code synchrone : vues sync et ORM des vues async
+    (``sync_to_async`` partage un seul thread par requête). Les wrappers
+    d'exécution et le chronométrage des templates, liés au thread, y voient
+    alors toutes les requêtes SQL.
+    """
+    await sync_to_async(context_manager.__enter__)()
+    try:
+        yield
+    finally:
+        await sync_to_async(context_manager.__exit__)(None, None, None)
+
+
+def remember_profile_language(response, user, language):
+    """
+    Mémorise la langue du profil dans un cookie signé lié à l'utilisateur :
+    les requêtes suivantes n'ont plus besoin de lire ``UserProfile``.
+    """
+    response.set_signed_cookie(
+        PROFILE_LANGUAGE_COOKIE, f'{user.pk}:{language}', salt=PROFILE_LANGUAGE_SALT,
+        max_age=settings.LANGUAGE_COOKIE_AGE or 365 * 24 * 60 * 60,
+        path=settings.LANGUAGE_COOKIE_PATH, secure=settings.LANGUAGE_COOKIE_SECURE,
+        httponly=True, samesite=settings.LANGUAGE_COOKIE_SAMESITE,
+    )
+
 
 class UserLanguageMiddleware(MiddlewareMixin):
     """
     Middleware pour définir automatiquement la langue de l'utilisateur
     en fonction de sa préférence dans le profil ou de la session.
+
+    La langue résolue n'est jamais réécrite dans la session : seul un
+    changement explicite (``set_language_custom``) la modifie, ce qui évite
+    de créer une ligne ``django_session`` par visiteur anonyme. La langue du
+    profil est lue au plus une fois, puis mise en cache sur l'utilisateur et
+    dans un cookie signé.
     """
     def process_request(self, request):
         language = None
         
         # 1. Vérifier d'abord la langue dans la session
         if hasattr(request, 'session'):
-            language = request.session.get('django_language')
+            language = request.session.get(LANGUAGE_SESSION_KEY)
         
         # 2. Si pas dans la session, vérifier le cookie
         if not language and hasattr(request, 'COOKIES'):
@@ -21,8 +71,7 @@ class UserLanguageMiddleware(MiddlewareMixin):
         
         # 3. Si toujours pas de langue, vérifier le profil utilisateur
         if not language and hasattr(request, 'user') and request.user.is_authenticated:
-            if hasattr(request.user, 'profile') and hasattr(request.user.profile, 'language'):
-                language = request.user.profile.language
+            language = self.profile_language(request)
         
         # 4. Si toujours pas de langue, utiliser la langue par défaut
         if not language or language not in dict(settings.LANGUAGES).keys():
@@ -31,8 +80,177 @@ class UserLanguageMiddleware(MiddlewareMixin):
         # Activer la langue pour cette requête
         translation.activate(language)
         request.LANGUAGE_CODE = language
-        
-        # Mettre à jour la session si nécessaire
-        if hasattr(request, 'session') and \
-           request.session.get('django_language') != language:
-            request.session['django_language'] = language
+
+    def process_response(self, request, response):
+        pending = getattr(request, '_profile_language_pending', None)
+        if pending:
+            remember_profile_language(response, request.user, pending)
+        return response
+
+    def profile_language(self, request):
+        """Langue du profil : cache de l'utilisateur, cookie signé, puis base."""
+        user = request.user
+        if hasattr(user, '_profile_language'):
+            return user._profile_language
+
+        signed = request.get_signed_cookie(PROFILE_LANGUAGE_COOKIE, default=None, salt=PROFILE_LANGUAGE_SALT)
+        user_id, _, language = (signed or '').partition(':')
+        if user_id != str(user.pk):
+            # Une seule colonne, sans charger le profil complet
+            from .models import UserProfile
+            language = UserProfile.objects.filter(user_id=user.pk).values_list('language', flat=True).first()
+            if language:
+                request._profile_language_pending = language
+
+        user._profile_language = language
+        return language
+
+
+class QueryBudgetMiddleware:
+    """
+    Middleware qui enregistre les requêtes SQL de chaque requête HTTP,
+    détecte les motifs N+1 et applique un budget de requêtes par vue
+    (réglages ``QUERY_INSPECTOR``).
+
+    Sous ASGI, l'enregistreur est installé dans le thread de la requête (voir
+    ``in_request_thread``) : vues sync et async sont inspectées de la même façon.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.config['ENABLED']:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with recorder.install():
+            response = self.get_response(request)
+        return self.check(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not self.config['ENABLED']:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        async with in_request_thread(recorder.install()):
+            response = await self.get_response(request)
+        # Journalisation et fichier de rapport : hors de la boucle d'événements
+        return await sync_to_async(self.check)(request, response, recorder)
+
+    def check(self, request, response, recorder):
+        report = recorder.report(self.config['N_PLUS_ONE_THRESHOLD'])
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or request.path
+        budget = self.config['BUDGETS'].get(view_name, self.config['DEFAULT_BUDGET'])
+        suspects = report.n_plus_one()
+
+        if suspects:
+            query_logger.warning("N+1 sur %s\n%s", view_name, report.format())
+
+        if budget is not None and report.count > budget:
+            message = f"{view_name} : {report.count} requêtes pour un budget de {budget}"
+            if self.config['RAISE_ON_VIOLATION']:
+                raise QueryBudgetExceeded(f"{message}\n{report.format()}")
+            query_logger.warning(message)
+
+        if self.config['RESPONSE_HEADER']:
+            response['X-Query-Count'] = str(report.count)
+            response['X-Query-Duplicates'] = str(report.duplicates)
+            response['X-Query-Time-Ms'] = f"{report.total_time * 1000:.1f}"
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+
+        if self.config['REPORT_FILE']:
+            entry = report.as_dict()
+            entry.update({'view': view_name, 'path': request.path, 'budget': budget})
+            write_report_entry(self.config['REPORT_FILE'], entry)
+
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Middleware qui mesure la latence, le temps base de données, le nombre de
+    requêtes SQL et le temps de rendu des templates par vue (``foodapp.metrics``).
+
+    Sous ASGI, les chronomètres sont installés dans le thread de la requête
+    (voir ``in_request_thread``) : les mêmes mesures sont faites qu'en WSGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = metrics.get_config()
+        if self.config['ENABLED']:
+            metrics.instrument_templates()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.config['ENABLED']:
+            return self.get_response(request)
+
+        db = {'time': 0.0, 'count': 0, 'templates': 0.0}
+        start = time.perf_counter()
+        with self.timing(db):
+            response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, db)
+
+    async def __acall__(self, request):
+        if not self.config['ENABLED']:
+            return await self.get_response(request)
+
+        db = {'time': 0.0, 'count': 0, 'templates': 0.0}
+        start = time.perf_counter()
+        async with in_request_thread(self.timing(db)):
+            response = await self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, db)
+
+    @contextmanager
+    def timing(self, db):
+        """Chronomètre les requêtes SQL et le rendu des templates du thread courant."""
+        def db_timer(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db['time'] += time.perf_counter() - start
+                db['count'] += 1
+
+        metrics.start_request_timing()
+        try:
+            with connections['default'].execute_wrapper(db_timer):
+                yield db
+        finally:
+            db['templates'] = metrics.pop_template_time()
+
+    def record(self, request, response, duration, db):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name if match else None) or 'unmatched'
+        metrics.REQUEST_LATENCY.observe(duration, view=view, method=request.method)
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.DB_TIME.observe(db['time'], view=view)
+        metrics.DB_QUERIES.observe(db['count'], view=view)
+        metrics.TEMPLATE_TIME.observe(db['templates'], view=view)
+
+        if response.streaming:
+            kind = self.config['CLIENT_KINDS'].get(view, 'stream')
+            if getattr(response, 'is_async', False):
+                response.streaming_content = metrics.tracked_stream_async(response.streaming_content, kind)
+            else:
+                response.streaming_content = metrics.tracked_stream(response.streaming_content, kind)
+
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0025_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpooledEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template', models.CharField(blank=True, max_length=100)),
+                ('to_email', models.EmailField(max_length=254)),
+                ('from_email', models.CharField(blank=True, max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('html_body', models.TextField(blank=True)),
+                ('dedup_key', models.CharField(blank=True, help_text="Empêche d'envoyer deux fois le même message au même destinataire", max_length=64, null=True, unique=True)),
+                ('status', models.CharField(choices=[('queued', 'En file'), ('sending', "En cours d'envoi"), ('sent', 'Envoyé'), ('failed', 'Échec')], default='queued', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('batch_token', models.CharField(blank=True, max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Email en file',
+                'verbose_name_plural': 'Emails en file',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='foodapp_spool_status_id')],
+            },
+        ),
+    ]
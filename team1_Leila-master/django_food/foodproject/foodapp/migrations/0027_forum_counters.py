@@ -0,0 +1,76 @@
+# Generated by Django 5.2.1 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Calcule les compteurs des sujets et des catégories existants."""
+    ForumTopic = apps.get_model('foodapp', 'ForumTopic')
+    ForumMessage = apps.get_model('foodapp', 'ForumMessage')
+    ForumCategoryStats = apps.get_model('foodapp', 'ForumCategoryStats')
+
+    messages = ForumMessage.objects.filter(topic=OuterRef('pk'))
+    latest = messages.order_by('-created_at', '-id')
+    ForumTopic.objects.update(
+        message_count=Coalesce(Subquery(messages.order_by().values('topic').annotate(n=Count('id')).values('n')), 0),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        last_message_author=Subquery(latest.values('author')[:1]),
+    )
+
+    totals = ForumTopic.objects.order_by().values('category').annotate(
+        topics=Count('id'), messages=Sum('message_count'), latest=Max('last_message_at'),
+    )
+    ForumCategoryStats.objects.bulk_create([
+        ForumCategoryStats(category=row['category'], topic_count=row['topics'],
+                           message_count=row['messages'] or 0, last_message_at=row['latest'])
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0026_spooledemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumtopic',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Nombre de messages'),
+        ),
+        migrations.AddField(
+            model_name='forumtopic',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernier message le'),
+        ),
+        migrations.AddField(
+            model_name='forumtopic',
+            name='last_message_author',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Auteur du dernier message'),
+        ),
+        migrations.AddIndex(
+            model_name='forummessage',
+            index=models.Index(fields=['topic', 'created_at'], name='foodapp_forummsg_topic_date'),
+        ),
+        migrations.CreateModel(
+            name='ForumCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('general', 'Discussion Générale'), ('recipes', 'Recettes & Astuces'), ('restaurants', 'Restaurants'), ('travel', 'Voyages Culinaires'), ('events', 'Événements & Rencontres')], max_length=20, unique=True, verbose_name='Catégorie')),
+                ('topic_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de sujets')),
+                ('message_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de messages')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernier message le')),
+            ],
+            options={
+                'verbose_name': 'Statistiques de catégorie du forum',
+                'verbose_name_plural': 'Statistiques des catégories du forum',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0027_forum_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Nombre de vues'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Nombre de vues'),
+        ),
+    ]
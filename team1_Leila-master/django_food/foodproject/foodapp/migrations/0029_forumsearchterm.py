@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from foodapp.text_search import bm25_weights
+
+
+def build_index(apps, schema_editor):
+    """Indexe les sujets et messages existants."""
+    ForumTopic = apps.get_model('foodapp', 'ForumTopic')
+    ForumMessage = apps.get_model('foodapp', 'ForumMessage')
+    ForumSearchTerm = apps.get_model('foodapp', 'ForumSearchTerm')
+
+    rows = []
+    for topic_id, category, title, content in ForumTopic.objects.values_list('id', 'category', 'title', 'content').iterator():
+        weights = bm25_weights(content)
+        weights.update(bm25_weights(title, boost=3))
+        rows.extend(ForumSearchTerm(term=term, topic_id=topic_id, category=category, weight=weight)
+                    for term, weight in weights.items())
+    for message_id, topic_id, category, content in ForumMessage.objects.values_list(
+        'id', 'topic_id', 'topic__category', 'content'
+    ).iterator():
+        rows.extend(ForumSearchTerm(term=term, topic_id=topic_id, message_id=message_id, category=category, weight=weight)
+                    for term, weight in bm25_weights(content).items())
+    ForumSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0028_views_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForumSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=40, verbose_name='Terme')),
+                ('category', models.CharField(max_length=20, verbose_name='Catégorie')),
+                ('weight', models.FloatField(verbose_name='Poids BM25')),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='foodapp.forummessage', verbose_name='Message')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='foodapp.forumtopic', verbose_name='Sujet')),
+            ],
+            options={
+                'verbose_name': "Terme de l'index du forum",
+                'verbose_name_plural': "Termes de l'index du forum",
+                'indexes': [models.Index(fields=['term', 'category'], name='foodapp_forumterm_cat'), models.Index(fields=['topic', 'message'], name='foodapp_forumterm_doc')],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
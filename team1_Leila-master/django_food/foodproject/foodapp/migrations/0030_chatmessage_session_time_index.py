@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0029_forumsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'timestamp'], name='foodapp_chatmsg_session_time'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['last_interaction'], name='foodapp_chatsession_last'),
+        ),
+    ]
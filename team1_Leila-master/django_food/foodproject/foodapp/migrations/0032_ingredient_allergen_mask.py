@@ -0,0 +1,200 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:40
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Figé ici : la migration ne doit pas dépendre de foodapp.allergens (les
+# synonymes pourront changer, les masques déjà calculés restent ceux-ci)
+ALLERGENS = (
+    'peanuts', 'tree_nuts', 'milk', 'eggs', 'fish', 'shellfish', 'soy',
+    'wheat', 'sesame', 'mustard', 'celery', 'lupin', 'molluscs',
+)
+BITS = {allergen: 1 << position for position, allergen in enumerate(ALLERGENS)}
+
+# Termes (normalisés, au singulier) qui signalent chaque allergène ; une
+# expression de plusieurs mots doit apparaître telle quelle dans l'ingrédient
+SYNONYMS = {
+    'peanuts': ['arachide', 'cacahuete', 'peanut'],
+    'tree_nuts': ['amande', 'almond', 'noix', 'walnut', 'noisette', 'hazelnut', 'pistache', 'pistachio',
+                  'cajou', 'cashew', 'pecan', 'noix de pecan', 'pignon', 'pine nut', 'macadamia',
+                  'fruits a coque', 'fruit a coque', 'nut', 'nuts'],
+    'milk': ['lait', 'milk', 'beurre', 'butter', 'smen', 'fromage', 'cheese', 'creme', 'cream', 'yaourt',
+             'yogurt', 'yoghurt', 'lben', 'raib', 'ghee', 'mascarpone', 'ricotta', 'mozzarella', 'lactose'],
+    'eggs': ['oeuf', 'egg', 'jaune d oeuf', 'blanc d oeuf', 'mayonnaise'],
+    'fish': ['poisson', 'fish', 'sardine', 'thon', 'tuna', 'merlu', 'colin', 'hake', 'saumon', 'salmon',
+             'anchois', 'anchovy', 'dorade', 'sea bream', 'loup', 'sole', 'cabillaud', 'cod'],
+    'shellfish': ['crevette', 'shrimp', 'prawn', 'gambas', 'crabe', 'crab', 'homard', 'lobster',
+                  'langouste', 'langoustine', 'fruits de mer', 'seafood'],
+    'soy': ['soja', 'soy', 'soya', 'tofu', 'sauce soja', 'soy sauce', 'edamame'],
+    'wheat': ['ble', 'wheat', 'farine', 'flour', 'semoule', 'semolina', 'couscous', 'pain', 'bread',
+              'vermicelle', 'vermicelli', 'pate', 'pasta', 'warqa', 'feuille de brick', 'brick', 'malsouka',
+              'msemen', 'gluten', 'chapelure', 'breadcrumb', 'boulgour', 'bulgur', 'orge', 'barley'],
+    'sesame': ['sesame', 'tahini', 'tahina', 'graine de sesame', 'sesame seed'],
+    'mustard': ['moutarde', 'mustard'],
+    'celery': ['celeri', 'celery', 'celeriac'],
+    'lupin': ['lupin', 'tourmous'],
+    'molluscs': ['moule', 'mussel', 'calamar', 'calamari', 'squid', 'poulpe', 'octopus', 'seiche',
+                 'cuttlefish', 'huitre', 'oyster', 'palourde', 'clam', 'escargot', 'snail', 'coquille saint jacques',
+                 'scallop'],
+}
+
+# Expressions dont les mots ne doivent pas être lus séparément (« beurre de
+# cacahuète » ne contient pas de lait) : elles remplacent les synonymes de leurs mots
+COMPOUNDS = {
+    'beurre de cacahuete': ['peanuts'],
+    'peanut butter': ['peanuts'],
+    'lait de coco': [],
+    'coconut milk': [],
+    'creme de coco': [],
+    'coconut cream': [],
+    'lait d amande': ['tree_nuts'],
+    'almond milk': ['tree_nuts'],
+    'lait de soja': ['soy'],
+    'soy milk': ['soy'],
+    'beurre de cacao': [],
+    'cocoa butter': [],
+}
+
+# Les ingrédients sont séparés par des virgules, points-virgules, retours à la
+# ligne, puces ou « et »/« and »
+SEPARATOR_RE = re.compile(r'[,;\n•·]|\s+(?:et|and)\s+', re.IGNORECASE)
+# Quantités et unités en tête d'ingrédient : « 200 g de », « 2 c. à soupe d' », « 1/2 cup »
+QUANTITY_RE = re.compile(
+    r"^[\s\-*]*(?:[\d/.,½¼¾]+\s*)?"
+    r"(?:(?:kg|g|gr|grammes?|mg|l|cl|ml|litres?|cups?|tasses?|verres?|tbsp|tsp|c\.?\s*a\.?\s*(?:soupe|cafe)|"
+    r"cuilleres?\s+a\s+(?:soupe|cafe)|pincees?|bottes?|gousses?|tranches?|morceaux?|poignees?|pinch)\b\.?\s*)?"
+    r"(?:(?:de|d|du|des|of)\b\s*)?",
+)
+MAX_NAME_LENGTH = 100
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def light_stem(term):
+    if len(term) > 4 and (term.endswith('eaux') or term[-1] == 's' and term[-2] not in 'su'):
+        return term[:-1]
+    return term
+
+
+def _stems(text):
+    return ' '.join(light_stem(word) for word in re.findall(r'\w+', normalize(text)))
+
+
+def _phrases(words):
+    """Termes et suites de 2 à 4 termes de ``words``, pour les synonymes composés."""
+    phrases = set(words)
+    for size in (2, 3, 4):
+        phrases.update(' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return phrases
+
+
+_SYNONYM_BITS = {}
+for _allergen, _terms in SYNONYMS.items():
+    for _term in _terms:
+        _SYNONYM_BITS[_stems(_term)] = _SYNONYM_BITS.get(_stems(_term), 0) | BITS[_allergen]
+_COMPOUND_BITS = {
+    _stems(_compound): sum(BITS[allergen] for allergen in _allergens)
+    for _compound, _allergens in COMPOUNDS.items()
+}
+
+
+def normalize_ingredient(text):
+    """Nom canonique d'un ingrédient : sans quantité, minuscules, sans accents (« 200 g d'Amandes » -> « amandes »)."""
+    name = normalize(text).replace('œ', 'oe').replace("'", ' ').replace('’', ' ')
+    name = QUANTITY_RE.sub('', name)
+    name = re.sub(r'\([^)]*\)', ' ', name)
+    return ' '.join(name.split())[:MAX_NAME_LENGTH]
+
+
+def parse_ingredients(text):
+    """Noms canoniques des ingrédients de ``text``, sans doublons, dans l'ordre."""
+    names = (normalize_ingredient(part) for part in SEPARATOR_RE.split(text or ''))
+    return list(dict.fromkeys(name for name in names if len(name) > 1))
+
+
+def detect_allergens(name):
+    """Masque des allergènes dont un synonyme apparaît dans l'ingrédient ``name``."""
+    stems = f' {_stems(name)} '
+    mask = 0
+    for compound, bits in _COMPOUND_BITS.items():
+        if f' {compound} ' in stems:
+            mask |= bits
+            stems = stems.replace(f' {compound} ', ' | ')
+    for phrase in _phrases(stems.split()):
+        mask |= _SYNONYM_BITS.get(phrase, 0)
+    return mask
+
+
+def flag_mask(has_gluten=False, has_lactose=False, has_nuts=False):
+    """Allergènes déclarés par les cases du plat (saisie manuelle, prioritaire sur le texte)."""
+    return ((BITS['wheat'] if has_gluten else 0)
+            | (BITS['milk'] if has_lactose else 0)
+            | (BITS['peanuts'] | BITS['tree_nuts'] if has_nuts else 0))
+
+
+
+def index_ingredients(apps, schema_editor):
+    """Extrait les ingrédients des plats existants et calcule leurs masques d'allergènes."""
+    Dish = apps.get_model('foodapp', 'Dish')
+    Ingredient = apps.get_model('foodapp', 'Ingredient')
+    DishIngredient = Dish.ingredient_items.through
+
+    dishes = list(Dish.objects.values_list('id', 'ingredients', 'has_gluten', 'has_lactose', 'has_nuts'))
+    parsed = {dish_id: parse_ingredients(text) for dish_id, text, *_ in dishes}
+    names = {name for dish_names in parsed.values() for name in dish_names}
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, allergen_mask=detect_allergens(name)) for name in sorted(names)],
+        batch_size=500,
+    )
+    ingredients = {name: (pk, mask) for pk, name, mask in Ingredient.objects.values_list('id', 'name', 'allergen_mask')}
+
+    links = []
+    for dish_id, _, has_gluten, has_lactose, has_nuts in dishes:
+        mask = flag_mask(has_gluten, has_lactose, has_nuts)
+        for name in parsed[dish_id]:
+            ingredient_id, ingredient_mask = ingredients[name]
+            links.append(DishIngredient(dish_id=dish_id, ingredient_id=ingredient_id))
+            mask |= ingredient_mask
+        if mask:
+            Dish.objects.filter(id=dish_id).update(allergen_mask=mask)
+    DishIngredient.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0031_dish_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Nom normalisé')),
+                ('allergen_mask', models.PositiveIntegerField(default=0, verbose_name='Allergènes (masque)')),
+                ('is_verified', models.BooleanField(default=False, verbose_name='Allergènes vérifiés')),
+            ],
+            options={
+                'verbose_name': 'Ingrédient',
+                'verbose_name_plural': 'Ingrédients',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='allergen_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Allergènes (masque)'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='ingredient_items',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='dishes', to='foodapp.ingredient'),
+        ),
+        migrations.RunPython(index_ingredients, migrations.RunPython.noop),
+    ]
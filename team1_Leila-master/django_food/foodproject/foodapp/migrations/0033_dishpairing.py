@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0032_ingredient_allergen_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DishPairing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('restaurant', 'Restaurant'), ('city', 'Ville')], max_length=10, verbose_name='Portée')),
+                ('scope_id', models.PositiveIntegerField(verbose_name='Identifiant de la portée')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rang')),
+                ('score', models.FloatField(verbose_name='Score')),
+                ('support', models.PositiveIntegerField(verbose_name='Commandes communes')),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='foodapp.dish', verbose_name='Plat')),
+                ('paired_dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='foodapp.dish', verbose_name='Plat associé')),
+            ],
+            options={
+                'verbose_name': 'Plat souvent commandé avec',
+                'verbose_name_plural': 'Plats souvent commandés ensemble',
+                'indexes': [models.Index(fields=['scope', 'scope_id', 'dish', 'rank'], name='foodapp_pairing_lookup')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0033_dishpairing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='similarity_version',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='DishSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rang')),
+                ('score', models.FloatField(verbose_name='Score')),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='foodapp.dish', verbose_name='Plat')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='foodapp.dish', verbose_name='Plat similaire')),
+            ],
+            options={
+                'verbose_name': 'Plat similaire',
+                'verbose_name_plural': 'Plats similaires',
+                'indexes': [models.Index(fields=['dish', 'rank'], name='foodapp_similar_lookup')],
+            },
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:00
+
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Figé ici : la migration ne doit pas dépendre de foodapp.popularity
+DEFAULTS = {
+    'HALF_LIFE_DAYS': 30,
+    'TRENDING_HALF_LIFE_DAYS': 3,
+    'EPOCH': datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+    'WEIGHTS': {'view': 0.1, 'order': 5.0, 'review': 3.0, 'reservation': 4.0},
+}
+COMPLETED_ORDER_STATUSES = ('paid', 'delivered')
+CHUNK_SIZE = 2000
+
+
+def compute_scores(apps, schema_editor):
+    """Calcule les scores des plats et restaurants existants depuis l'historique."""
+    overrides = getattr(settings, 'POPULARITY', {})
+    config = {**DEFAULTS, **overrides, 'WEIGHTS': {**DEFAULTS['WEIGHTS'], **overrides.get('WEIGHTS', {})}}
+    Dish = apps.get_model('foodapp', 'Dish')
+    Restaurant = apps.get_model('foodapp', 'Restaurant')
+    Order = apps.get_model('foodapp', 'Order')
+    OrderItem = apps.get_model('foodapp', 'OrderItem')
+    Review = apps.get_model('foodapp', 'Review')
+    Reservation = apps.get_model('foodapp', 'Reservation')
+
+    scores = {Dish: defaultdict(lambda: [0.0, 0.0]), Restaurant: defaultdict(lambda: [0.0, 0.0])}
+
+    def add(model, pk, kind, amount, when):
+        weight = config['WEIGHTS'][kind] * amount
+        age = (when - config['EPOCH']).total_seconds() / 86400
+        total = scores[model][pk]
+        total[0] += weight * 2.0 ** (age / config['HALF_LIFE_DAYS'])
+        total[1] += weight * 2.0 ** (age / config['TRENDING_HALF_LIFE_DAYS'])
+
+    completed = Order.objects.filter(status__in=COMPLETED_ORDER_STATUSES)
+    for restaurant_id, when in completed.values_list('restaurant_id', 'order_time').iterator(chunk_size=CHUNK_SIZE):
+        add(Restaurant, restaurant_id, 'order', 1, when)
+    items = OrderItem.objects.filter(order__status__in=COMPLETED_ORDER_STATUSES)
+    for dish_id, quantity, when in items.values_list('dish_id', 'quantity', 'order__order_time').iterator(
+            chunk_size=CHUNK_SIZE):
+        add(Dish, dish_id, 'order', quantity, when)
+    reviews = Review.objects.filter(is_published=True)
+    for restaurant_id, rating, when in reviews.values_list('restaurant_id', 'rating', 'created_at').iterator(
+            chunk_size=CHUNK_SIZE):
+        add(Restaurant, restaurant_id, 'review', rating / 5, when)
+    reservations = Reservation.objects.exclude(status='canceled')
+    for restaurant_id, when in reservations.values_list('restaurant_id', 'created_at').iterator(chunk_size=CHUNK_SIZE):
+        add(Restaurant, restaurant_id, 'reservation', 1, when)
+
+    for model, model_scores in scores.items():
+        objects = []
+        for pk, views, when in model.objects.values_list('pk', 'views_count', 'updated_at').iterator(
+                chunk_size=CHUNK_SIZE):
+            if views:
+                add(model, pk, 'view', views, when)
+            popularity, trending = model_scores.get(pk, (0.0, 0.0))
+            objects.append(model(pk=pk, popularity_score=popularity, trending_score=trending))
+        model.objects.bulk_update(objects, ['popularity_score', 'trending_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0034_dishsimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='popularity_score',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Popularité'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Tendance'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='popularity_score',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Popularité'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Tendance'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['city', '-popularity_score'], name='foodapp_dish_city_pop'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['city', '-trending_score'], name='foodapp_dish_city_trend'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['type', '-popularity_score'], name='foodapp_dish_type_pop'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['type', '-trending_score'], name='foodapp_dish_type_trend'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['city', '-popularity_score'], name='foodapp_rest_city_pop'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['city', '-trending_score'], name='foodapp_rest_city_trend'),
+        ),
+        migrations.RunPython(compute_scores, migrations.RunPython.noop),
+    ]
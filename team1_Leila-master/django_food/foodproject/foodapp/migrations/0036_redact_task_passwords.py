@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:05
+
+import re
+
+from django.db import migrations
+
+# Figé ici : la migration ne doit pas dépendre de foodapp.task_queue
+PASSWORD_TEXT = re.compile(r'((?:mot de passe|password)[^:\n]*:\s*)\S+', re.IGNORECASE)
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return PASSWORD_TEXT.sub(lambda match: match.group(1) + '[masqué]', value)
+    return value
+
+
+def redact_finished_tasks(apps, schema_editor):
+    """Efface les mots de passe des emails déjà envoyés ou abandonnés (les tâches en attente restent à livrer)."""
+    Task = apps.get_model('foodapp', 'Task')
+    tasks = Task.objects.filter(status__in=['done', 'dead'], name='foodapp.tasks.send_email')
+    for task in tasks.iterator():
+        payload = redact(task.payload)
+        if payload != task.payload:
+            Task.objects.filter(pk=task.pk).update(payload=payload)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0035_popularity_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_finished_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+def clear_account_passwords(apps, schema_editor):
+    """Efface le contenu des emails de création de compte déjà traités : il contenait le mot de passe."""
+    SpooledEmail = apps.get_model('foodapp', 'SpooledEmail')
+    SpooledEmail.objects.filter(template='restaurant_account_created', status__in=['sent', 'failed']).update(
+        body='', html_body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0036_redact_task_passwords'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spooledemail',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(clear_account_passwords, migrations.RunPython.noop),
+    ]
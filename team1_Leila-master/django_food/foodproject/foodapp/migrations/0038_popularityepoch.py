@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:35
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+# Figé ici : la migration ne doit pas dépendre de foodapp.popularity
+DEFAULTS = {
+    'HALF_LIFE_DAYS': 30,
+    'TRENDING_HALF_LIFE_DAYS': 3,
+    'EPOCH': datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+}
+
+
+def move_epoch_to_now(apps, schema_editor):
+    """Ramène l'origine des scores (jusqu'ici EPOCH) à maintenant, en divisant les scores d'autant."""
+    config = {**DEFAULTS, **getattr(settings, 'POPULARITY', {})}
+    now = timezone.now()
+    elapsed_days = max((now - config['EPOCH']).total_seconds() / 86400, 0)
+    for model_name in ('Dish', 'Restaurant'):
+        apps.get_model('foodapp', model_name).objects.update(
+            popularity_score=F('popularity_score') * 2.0 ** -(elapsed_days / config['HALF_LIFE_DAYS']),
+            trending_score=F('trending_score') * 2.0 ** -(elapsed_days / config['TRENDING_HALF_LIFE_DAYS']),
+        )
+    apps.get_model('foodapp', 'PopularityEpoch').objects.create(pk=1, epoch=max(now, config['EPOCH']))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodapp', '0037_spooledemail_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField(verbose_name='Origine')),
+            ],
+            options={
+                'verbose_name': 'Origine des scores de popularité',
+                'verbose_name_plural': 'Origine des scores de popularité',
+            },
+        ),
+        migrations.RunPython(move_epoch_to_now, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,17 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils.html import mark_safe
 from django.utils import timezone
 import datetime
 import uuid
+from decimal import Decimal
+
+from . import allergens, popularity
+from .text_search import bm25_weights
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -40,6 +48,49 @@ class City(models.Model):
         verbose_name_plural = "Cities"
         ordering = ['name']
 
+class Ingredient(models.Model):
+    """
+    Ingrédient normalisé extrait du texte ``Dish.ingredients`` (voir
+    foodapp.allergens), avec le masque des allergènes qu'il contient.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Nom normalisé")
+    allergen_mask = models.PositiveIntegerField(default=0, verbose_name="Allergènes (masque)")
+    # Un masque corrigé à la main n'est plus recalculé depuis les synonymes
+    is_verified = models.BooleanField(default=False, verbose_name="Allergènes vérifiés")
+    
+    def __str__(self):
+        return self.name
+    
+    def allergen_list(self):
+        return allergens.allergen_names(self.allergen_mask)
+    
+    def save(self, *args, **kwargs):
+        if not self.is_verified:
+            self.allergen_mask = allergens.detect_allergens(self.name)
+        super().save(*args, **kwargs)
+        Dish.refresh_allergen_masks(self.dishes.values_list('id', flat=True))
+    
+    @classmethod
+    def for_text(cls, text):
+        """Ingrédients de ``text`` (créés si besoin), dans l'ordre du texte."""
+        names = allergens.parse_ingredients(text)
+        if not names:
+            return []
+        known = cls.objects.in_bulk(names, field_name='name')
+        missing = [name for name in names if name not in known]
+        if missing:
+            cls.objects.bulk_create(
+                [cls(name=name, allergen_mask=allergens.detect_allergens(name)) for name in missing],
+                ignore_conflicts=True,
+            )
+            known = cls.objects.in_bulk(names, field_name='name')
+        return [known[name] for name in names if name in known]
+    
+    class Meta:
+        verbose_name = "Ingrédient"
+        verbose_name_plural = "Ingrédients"
+        ordering = ['name']
+
 class Dish(models.Model):
     # Types de plats
     SWEET = 'sweet'
@@ -89,6 +140,10 @@ class Dish(models.Model):
     is_vegetarian = models.BooleanField(default=False)
     is_vegan = models.BooleanField(default=False)
     ingredients = models.TextField(null=True, blank=True)
+    # Tenus à jour par save() à partir de ``ingredients`` et des cases has_* (voir foodapp.allergens)
+    ingredient_items = models.ManyToManyField(Ingredient, related_name='dishes', blank=True, editable=False)
+    allergen_mask = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                                verbose_name="Allergènes (masque)")
     preparation_steps = models.TextField(null=True, blank=True)
     history = models.TextField(null=True, blank=True)
     city = models.ForeignKey('City', related_name='dishes', on_delete=models.SET_NULL, null=True, blank=True)
@@ -104,17 +159,74 @@ class Dish(models.Model):
     
     # Champ pour la date de création du plat (pour l'icône "Nouveau")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Version du catalogue pour les caches de recommandations
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Champ pour suivre les utilisateurs qui ont vu ce plat
     viewed_by = models.ManyToManyField(User, related_name='viewed_dishes', blank=True)
+    # Incrémenté par lots via foodapp.view_counter
+    views_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de vues")
+    # updated_at lors du dernier calcul des plats similaires (voir foodapp.similar_dishes)
+    similarity_version = models.DateTimeField(null=True, blank=True, editable=False)
+    # Scores à décroissance exponentielle (voir foodapp.popularity)
+    popularity_score = models.FloatField(default=0, db_index=True, editable=False, verbose_name="Popularité")
+    trending_score = models.FloatField(default=0, db_index=True, editable=False, verbose_name="Tendance")
 
     # Champ pour identifier les plats créés via l'interface d'administration
     is_admin_created = models.BooleanField(default=True, 
                                          help_text="Indique si le plat a été créé via le panneau d'administration Django")
     
+    # Champs dont dépend allergen_mask
+    ALLERGEN_FIELDS = {'ingredients', 'has_gluten', 'has_lactose', 'has_nuts'}
+    
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        reindex = update_fields is None or bool(self.ALLERGEN_FIELDS & set(update_fields))
+        if reindex:
+            items = Ingredient.for_text(self.ingredients)
+            self.allergen_mask = allergens.flag_mask(self.has_gluten, self.has_lactose, self.has_nuts)
+            for item in items:
+                self.allergen_mask |= item.allergen_mask
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'allergen_mask'}
+        super().save(*args, **kwargs)
+        if reindex:
+            self.ingredient_items.set(items)
+    
+    @classmethod
+    def refresh_allergen_masks(cls, dish_ids):
+        """Recalcule allergen_mask des plats ``dish_ids`` depuis leurs ingrédients (une requête par masque)."""
+        masks = {
+            dish_id: allergens.flag_mask(has_gluten, has_lactose, has_nuts)
+            for dish_id, has_gluten, has_lactose, has_nuts in cls.objects.filter(id__in=list(dish_ids)).values_list(
+                'id', 'has_gluten', 'has_lactose', 'has_nuts')
+        }
+        links = cls.ingredient_items.through.objects.filter(dish_id__in=list(masks))
+        for dish_id, mask in links.values_list('dish_id', 'ingredient__allergen_mask'):
+            masks[dish_id] |= mask
+        by_mask = {}
+        for dish_id, mask in masks.items():
+            by_mask.setdefault(mask, []).append(dish_id)
+        now = timezone.now()
+        for mask, ids in by_mask.items():
+            cls.objects.filter(id__in=ids).exclude(allergen_mask=mask).update(allergen_mask=mask, updated_at=now)
+        return len(masks)
+    
+    def allergen_list(self):
+        return allergens.allergen_names(self.allergen_mask)
+    
+    @classmethod
+    def with_last_price(cls, queryset):
+        """
+        ``queryset`` annoté de ``price`` : dernier prix facturé du plat (les plats
+        n'ont qu'une gamme de prix), 0 s'il n'a jamais été vendu.
+        """
+        last_price = OrderItem.objects.filter(dish=OuterRef('pk')).order_by('-id').values('price')[:1]
+        return queryset.annotate(price=Coalesce(Subquery(last_price), Value(Decimal('0'))))
+    
     def is_new(self):
         """Vérifie si le plat est considéré comme nouveau (moins de 3 jours)"""
         three_days_ago = timezone.now() - datetime.timedelta(days=3)
@@ -137,6 +249,15 @@ class Dish(models.Model):
         return "—"
     
     get_image_preview.short_description = "Image"
+    
+    class Meta:
+        indexes = [
+            # Classements par ville et par type (dish_list, API)
+            models.Index(fields=['city', '-popularity_score'], name='foodapp_dish_city_pop'),
+            models.Index(fields=['city', '-trending_score'], name='foodapp_dish_city_trend'),
+            models.Index(fields=['type', '-popularity_score'], name='foodapp_dish_type_pop'),
+            models.Index(fields=['type', '-trending_score'], name='foodapp_dish_type_trend'),
+        ]
 
 class Restaurant(models.Model):
     name = models.CharField(max_length=100)
@@ -151,6 +272,11 @@ class Restaurant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     capacity = models.PositiveIntegerField(default=50, help_text="Capacité maximale du restaurant")
+    # Incrémenté par lots via foodapp.view_counter
+    views_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de vues")
+    # Scores à décroissance exponentielle (voir foodapp.popularity)
+    popularity_score = models.FloatField(default=0, db_index=True, editable=False, verbose_name="Popularité")
+    trending_score = models.FloatField(default=0, db_index=True, editable=False, verbose_name="Tendance")
 
     def __str__(self):
         return f"{self.name} - {self.city.name}"
@@ -168,6 +294,12 @@ class Restaurant(models.Model):
         if not reviews:
             return 0
         return sum(review.rating for review in reviews) / reviews.count()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['city', '-popularity_score'], name='foodapp_rest_city_pop'),
+            models.Index(fields=['city', '-trending_score'], name='foodapp_rest_city_trend'),
+        ]
 
 class RestaurantAccount(models.Model):
     ACCOUNT_TYPE_CHOICES = [
@@ -328,7 +460,10 @@ class Reservation(models.Model):
             self.confirmation_code = ''.join(
                 random.choices(string.ascii_uppercase + string.digits, k=6)
             )
+        created = self._state.adding
         super().save(*args, **kwargs)
+        if created and self.status != self.STATUS_CANCELED:
+            popularity.record(Restaurant.objects.filter(pk=self.restaurant_id), 'reservation')
     
     @property
     def is_past(self):
@@ -381,6 +516,12 @@ class Review(models.Model):
     def __str__(self):
         return f"Avis de {self.user.username} sur {self.restaurant.name} - {self.rating}/5"
     
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        if created and self.is_published:
+            popularity.record(Restaurant.objects.filter(pk=self.restaurant_id), 'review', self.rating / 5)
+    
     class Meta:
         unique_together = ('user', 'restaurant')
         ordering = ['-created_at']
@@ -613,19 +754,58 @@ class ForumTopic(models.Model):
     is_pinned = models.BooleanField(default=False, verbose_name="Épinglé")
     views_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de vues")
     
+    # Compteurs dénormalisés, tenus à jour par ForumMessage.save() et les
+    # signaux post_delete (reconstruction : manage.py rebuild_forum_counters)
+    message_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de messages")
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernier message le")
+    last_message_author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                            related_name='+', verbose_name="Auteur du dernier message")
+    
     def __str__(self):
         return self.title
     
     @property
     def messages_count(self):
-        return self.messages.count()
+        return self.message_count
     
     @property
     def last_activity(self):
-        last_message = self.messages.order_by('-created_at').first()
-        if last_message:
-            return last_message.created_at
-        return self.created_at
+        return self.last_message_at or self.created_at
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        previous = None
+        if not adding and (update_fields is None or 'category' in update_fields):
+            previous = ForumTopic.objects.filter(pk=self.pk).values_list('category', 'message_count').first()
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or {'title', 'content', 'category'} & set(update_fields):
+                ForumSearchTerm.index_topic(self)
+            if adding:
+                ForumCategoryStats.adjust(self.category, topics=1)
+            elif previous and previous[0] != self.category:
+                # Changement de catégorie : déplacer le sujet et ses messages
+                old_category, message_count = previous
+                ForumCategoryStats.adjust(old_category, topics=-1, messages=-message_count)
+                ForumCategoryStats.adjust(self.category, topics=1, messages=message_count)
+                ForumCategoryStats.refresh_last_message(old_category, self.category)
+                ForumSearchTerm.objects.filter(topic=self).update(category=self.category)
+    
+    @classmethod
+    def rebuild_counters(cls, topic_ids=None):
+        """Recalcule les compteurs des sujets (tous par défaut) depuis les messages (une requête)."""
+        messages = ForumMessage.objects.filter(topic=OuterRef('pk'))
+        latest = messages.order_by('-created_at', '-id')
+        topics = cls.objects.all() if topic_ids is None else cls.objects.filter(pk__in=topic_ids)
+        return topics.update(
+            message_count=Coalesce(Subquery(
+                messages.order_by().values('topic').annotate(n=Count('id')).values('n')
+            ), 0),
+            last_message_at=Subquery(latest.values('created_at')[:1]),
+            last_message_author=Subquery(latest.values('author')[:1]),
+        )
     
     class Meta:
         verbose_name = "Sujet de forum"
@@ -644,10 +824,190 @@ class ForumMessage(models.Model):
     def __str__(self):
         return f"Message de {self.author.username} dans {self.topic.title}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'content' in update_fields:
+                ForumSearchTerm.index_message(self)
+            if adding:
+                # Le nouveau message est le plus récent : mise à jour sans relire le sujet
+                ForumTopic.objects.filter(pk=self.topic_id).update(
+                    message_count=F('message_count') + 1,
+                    last_message_at=self.created_at,
+                    last_message_author_id=self.author_id,
+                    updated_at=self.created_at,
+                )
+                ForumCategoryStats.adjust(self.topic.category, messages=1, last_message_at=self.created_at)
+    
     class Meta:
         verbose_name = "Message de forum"
         verbose_name_plural = "Messages de forum"
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['topic', 'created_at'], name='foodapp_forummsg_topic_date'),
+        ]
+
+class ForumCategoryStats(models.Model):
+    """Compteurs par catégorie du forum (sidebar), tenus à jour avec les sujets et messages"""
+    category = models.CharField(max_length=20, choices=ForumTopic.CATEGORY_CHOICES, unique=True, verbose_name="Catégorie")
+    topic_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de sujets")
+    message_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de messages")
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernier message le")
+    
+    def __str__(self):
+        return f"{self.get_category_display()} : {self.topic_count} sujets"
+    
+    @classmethod
+    def adjust(cls, category, topics=0, messages=0, last_message_at=None):
+        """Ajoute des deltas aux compteurs (UPDATE atomique, sans lecture préalable)."""
+        changes = {}
+        if topics:
+            changes['topic_count'] = Greatest(F('topic_count') + topics, Value(0))
+        if messages:
+            changes['message_count'] = Greatest(F('message_count') + messages, Value(0))
+        if last_message_at:
+            changes['last_message_at'] = last_message_at
+        if not changes:
+            return
+        if not cls.objects.filter(category=category).update(**changes):
+            cls.objects.bulk_create([cls(category=category)], ignore_conflicts=True)
+            cls.objects.filter(category=category).update(**changes)
+    
+    @classmethod
+    def refresh_last_message(cls, *categories):
+        for category in categories:
+            latest = ForumTopic.objects.filter(category=category).aggregate(latest=Max('last_message_at'))['latest']
+            cls.objects.filter(category=category).update(last_message_at=latest)
+    
+    @classmethod
+    def rebuild(cls, categories=None):
+        """Recalcule les catégories (toutes par défaut) depuis les compteurs des sujets."""
+        topics = ForumTopic.objects.all() if categories is None else ForumTopic.objects.filter(category__in=categories)
+        totals = {
+            row['category']: row
+            for row in topics.order_by().values('category').annotate(
+                topics=Count('id'), messages=Sum('message_count'), latest=Max('last_message_at'),
+            )
+        }
+        for category in categories or [key for key, _ in ForumTopic.CATEGORY_CHOICES]:
+            row = totals.get(category, {})
+            cls.objects.update_or_create(category=category, defaults={
+                'topic_count': row.get('topics') or 0,
+                'message_count': row.get('messages') or 0,
+                'last_message_at': row.get('latest'),
+            })
+    
+    class Meta:
+        verbose_name = "Statistiques de catégorie du forum"
+        verbose_name_plural = "Statistiques des catégories du forum"
+
+def _deletes_topics(origin):
+    """La suppression partie de ``origin`` (instance ou QuerySet) supprime des sujets du forum."""
+    return isinstance(origin, ForumTopic) or (isinstance(origin, models.QuerySet) and origin.model is ForumTopic)
+
+@receiver(post_delete, sender=ForumMessage)
+def forum_message_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Retire le message des compteurs de son sujet et de sa catégorie, qu'il soit
+    supprimé seul, par QuerySet.delete() ou en cascade (ex. son auteur).
+    """
+    if _deletes_topics(origin):
+        return  # Le sujet disparaît aussi : forum_topic_deleted recalcule la catégorie
+    latest = (
+        ForumMessage.objects.filter(topic_id=instance.topic_id)
+        .order_by('-created_at', '-id').values_list('created_at', 'author_id').first()
+    )
+    ForumTopic.objects.filter(pk=instance.topic_id).update(
+        message_count=Greatest(F('message_count') - 1, Value(0)),
+        last_message_at=latest[0] if latest else None,
+        last_message_author_id=latest[1] if latest else None,
+    )
+    category = ForumTopic.objects.filter(pk=instance.topic_id).values_list('category', flat=True).first()
+    if category:
+        ForumCategoryStats.adjust(category, messages=-1)
+        ForumCategoryStats.refresh_last_message(category)
+
+@receiver(post_delete, sender=ForumTopic)
+def forum_topic_deleted(sender, instance, **kwargs):
+    """Recalcule la catégorie du sujet supprimé depuis les sujets restants (messages en cascade compris)."""
+    ForumCategoryStats.rebuild([instance.category])
+
+class ForumSearchTerm(models.Model):
+    """
+    Index inversé du forum : une ligne par terme et par document (le sujet
+    lui-même, ou un de ses messages). Tenu à jour par ForumTopic.save() et
+    ForumMessage.save() ; les suppressions passent par la cascade.
+    """
+    # Un terme du titre compte comme TITLE_BOOST occurrences dans le contenu
+    TITLE_BOOST = 3
+    
+    term = models.CharField(max_length=40, verbose_name="Terme")
+    topic = models.ForeignKey(ForumTopic, on_delete=models.CASCADE, related_name='+', verbose_name="Sujet")
+    message = models.ForeignKey(ForumMessage, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='+', verbose_name="Message")
+    # Copie de la catégorie du sujet : le filtre par catégorie reste dans l'index
+    category = models.CharField(max_length=20, verbose_name="Catégorie")
+    weight = models.FloatField(verbose_name="Poids BM25")
+    
+    def __str__(self):
+        return self.term
+    
+    @classmethod
+    def topic_weights(cls, title, content):
+        weights = bm25_weights(content)
+        weights.update(bm25_weights(title, boost=cls.TITLE_BOOST))
+        return weights
+    
+    @classmethod
+    def replace_document(cls, topic_id, message_id, category, weights):
+        cls.objects.filter(topic_id=topic_id, message_id=message_id).delete()
+        cls.objects.bulk_create([
+            cls(term=term, topic_id=topic_id, message_id=message_id, category=category, weight=weight)
+            for term, weight in weights.items()
+        ])
+    
+    @classmethod
+    def index_topic(cls, topic):
+        cls.replace_document(topic.pk, None, topic.category, cls.topic_weights(topic.title, topic.content))
+    
+    @classmethod
+    def index_message(cls, message):
+        cls.replace_document(message.topic_id, message.pk, message.topic.category, bm25_weights(message.content))
+    
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Réindexe tous les sujets et messages ; renvoie le nombre de documents indexés."""
+        cls.objects.all().delete()
+        documents = 0
+        rows = []
+        topics = ForumTopic.objects.order_by().values_list('id', 'category', 'title', 'content')
+        for topic_id, category, title, content in topics.iterator(chunk_size=batch_size):
+            rows.extend(cls(term=term, topic_id=topic_id, category=category, weight=weight)
+                        for term, weight in cls.topic_weights(title, content).items())
+            documents += 1
+            if len(rows) >= batch_size:
+                cls.objects.bulk_create(rows, batch_size=batch_size)
+                rows = []
+        messages = ForumMessage.objects.order_by().values_list('id', 'topic_id', 'topic__category', 'content')
+        for message_id, topic_id, category, content in messages.iterator(chunk_size=batch_size):
+            rows.extend(cls(term=term, topic_id=topic_id, message_id=message_id, category=category, weight=weight)
+                        for term, weight in bm25_weights(content).items())
+            documents += 1
+            if len(rows) >= batch_size:
+                cls.objects.bulk_create(rows, batch_size=batch_size)
+                rows = []
+        cls.objects.bulk_create(rows, batch_size=batch_size)
+        return documents
+    
+    class Meta:
+        verbose_name = "Terme de l'index du forum"
+        verbose_name_plural = "Termes de l'index du forum"
+        indexes = [
+            models.Index(fields=['term', 'category'], name='foodapp_forumterm_cat'),
+            models.Index(fields=['topic', 'message'], name='foodapp_forumterm_doc'),
+        ]
 
 class RestaurantDraft(models.Model):
     STATUS_CHOICES = [
@@ -838,7 +1198,27 @@ class Order(models.Model):
             self.order_code = ''.join(
                 random.choices(string.ascii_uppercase + string.digits, k=6)
             )
+        # Popularité comptée une fois, au passage à « payée » ou « livrée »
+        newly_completed = self.is_completed and (self._state.adding or not Order.objects.filter(
+            pk=self.pk, status__in=[self.STATUS_DELIVERED, self.STATUS_PAID]).exists())
         super().save(*args, **kwargs)
+        if newly_completed:
+            self.record_popularity()
+    
+    def update_total(self):
+        """Recalcule total_amount à partir des lignes de la commande."""
+        total = self.items.aggregate(total=Sum(F('price') * F('quantity')))['total'] or 0
+        self.total_amount = Decimal(total).quantize(Decimal('0.01'))
+        self.save(update_fields=['total_amount'])
+    
+    def record_popularity(self):
+        """Ajoute la commande au score du restaurant et ses lignes à celui des plats."""
+        popularity.record(Restaurant.objects.filter(pk=self.restaurant_id), 'order', when=self.order_time)
+        by_quantity = {}
+        for dish_id, quantity in self.items.values_list('dish_id', 'quantity'):
+            by_quantity.setdefault(quantity, []).append(dish_id)
+        for quantity, dish_ids in by_quantity.items():
+            popularity.record(Dish.objects.filter(id__in=dish_ids), 'order', quantity, when=self.order_time)
     
     @property
     def is_completed(self):
@@ -867,10 +1247,81 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.dish.name} (Commande #{self.order.id})"
     
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        # Ligne ajoutée à une commande déjà terminée : comptée ici plutôt que par Order.save()
+        if created and Order.objects.filter(pk=self.order_id, status__in=popularity.COMPLETED_ORDER_STATUSES).exists():
+            popularity.record(Dish.objects.filter(pk=self.dish_id), 'order', self.quantity)
+    
     @property
     def subtotal(self):
         return self.price * self.quantity
 
+class DishSimilarity(models.Model):
+    """Plats les plus proches par contenu, calculés par foodapp.similar_dishes (une ligne par voisin)."""
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='+', verbose_name="Plat")
+    similar = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='neighbor_of', verbose_name="Plat similaire")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rang")
+    # Similarité cosinus des vecteurs TF-IDF + caractéristiques, dans [0, 1]
+    score = models.FloatField(verbose_name="Score")
+    
+    def __str__(self):
+        return f"{self.dish_id} ~ {self.similar_id} ({self.score:.2f})"
+    
+    class Meta:
+        verbose_name = "Plat similaire"
+        verbose_name_plural = "Plats similaires"
+        indexes = [
+            models.Index(fields=['dish', 'rank'], name='foodapp_similar_lookup'),
+        ]
+
+class DishPairing(models.Model):
+    """
+    Plats souvent commandés ensemble, calculés par foodapp.pairings : une
+    ligne par voisin, pour un restaurant ou pour une ville.
+    """
+    SCOPE_RESTAURANT = 'restaurant'
+    SCOPE_CITY = 'city'
+    SCOPE_CHOICES = [
+        (SCOPE_RESTAURANT, 'Restaurant'),
+        (SCOPE_CITY, 'Ville'),
+    ]
+    
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES, verbose_name="Portée")
+    # Identifiant du restaurant ou de la ville selon la portée
+    scope_id = models.PositiveIntegerField(verbose_name="Identifiant de la portée")
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='+', verbose_name="Plat")
+    paired_dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='+', verbose_name="Plat associé")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rang")
+    # Similarité cosinus des commandes des deux plats, dans [0, 1]
+    score = models.FloatField(verbose_name="Score")
+    support = models.PositiveIntegerField(verbose_name="Commandes communes")
+    
+    def __str__(self):
+        return f"{self.dish_id} -> {self.paired_dish_id} ({self.score:.2f})"
+    
+    class Meta:
+        verbose_name = "Plat souvent commandé avec"
+        verbose_name_plural = "Plats souvent commandés ensemble"
+        indexes = [
+            models.Index(fields=['scope', 'scope_id', 'dish', 'rank'], name='foodapp_pairing_lookup'),
+        ]
+
+class PopularityEpoch(models.Model):
+    """
+    Origine des scores de popularité stockés (une seule ligne), avancée
+    chaque jour par foodapp.popularity.rebase.
+    """
+    epoch = models.DateTimeField(verbose_name="Origine")
+    
+    def __str__(self):
+        return f"Origine des scores : {self.epoch:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        verbose_name = "Origine des scores de popularité"
+        verbose_name_plural = "Origine des scores de popularité"
+
 class ChatSession(models.Model):
     """Model for storing chat sessions"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -883,6 +1334,11 @@ class ChatSession(models.Model):
     
     def __str__(self):
         return f"Chat {self.session_id} - {'Anonymous' if not self.user else self.user.username}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_interaction'], name='foodapp_chatsession_last'),
+        ]
 
 class KitchenOrderStatus(models.Model):
     """Suivi de l'état des commandes en cuisine"""
@@ -933,6 +1389,9 @@ class ChatMessage(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['session', 'timestamp'], name='foodapp_chatmsg_session_time'),
+        ]
 
 class ChatbotKnowledge(models.Model):
     """Model for storing chatbot knowledge base"""
@@ -962,3 +1421,84 @@ class ChatbotKnowledge(models.Model):
     class Meta:
         verbose_name_plural = "Chatbot Knowledge Base"
 
+
+class Task(models.Model):
+    """Tâche différée exécutée par les workers (``manage.py run_workers``)"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_DEAD = 'dead'
+    
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_RUNNING, 'En cours'),
+        (STATUS_DONE, 'Terminée'),
+        (STATUS_DEAD, 'Abandonnée'),
+    ]
+    
+    name = models.CharField(max_length=200, help_text="Chemin de la fonction, ex. foodapp.tasks.send_email")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    priority = models.SmallIntegerField(default=0, help_text="Les valeurs élevées passent en premier")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.get_status_display()})"
+    
+    class Meta:
+        verbose_name = "Tâche"
+        verbose_name_plural = "Tâches"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='foodapp_task_status_run_at'),
+        ]
+
+class SpooledEmail(models.Model):
+    """Email en attente d'envoi groupé (voir ``mail_spool.py``)"""
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'En file'),
+        (STATUS_SENDING, 'En cours d\'envoi'),
+        (STATUS_SENT, 'Envoyé'),
+        (STATUS_FAILED, 'Échec'),
+    ]
+    
+    template = models.CharField(max_length=100, blank=True)
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    dedup_key = models.CharField(max_length=64, unique=True, null=True, blank=True,
+                                 help_text="Empêche d'envoyer deux fois le même message au même destinataire")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Après un échec : pas de nouvel essai avant cette date (délai exponentiel)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    batch_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.subject} → {self.to_email} ({self.get_status_display()})"
+    
+    class Meta:
+        verbose_name = "Email en file"
+        verbose_name_plural = "Emails en file"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='foodapp_spool_status_id'),
+        ]
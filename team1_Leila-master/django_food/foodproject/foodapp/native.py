@@ -0,0 +1,250 @@
+"""
+Compilation et exécution des programmes C++ (``management/commands/c++``).
+
+- Cache de compilation : le binaire est nommé d'après le hash du source, du
+  compilateur (``CXX --version``) et des options (``CXXFLAGS``). Une source
+  inchangée n'est compilée qu'une fois, y compris entre processus ; modifier
+  le source ou les options produit un nouveau binaire.
+- Échange en flux : les enregistrements sont envoyés au programme
+  (``<binaire> --stream``) en NDJSON, une ligne JSON par enregistrement, par
+  blocs sur stdin ; les résultats sont lus ligne à ligne sur stdout par un
+  thread, pendant l'envoi. Aucun fichier temporaire, mémoire bornée quelle
+  que soit la taille de la table.
+- Bibliothèques chargées pendant les requêtes : ``install`` les compile au
+  déploiement (``manage.py build_native``) sous un nom fixe, accompagnées de
+  l'empreinte du source ; ``installed`` les retrouve sans lancer le compilateur.
+"""
+import functools
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULTS = {
+    'CXX': os.getenv('CXX') or 'g++',
+    'CXXFLAGS': ['-std=c++17', '-O2'],
+    # None : <BASE_DIR>/build/native
+    'CACHE_DIR': None,
+    'CHUNK_SIZE': 1000,
+}
+
+EXE_SUFFIX = '.exe' if sys.platform == 'win32' else ''
+LIB_SUFFIX = {'win32': '.dll', 'darwin': '.dylib'}.get(sys.platform, '.so')
+SHARED_FLAGS = ['-shared', '-fPIC']
+
+
+class NativeError(Exception):
+    """Échec de compilation ou d'exécution d'un programme natif."""
+
+    def __init__(self, message, output=''):
+        super().__init__(message)
+        self.output = output
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'NATIVE_BUILD', {})}
+    if os.getenv('CXXFLAGS'):
+        config['CXXFLAGS'] = shlex.split(os.environ['CXXFLAGS'])
+    if not config['CACHE_DIR']:
+        config['CACHE_DIR'] = os.path.join(settings.BASE_DIR, 'build', 'native')
+    return config
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_id(cxx):
+    """Première ligne de ``CXX --version`` (change avec le compilateur installé)."""
+    try:
+        result = subprocess.run([cxx, '--version'], capture_output=True, text=True)
+    except OSError as e:
+        raise NativeError(f'Compilateur introuvable : {cxx} ({e})')
+    return (result.stdout or result.stderr).strip().splitlines()[0] if result.returncode == 0 else cxx
+
+
+def compile_flags(config, shared=False):
+    return [*config['CXXFLAGS'], *(SHARED_FLAGS if shared else [])]
+
+
+def cache_key(source, config=None, shared=False):
+    config = config or get_config()
+    digest = hashlib.sha256()
+    with open(source, 'rb') as f:
+        digest.update(f.read())
+    digest.update(b'\0' + compiler_id(config['CXX']).encode())
+    digest.update(b'\0' + '\0'.join(compile_flags(config, shared)).encode())
+    return digest.hexdigest()[:16]
+
+
+def binary_path(source, config=None, shared=False):
+    config = config or get_config()
+    stem = os.path.splitext(os.path.basename(source))[0]
+    suffix = LIB_SUFFIX if shared else EXE_SUFFIX
+    return os.path.join(config['CACHE_DIR'], f'{stem}-{cache_key(source, config, shared)}{suffix}')
+
+
+def build(source, force=False, config=None, shared=False):
+    """
+    Renvoie ``(chemin du binaire, compilé)`` ; ne compile que si le binaire
+    correspondant au source et aux options n'est pas déjà en cache.
+    ``shared=True`` produit une bibliothèque partagée (chargée avec ctypes).
+    """
+    config = config or get_config()
+    if not os.path.exists(source):
+        raise NativeError(f'Source introuvable : {source}')
+    path = binary_path(source, config, shared)
+    if os.path.exists(path) and not force:
+        return path, False
+
+    os.makedirs(config['CACHE_DIR'], exist_ok=True)
+    # Écriture dans un fichier temporaire puis renommage atomique : deux
+    # compilations concurrentes ne laissent jamais un binaire tronqué
+    tmp = f'{path}.{os.getpid()}.tmp'
+    cmd = [config['CXX'], *compile_flags(config, shared), source, '-o', tmp]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        raise NativeError(f"Compilateur introuvable : {config['CXX']} ({e})")
+    if result.returncode != 0:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise NativeError(f'Échec de la compilation : {shlex.join(cmd)}', result.stderr)
+    os.replace(tmp, path)
+    return path, True
+
+
+def source_digest(source):
+    with open(source, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def installed_path(source, config=None, shared=False):
+    config = config or get_config()
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(config['CACHE_DIR'], stem + (LIB_SUFFIX if shared else EXE_SUFFIX))
+
+
+def install(source, force=False, config=None, shared=False):
+    """
+    Compile ``source`` (via le cache) et copie le binaire sous
+    ``installed_path``, avec l'empreinte du source dans ``<binaire>.sha256``.
+    Renvoie ``(chemin installé, compilé)``.
+    """
+    config = config or get_config()
+    path, compiled = build(source, force, config, shared)
+    target = installed_path(source, config, shared)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    shutil.copy2(path, tmp)
+    os.replace(tmp, target)
+    with open(tmp, 'w') as f:
+        f.write(source_digest(source))
+    os.replace(tmp, f'{target}.sha256')
+    return target, compiled
+
+
+def installed(source, config=None, shared=False):
+    """Binaire installé pour la version actuelle de ``source`` ; None s'il manque ou est périmé."""
+    target = installed_path(source, config, shared)
+    try:
+        with open(f'{target}.sha256') as f:
+            digest = f.read().strip()
+    except OSError:
+        return None
+    if digest != source_digest(source) or not os.path.exists(target):
+        return None
+    return target
+
+
+def clear_cache(config=None):
+    """Supprime les binaires en cache ; renvoie leur nombre."""
+    config = config or get_config()
+    directory = config['CACHE_DIR']
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        os.unlink(os.path.join(directory, name))
+        removed += 1
+    return removed
+
+
+def stream(binary, records, on_result, chunk_size=None, args=('--stream',)):
+    """
+    Envoie ``records`` (itérable de dicts) au programme, en NDJSON par blocs
+    de ``chunk_size`` lignes, et appelle ``on_result(dict)`` pour chaque ligne
+    produite (depuis un thread de lecture). Une ligne ``{"summary": ...}``
+    n'est pas transmise à ``on_result`` mais renvoyée.
+
+    Renvoie ``{'sent', 'received', 'summary', 'seconds'}``. Les enregistrements
+    sont consommés dans le thread appelant (querysets et connexion à la base
+    restent dans ce thread).
+    """
+    chunk_size = chunk_size or get_config()['CHUNK_SIZE']
+    stats = {'sent': 0, 'received': 0, 'summary': None}
+    errors = []
+    start = time.perf_counter()
+
+    with tempfile.TemporaryFile(mode='w+') as stderr:
+        process = subprocess.Popen(
+            [binary, *args], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+            text=True, encoding='utf-8', bufsize=1 << 16,
+        )
+
+        def read():
+            # Lire en continu : un pipe stdout plein bloquerait le programme,
+            # donc l'écriture sur stdin
+            for line in process.stdout:
+                if not line.strip():
+                    continue
+                try:
+                    result = json.loads(line)
+                    if 'summary' in result:
+                        stats['summary'] = result['summary']
+                    else:
+                        stats['received'] += 1
+                        on_result(result)
+                except Exception as e:
+                    if not errors:
+                        errors.append(e)
+
+        reader = threading.Thread(target=read, name='native-stream-reader', daemon=True)
+        reader.start()
+
+        try:
+            chunk = []
+            for record in records:
+                chunk.append(json.dumps(record, default=str, ensure_ascii=False))
+                if len(chunk) >= chunk_size:
+                    process.stdin.write('\n'.join(chunk) + '\n')
+                    stats['sent'] += len(chunk)
+                    chunk = []
+            if chunk:
+                process.stdin.write('\n'.join(chunk) + '\n')
+                stats['sent'] += len(chunk)
+        except BrokenPipeError:
+            pass  # programme arrêté : l'erreur est rapportée par le code de sortie
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            reader.join()
+            returncode = process.wait()
+
+        if returncode != 0:
+            stderr.seek(0)
+            raise NativeError(f'{os.path.basename(binary)} a échoué (code {returncode})', stderr.read()[-4000:])
+    if errors:
+        raise errors[0]
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
@@ -0,0 +1,134 @@
+"""
+« Souvent commandés ensemble » : co-occurrences des plats dans les commandes.
+
+Le calcul (commande ``build_pairings`` ou tâche ``tasks.rebuild_pairings``)
+parcourt les lignes des commandes payées ou livrées triées par commande, par
+blocs de ``CHUNK_SIZE`` lignes : seule la commande en cours est en mémoire,
+plus une matrice creuse de co-occurrences par restaurant et par ville
+(``{plat: Counter(plat voisin: commandes communes)}``). Le score d'une paire
+est la similarité cosinus ``n(a, b) / sqrt(n(a) * n(b))`` ; les ``TOP_K``
+meilleurs voisins de chaque plat sont écrits dans ``DishPairing``, une ligne
+par voisin, lue par un seul index (portée, identifiant, plat, rang).
+"""
+import heapq
+import itertools
+import math
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import DishPairing, Order, OrderItem
+
+DEFAULTS = {
+    'TOP_K': 6,
+    # Nombre minimal de commandes communes pour retenir une paire
+    'MIN_SUPPORT': 2,
+    'CHUNK_SIZE': 2000,
+    # Les commandes de groupe au-delà de cette taille sont tronquées (paires en n²)
+    'MAX_BASKET_SIZE': 30,
+}
+
+COMPLETED_STATUSES = (Order.STATUS_PAID, Order.STATUS_DELIVERED)
+
+WRITE_BATCH_SIZE = 1000
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PAIRINGS', {})}
+
+
+class CooccurrenceMatrix:
+    """Matrice creuse et symétrique des commandes communes à deux plats."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.pairs = defaultdict(Counter)
+
+    def add_basket(self, dish_ids):
+        self.counts.update(dish_ids)
+        for a, b in itertools.combinations(dish_ids, 2):
+            self.pairs[a][b] += 1
+            self.pairs[b][a] += 1
+
+    def neighbors(self, top_k, min_support):
+        """``{plat: [(voisin, score, support), ...]}``, meilleurs scores d'abord (égalités : plus petit id)."""
+        result = {}
+        for dish_id, row in self.pairs.items():
+            scored = (
+                (support / math.sqrt(self.counts[dish_id] * self.counts[other]), -other, support)
+                for other, support in row.items() if support >= min_support
+            )
+            best = heapq.nlargest(top_k, scored)
+            if best:
+                result[dish_id] = [(-other, score, support) for score, other, support in best]
+        return result
+
+
+def order_baskets(chunk_size, max_basket_size):
+    """``(restaurant_id, city_id, [plats])`` pour chaque commande terminée, lues par blocs."""
+    rows = OrderItem.objects.filter(order__status__in=COMPLETED_STATUSES).order_by('order_id').values_list(
+        'order_id', 'order__restaurant_id', 'order__restaurant__city_id', 'dish_id',
+    ).iterator(chunk_size=chunk_size)
+    for _, items in itertools.groupby(rows, key=itemgetter(0)):
+        items = list(items)
+        dish_ids = sorted({item[3] for item in items})[:max_basket_size]
+        yield items[0][1], items[0][2], dish_ids
+
+
+def build_matrices(config=None):
+    """Matrices de co-occurrence par portée : ``{(portée, identifiant): CooccurrenceMatrix}``."""
+    config = config or get_config()
+    matrices = defaultdict(CooccurrenceMatrix)
+    for restaurant_id, city_id, dish_ids in order_baskets(config['CHUNK_SIZE'], config['MAX_BASKET_SIZE']):
+        matrices[(DishPairing.SCOPE_RESTAURANT, restaurant_id)].add_basket(dish_ids)
+        if city_id is not None:
+            matrices[(DishPairing.SCOPE_CITY, city_id)].add_basket(dish_ids)
+    return matrices
+
+
+def rebuild(config=None):
+    """Recalcule toute la table ``DishPairing`` ; renvoie ``(nombre de portées, lignes écrites)``."""
+    config = config or get_config()
+    matrices = build_matrices(config)
+    rows = [
+        DishPairing(scope=scope, scope_id=scope_id, dish_id=dish_id, paired_dish_id=other,
+                    rank=rank, score=score, support=support)
+        for (scope, scope_id), matrix in matrices.items()
+        for dish_id, neighbors in matrix.neighbors(config['TOP_K'], config['MIN_SUPPORT']).items()
+        for rank, (other, score, support) in enumerate(neighbors)
+    ]
+    with transaction.atomic():
+        DishPairing.objects.all().delete()
+        DishPairing.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+    return len(matrices), len(rows)
+
+
+def paired_dishes(dish, restaurant_id=None, limit=None):
+    """
+    Plats souvent commandés avec ``dish`` : ceux du restaurant (``restaurant_id``
+    ou celui du plat), à défaut ceux de la ville du plat.
+    """
+    limit = limit or get_config()['TOP_K']
+    scopes = [(DishPairing.SCOPE_RESTAURANT, restaurant_id or dish.restaurant_id),
+              (DishPairing.SCOPE_CITY, dish.city_id)]
+    for scope, scope_id in scopes:
+        if scope_id is None:
+            continue
+        pairings = list(DishPairing.objects.filter(scope=scope, scope_id=scope_id, dish_id=dish.pk)
+                        .select_related('paired_dish').order_by('rank')[:limit])
+        if pairings:
+            return [pairing.paired_dish for pairing in pairings]
+    return []
+
+
+def restaurant_pairings(restaurant_id, dish_ids=None):
+    """``{plat: [voisins]}`` pour la caisse d'un restaurant, en une requête."""
+    pairings = DishPairing.objects.filter(scope=DishPairing.SCOPE_RESTAURANT, scope_id=restaurant_id)
+    if dish_ids is not None:
+        pairings = pairings.filter(dish_id__in=dish_ids, paired_dish_id__in=dish_ids)
+    result = defaultdict(list)
+    for dish_id, paired_dish_id in pairings.order_by('dish_id', 'rank').values_list('dish_id', 'paired_dish_id'):
+        result[dish_id].append(paired_dish_id)
+    return dict(result)
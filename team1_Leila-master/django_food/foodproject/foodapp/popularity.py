@@ -0,0 +1,234 @@
+"""
+Popularité et tendances des plats et des restaurants.
+
+Chaque événement (vue, commande payée ou livrée, avis, réservation) ajoute
+son poids aux colonnes indexées ``popularity_score`` (demi-vie
+``HALF_LIFE_DAYS``) et ``trending_score`` (demi-vie
+``TRENDING_HALF_LIFE_DAYS``). Pour éviter de réécrire tous les scores à
+mesure qu'ils décroissent, un événement survenu à l'instant t ajoute
+``poids * 2 ** ((t - origine) / demi-vie)`` : les événements récents pèsent
+exponentiellement plus, le classement est le même que celui des scores
+décroissants à tout instant, et la mise à jour est un simple
+``UPDATE ... SET score = score + x``. La valeur décrue à l'instant présent
+s'obtient avec ``current_value`` à partir de l'origine lue une fois par
+requête (``current_epoch(cached=True)``).
+
+L'origine (``PopularityEpoch``, ``EPOCH`` à défaut) est avancée chaque jour
+par ``rebase``, qui divise les scores stockés d'autant (un UPDATE par table) :
+sans cela, avec la demi-vie de 3 jours, les valeurs dépasseraient la limite
+des flottants au bout de huit ans environ. ``rebase`` est programmé dans la
+file de tâches par le premier enregistrement qui trouve une origine de plus
+de ``REBASE_AFTER_HOURS`` heures.
+
+Les vues sont ajoutées au vidage de ``view_counter`` ; les commandes, avis et
+réservations par le ``save()`` de leur modèle. ``rebuild`` (commande
+``rebuild_popularity``) recalcule tout depuis l'historique.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+DEFAULTS = {
+    'HALF_LIFE_DAYS': 30,
+    'TRENDING_HALF_LIFE_DAYS': 3,
+    # Origine initiale ; ensuite celle de PopularityEpoch
+    'EPOCH': datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+    'REBASE_AFTER_HOURS': 24,
+    # Durée de mise en cache de l'origine pour l'affichage (current_value)
+    'EPOCH_CACHE_SECONDS': 300,
+    'WEIGHTS': {
+        'view': 0.1,
+        'order': 5.0,
+        # Multiplié par note / 5
+        'review': 3.0,
+        'reservation': 4.0,
+    },
+}
+
+POPULARITY_FIELD = 'popularity_score'
+TRENDING_FIELD = 'trending_score'
+# Valeurs du paramètre ``sort``/``ordering`` des vues et des API
+SORTS = {'popularity': POPULARITY_FIELD, 'trending': TRENDING_FIELD}
+
+COMPLETED_ORDER_STATUSES = ('paid', 'delivered')
+CANCELED_RESERVATION_STATUS = 'canceled'
+
+WRITE_BATCH_SIZE = 500
+
+# 2 ** 900 laisse de la marge aux sommes de scores avant la limite des flottants (2 ** 1024)
+MAX_EXPONENT = 900
+
+EPOCH_CACHE_KEY = 'popularity:epoch'
+REBASE_SCHEDULED_KEY = 'popularity:rebase-scheduled'
+
+
+def get_config():
+    overrides = getattr(settings, 'POPULARITY', {})
+    return {**DEFAULTS, **overrides, 'WEIGHTS': {**DEFAULTS['WEIGHTS'], **overrides.get('WEIGHTS', {})}}
+
+
+def growth(when, half_life_days, epoch):
+    """
+    Facteur ``2 ** ((when - epoch) / demi-vie)`` d'un événement survenu à
+    ``when``. L'exposant est plafonné à ``MAX_EXPONENT`` : si l'origine n'est
+    plus avancée, les événements récents finissent par peser tous autant,
+    mais l'enregistrement ne lève jamais OverflowError.
+    """
+    return 2.0 ** min((when - epoch).total_seconds() / (half_life_days * 86400), MAX_EXPONENT)
+
+
+def current_epoch(config=None, cached=False):
+    """
+    Origine des scores stockés. ``cached`` : valeur du cache (affichage
+    seulement ; les écritures relisent la base pour ne pas mélanger deux
+    origines). Programme ``rebase`` si l'origine est trop ancienne.
+    """
+    config = config or get_config()
+    epoch = cache.get(EPOCH_CACHE_KEY) if cached else None
+    if epoch is None:
+        PopularityEpoch = django_apps.get_model('foodapp', 'PopularityEpoch')
+        epoch = PopularityEpoch.objects.filter(pk=1).values_list('epoch', flat=True).first() or config['EPOCH']
+        cache.set(EPOCH_CACHE_KEY, epoch, config['EPOCH_CACHE_SECONDS'])
+    if timezone.now() - epoch > timedelta(hours=config['REBASE_AFTER_HOURS']) \
+            and cache.add(REBASE_SCHEDULED_KEY, True, 3600):
+        from .task_queue import schedule
+        transaction.on_commit(lambda: schedule('foodapp.tasks.rebase_popularity'))
+    return epoch
+
+
+def rebase(now=None, config=None):
+    """
+    Avance l'origine des scores à ``now`` en divisant les scores stockés par
+    la croissance écoulée : classements et ``current_value`` sont inchangés.
+    Renvoie la nouvelle origine.
+    """
+    config = config or get_config()
+    now = now or timezone.now()
+    PopularityEpoch = django_apps.get_model('foodapp', 'PopularityEpoch')
+    with transaction.atomic():
+        row, _ = PopularityEpoch.objects.select_for_update().get_or_create(pk=1, defaults={'epoch': config['EPOCH']})
+        if now > row.epoch:
+            # Exposant négatif : un très long retard donne 0.0, jamais un dépassement
+            elapsed_days = (now - row.epoch).total_seconds() / 86400
+            for model_name in ('Dish', 'Restaurant'):
+                django_apps.get_model('foodapp', model_name).objects.update(**{
+                    POPULARITY_FIELD: F(POPULARITY_FIELD) * 2.0 ** -(elapsed_days / config['HALF_LIFE_DAYS']),
+                    TRENDING_FIELD: F(TRENDING_FIELD) * 2.0 ** -(elapsed_days / config['TRENDING_HALF_LIFE_DAYS']),
+                })
+            row.epoch = now
+            row.save(update_fields=['epoch'])
+    cache.set(EPOCH_CACHE_KEY, row.epoch, config['EPOCH_CACHE_SECONDS'])
+    cache.delete(REBASE_SCHEDULED_KEY)
+    return row.epoch
+
+
+def event_scores(kind, amount=1, when=None, config=None, epoch=None):
+    """Contributions ``(popularité, tendance)`` de ``amount`` événements ``kind`` survenus à ``when``."""
+    config = config or get_config()
+    when = when or timezone.now()
+    epoch = epoch or current_epoch(config)
+    weight = config['WEIGHTS'][kind] * amount
+    return (
+        weight * growth(when, config['HALF_LIFE_DAYS'], epoch),
+        weight * growth(when, config['TRENDING_HALF_LIFE_DAYS'], epoch),
+    )
+
+
+def increments(kind, amount=1, when=None, config=None):
+    """Arguments de ``QuerySet.update()`` ajoutant ces événements aux deux scores."""
+    popularity, trending = event_scores(kind, amount, when, config)
+    return {POPULARITY_FIELD: F(POPULARITY_FIELD) + popularity, TRENDING_FIELD: F(TRENDING_FIELD) + trending}
+
+
+def is_ranked(model):
+    return hasattr(model, POPULARITY_FIELD)
+
+
+def record(queryset, kind, amount=1, when=None):
+    """Ajoute ``amount`` événements ``kind`` à chaque objet de ``queryset`` (un UPDATE)."""
+    if amount:
+        queryset.update(**increments(kind, amount, when))
+
+
+def current_value(stored, epoch, trending=False, now=None, config=None):
+    """
+    Score décru à l'instant ``now`` (comparable d'un jour à l'autre,
+    contrairement à la valeur stockée). Calcul pur : ``epoch`` vient de
+    ``current_epoch(cached=True)``, résolu une fois par requête (via
+    ``sync_to_async`` dans les vues asynchrones).
+    """
+    config = config or get_config()
+    half_life = config['TRENDING_HALF_LIFE_DAYS'] if trending else config['HALF_LIFE_DAYS']
+    return stored / growth(now or timezone.now(), half_life, epoch)
+
+
+def ranked(queryset, sort='popularity'):
+    """``queryset`` trié par score décroissant (index sur la colonne, ou ville/type + colonne)."""
+    return queryset.order_by(f'-{SORTS[sort]}', 'id')
+
+
+def leaderboard(queryset, sort='popularity', city_id=None, dish_type=None, limit=10):
+    """Meilleurs objets de ``queryset``, éventuellement pour une ville et un type de plat."""
+    if city_id:
+        queryset = queryset.filter(city_id=city_id)
+    if dish_type:
+        queryset = queryset.filter(type=dish_type)
+    return ranked(queryset, sort)[:limit]
+
+
+def rebuild(config=None, chunk_size=2000):
+    """
+    Recalcule les scores de tous les plats et restaurants depuis l'historique.
+    Les vues n'étant pas datées, leur total compte à la date ``updated_at`` de
+    l'objet. Renvoie ``(plats, restaurants)`` mis à jour.
+    """
+    config = config or get_config()
+    epoch = current_epoch(config)
+    Dish = django_apps.get_model('foodapp', 'Dish')
+    Restaurant = django_apps.get_model('foodapp', 'Restaurant')
+    Order = django_apps.get_model('foodapp', 'Order')
+    OrderItem = django_apps.get_model('foodapp', 'OrderItem')
+    Review = django_apps.get_model('foodapp', 'Review')
+    Reservation = django_apps.get_model('foodapp', 'Reservation')
+
+    scores = {Dish: defaultdict(lambda: [0.0, 0.0]), Restaurant: defaultdict(lambda: [0.0, 0.0])}
+
+    def add(model, pk, kind, amount, when):
+        popularity, trending = event_scores(kind, amount, when, config, epoch)
+        total = scores[model][pk]
+        total[0] += popularity
+        total[1] += trending
+
+    completed = Order.objects.filter(status__in=COMPLETED_ORDER_STATUSES)
+    for restaurant_id, when in completed.values_list('restaurant_id', 'order_time').iterator(chunk_size=chunk_size):
+        add(Restaurant, restaurant_id, 'order', 1, when)
+    items = OrderItem.objects.filter(order__status__in=COMPLETED_ORDER_STATUSES)
+    for dish_id, quantity, when in items.values_list('dish_id', 'quantity', 'order__order_time').iterator(
+            chunk_size=chunk_size):
+        add(Dish, dish_id, 'order', quantity, when)
+    reviews = Review.objects.filter(is_published=True)
+    for restaurant_id, rating, when in reviews.values_list('restaurant_id', 'rating', 'created_at').iterator(
+            chunk_size=chunk_size):
+        add(Restaurant, restaurant_id, 'review', rating / 5, when)
+    reservations = Reservation.objects.exclude(status=CANCELED_RESERVATION_STATUS)
+    for restaurant_id, when in reservations.values_list('restaurant_id', 'created_at').iterator(chunk_size=chunk_size):
+        add(Restaurant, restaurant_id, 'reservation', 1, when)
+
+    updated = []
+    for model, model_scores in scores.items():
+        objects = []
+        for pk, views, when in model.objects.values_list('pk', 'views_count', 'updated_at').iterator(
+                chunk_size=chunk_size):
+            if views:
+                add(model, pk, 'view', views, when)
+            popularity, trending = model_scores.get(pk, (0.0, 0.0))
+            objects.append(model(pk=pk, popularity_score=popularity, trending_score=trending))
+        model.objects.bulk_update(objects, [POPULARITY_FIELD, TRENDING_FIELD], batch_size=WRITE_BATCH_SIZE)
+        updated.append(len(objects))
+    return tuple(updated)
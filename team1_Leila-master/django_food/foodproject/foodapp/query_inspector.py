@@ -0,0 +1,211 @@
+"""
+Inspection des requêtes SQL exécutées par requête HTTP.
+
+Enregistre chaque requête via ``connection.execute_wrapper``, regroupe les
+requêtes identiques aux paramètres près (empreinte) et signale les motifs N+1
+avec la ligne de code qui les a déclenchés. Utilisé par
+``QueryBudgetMiddleware``, par le helper de test ``assert_max_queries`` et par
+la commande ``query_report``.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import contextmanager, ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('foodapp.queries')
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DEFAULT_BUDGET': None,          # Nombre max de requêtes par vue (None = illimité)
+    'BUDGETS': {},                   # {'url_name': max_queries}
+    'N_PLUS_ONE_THRESHOLD': 5,       # Répétitions d'une même empreinte avant alerte
+    'RAISE_ON_VIOLATION': False,     # Lever une exception au lieu de journaliser
+    'RESPONSE_HEADER': False,        # Ajouter les en-têtes X-Query-* à la réponse
+    'REPORT_FILE': None,             # Fichier JSONL pour la commande query_report
+}
+
+# Fichiers à ignorer pour trouver la ligne "responsable" d'une requête
+_IGNORED_FRAMES = (
+    os.sep + 'django' + os.sep,
+    os.sep + 'site-packages' + os.sep,
+    os.sep + 'threading.py',
+    __file__.rstrip('c'),
+)
+
+# Wrappers posés par d'autres modules autour de l'exécution ou du rendu :
+# jamais l'origine d'une requête, même si leur fichier est applicatif
+_IGNORED_FUNCTIONS = (
+    (os.path.join(os.path.dirname(__file__), 'middleware.py'), 'db_timer'),
+    (os.path.join(os.path.dirname(__file__), 'metrics.py'), 'render'),
+)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'QUERY_INSPECTOR', {}))
+    return config
+
+
+class QueryBudgetExceeded(Exception):
+    """Levée quand une vue dépasse son budget de requêtes (mode strict)."""
+
+
+def fingerprint(sql):
+    """
+    Normalise une requête SQL pour que deux requêtes ne différant que par
+    leurs paramètres aient la même empreinte.
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def _origin_frame():
+    """Retourne 'fichier:ligne in fonction' de la première frame applicative."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if any(part in frame.filename for part in _IGNORED_FRAMES):
+            continue
+        if not any(frame.name == name and frame.filename == path for path, name in _IGNORED_FUNCTIONS):
+            return f"{os.path.relpath(frame.filename, settings.BASE_DIR)}:{frame.lineno} in {frame.name}"
+    return None
+
+
+class QueryRecorder:
+    """
+    Wrapper d'exécution qui enregistre SQL, durée et origine de chaque requête.
+
+    S'installe sur toutes les connexions avec ``recorder.install()`` (context
+    manager).
+    """
+
+    def __init__(self, capture_stack=True):
+        self.capture_stack = capture_stack
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration': time.perf_counter() - start,
+                'origin': _origin_frame() if self.capture_stack else None,
+                'alias': context['connection'].alias,
+            })
+
+    @contextmanager
+    def install(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    def report(self, threshold=None):
+        return QueryReport(self.queries, threshold)
+
+
+class QueryReport:
+    """Analyse d'une liste de requêtes enregistrées."""
+
+    def __init__(self, queries, threshold=None):
+        if threshold is None:
+            threshold = get_config()['N_PLUS_ONE_THRESHOLD']
+        self.queries = queries
+        self.threshold = threshold
+
+        groups = defaultdict(list)
+        for query in queries:
+            groups[fingerprint(query['sql'])].append(query)
+        self.groups = groups
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(q['duration'] for q in self.queries)
+
+    @property
+    def duplicates(self):
+        """Nombre de requêtes qui répètent une empreinte déjà vue."""
+        return sum(len(group) - 1 for group in self.groups.values())
+
+    def n_plus_one(self):
+        """
+        Liste des motifs N+1 : une même empreinte répétée au moins
+        ``threshold`` fois, avec l'origine la plus fréquente.
+        """
+        suspects = []
+        for sql, group in self.groups.items():
+            if len(group) < self.threshold:
+                continue
+            origins = Counter(q['origin'] for q in group if q['origin'])
+            origin = origins.most_common(1)[0][0] if origins else None
+            suspects.append({'fingerprint': sql, 'count': len(group), 'origin': origin})
+        suspects.sort(key=lambda s: s['count'], reverse=True)
+        return suspects
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'time_ms': round(self.total_time * 1000, 2),
+            'duplicates': self.duplicates,
+            'n_plus_one': self.n_plus_one(),
+        }
+
+    def format(self):
+        lines = [f"{self.count} requêtes ({self.duplicates} répétées, {self.total_time * 1000:.1f} ms)"]
+        for suspect in self.n_plus_one():
+            lines.append(f"  N+1 x{suspect['count']} depuis {suspect['origin'] or '?'}")
+            lines.append(f"    {suspect['fingerprint'][:200]}")
+        return '\n'.join(lines)
+
+
+_report_lock = threading.Lock()
+
+
+def write_report_entry(path, entry):
+    """Ajoute une ligne JSON au fichier de rapport agrégé."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    with _report_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+@contextmanager
+def assert_max_queries(max_queries, threshold=None, allow_n_plus_one=False):
+    """
+    Helper de test : échoue si le bloc exécute plus de ``max_queries`` requêtes
+    ou contient un motif N+1.
+
+        with assert_max_queries(5):
+            self.client.get(reverse('dish_list'))
+    """
+    recorder = QueryRecorder()
+    with recorder.install():
+        yield recorder
+    report = recorder.report(threshold)
+    if report.count > max_queries:
+        raise AssertionError(f"Budget de {max_queries} requêtes dépassé :\n{report.format()}")
+    if not allow_n_plus_one and report.n_plus_one():
+        raise AssertionError(f"Motif N+1 détecté :\n{report.format()}")
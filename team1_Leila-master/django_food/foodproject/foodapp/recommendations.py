@@ -0,0 +1,283 @@
+"""
+Recommandation de plats à partir du profil utilisateur.
+
+Le catalogue est encodé une fois par processus en matrice de caractéristiques
+(une ligne par plat : indicateurs régime/santé, type, origine, calories,
+note, popularité). Un profil devient un vecteur de poids et deux listes
+d'indicateurs : ``forbidden`` (plat exclu si l'indicateur est vrai) et
+``required`` (plat exclu s'il est faux) ; les allergies sont un masque de bits
+comparé à ``Dish.allergen_mask`` (voir foodapp.allergens). Tout le catalogue
+est noté en une multiplication matrice-vecteur, les exclusions en une autre
+et un ET bit à bit, puis les N meilleurs sont extraits avec ``argpartition``.
+
+La matrice est reconstruite quand le catalogue change (nombre de plats,
+dernier ``Dish.updated_at``, avis et leurs notes) et au moins toutes les
+``SCORES_MAX_AGE`` secondes : les compteurs de vues sont mis à jour par
+``QuerySet.update()`` sans toucher ``updated_at``. Les N meilleurs plats de chaque utilisateur sont
+gardés dans le cache Django sous une clé qui contient la version du profil
+(``UserProfile.updated_at``) et celle du catalogue : toute modification de
+l'un ou de l'autre les rend obsolètes. Sans NumPy, le même calcul est fait en
+Python pur.
+"""
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Sum
+
+from . import allergens
+from .models import Dish, Review
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULTS = {
+    'TOP_N': 12,
+    'CACHE_TIMEOUT': 60 * 60,
+    # Calories au-delà desquelles un plat est considéré comme très calorique
+    'CALORIES_SCALE': 1000,
+    # Délai maximal avant de prendre en compte les nouvelles vues (0 : jamais)
+    'SCORES_MAX_AGE': 10 * 60,
+}
+
+# Indicateurs booléens des plats (colonnes 0..len(FLAGS)-1 de la matrice)
+FLAGS = (
+    'vegetarian', 'vegan', 'gluten', 'lactose', 'nuts', 'sugary', 'cholesterol',
+    'diabetic_friendly', 'low_calorie', 'tourist',
+    'sweet', 'salty', 'drink', 'moroccan', 'international', 'fusion',
+)
+# Valeurs continues dans [0, 1]
+NUMERIC = ('calories', 'rating', 'popularity')
+FEATURES = FLAGS + NUMERIC
+COLUMN = {name: index for index, name in enumerate(FEATURES)}
+
+# Préférences communes à tous les profils : plats bien notés et populaires d'abord
+BASE_WEIGHTS = {'rating': 1.0, 'popularity': 0.5, 'tourist': 0.1}
+
+# Poids ajoutés selon les objectifs et contraintes du profil
+GOAL_WEIGHTS = {
+    'weight_loss': {'low_calorie': 1.0, 'calories': -1.0},
+    'weight_gain': {'calories': 0.8},
+    'muscle_gain': {'calories': 0.5},
+    'heart_health': {'cholesterol': -1.0, 'low_calorie': 0.3},
+    'diabetes': {'diabetic_friendly': 1.0, 'sugary': -1.0},
+    'digestive_health': {'vegetarian': 0.3},
+    'energy': {'calories': 0.3},
+}
+DIET_WEIGHTS = {
+    'keto': {'sugary': -1.0, 'sweet': -0.5},
+    'mediterranean': {'vegetarian': 0.3},
+    'pescatarian': {'vegetarian': 0.5},
+    'paleo': {'sugary': -0.5},
+}
+ACTIVITY_WEIGHTS = {
+    'sedentary': {'calories': -0.3},
+    'active': {'calories': 0.3},
+    'extreme': {'calories': 0.5},
+}
+WEIGHT_GOAL_WEIGHTS = {
+    'lose': {'low_calorie': 0.5, 'calories': -0.5},
+    'gain': {'calories': 0.5},
+}
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RECOMMENDATIONS', {})}
+
+
+class Catalog:
+    """Matrice des caractéristiques des plats, avec la version du catalogue encodé."""
+
+    def __init__(self, ids, rows, version, allergen_masks=None):
+        self.ids = ids
+        self.version = version
+        allergen_masks = allergen_masks or [0] * len(ids)
+        if numpy is not None:
+            self.features = numpy.array(rows, dtype=numpy.float32).reshape(len(rows), len(FEATURES))
+            self.flags = self.features[:, :len(FLAGS)].astype(numpy.uint8)
+            self.allergen_masks = numpy.array(allergen_masks, dtype=numpy.int64)
+        else:
+            self.features = rows
+            self.flags = [row[:len(FLAGS)] for row in rows]
+            self.allergen_masks = allergen_masks
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def catalog_version(config=None):
+    """
+    Version du catalogue encodé : plats, avis (la note moyenne en dépend) et
+    tranche de ``SCORES_MAX_AGE`` secondes pour les compteurs de vues.
+    """
+    config = config or get_config()
+    dishes = Dish.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+    reviews = Review.objects.aggregate(count=Count('id'), total=Sum('rating'), latest=Max('updated_at'))
+    period = int(time.time() // config['SCORES_MAX_AGE']) if config['SCORES_MAX_AGE'] else 0
+    parts = (
+        dishes['count'], dishes['latest'].timestamp() if dishes['latest'] else 0,
+        reviews['count'], reviews['total'] or 0, reviews['latest'].timestamp() if reviews['latest'] else 0,
+        period,
+    )
+    return ':'.join(str(part) for part in parts)
+
+
+def encode_dish(row, config, max_views):
+    """Ligne de la matrice pour un plat (tuple de ``values_list`` de ``load_catalog``)."""
+    (_, is_vegetarian, is_vegan, has_gluten, has_lactose, has_nuts, has_sugar, has_cholesterol,
+     is_diabetic_friendly, is_low_calorie, is_tourist, dish_type, origin, calories, rating, views, _) = row
+    flags = {
+        'vegetarian': is_vegetarian or is_vegan,
+        'vegan': is_vegan,
+        'gluten': has_gluten,
+        'lactose': has_lactose,
+        'nuts': has_nuts,
+        # Un dessert sucré mais adapté aux diabétiques reste permis
+        'sugary': has_sugar and not is_diabetic_friendly,
+        'cholesterol': has_cholesterol,
+        'diabetic_friendly': is_diabetic_friendly,
+        'low_calorie': is_low_calorie,
+        'tourist': is_tourist,
+        'sweet': dish_type == Dish.SWEET,
+        'salty': dish_type == Dish.SALTY,
+        'drink': dish_type == Dish.DRINK,
+        'moroccan': origin == Dish.MOROCCAN,
+        'international': origin == Dish.INTERNATIONAL,
+        'fusion': origin == Dish.FUSION,
+    }
+    numeric = {
+        # Valeurs inconnues : milieu de l'échelle, ni favorisées ni pénalisées
+        'calories': min(calories / config['CALORIES_SCALE'], 1.0) if calories is not None else 0.5,
+        'rating': rating / 5 if rating is not None else 0.5,
+        'popularity': math.log1p(views) / math.log1p(max_views) if max_views else 0.0,
+    }
+    return [float(flags[name]) for name in FLAGS] + [numeric[name] for name in NUMERIC]
+
+
+def load_catalog(version=None):
+    config = get_config()
+    rows = list(Dish.objects.order_by('id').annotate(rating=Avg('restaurant__reviews__rating')).values_list(
+        'id', 'is_vegetarian', 'is_vegan', 'has_gluten', 'has_lactose', 'has_nuts', 'has_sugar', 'has_cholesterol',
+        'is_diabetic_friendly', 'is_low_calorie', 'is_tourist_recommended', 'type', 'origin', 'calories',
+        'rating', 'views_count', 'allergen_mask',
+    ))
+    max_views = max((row[-2] for row in rows), default=0)
+    return Catalog(
+        [row[0] for row in rows],
+        [encode_dish(row, config, max_views) for row in rows],
+        version or catalog_version(),
+        [row[-1] for row in rows],
+    )
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Matrice du catalogue courant (reconstruite si les plats ont changé)."""
+    global _catalog
+    version = catalog_version()
+    if _catalog is None or _catalog.version != version:
+        with _catalog_lock:
+            if _catalog is None or _catalog.version != version:
+                _catalog = load_catalog(version)
+    return _catalog
+
+
+def profile_vector(profile):
+    """Poids des caractéristiques, indicateurs interdits/requis et masque des allergènes exclus pour ``profile``."""
+    weights = dict(BASE_WEIGHTS)
+
+    def add(extra):
+        for feature, weight in extra.items():
+            weights[feature] = weights.get(feature, 0.0) + weight
+
+    forbidden, required = set(), set()
+    diet = profile.dietary_preference
+    if diet == 'vegan' or profile.is_vegan:
+        required.add('vegan')
+    elif diet == 'vegetarian' or profile.is_vegetarian:
+        required.add('vegetarian')
+    if profile.has_diabetes:
+        forbidden.add('sugary')
+    if profile.has_high_cholesterol:
+        forbidden.add('cholesterol')
+    if profile.has_high_blood_pressure:
+        add({'low_calorie': 0.3, 'cholesterol': -0.3})
+
+    add(DIET_WEIGHTS.get(diet, {}))
+    for goal in profile.health_goals or []:
+        add(GOAL_WEIGHTS.get(goal, {}))
+    add(ACTIVITY_WEIGHTS.get(profile.activity_level, {}))
+    add(WEIGHT_GOAL_WEIGHTS.get(profile.weight_goal, {}))
+    # Gluten, lactose et allergies : Dish.allergen_mask couvre aussi les cases has_*
+    return weights, forbidden, required, allergens.profile_mask(profile)
+
+
+def _numpy_top(catalog, weights, forbidden, required, allergen_mask, n):
+    vector = numpy.zeros(len(FEATURES), dtype=numpy.float32)
+    for feature, weight in weights.items():
+        vector[COLUMN[feature]] = weight
+    scores = catalog.features @ vector
+
+    forbidden_mask = numpy.zeros(len(FLAGS), dtype=numpy.uint8)
+    required_mask = numpy.zeros(len(FLAGS), dtype=numpy.uint8)
+    forbidden_mask[[COLUMN[flag] for flag in forbidden]] = 1
+    required_mask[[COLUMN[flag] for flag in required]] = 1
+    # Exclu : un indicateur interdit présent ou un indicateur requis absent
+    excluded = (catalog.flags @ forbidden_mask > 0) | ((1 - catalog.flags) @ required_mask > 0)
+    excluded |= (catalog.allergen_masks & allergen_mask) != 0
+    scores[excluded] = -numpy.inf
+
+    allowed = int((~excluded).sum())
+    n = min(n, allowed)
+    if not n:
+        return []
+    candidates = numpy.argpartition(-scores, n - 1)[:n] if n < len(scores) else numpy.arange(len(scores))
+    # Ordre décroissant, égalités départagées par l'ordre du catalogue (id)
+    candidates = candidates[numpy.lexsort((candidates, -scores[candidates]))]
+    ids = numpy.asarray(catalog.ids)
+    return [int(dish_id) for dish_id in ids[candidates[:n]]]
+
+
+def _python_top(catalog, weights, forbidden, required, allergen_mask, n):
+    vector = [weights.get(feature, 0.0) for feature in FEATURES]
+    forbidden = [COLUMN[flag] for flag in forbidden]
+    required = [COLUMN[flag] for flag in required]
+    scored = (
+        (sum(value * weight for value, weight in zip(row, vector)), -index)
+        for index, (row, mask) in enumerate(zip(catalog.features, catalog.allergen_masks))
+        if not mask & allergen_mask and not any(row[c] for c in forbidden) and all(row[c] for c in required)
+    )
+    return [catalog.ids[-index] for _, index in heapq.nlargest(n, scored)]
+
+
+def rank_catalog(catalog, profile, n):
+    top = _numpy_top if numpy is not None else _python_top
+    return top(catalog, *profile_vector(profile), n)
+
+
+def recommended_dish_ids(profile, n=None):
+    """Identifiants des ``n`` plats les plus adaptés à ``profile``, lus en cache si possible."""
+    config = get_config()
+    n = n or config['TOP_N']
+    catalog = get_catalog()
+    updated = profile.updated_at.timestamp() if profile.updated_at else 0
+    key = f'recommendations:{profile.user_id}:{updated}:{catalog.version}:{n}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = rank_catalog(catalog, profile, n)
+        cache.set(key, ids, config['CACHE_TIMEOUT'])
+    return ids
+
+
+def recommended_dishes(profile, n=None):
+    """Plats recommandés à ``profile``, dans l'ordre du score."""
+    ids = recommended_dish_ids(profile)
+    dishes = Dish.objects.in_bulk(ids[:n] if n else ids)
+    return [dishes[dish_id] for dish_id in (ids[:n] if n else ids) if dish_id in dishes]
@@ -0,0 +1,143 @@
+"""
+Moteur de sessions hybride (``SESSION_ENGINE = 'foodapp.session_engine'``).
+
+- Les petites sessions anonymes (langue, identifiant de chat...) sont
+  stockées dans un cookie signé : aucun accès à ``django_session``.
+- Les sessions authentifiées, trop volumineuses pour un cookie ou contenant
+  des données qui ne doivent pas quitter le serveur (assistant d'inscription)
+  passent en cache + base (write-through, ``cached_db``), ou en base seule
+  si le cache n'est pas partagé entre processus (``LocMemCache`` : chaque
+  worker garderait sa copie d'une session déconnectée ailleurs).
+
+Le cookie signé est lisible par le client (signé, pas chiffré) : les clés
+listées dans ``SESSION_STRATEGY['SERVER_SIDE_PREFIXES']`` forcent donc le
+stockage serveur. Réglages dans ``settings.SESSION_STRATEGY``.
+"""
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends import cached_db, db, signed_cookies
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+DEFAULTS = {
+    'ANONYMOUS_COOKIE': True,
+    # Les navigateurs limitent un cookie à ~4 Ko, en-tête compris
+    'COOKIE_MAX_BYTES': 2048,
+    # Préfixe des données de formtools (mots de passe de l'assistant d'inscription)
+    'SERVER_SIDE_PREFIXES': ('wizard_',),
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SESSION_STRATEGY', {})}
+
+
+def is_cookie_key(session_key):
+    """Une clé de session signée contient des ':' ; une clé en base est alphanumérique."""
+    return bool(session_key) and ':' in session_key
+
+
+def cache_is_shared():
+    """Le cache des sessions est-il commun à tous les workers ?"""
+    return not isinstance(caches[settings.SESSION_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+class _CachedDBStore(cached_db.SessionStore):
+    def _get_session_from_db(self):
+        metrics.record_session('db', 'read')
+        return super()._get_session_from_db()
+
+
+class _DBStore(db.SessionStore):
+    def _get_session_from_db(self):
+        metrics.record_session('db', 'read')
+        return super()._get_session_from_db()
+
+
+def server_store(session_key=None):
+    """Stockage serveur : cache + base si le cache est partagé, base seule sinon."""
+    return (_CachedDBStore if cache_is_shared() else _DBStore)(session_key)
+
+
+class SessionStore(SessionBase):
+    """
+    Choisit le stockage à chaque sauvegarde en fonction du contenu de la
+    session ; la clé de session (cookie) indique où la relire.
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self.config = get_config()
+
+    def _store_for(self, session_key):
+        if is_cookie_key(session_key):
+            return signed_cookies.SessionStore(session_key)
+        return server_store(session_key)
+
+    def _needs_server_side(self, data):
+        if not self.config['ANONYMOUS_COOKIE'] or SESSION_KEY in data:
+            return True
+        prefixes = tuple(self.config['SERVER_SIDE_PREFIXES'])
+        return bool(prefixes) and any(key.startswith(prefixes) for key in data)
+
+    def load(self):
+        if not self.session_key:
+            return {}
+        store = self._store_for(self.session_key)
+        if is_cookie_key(self.session_key):
+            metrics.record_session('cookie', 'read')
+        elif isinstance(store, _CachedDBStore):
+            metrics.record_session('cache', 'read')
+        data = store.load()
+        if not data:
+            # Cookie invalide/expiré ou session absente du cache et de la base
+            self._session_key = None
+        return data
+
+    def exists(self, session_key):
+        if is_cookie_key(session_key):
+            return False
+        return server_store().exists(session_key)
+
+    def create(self):
+        # Le stockage est choisi à la sauvegarde, selon le contenu
+        self._session_key = None
+        self.modified = True
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        previous_key = self.session_key
+
+        if not self._needs_server_side(data):
+            cookie_store = signed_cookies.SessionStore()
+            cookie_store._session_cache = data
+            cookie_store.save()
+            if len(cookie_store.session_key) <= self.config['COOKIE_MAX_BYTES']:
+                metrics.record_session('cookie', 'write')
+                self._session_key = cookie_store.session_key
+                if previous_key and not is_cookie_key(previous_key):
+                    self.delete(previous_key)
+                return
+
+        # Une session qui quitte le cookie reçoit une nouvelle clé en base
+        db_key = None if is_cookie_key(previous_key) else previous_key
+        store = server_store(db_key)
+        store._session_cache = data
+        store.save(must_create=must_create or db_key is None)
+        metrics.record_session('db', 'write')
+        self._session_key = store.session_key
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if session_key and not is_cookie_key(session_key):
+            server_store(session_key).delete(session_key)
+            metrics.record_session('db', 'write')
+
+    @classmethod
+    def clear_expired(cls):
+        cached_db.SessionStore.clear_expired()
@@ -0,0 +1,267 @@
+"""
+Plats similaires par contenu.
+
+Chaque plat devient un vecteur creux : TF-IDF (fréquence logarithmique) des
+termes de son nom (compté ``NAME_BOOST`` fois), de sa description et de ses
+ingrédients, limité aux ``MAX_FEATURES`` termes les plus fréquents, puis des
+caractéristiques catégorielles pondérées (``type:salty``, ``origin:moroccan``,
+``city:3``, ``flag:is_vegan``...). Les vecteurs sont de norme 1 : la
+similarité cosinus est un produit scalaire, accumulé pour un plat à la fois
+sur l'index inversé des caractéristiques (tableaux NumPy s'il est installé).
+La mémoire suit le nombre de valeurs non nulles, jamais plats x termes.
+
+Les ``TOP_K`` voisins de chaque plat sont écrits dans ``DishSimilarity``.
+Le calcul incrémental (``refresh``) ne traite que les plats modifiés depuis le
+dernier passage (``Dish.updated_at`` > ``Dish.similarity_version``) et les
+plats dont la liste peut changer à cause d'eux ; il ne lit de
+``DishSimilarity`` que les lignes de ces plats. Les vecteurs de tout le
+catalogue restent nécessaires : tout plat peut devenir voisin d'un plat modifié.
+"""
+import heapq
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Dish, DishSimilarity
+from .text_search import light_stem, tokenize
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULTS = {
+    'TOP_K': 6,
+    'MAX_FEATURES': 3000,
+    # Voisins sous ce score ignorés
+    'MIN_SCORE': 0.05,
+}
+
+# Un terme du nom compte comme NAME_BOOST occurrences
+NAME_BOOST = 2
+
+# Poids des caractéristiques catégorielles, face au texte (norme 1)
+CATEGORY_WEIGHTS = {'type': 0.35, 'origin': 0.25, 'city': 0.25, 'flag': 0.1}
+FLAGS = ('is_vegetarian', 'is_vegan', 'has_gluten', 'has_lactose', 'has_nuts', 'has_sugar',
+         'is_diabetic_friendly', 'is_low_calorie')
+FIELDS = ('id', 'name', 'description', 'ingredients', 'type', 'origin', 'city_id') + FLAGS
+
+WRITE_BATCH_SIZE = 1000
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SIMILAR_DISHES', {})}
+
+
+def text_terms(row):
+    terms = Counter()
+    for _ in range(NAME_BOOST):
+        terms.update(light_stem(term) for term in tokenize(row['name']))
+    for field in ('description', 'ingredients'):
+        terms.update(light_stem(term) for term in tokenize(row[field]))
+    return terms
+
+
+def category_features(row):
+    features = {f"type:{row['type']}": CATEGORY_WEIGHTS['type'], f"origin:{row['origin']}": CATEGORY_WEIGHTS['origin']}
+    if row['city_id'] is not None:
+        features[f"city:{row['city_id']}"] = CATEGORY_WEIGHTS['city']
+    features.update({f'flag:{flag}': CATEGORY_WEIGHTS['flag'] for flag in FLAGS if row[flag]})
+    return features
+
+
+def _normalized(vector):
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {feature: weight / norm for feature, weight in vector.items()} if norm else {}
+
+
+class Corpus:
+    """Vecteurs normalisés de tout le catalogue, avec un index inversé des caractéristiques."""
+
+    def __init__(self, rows, max_features):
+        self.ids = [row['id'] for row in rows]
+        self.position = {dish_id: index for index, dish_id in enumerate(self.ids)}
+        counts = [text_terms(row) for row in rows]
+        document_frequency = Counter()
+        for terms in counts:
+            document_frequency.update(terms.keys())
+        vocabulary = sorted(document_frequency, key=lambda term: (-document_frequency[term], term))[:max_features]
+        total = len(rows)
+        idf = {term: math.log((1 + total) / (1 + document_frequency[term])) + 1 for term in vocabulary}
+
+        self.vectors = []
+        for row, terms in zip(rows, counts):
+            text = _normalized({term: (1 + math.log(count)) * idf[term] for term, count in terms.items() if term in idf})
+            self.vectors.append(_normalized({**text, **category_features(row)}))
+
+        self.postings = {}
+        for index, vector in enumerate(self.vectors):
+            for feature, weight in vector.items():
+                self.postings.setdefault(feature, []).append((index, weight))
+        self._posting_arrays = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def posting_arrays(self):
+        """Index inversé en tableaux NumPy ``{caractéristique: (positions, poids)}``."""
+        if self._posting_arrays is None:
+            self._posting_arrays = {
+                feature: (numpy.fromiter((index for index, _ in postings), numpy.int32, len(postings)),
+                          numpy.fromiter((weight for _, weight in postings), numpy.float32, len(postings)))
+                for feature, postings in self.postings.items()
+            }
+        return self._posting_arrays
+
+    def _numpy_scores(self, position, buffer, limit):
+        """
+        Scores accumulés dans ``buffer`` (un flottant par plat, remis à zéro
+        après lecture). ``limit`` : ne garder que les ``limit`` meilleurs,
+        ex aequo compris.
+        """
+        for feature, weight in self.vectors[position].items():
+            others, weights = self.posting_arrays[feature]
+            # Positions distinctes dans une liste : l'addition indexée est exacte
+            buffer[others] += weight * weights
+        nonzero = numpy.flatnonzero(buffer)
+        values = buffer[nonzero]
+        buffer[nonzero] = 0
+        if limit and len(values) > limit:
+            keep = values >= numpy.partition(values, -limit)[-limit]
+            nonzero, values = nonzero[keep], values[keep]
+        return dict(zip(nonzero.tolist(), values.tolist()))
+
+    def _python_scores(self, position):
+        scores = Counter()
+        for feature, weight in self.vectors[position].items():
+            for other, other_weight in self.postings[feature]:
+                scores[other] += weight * other_weight
+        return scores
+
+    def similarities(self, dish_ids, limit=None):
+        """
+        ``(plat, {position: score})`` pour chaque plat de ``dish_ids``, un plat
+        à la fois ; avec NumPy, limité aux ``limit`` meilleurs scores.
+        """
+        buffer = numpy.zeros(len(self.ids), dtype=numpy.float32) if numpy is not None else None
+        for dish_id in dish_ids:
+            position = self.position.get(dish_id)
+            if position is None:
+                continue
+            if buffer is not None:
+                yield dish_id, self._numpy_scores(position, buffer, limit)
+            else:
+                yield dish_id, self._python_scores(position)
+
+    def neighbors(self, dish_ids, top_k, min_score):
+        """``{plat: [(voisin, score), ...]}``, meilleurs scores d'abord (égalités : plus petit id)."""
+        result = {}
+        # Le plat lui-même figure parmi ses meilleurs scores
+        for dish_id, scores in self.similarities(dish_ids, limit=top_k + 1):
+            best = heapq.nlargest(top_k, (
+                (score, -self.ids[other]) for other, score in scores.items()
+                if self.ids[other] != dish_id and score >= min_score
+            ))
+            result[dish_id] = [(-other, score) for score, other in best]
+        return result
+
+
+def load_corpus(config=None):
+    config = config or get_config()
+    rows = list(Dish.objects.order_by('id').values(*FIELDS))
+    return Corpus(rows, config['MAX_FEATURES'])
+
+
+def write_neighbors(neighbors, snapshot):
+    """Remplace les voisins des plats de ``neighbors`` et marque ces plats comme à jour à ``snapshot``."""
+    dish_ids = list(neighbors)
+    with transaction.atomic():
+        for start in range(0, len(dish_ids), WRITE_BATCH_SIZE):
+            batch = dish_ids[start:start + WRITE_BATCH_SIZE]
+            DishSimilarity.objects.filter(dish_id__in=batch).delete()
+            DishSimilarity.objects.bulk_create([
+                DishSimilarity(dish_id=dish_id, similar_id=other, rank=rank, score=score)
+                for dish_id in batch
+                for rank, (other, score) in enumerate(neighbors[dish_id])
+            ], batch_size=WRITE_BATCH_SIZE)
+            # Un plat modifié pendant le calcul garde updated_at > snapshot : il sera repris
+            Dish.objects.filter(id__in=batch, updated_at__lte=snapshot).update(similarity_version=F('updated_at'))
+
+
+def rebuild(config=None):
+    """Recalcule les voisins de tous les plats ; renvoie le nombre de plats traités."""
+    config = config or get_config()
+    snapshot = timezone.now()
+    corpus = load_corpus(config)
+    write_neighbors(corpus.neighbors(corpus.ids, config['TOP_K'], config['MIN_SCORE']), snapshot)
+    return len(corpus)
+
+
+def changed_dish_ids():
+    return list(Dish.objects.filter(
+        Q(similarity_version__isnull=True) | Q(similarity_version__lt=F('updated_at'))
+    ).values_list('id', flat=True))
+
+
+def refresh(config=None):
+    """
+    Recalcule les voisins des plats modifiés et des plats dont la liste peut
+    changer : ceux qui avaient un plat modifié parmi leurs voisins, ou dont la
+    similarité avec un plat modifié dépasse leur plus faible voisin actuel.
+    Renvoie ``(plats modifiés, plats recalculés)``.
+    """
+    config = config or get_config()
+    changed = changed_dish_ids()
+    if not changed:
+        return 0, 0
+    snapshot = timezone.now()
+    corpus = load_corpus(config)
+
+    affected = set(changed)
+    for start in range(0, len(changed), WRITE_BATCH_SIZE):
+        affected.update(DishSimilarity.objects.filter(
+            similar_id__in=changed[start:start + WRITE_BATCH_SIZE]).values_list('dish_id', flat=True))
+
+    # Meilleur score de chaque autre plat face aux plats modifiés
+    best = {}
+    for _, scores in corpus.similarities(changed):
+        for position, score in scores.items():
+            other = corpus.ids[position]
+            if score >= config['MIN_SCORE'] and other not in affected and score > best.get(other, 0):
+                best[other] = score
+    candidates = list(best)
+    for start in range(0, len(candidates), WRITE_BATCH_SIZE):
+        floors = DishSimilarity.objects.filter(dish_id__in=candidates[start:start + WRITE_BATCH_SIZE]).values(
+            'dish_id').annotate(count=Count('id'), floor=Min('score'))
+        full = {row['dish_id']: row['floor'] for row in floors if row['count'] >= config['TOP_K']}
+        for other in candidates[start:start + WRITE_BATCH_SIZE]:
+            if best[other] >= full.get(other, config['MIN_SCORE']):
+                affected.add(other)
+
+    affected = [dish_id for dish_id in corpus.ids if dish_id in affected]
+    write_neighbors(corpus.neighbors(affected, config['TOP_K'], config['MIN_SCORE']), snapshot)
+    return len(changed), len(affected)
+
+
+def similar_dishes(dish, limit=None):
+    """Plats les plus proches de ``dish``, en une requête."""
+    limit = limit or get_config()['TOP_K']
+    return list(Dish.objects.filter(neighbor_of__dish=dish).order_by('neighbor_of__rank')[:limit])
+
+
+def similar_to_restaurant(restaurant, limit=6):
+    """
+    Plats d'autres restaurants de la ville les plus proches de la carte de
+    ``restaurant`` (somme des scores), en une requête.
+    """
+    return list(
+        Dish.objects.filter(neighbor_of__dish__restaurant=restaurant, city_id=restaurant.city_id)
+        .exclude(restaurant=restaurant)
+        .annotate(match_score=Sum('neighbor_of__score'))
+        .order_by('-match_score', 'id')[:limit]
+    )
@@ -0,0 +1,238 @@
+"""
+File de tâches persistante, stockée en base (modèle ``Task``).
+
+Les vues appellent ``enqueue(fonction, *args, **kwargs)`` (ou
+``fonction.delay(...)`` pour les fonctions décorées par ``@task``) : la tâche
+est enregistrée dans la transaction de la requête et exécutée plus tard par
+``manage.py run_workers``. Les échecs sont rejoués avec un délai exponentiel ;
+après ``max_attempts`` essais la tâche passe en « Abandonnée » (dead letter),
+consultable et relançable depuis l'admin.
+
+Réservation des tâches : ``SELECT ... FOR UPDATE SKIP LOCKED`` quand la base
+le permet (PostgreSQL, MySQL 8, Oracle), sinon (SQLite) un bail posé par un
+``UPDATE`` conditionnel : un seul worker peut passer la ligne en « En cours ».
+Un bail expiré (worker arrêté brutalement) rend la tâche à nouveau disponible.
+"""
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger('foodapp.tasks')
+
+DEFAULTS = {
+    'MAX_ATTEMPTS': 5,
+    # Délai avant le n-ième nouvel essai : BACKOFF_BASE * 2**(n-1), plafonné
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'LEASE_SECONDS': 300,
+    'POLL_INTERVAL': 1.0,
+    # Exécuter immédiatement au lieu de mettre en file (tests, scripts)
+    'ALWAYS_EAGER': False,
+}
+
+
+# Masqués à l'affichage des tâches (admin) : arguments nommés et lignes « Mot de passe : ... »
+SENSITIVE_KEYS = re.compile(r'password|passwd|secret|token', re.IGNORECASE)
+SENSITIVE_TEXT = re.compile(r'((?:mot de passe|password)[^:\n]*:\s*)\S+', re.IGNORECASE)
+REDACTED = '[masqué]'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TASK_QUEUE', {})}
+
+
+def redact(value, key=''):
+    """Copie de ``value`` (charge utile JSON) sans mots de passe ni jetons."""
+    if key and SENSITIVE_KEYS.search(key):
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return SENSITIVE_TEXT.sub(lambda match: match.group(1) + REDACTED, value)
+    return value
+
+
+def task_name(func):
+    if isinstance(func, str):
+        return func
+    return getattr(func, 'task_name', f'{func.__module__}.{func.__qualname__}')
+
+
+def task(func=None, *, max_attempts=None, priority=0):
+    """
+    Déclare une fonction exécutable par les workers et lui ajoute
+    ``func.delay(*args, **kwargs)``. Les arguments doivent être sérialisables
+    en JSON.
+    """
+    def decorate(func):
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.delay = lambda *args, **kwargs: schedule(
+            func, args=args, kwargs=kwargs, priority=priority, max_attempts=max_attempts
+        )
+        return func
+
+    return decorate(func) if func else decorate
+
+
+def enqueue(func, *args, **kwargs):
+    """Met en file ``func(*args, **kwargs)`` pour exécution immédiate par un worker."""
+    return schedule(func, args=args, kwargs=kwargs)
+
+
+def schedule(func, args=(), kwargs=None, countdown=0, priority=0, max_attempts=None):
+    """Comme ``enqueue``, avec délai (secondes), priorité et nombre d'essais."""
+    config = get_config()
+    name = task_name(func)
+    kwargs = kwargs or {}
+
+    if config['ALWAYS_EAGER']:
+        import_string(name)(*args, **kwargs)
+        return None
+
+    return Task.objects.create(
+        name=name,
+        payload={'args': list(args), 'kwargs': kwargs},
+        priority=priority,
+        max_attempts=max_attempts or config['MAX_ATTEMPTS'],
+        run_at=timezone.now() + timedelta(seconds=countdown),
+    )
+
+
+def claim(worker_id, limit=1):
+    """Réserve jusqu'à ``limit`` tâches échues pour ``worker_id``."""
+    config = get_config()
+    now = timezone.now()
+    available = Task.objects.filter(
+        Q(status=Task.STATUS_PENDING, run_at__lte=now) |
+        Q(status=Task.STATUS_RUNNING, locked_until__lt=now)
+    )
+    lease = {
+        'status': Task.STATUS_RUNNING,
+        'locked_by': worker_id,
+        'locked_until': now + timedelta(seconds=config['LEASE_SECONDS']),
+        'attempts': F('attempts') + 1,
+    }
+    candidates = available.order_by('-priority', 'run_at', 'id').values_list('id', flat=True)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidates.select_for_update(skip_locked=True)[:limit])
+            Task.objects.filter(id__in=ids).update(**lease)
+    else:
+        # Bail optimiste : l'UPDATE ne touche la ligne que si elle est encore libre
+        ids = []
+        for task_id in candidates[:limit * 4]:
+            if available.filter(id=task_id).update(**lease):
+                ids.append(task_id)
+                if len(ids) >= limit:
+                    break
+
+    return list(Task.objects.filter(id__in=ids).order_by('-priority', 'run_at', 'id'))
+
+
+def backoff_delay(attempts, config=None):
+    config = config or get_config()
+    delay = min(config['BACKOFF_MAX'], config['BACKOFF_BASE'] * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def run_task(task, worker_id):
+    """Exécute une tâche réservée ; renvoie True si elle a réussi."""
+    owned = Task.objects.filter(id=task.id, locked_by=worker_id, status=Task.STATUS_RUNNING)
+    try:
+        func = import_string(task.name)
+        func(*task.payload.get('args', []), **task.payload.get('kwargs', {}))
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if task.attempts >= task.max_attempts:
+            owned.update(status=Task.STATUS_DEAD, last_error=error, locked_until=None, finished_at=now)
+            logger.error('Tâche %s #%s abandonnée après %s essais', task.name, task.id, task.attempts)
+        else:
+            retry_at = now + timedelta(seconds=backoff_delay(task.attempts))
+            owned.update(status=Task.STATUS_PENDING, last_error=error, locked_until=None, run_at=retry_at)
+            logger.warning('Tâche %s #%s en échec (essai %s/%s), nouvel essai à %s',
+                           task.name, task.id, task.attempts, task.max_attempts, retry_at)
+        return False
+
+    owned.update(status=Task.STATUS_DONE, locked_until=None, finished_at=timezone.now())
+    return True
+
+
+def retry(queryset):
+    """Remet en file des tâches (typiquement abandonnées) avec un compteur d'essais à zéro."""
+    return queryset.exclude(status=Task.STATUS_RUNNING).update(
+        status=Task.STATUS_PENDING, attempts=0, run_at=timezone.now(),
+        locked_by='', locked_until=None, finished_at=None,
+    )
+
+
+class WorkerPool:
+    """
+    Pool de threads qui dépilent la file. Chaque thread réserve ses tâches
+    indépendamment ; plusieurs pools (processus) peuvent tourner en parallèle.
+    """
+
+    def __init__(self, threads=1, batch_size=1, once=False):
+        self.threads = threads
+        self.batch_size = batch_size
+        self.once = once
+        self.config = get_config()
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        for index in range(self.threads):
+            thread = threading.Thread(
+                target=self._loop, args=(f'{prefix}:{index}',), name=f'task-worker-{index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self.stopping.set()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _loop(self, worker_id):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                tasks = claim(worker_id, self.batch_size)
+                if not tasks:
+                    if self.once:
+                        break
+                    self.stopping.wait(self.config['POLL_INTERVAL'])
+                    continue
+                for task in tasks:
+                    ok = run_task(task, worker_id)
+                    with self._lock:
+                        self.processed += 1
+                        self.failed += not ok
+        finally:
+            connection.close()
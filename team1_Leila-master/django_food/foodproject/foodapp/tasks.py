@@ -0,0 +1,80 @@
+"""
+Tâches exécutées en arrière-plan par ``manage.py run_workers``
+(voir ``task_queue.py``).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import send_mail
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .task_queue import task
+
+
+@task(max_attempts=8)
+def send_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """Envoie un email ; une erreur SMTP provoque un nouvel essai différé."""
+    recipients = [email for email in recipient_list if email]
+    if not recipients:
+        return
+    send_mail(
+        subject,
+        message,
+        from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients,
+        fail_silently=False,
+        html_message=html_message,
+    )
+
+
+@task(max_attempts=8)
+def send_password_setup_email(user_id, subject, message, from_email=None):
+    """
+    Envoie à l'utilisateur un lien pour choisir son mot de passe : ``{link}``
+    dans ``message`` est remplacé par ce lien. Le jeton est créé ici, au moment
+    de l'envoi, et n'est donc jamais stocké dans la tâche.
+    """
+    user = User.objects.get(pk=user_id)
+    path = reverse('password_set', args=[urlsafe_base64_encode(force_bytes(user.pk)),
+                                         default_token_generator.make_token(user)])
+    send_email(subject, message.replace('{link}', settings.FRONTEND_BASE_URL + path), [user.email], from_email)
+
+
+@task(max_attempts=3)
+def flush_mail_spool():
+    """Envoie par lots les emails en file (voir ``mail_spool.py``)."""
+    from .mail_spool import flush
+    flush()
+
+
+@task(max_attempts=3)
+def rebuild_pairings():
+    """Recalcule les plats souvent commandés ensemble (voir ``pairings.py``)."""
+    from .pairings import rebuild
+    rebuild()
+
+
+@task(max_attempts=3)
+def refresh_similar_dishes():
+    """Met à jour les plats similaires des plats modifiés (voir ``similar_dishes.py``)."""
+    from .similar_dishes import refresh
+    refresh()
+
+
+@task(max_attempts=3)
+def rebuild_forum_counters():
+    """Recalcule les compteurs du forum, par exemple après un ``bulk_create`` de messages."""
+    from .models import ForumCategoryStats, ForumTopic
+    with transaction.atomic():
+        ForumTopic.rebuild_counters()
+        ForumCategoryStats.rebuild()
+
+
+@task(max_attempts=3)
+def rebase_popularity():
+    """Avance l'origine des scores de popularité (voir ``popularity.py``)."""
+    from .popularity import rebase
+    rebase()
@@ -1,3 +1,819 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db.models import F
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    allergens, chat_history, chatbot, mail_spool, metrics, pairings, popularity, recommendations, session_engine,
+    similar_dishes, task_queue,
+)
+from .answer_cache import answer_cache
+from cpp_modules.food_processor import dish_sort
+from .middleware import MetricsMiddleware, QueryBudgetMiddleware
+from .models import (
+    ChatbotKnowledge, ChatMessage, ChatSession, City, Dish, DishSimilarity, ForumCategoryStats, ForumMessage, ForumTopic, Ingredient,
+    Order, OrderItem, PopularityEpoch, Reservation, Restaurant, RestaurantAccount, Review, SpooledEmail, Task,
+)
+from .query_inspector import QueryBudgetExceeded, QueryRecorder, assert_max_queries
+from .tasks import rebuild_forum_counters, send_password_setup_email
+
+
+def failing_task(message):
+    """Tâche de test qui échoue toujours (voir TaskQueueTests)."""
+    raise RuntimeError(message)
+
+
+class FlakyEmailBackend(EmailBackend):
+    """Backend de test qui refuse les messages adressés à ``bounce@example.com`` (voir MailSpoolTests)."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if 'bounce@example.com' in message.to:
+                raise ConnectionError('550 mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class ChatMessageTests(TestCase):
+    """Réponses du chat tirées de l'index BM25 de la base de connaissances (foodapp.chatbot)."""
+
+    def setUp(self):
+        # Index et cache propres au test : les ids des fiches sont réutilisés d'un test à l'autre
+        patcher = mock.patch.object(chatbot, 'knowledge_index', chatbot.KnowledgeIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        answer_cache.clear()
+        self.addCleanup(answer_cache.clear)
+
+        self.user = User.objects.create_user('leila', password='secret-pass')
+        self.client.force_login(self.user)
+        self.chat_session = ChatSession.objects.create(user=self.user)
+        session = self.client.session
+        session['chat_session_id'] = str(self.chat_session.session_id)
+        session.save()
+
+        self.tagine = ChatbotKnowledge.objects.create(
+            category='dish', title='Tagine',
+            content='Tagine is a slow-cooked stew of lamb with prunes and almonds.',
+            content_fr="Le tajine est un ragoût d'agneau mijoté aux pruneaux et aux amandes.",
+            keywords='tagine, lamb, stew',
+        )
+        ChatbotKnowledge.objects.create(
+            category='ingredient', title='Saffron',
+            content='Saffron from Taliouine colours couscous and rice dishes.',
+            content_fr='Le safran de Taliouine colore le couscous et le riz.',
+            keywords='saffron, spice',
+        )
+
+    def post(self, message):
+        return self.client.post(reverse('chat_message'), json.dumps({'message': message}),
+                                content_type='application/json')
+
+    def test_answer_comes_from_the_index(self):
+        data = self.post('How is a lamb tagine cooked?').json()
+
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['sources'][0]['id'], self.tagine.id)
+        self.assertTrue(data['response'].startswith('Tagine'))
+        roles = list(ChatMessage.objects.filter(session=self.chat_session).order_by('id').values_list('role', flat=True))
+        self.assertEqual(roles, ['user', 'assistant'])
+
+    def test_repeated_question_is_served_from_the_answer_cache(self):
+        first = self.post('Lamb tagine?').json()
+        second = self.post('  lamb TAGINE ? ').json()
+
+        self.assertEqual(first['response'], second['response'])
+        cached = ChatMessage.objects.filter(session=self.chat_session, role='assistant').order_by('id')
+        self.assertEqual([message.metadata['cached'] for message in cached], [False, True])
+
+    def test_unknown_question(self):
+        data = self.post('quantum chromodynamics').json()
+
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['sources'], [])
+        self.assertEqual(data['response'], chatbot.NO_ANSWER['en'])
+
+
+class ChatHistoryTests(TestCase):
+    """Page du chat, pages anciennes et archive indexée par segments (foodapp.chat_history)."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, CHAT_HISTORY={
+            'ARCHIVE_DIR': self.archive_dir, 'PAGE_SIZE': 3, 'KEEP_MESSAGES': 2, 'SEGMENT_SIZE': 2,
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.user = User.objects.create_user('leila', password='secret-pass')
+        self.client.force_login(self.user)
+        self.chat_session = ChatSession.objects.create(user=self.user)
+        session = self.client.session
+        session['chat_session_id'] = str(self.chat_session.session_id)
+        session.save()
+
+        start = timezone.now() - timedelta(days=1)
+        for number in range(7):
+            message = ChatMessage.objects.create(session=self.chat_session, role='user', content=f'message {number}')
+            ChatMessage.objects.filter(pk=message.pk).update(timestamp=start + timedelta(minutes=number))
+
+    def all_pages(self):
+        contents, cursor = [], None
+        while True:
+            response = self.client.get(reverse('chat_history'), {'before': cursor} if cursor else {})
+            data = response.json()
+            self.assertEqual(data['status'], 'success')
+            contents[:0] = [message['content'] for message in data['messages']]
+            cursor = data['older_cursor']
+            if not cursor:
+                return contents
+
+    def test_chat_page_shows_latest_messages(self):
+        response = self.client.get(reverse('chat'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['content'] for m in response.context['chat_history']],
+                         ['message 4', 'message 5', 'message 6'])
+        self.assertIsNotNone(response.context['older_cursor'])
+
+    def test_history_pages_continue_into_the_archive(self):
+        self.assertEqual(chat_history.compact_session(self.chat_session), 5)
+        self.assertEqual(ChatMessage.objects.filter(session=self.chat_session).count(), 2)
+        index = chat_history.read_index(self.chat_session.session_id)
+        self.assertEqual([segment['count'] for segment in index['segments']], [2, 2, 1])
+
+        self.assertEqual(self.all_pages(), [f'message {number}' for number in range(7)])
+
+    def test_archived_page_reads_only_the_segments_it_needs(self):
+        chat_history.compact_session(self.chat_session)
+
+        with mock.patch.object(chat_history, 'read_segment', wraps=chat_history.read_segment) as read_segment:
+            page, cursor = chat_history.history_page(self.chat_session)
+        self.assertEqual([m['content'] for m in page], ['message 4', 'message 5', 'message 6'])
+        self.assertEqual(read_segment.call_count, 1)
+
+        with mock.patch.object(chat_history, 'read_segment', wraps=chat_history.read_segment) as read_segment:
+            page, _ = chat_history.history_page(self.chat_session, before=cursor)
+        self.assertEqual([m['content'] for m in page], ['message 1', 'message 2', 'message 3'])
+        self.assertEqual(read_segment.call_count, 2)
+
+    def test_archive_is_stored_outside_media_root(self):
+        chat_history.compact_session(self.chat_session)
+
+        session_id = self.chat_session.session_id
+        self.assertTrue(os.path.exists(os.path.join(self.archive_dir, f'{session_id}.segments.gz')))
+        self.assertEqual(os.listdir(self.media_root), [])
+        with override_settings(CHAT_HISTORY={'ARCHIVE_DIR': os.path.join(self.media_root, 'chat_archive')}):
+            with self.assertRaises(ImproperlyConfigured):
+                chat_history.archive_dir()
+
+    def test_legacy_archive_is_moved_out_of_media_root(self):
+        session_id = self.chat_session.session_id
+        os.makedirs(chat_history.legacy_dir())
+        with gzip.open(chat_history.legacy_path(session_id), 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'id': 1, 'role': 'user', 'content': 'old', 'metadata': {},
+                                'timestamp': '2025-01-01T10:00:00+00:00'}) + '\n')
+            f.write(json.dumps({'type': 'context', 'values': {'city': 'Fès'}}) + '\n')
+
+        self.assertEqual(chat_history.convert_legacy_archives(), 1)
+        self.assertFalse(os.path.exists(chat_history.legacy_dir()))
+        messages, context = chat_history.read_archive(session_id)
+        self.assertEqual([m['content'] for m in messages], ['old'])
+        self.assertEqual(context, {'city': 'Fès'})
+
+
+class CartAndPosTests(TestCase):
+    """Panier et caisse, avec les plats souvent commandés ensemble (foodapp.pairings)."""
+
+    def setUp(self):
+        self.city = City.objects.create(name='Fès')
+        self.restaurant = Restaurant.objects.create(
+            name='Dar Tajine', city=self.city, address='Médina', phone='0535000000', email='dar@example.com')
+        self.tagine, self.tea, self.salad = (
+            Dish.objects.create(name=name, description=name, price_range=Dish.PRICE_MEDIUM, type=dish_type,
+                                city=self.city, restaurant=self.restaurant)
+            for name, dish_type in (('Tajine', Dish.SALTY), ('Thé à la menthe', Dish.DRINK), ('Zaalouk', Dish.SALTY))
+        )
+        for _ in range(2):
+            order = Order.objects.create(restaurant=self.restaurant)
+            OrderItem.objects.create(order=order, dish=self.tagine, price=Decimal('65.00'))
+            OrderItem.objects.create(order=order, dish=self.tea, price=Decimal('12.50'))
+            order.status = Order.STATUS_PAID
+            order.save()
+        pairings.rebuild()
+
+        self.user = User.objects.create_user('leila', password='secret-pass')
+        self.client.force_login(self.user)
+
+    def add(self, dish, quantity=1):
+        return self.client.post(reverse('api_add_to_cart'), json.dumps({'dish_id': dish.id, 'quantity': quantity}),
+                                content_type='application/json')
+
+    def test_add_to_cart_suggests_paired_dishes(self):
+        data = self.add(self.tagine).json()
+
+        self.assertTrue(data['success'], data)
+        self.assertEqual(data['cart_count'], 1)
+        self.assertEqual(data['cart_total'], '65.00')
+        self.assertEqual([suggestion['id'] for suggestion in data['suggestions']], [self.tea.id])
+
+    def test_add_to_cart_accumulates_quantities_in_one_cart_per_restaurant(self):
+        self.add(self.tagine)
+        data = self.add(self.tagine, quantity=2).json()
+
+        cart = Order.objects.get(user=self.user, status=Order.STATUS_NEW)
+        self.assertEqual(cart.restaurant, self.restaurant)
+        self.assertEqual(cart.items.get().quantity, 3)
+        self.assertEqual(data['cart_total'], '195.00')
+
+    def test_add_to_cart_rejects_dishes_without_restaurant(self):
+        dish = Dish.objects.create(name='Harira', description='Soupe', price_range=Dish.PRICE_LOW, type=Dish.SALTY)
+
+        response = self.add(dish)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+
+    def test_pos_exposes_pairings_and_prices(self):
+        self.login_owner()
+
+        response = self.client.get(reverse('restaurant_pos', args=[self.restaurant.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['dish_pairings'], {self.tagine.id: [self.tea.id], self.tea.id: [self.tagine.id]})
+        self.assertContains(response, f"addToOrder({self.tea.id}, 'Thé à la menthe', 12.5,")
+
+    def login_owner(self):
+        owner = User.objects.create_user('owner', password='secret-pass')
+        RestaurantAccount.objects.create(user=owner, restaurant=self.restaurant, is_active=True)
+        self.client.force_login(owner)
+
+    def test_create_order_bills_the_last_price(self):
+        self.login_owner()
+        payload = {'restaurant_id': self.restaurant.id, 'table_number': 'B1',
+                   'items': [{'dish_id': self.tagine.id}, {'dish_id': self.tea.id, 'quantity': 2}]}
+
+        response = self.client.post(reverse('create_order'), json.dumps(payload), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual((order.status, order.total_amount), (Order.STATUS_NEW, Decimal('90.00')))
+
+    def test_restaurant_stats_renders(self):
+        self.login_owner()
+        response = self.client.get(reverse('restaurant_stats'), {'from': '2026-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['orders_count'], 2)
+        self.assertEqual(sum(json.loads(response.context['orders_data'])), 2)
+        self.assertEqual(sum(json.loads(response.context['revenue_data'])), float(response.context['revenue']))
+
+
+class TaskQueueTests(TestCase):
+    """File de tâches : nouvel essai différé, abandon, et aucun secret dans les charges utiles."""
+
+    def run_next(self):
+        task, = task_queue.claim('test-worker')
+        return task_queue.run_task(task, 'test-worker')
+
+    def run_failing(self):
+        with self.assertLogs('foodapp.tasks', 'WARNING'):
+            return self.run_next()
+
+    def test_failed_task_is_retried_with_backoff_then_dead(self):
+        task = task_queue.schedule('foodapp.tests.failing_task', args=['boom'], max_attempts=2)
+
+        self.assertFalse(self.run_failing())
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.STATUS_PENDING, 1))
+        self.assertIn('RuntimeError: boom', task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=7))
+        self.assertEqual(task_queue.claim('test-worker'), [])
+
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        self.assertFalse(self.run_failing())
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.STATUS_DEAD, 2))
+
+        self.assertEqual(task_queue.retry(Task.objects.filter(pk=task.pk)), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.STATUS_PENDING, 0))
+
+    def test_backoff_grows_exponentially_up_to_the_cap(self):
+        config = {'BACKOFF_BASE': 10, 'BACKOFF_MAX': 60}
+        with mock.patch('foodapp.task_queue.random.uniform', return_value=1.0):
+            delays = [task_queue.backoff_delay(attempts, config) for attempts in range(1, 6)]
+        self.assertEqual(delays, [10, 20, 40, 60, 60])
+
+    def test_password_setup_email_stores_no_secret(self):
+        user = User.objects.create_user('owner', email='owner@example.com', password=None)
+
+        task = send_password_setup_email.delay(user.id, 'Bienvenue', 'Choisissez votre mot de passe : {link}')
+        self.assertEqual(task.payload['args'][0], user.id)
+        self.assertNotIn('/account/password/', json.dumps(task.payload))
+
+        self.assertTrue(self.run_next())
+        link = mail.outbox[0].body.rsplit(' ', 1)[1]
+        self.assertEqual(mail.outbox[0].to, ['owner@example.com'])
+
+        set_password_url = self.client.get(link[link.index('/account/'):]).url
+        response = self.client.post(set_password_url, {'new_password1': 'tajine-2026!', 'new_password2': 'tajine-2026!'})
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('tajine-2026!'))
+
+    def test_payload_is_redacted_for_display(self):
+        payload = {'args': ['Compte créé\nMot de passe temporaire : s3cret\nMerci'], 'kwargs': {'password': 'x'}}
+
+        self.assertEqual(task_queue.redact(payload), {
+            'args': ['Compte créé\nMot de passe temporaire : [masqué]\nMerci'], 'kwargs': {'password': '[masqué]'},
+        })
+
+
+class MailSpoolTests(TestCase):
+    """Spool d'emails : déduplication, échec partiel sans doublon, délai avant nouvel essai, conservation."""
+    template = 'review_published'
+
+    def spool(self, *recipients, key='review:1'):
+        context = {'review': {'rating': 5, 'user': {'first_name': 'Leila', 'username': 'leila'}, 'restaurant': {'name': 'Chez Leila'}}}
+        return mail_spool.spool_many(self.template, [(recipient, context, key) for recipient in recipients])
+
+    def flush(self):
+        with self.assertLogs('foodapp.mail', 'WARNING'):
+            return mail_spool.flush(config={'BACKEND': 'foodapp.tests.FlakyEmailBackend', 'RATE_PER_MINUTE': 0})
+
+    def test_spool_many_returns_the_number_of_queued_messages(self):
+        self.assertEqual(self.spool('a@example.com', 'b@example.com', 'A@example.com '), 2)
+        self.assertEqual(self.spool('a@example.com', 'c@example.com'), 1)
+        self.assertEqual(SpooledEmail.objects.count(), 3)
+
+    def test_partial_failure_sends_each_message_once_and_backs_off(self):
+        self.spool('a@example.com', 'bounce@example.com', 'b@example.com')
+
+        stats = self.flush()
+        self.assertEqual((stats['sent'], stats['failed']), (2, 1))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@example.com', 'b@example.com'])
+
+        failed = SpooledEmail.objects.get(to_email='bounce@example.com')
+        self.assertEqual((failed.status, failed.attempts), (SpooledEmail.STATUS_QUEUED, 1))
+        self.assertIn('550', failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=20))
+        self.assertIsNone(mail_spool.claim(10))
+        self.assertTrue(Task.objects.filter(name='foodapp.tasks.flush_mail_spool', run_at__gt=timezone.now()).exists())
+
+        SpooledEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now(), attempts=2)
+        self.flush()
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (SpooledEmail.STATUS_FAILED, 3))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_sent_bodies_are_purged_after_retention(self):
+        self.spool('a@example.com', 'b@example.com')
+        SpooledEmail.objects.update(status=SpooledEmail.STATUS_SENT, sent_at=timezone.now())
+        SpooledEmail.objects.filter(to_email='a@example.com').update(sent_at=timezone.now() - timedelta(days=8))
+
+        self.assertEqual(mail_spool.purge_sent_bodies(), 1)
+        old, recent = SpooledEmail.objects.order_by('to_email')
+        self.assertEqual((old.body, recent.body != ''), ('', True))
+        self.assertIsNotNone(old.dedup_key)
+        self.assertEqual(self.spool('a@example.com'), 0)
+
+    def test_reservation_status_round_trip_notifies_again(self):
+        restaurant = Restaurant.objects.create(name='Riad', city=City.objects.create(name='Essaouira'),
+                                               address='Port', phone='0524000000', email='riad@example.com')
+        reservation = Reservation.objects.create(restaurant=restaurant, name='Leila', email='leila@example.com',
+                                                 phone='0600000000', date='2026-11-01', time='20:00')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin-pass'))
+
+        def act(action):
+            self.client.post(reverse('admin:foodapp_reservation_changelist'),
+                             {'action': action, '_selected_action': [reservation.pk]})
+            return SpooledEmail.objects.filter(template='reservation_status').count()
+
+        self.assertEqual(act('mark_as_confirmed'), 1)
+        self.assertEqual(act('mark_as_confirmed'), 1)
+        self.assertEqual(act('mark_as_canceled'), 2)
+        self.assertEqual(act('mark_as_confirmed'), 3)
+
+
+class QueryInspectorTests(TestCase):
+    """Inspection des requêtes SQL : origine, budget par vue, helper de test."""
+
+    def test_origin_skips_the_metrics_timer(self):
+        recorder = QueryRecorder()
+
+        def view(request):
+            with recorder.install():
+                list(City.objects.all())
+            return HttpResponse()
+
+        MetricsMiddleware(view)(RequestFactory().get('/'))
+        origin = recorder.queries[0]['origin']
+        self.assertTrue(origin.startswith(os.path.join('foodapp', 'tests.py')), origin)
+        self.assertTrue(origin.endswith(' in view'), origin)
+
+    @override_settings(QUERY_INSPECTOR={'ENABLED': True, 'RESPONSE_HEADER': True})
+    async def test_sync_view_under_asgi_is_inspected_and_timed(self):
+        with mock.patch.object(metrics.DB_QUERIES, 'observe') as observe:
+            response = await self.async_client.get(reverse('dish_list'))
+
+        count = int(response['X-Query-Count'])
+        self.assertGreater(count, 0)
+        observe.assert_called_once_with(count, view='dish_list')
+
+    def test_assert_max_queries_checks_count_and_n_plus_one(self):
+        city = City.objects.create(name='Tanger')
+        with assert_max_queries(1) as recorder:
+            City.objects.get(pk=city.pk)
+        self.assertEqual(len(recorder.queries), 1)
+
+        with self.assertRaisesMessage(AssertionError, 'Budget de 1 requêtes dépassé'):
+            with assert_max_queries(1):
+                City.objects.get(pk=city.pk)
+                City.objects.count()
+
+        with self.assertRaisesMessage(AssertionError, 'Motif N+1'):
+            with assert_max_queries(10, threshold=3):
+                for _ in range(3):
+                    City.objects.get(pk=city.pk)
+
+    def budget_response(self, queries):
+        def view(request):
+            for _ in range(queries):
+                City.objects.count()
+            return HttpResponse()
+
+        # Sans résolution d'URL, le budget est cherché sous le chemin de la requête
+        return QueryBudgetMiddleware(view)(RequestFactory().get('/menu/'))
+
+    @override_settings(QUERY_INSPECTOR={'ENABLED': True, 'BUDGETS': {'/menu/': 2}, 'RESPONSE_HEADER': True})
+    def test_budget_is_reported_in_headers_and_logged(self):
+        response = self.budget_response(2)
+        self.assertEqual((response['X-Query-Count'], response['X-Query-Budget']), ('2', '2'))
+
+        with self.assertLogs('foodapp.queries', 'WARNING') as logs:
+            response = self.budget_response(3)
+        self.assertEqual(response['X-Query-Count'], '3')
+        self.assertIn('3 requêtes pour un budget de 2', logs.output[0])
+
+    @override_settings(QUERY_INSPECTOR={'ENABLED': True, 'BUDGETS': {'/menu/': 2}, 'RAISE_ON_VIOLATION': True})
+    def test_budget_violation_raises_in_strict_mode(self):
+        self.budget_response(2)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.budget_response(3)
+
+
+class SessionEngineTests(TestCase):
+    """Moteur de sessions hybride : cookie signé pour les anonymes, cache + base sinon."""
+
+    def save(self, store=None, **data):
+        store = store or session_engine.SessionStore()
+        store.update(data)
+        store.save()
+        return store
+
+    def test_small_anonymous_session_stays_in_the_cookie(self):
+        store = self.save(language='fr')
+        self.assertTrue(session_engine.is_cookie_key(store.session_key))
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(session_engine.SessionStore(store.session_key)['language'], 'fr')
+
+    def test_login_moves_the_session_to_the_database(self):
+        store = self.save(language='fr')
+        cookie_key = store.session_key
+        self.save(store, **{SESSION_KEY: '1'})
+
+        self.assertFalse(session_engine.is_cookie_key(store.session_key))
+        self.assertNotEqual(store.session_key, cookie_key)
+        self.assertTrue(Session.objects.filter(session_key=store.session_key).exists())
+        reloaded = session_engine.SessionStore(store.session_key)
+        self.assertEqual((reloaded['language'], reloaded[SESSION_KEY]), ('fr', '1'))
+
+    def test_wizard_data_and_large_sessions_stay_on_the_server(self):
+        wizard = self.save(wizard_signup={'password1': 'secret'})
+        # Le cookie signé est compressé : des données aléatoires gardent leur taille
+        large = self.save(history=os.urandom(2048).hex())
+        for store in (wizard, large):
+            self.assertFalse(session_engine.is_cookie_key(store.session_key))
+        self.assertEqual(Session.objects.count(), 2)
+
+    def test_logout_from_the_database_falls_back_to_the_cookie(self):
+        store = self.save(**{SESSION_KEY: '1', 'language': 'fr'})
+        db_key = store.session_key
+        del store[SESSION_KEY]
+        store.save()
+
+        self.assertTrue(session_engine.is_cookie_key(store.session_key))
+        self.assertFalse(Session.objects.filter(session_key=db_key).exists())
+
+    def test_logout_in_another_worker_is_seen_with_a_process_local_cache(self):
+        store = self.save(**{SESSION_KEY: '1'})
+        # Autre worker : la session est supprimée de la base, ce cache-ci n'en sait rien
+        Session.objects.filter(session_key=store.session_key).delete()
+        self.assertEqual(dict(session_engine.SessionStore(store.session_key).items()), {})
+
+    def test_shared_cache_keeps_the_write_through_store(self):
+        with mock.patch.object(session_engine, 'cache_is_shared', return_value=True):
+            store = self.save(**{SESSION_KEY: '1'})
+            with self.assertNumQueries(0):
+                self.assertEqual(session_engine.SessionStore(store.session_key)[SESSION_KEY], '1')
+
+    def test_invalid_cookie_starts_an_empty_session(self):
+        store = session_engine.SessionStore('forged:value')
+        self.assertEqual(dict(store.items()), {})
+        self.assertIsNone(store.session_key)
+
+
+class PopularityTests(TestCase):
+    """Scores de popularité : décroissance, plafond de l'exposant et avancée de l'origine."""
+
+    def setUp(self):
+        cache.delete_many([popularity.EPOCH_CACHE_KEY, popularity.REBASE_SCHEDULED_KEY])
+        self.now = timezone.now()
+        PopularityEpoch.objects.update_or_create(pk=1, defaults={'epoch': self.now - timedelta(hours=1)})
+        city = City.objects.create(name='Rabat')
+        self.old, self.recent = (
+            Dish.objects.create(name=name, description=name, price_range=Dish.PRICE_MEDIUM, type=Dish.SALTY, city=city)
+            for name in ('Pastilla', 'Rfissa')
+        )
+
+    def trending(self, dish, now):
+        dish.refresh_from_db()
+        return popularity.current_value(dish.trending_score, popularity.current_epoch(), trending=True, now=now)
+
+    def test_scores_halve_every_half_life(self):
+        popularity.record(Dish.objects.filter(pk=self.old.pk), 'order', when=self.now - timedelta(days=3))
+        popularity.record(Dish.objects.filter(pk=self.recent.pk), 'order', when=self.now)
+
+        self.assertAlmostEqual(self.trending(self.old, self.now), 2.5)
+        self.assertAlmostEqual(self.trending(self.recent, self.now), 5.0)
+        self.assertAlmostEqual(self.trending(self.recent, self.now + timedelta(days=6)), 1.25)
+        self.assertEqual(list(popularity.ranked(Dish.objects.all(), 'trending')), [self.recent, self.old])
+
+    def test_growth_never_overflows(self):
+        epoch = popularity.DEFAULTS['EPOCH']
+        factor = popularity.growth(epoch + timedelta(days=365 * 20), 3, epoch)
+        self.assertEqual(factor, 2.0 ** popularity.MAX_EXPONENT)
+
+    def test_rebase_keeps_values_and_ranking(self):
+        popularity.record(Dish.objects.filter(pk=self.old.pk), 'order', when=self.now - timedelta(days=1))
+        popularity.record(Dish.objects.filter(pk=self.recent.pk), 'review', when=self.now)
+        later = self.now + timedelta(days=10)
+        before = self.trending(self.old, later), self.trending(self.recent, later)
+
+        self.assertEqual(popularity.rebase(now=later), later)
+        self.assertEqual(PopularityEpoch.objects.get().epoch, later)
+        self.assertAlmostEqual(self.trending(self.old, later), before[0])
+        self.assertAlmostEqual(self.trending(self.recent, later), before[1])
+        self.assertAlmostEqual(self.old.trending_score, before[0])
+
+        popularity.record(Dish.objects.filter(pk=self.recent.pk), 'order', when=self.now)
+        # Commande un jour après celle de self.old : même poids, un tiers de demi-vie plus récente
+        self.assertAlmostEqual(self.trending(self.recent, later), before[1] + before[0] * 2 ** (1 / 3))
+        self.assertEqual(list(popularity.ranked(Dish.objects.all(), 'trending')), [self.recent, self.old])
+
+    def test_old_epoch_schedules_a_rebase(self):
+        PopularityEpoch.objects.update(epoch=self.now - timedelta(days=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            popularity.record(Dish.objects.filter(pk=self.old.pk), 'view')
+            popularity.record(Dish.objects.filter(pk=self.old.pk), 'view')
+        self.assertEqual(Task.objects.filter(name='foodapp.tasks.rebase_popularity').count(), 1)
+
+    def ranked_restaurants(self):
+        city = City.objects.get(name='Rabat')
+        quiet, busy = (Restaurant.objects.create(name=name, city=city, address='Médina', phone='0600000000',
+                                                 email='contact@example.com') for name in ('Dar Zaki', 'Le Dhow'))
+        popularity.record(Restaurant.objects.filter(pk=busy.pk), 'order', 3)
+        return [busy.name, quiet.name]
+
+    def test_restaurants_api_serves_the_leaderboard(self):
+        expected = self.ranked_restaurants()
+        response = self.client.get(reverse('api_restaurants'), {'ordering': 'popularity'})
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['results']
+        self.assertEqual([row['name'] for row in results], expected)
+        self.assertAlmostEqual(results[0]['popularity'], 15.0, places=1)
+
+    async def test_async_apis_read_the_epoch_outside_the_event_loop(self):
+        expected = await sync_to_async(self.ranked_restaurants)()
+        # Cache froid et origine ancienne : lecture en base et programmation de rebase
+        await PopularityEpoch.objects.aupdate(epoch=self.now - timedelta(days=2))
+        for url, names in (('api_dishes_async', None), ('api_restaurants_async', expected)):
+            await sync_to_async(cache.delete_many)([popularity.EPOCH_CACHE_KEY, popularity.REBASE_SCHEDULED_KEY])
+            response = await self.async_client.get(reverse(url), {'ordering': 'popularity'})
+            self.assertEqual(response.status_code, 200, response.content)
+            if names:
+                self.assertEqual([row['name'] for row in response.json()['results']], names)
+
+
+class IngredientAdminTests(TestCase):
+    """Correction manuelle des allergènes d'un ingrédient dans l'admin."""
+
+    def setUp(self):
+        self.dish = Dish.objects.create(name='Msemen', description='Crêpe feuilletée', ingredients='farine, sel',
+                                        price_range=Dish.PRICE_LOW, type=Dish.SALTY)
+        self.flour = Ingredient.objects.get(name='farine')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin-pass'))
+
+    def change(self, **data):
+        url = reverse('admin:foodapp_ingredient_change', args=[self.flour.pk])
+        response = self.client.post(url, {'name': 'farine', **data})
+        self.assertEqual(response.status_code, 302)
+        self.flour.refresh_from_db()
+        self.dish.refresh_from_db()
+
+    def test_checkboxes_show_the_detected_allergens(self):
+        response = self.client.get(reverse('admin:foodapp_ingredient_change', args=[self.flour.pk]))
+        self.assertContains(response, 'type="checkbox" name="allergens" value="wheat"')
+        self.assertEqual(response.context['adminform'].form.initial['allergens'], ['wheat'])
+
+    def test_editing_allergens_marks_the_ingredient_verified(self):
+        self.change(allergens=['wheat', 'sesame'])
+        self.assertTrue(self.flour.is_verified)
+        self.assertEqual(self.flour.allergen_list(), ['wheat', 'sesame'])
+        self.assertEqual(self.dish.allergen_mask, allergens.mask_for(['wheat', 'sesame']))
+
+        # Décocher « vérifié » sans toucher aux allergènes : retour à la détection
+        self.change(allergens=['wheat', 'sesame'], is_verified='')
+        self.assertFalse(self.flour.is_verified)
+        self.assertEqual(self.flour.allergen_list(), ['wheat'])
+
+
+class RecommendationCatalogTests(TestCase):
+    """La matrice des recommandations suit les notes et les vues, même écrites par ``update()``."""
+
+    def setUp(self):
+        restaurant = Restaurant.objects.create(
+            name='Riad Zitoun', city=City.objects.create(name='Marrakech'), address='Derb', phone='0524000000',
+            email='riad@example.com')
+        Dish.objects.create(name='Tanjia', description='Tanjia', price_range=Dish.PRICE_HIGH, type=Dish.SALTY,
+                            restaurant=restaurant)
+        self.review = Review.objects.create(user=User.objects.create_user('critique'), restaurant=restaurant, rating=4)
+
+    def test_version_follows_ratings_updated_in_bulk(self):
+        version = recommendations.catalog_version()
+        Review.objects.filter(pk=self.review.pk).update(rating=1)
+        self.assertNotEqual(recommendations.catalog_version(), version)
+
+    def test_view_counters_are_picked_up_after_max_age(self):
+        config = dict(recommendations.get_config(), SCORES_MAX_AGE=600)
+        with mock.patch('foodapp.recommendations.time.time', return_value=6000.0):
+            version = recommendations.catalog_version(config)
+            Dish.objects.update(views_count=F('views_count') + 50)
+            self.assertEqual(recommendations.catalog_version(config), version)
+        with mock.patch('foodapp.recommendations.time.time', return_value=6600.0):
+            self.assertNotEqual(recommendations.catalog_version(config), version)
+
+
+class ForumCounterTests(TestCase):
+    """Compteurs dénormalisés du forum, y compris après des suppressions en masse ou en cascade."""
+
+    def setUp(self):
+        self.alice, self.bob = (User.objects.create_user(name) for name in ('alice', 'bob'))
+        self.topic = ForumTopic.objects.create(title='Meilleur couscous', author=self.alice, content='Où ?')
+        self.other = ForumTopic.objects.create(title='Thé', author=self.bob, content='Menthe ou absinthe ?')
+        for author in (self.alice, self.bob, self.alice):
+            ForumMessage.objects.create(topic=self.topic, author=author, content='À Fès')
+        ForumMessage.objects.create(topic=self.other, author=self.alice, content='Menthe')
+
+    def assertCounters(self, topic_messages, topics, messages):
+        self.topic.refresh_from_db()
+        stats = ForumCategoryStats.objects.get(category='general')
+        self.assertEqual(self.topic.message_count, topic_messages)
+        self.assertEqual((stats.topic_count, stats.message_count), (topics, messages))
+
+    def test_queryset_delete_updates_counters(self):
+        ForumMessage.objects.filter(author=self.alice, topic=self.topic).delete()
+        self.assertCounters(1, 2, 2)
+        self.assertEqual(self.topic.last_message_author, self.bob)
+
+    def test_cascade_from_user_deletion_updates_counters(self):
+        self.bob.delete()
+        self.assertCounters(2, 1, 2)
+        self.assertEqual(ForumCategoryStats.objects.get(category='general').last_message_at,
+                         self.topic.last_message_at)
+
+    def test_topic_delete_removes_its_messages_from_the_category(self):
+        self.topic.delete()
+        stats = ForumCategoryStats.objects.get(category='general')
+        self.assertEqual((stats.topic_count, stats.message_count), (1, 1))
+
+    def test_rebuild_task_fixes_bulk_created_messages(self):
+        ForumMessage.objects.bulk_create([ForumMessage(topic=self.topic, author=self.bob, content='Chez Lalla')])
+        self.assertCounters(3, 2, 4)
+        rebuild_forum_counters()
+        self.assertCounters(4, 2, 5)
+
+
+class NativeDishSortTests(TestCase):
+    """Le tri natif n'est compilé qu'au déploiement : une requête ne fait que charger la bibliothèque."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        patcher = mock.patch.multiple(dish_sort, _native_library=None, _native_error=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.columns = dish_sort.DishColumns.from_rows(
+            [(1, 'Tajine', 'M', 4.0), (2, 'Éclair', 'L', None), (3, 'couscous', 'H', 5.0)])
+
+    def test_missing_library_falls_back_without_compiling(self):
+        with override_settings(NATIVE_BUILD={'CACHE_DIR': self.cache_dir}), \
+                mock.patch('foodapp.native.build', side_effect=AssertionError('compilation pendant une requête')):
+            self.assertNotIn('native', dish_sort.available_backends())
+            self.assertEqual(dish_sort.sorted_ids(self.columns, 'name', backend='native'), [3, 2, 1])
+
+    @skipUnless(shutil.which('g++'), 'g++ absent')
+    def test_build_native_installs_the_library_loaded_at_runtime(self):
+        with override_settings(NATIVE_BUILD={'CACHE_DIR': self.cache_dir}):
+            call_command('build_native', stdout=io.StringIO())
+            with mock.patch('foodapp.native.build', side_effect=AssertionError('compilation pendant une requête')):
+                self.assertEqual(dish_sort.available_backends()[0], 'native')
+                self.assertEqual(dish_sort.sorted_ids(self.columns, 'rating', backend='native'), [3, 1, 2])
+
+
+class BenchCommandTests(TestCase):
+    """Commande bench : une page d'erreur n'est jamais mesurée ni comparée."""
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_error_responses_are_not_timed(self):
+        output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        failing = mock.patch('foodapp.management.commands.bench.Command.scenario_accueil',
+                             lambda command: lambda: HttpResponse(status=500))
+
+        with failing, self.assertRaisesMessage(CommandError, 'accueil'):
+            call_command('bench', only=['accueil', 'get_dishes'], iterations=2, warmup=0, output=output,
+                         stdout=io.StringIO())
+
+        with open(output, encoding='utf-8') as f:
+            results = json.load(f)['results']
+        self.assertEqual(results['accueil'], {'error': 'réponses hors 2xx/3xx', 'statuses': {'500': 2}})
+        self.assertIn('p50_ms', results['get_dishes'])
+
+
+class SimilarDishesTests(TestCase):
+    """Plats similaires : scores sur l'index inversé et recalcul incrémental."""
+
+    def setUp(self):
+        city = City.objects.create(name='Marrakech')
+        self.tanjia, self.tajine, self.couscous, self.chebakia = (
+            Dish.objects.create(name=name, description=description, ingredients=ingredients,
+                                price_range=Dish.PRICE_MEDIUM, type=dish_type, city=city)
+            for name, description, ingredients, dish_type in (
+                ('Tanjia', 'Viande mijotée au four', 'boeuf, cumin, citron confit', Dish.SALTY),
+                ('Tajine', 'Viande mijotée aux légumes', 'agneau, cumin, citron confit', Dish.SALTY),
+                ('Couscous', 'Semoule aux sept légumes', 'semoule, légumes, pois chiches', Dish.SALTY),
+                ('Chebakia', 'Gâteau au miel et sésame', 'farine, miel, sésame', Dish.SWEET),
+            )
+        )
+
+    def neighbors(self, dish):
+        return list(DishSimilarity.objects.filter(dish=dish).order_by('rank').values_list('similar_id', flat=True))
+
+    @skipUnless(similar_dishes.numpy is not None, 'NumPy absent')
+    def test_numpy_scores_match_the_python_index(self):
+        corpus = similar_dishes.load_corpus()
+        ids = corpus.ids
+        with_numpy = dict(corpus.similarities(ids))
+        with mock.patch.object(similar_dishes, 'numpy', None):
+            without_numpy = dict(corpus.similarities(ids))
+        for dish_id in ids:
+            self.assertEqual(with_numpy[dish_id].keys(), without_numpy[dish_id].keys())
+            for position, score in without_numpy[dish_id].items():
+                self.assertAlmostEqual(with_numpy[dish_id][position], score, places=5)
+
+    def test_refresh_updates_dishes_that_now_resemble_a_changed_dish(self):
+        similar_dishes.rebuild()
+        self.assertEqual(self.neighbors(self.tanjia)[0], self.tajine.id)
+        self.assertEqual(similar_dishes.refresh(), (0, 0))
+
+        self.couscous.description = 'Viande mijotée au four'
+        self.couscous.ingredients = 'boeuf, cumin, citron confit'
+        self.couscous.save()
+        changed, recomputed = similar_dishes.refresh()
+
+        self.assertEqual(changed, 1)
+        self.assertGreaterEqual(recomputed, 3)
+        self.assertEqual(self.neighbors(self.tanjia)[0], self.couscous.id)
@@ -0,0 +1,112 @@
+"""
+Outils texte communs aux index de recherche (forum) : normalisation
+(minuscules, sans accents), découpage en termes sans mots vides français et
+anglais, pondération BM25 et extraits surlignés.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+WORD_RE = re.compile(r'\w+')
+
+# Longueur maximale d'un terme indexé (colonne ``term`` des index)
+MAX_TERM_LENGTH = 40
+
+STOPWORDS = frozenset("""
+a au aux avec ce ces c cette d dans de des du elle en et est il ils j je l la le les leur lui
+ma mais me mes moi mon n ne nos notre nous on ou par pas pour qu que qui s sa se ses son sur
+t ta te tes toi ton tu un une vos votre vous y ete etre avoir ai as avons avez ont sont suis
+ca cela ici tres plus moins comme aussi bien tout tous toute toutes
+quoi quel quelle quels quelles comment pourquoi quand combien
+an and are as at be but by for from has have i in is it its me my no not of on or our so
+that the their them there these they this to was we were what when where which who why will
+with you your do does can how
+""".split())
+
+# Paramètres BM25 ; la longueur moyenne est fixe pour que l'ajout d'un
+# document ne modifie pas les poids des autres
+BM25_K1 = 1.2
+BM25_B = 0.75
+AVERAGE_LENGTH = 60
+
+
+def normalize(text):
+    """Minuscules et lettres sans accents (« Tajine Épicé » -> « tajine epice »)."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text, stopwords=STOPWORDS):
+    """Termes normalisés de ``text``, dans l'ordre, mots vides exclus."""
+    return [
+        word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(normalize(text or ''))
+        if len(word) > 1 and word not in stopwords
+    ]
+
+
+def bm25_weights(text, boost=1.0):
+    """Poids BM25 (fréquence saturée, normalisée par la longueur) de chaque terme."""
+    terms = tokenize(text)
+    if not terms:
+        return Counter()
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / AVERAGE_LENGTH)
+    return Counter({
+        term: boost * count * (BM25_K1 + 1) / (count + norm)
+        for term, count in Counter(terms).items()
+    })
+
+
+def idf(documents, matching):
+    """IDF BM25 d'un terme présent dans ``matching`` documents sur ``documents``."""
+    return math.log(1 + (documents - matching + 0.5) / (matching + 0.5))
+
+
+def highlight(text, terms, width=200):
+    """
+    Extrait HTML de ``text`` (échappé) autour de la zone la plus riche en
+    termes recherchés, chaque occurrence entourée de ``<mark>``.
+    """
+    text = text or ''
+    terms = set(terms)
+    matches = [m for m in WORD_RE.finditer(text) if normalize(m.group())[:MAX_TERM_LENGTH] in terms]
+
+    if matches:
+        # Fenêtre qui commence peu avant l'occurrence suivie du plus grand nombre d'autres
+        best = max(range(len(matches)), key=lambda i: sum(
+            1 for m in matches[i:] if m.start() - matches[i].start() < width
+        ))
+        start = max(0, matches[best].start() - width // 4)
+    else:
+        start = 0
+    end = min(len(text), start + width)
+    # Ne pas couper les mots aux bords de l'extrait
+    if start > 0:
+        space = text.find(' ', start, matches[best].start() if matches else end)
+        start = space + 1 if space != -1 else start
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+
+    parts = ['…'] if start > 0 else []
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:end]))
+    if end < len(text):
+        parts.append('…')
+    return mark_safe(''.join(parts))
+
+
+def light_stem(term):
+    """Retire la marque du pluriel (tajines -> tajine, gâteaux -> gateau)."""
+    if len(term) > 4 and (term.endswith('eaux') or term[-1] == 's' and term[-2] not in 'su'):
+        return term[:-1]
+    return term
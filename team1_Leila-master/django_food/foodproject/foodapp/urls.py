@@ -1,15 +1,15 @@
 from django.urls import path
-from . import views
-from . import views_admin
+from . import views_async
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
+from .lazy_views import LazyModule, LazyView
 from .views_i18n import set_language_custom
-from .views import RestaurantRegistrationWizard
-from .forms import (
-    RestaurantAuthInfoForm, RestaurantBasicInfoForm,
-    RestaurantOwnerInfoForm, RestaurantLegalDocsForm, RestaurantPhotosForm
-)
+
+# Les modules de vues sont importés à la première requête qui les utilise
+views = LazyModule('foodapp.views')
+views_admin = LazyModule('foodapp.views_admin')
+views_forum = LazyModule('foodapp.views_forum')
 
 # Fonction pour rediriger vers login
 def redirect_to_login(request):
@@ -19,26 +19,38 @@ def redirect_to_login(request):
 def redirect_to_restaurant_wizard(request):
     return redirect('restaurant_register')
 
-# Define the form list for the wizard
-RESTAURANT_WIZARD_FORMS = [
-    ("auth_info", RestaurantAuthInfoForm),
-    ("basic_info", RestaurantBasicInfoForm),
-    ("owner_info", RestaurantOwnerInfoForm),
-    ("legal_docs", RestaurantLegalDocsForm),
-    ("photos", RestaurantPhotosForm),
-]
+def build_restaurant_registration_wizard():
+    """Construit la vue de l'assistant d'inscription (formulaires et formtools à la demande)."""
+    from .forms import (
+        RestaurantAuthInfoForm, RestaurantBasicInfoForm,
+        RestaurantOwnerInfoForm, RestaurantLegalDocsForm, RestaurantPhotosForm
+    )
+    from .views import RestaurantRegistrationWizard
 
-# Define the form list for the wizard
-RESTAURANT_WIZARD_FORMS = [
-    ("auth_info", RestaurantAuthInfoForm),
-    ("basic_info", RestaurantBasicInfoForm),
-    ("owner_info", RestaurantOwnerInfoForm),
-    ("legal_docs", RestaurantLegalDocsForm),
-    ("photos", RestaurantPhotosForm),
-]
+    # Define the form list for the wizard
+    restaurant_wizard_forms = [
+        ("auth_info", RestaurantAuthInfoForm),
+        ("basic_info", RestaurantBasicInfoForm),
+        ("owner_info", RestaurantOwnerInfoForm),
+        ("legal_docs", RestaurantLegalDocsForm),
+        ("photos", RestaurantPhotosForm),
+    ]
+    return RestaurantRegistrationWizard.as_view(form_list=restaurant_wizard_forms)
 
 # Create the wizard view with the form list
-restaurant_registration_wizard = RestaurantRegistrationWizard.as_view(form_list=RESTAURANT_WIZARD_FORMS)
+restaurant_registration_wizard = LazyView(
+    'foodapp.views.RestaurantRegistrationWizard', loader=build_restaurant_registration_wizard
+)
+
+def build_password_set_view():
+    from django.contrib.auth import views as auth_views
+    from django.urls import reverse_lazy
+    return auth_views.PasswordResetConfirmView.as_view(
+        template_name='foodapp/password_set.html', success_url=reverse_lazy('login')
+    )
+
+# Lien envoyé par tasks.send_password_setup_email (aucun mot de passe par email)
+password_set_view = LazyView('django.contrib.auth.views.PasswordResetConfirmView', loader=build_password_set_view)
 
 urlpatterns = [
     # Pages principales
@@ -85,16 +97,29 @@ urlpatterns = [
     path('cuisine/moroccan/', views.moroccan_cuisine, name='moroccan_cuisine'),
     
     # Forum
-    path('forum/', views.dashboard, name='forum_topics_list'),  # Temporairement redirigé vers dashboard
+    path('forum/', views_forum.forum_topics_list, name='forum_topics_list'),
+    path('forum/category/<str:category>/', views_forum.forum_topics_by_category, name='forum_topics_by_category'),
+    path('forum/new/', views_forum.forum_new_topic, name='forum_new_topic'),
+    path('forum/topic/<int:topic_id>/', views_forum.forum_topic_detail, name='forum_topic_detail'),
+    path('forum/topic/<int:topic_id>/messages/', views_forum.forum_topic_messages, name='forum_topic_messages'),
+    path('forum/topic/<int:topic_id>/reply/', views_forum.forum_reply, name='forum_reply'),
+    path('forum/message/<int:message_id>/edit/', views_forum.forum_edit_message, name='forum_edit_message'),
+    path('forum/message/<int:message_id>/delete/', views_forum.forum_delete_message, name='forum_delete_message'),
     
     # API
     path('api/dishes/', views.get_dishes, name='api_dishes'),
     path('api/restaurants/', views.get_restaurants, name='api_restaurants'),
     
+    # API asynchrones (ASGI)
+    path('api/async/dishes/', views_async.get_dishes_async, name='api_dishes_async'),
+    path('api/async/restaurants/', views_async.get_restaurants_async, name='api_restaurants_async'),
+    path('restaurant/orders/stream/', views_async.restaurant_orders_stream, name='restaurant_orders_stream'),
+    
     # Auth
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('signup/', views.signup_view, name='signup'),
+    path('account/password/<uidb64>/<token>/', password_set_view, name='password_set'),
     path('restaurant-signup/', redirect_to_restaurant_wizard, name='restaurant_signup'),  # Redirection vers le wizard d'inscription
     path('restaurant/pending-approval/', views.restaurant_pending_approval, name='restaurant_pending_approval'),  # Page d'attente d'approbation
     path('restaurant/registration-confirmation/', views.restaurant_registration_confirmation, name='restaurant_registration_confirmation'),  # Page de confirmation
@@ -112,6 +137,7 @@ urlpatterns = [
     # Chatbot URLs
     path('chat/', views.chat_view, name='chat'),
     path('chat/message/', views.chat_message, name='chat_message'),
+    path('chat/history/', views.chat_history_page, name='chat_history'),
     path('chat/preferences/', views.update_chat_preferences, name='chat_preferences'),
 
     # Dashboard restaurant
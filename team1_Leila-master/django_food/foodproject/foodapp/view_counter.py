@@ -0,0 +1,149 @@
+"""
+Compteur de vues tamponné.
+
+Chaque consultation d'une page (sujet du forum, plat, restaurant) ajoute 1 à
+un compteur en mémoire du processus au lieu d'écrire en base. Un thread vide
+le tampon toutes les ``FLUSH_INTERVAL`` secondes (ou dès ``MAX_PENDING``
+objets en attente) en un ``UPDATE ... SET views_count = views_count + n`` par
+modèle et par valeur de n : les vues d'un sujet populaire ne se disputent plus
+le verrou de la ligne et aucun incrément n'est perdu entre deux requêtes
+concurrentes. Pour les plats et restaurants, le même UPDATE ajoute les vues
+aux scores de popularité (voir ``popularity.py``).
+
+Les lectures ajoutent les deltas en attente du processus (``value``,
+``merge``). Avec plusieurs processus, chacun ne voit que ses propres deltas
+jusqu'au prochain vidage. Le tampon est vidé à l'arrêt du processus.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+
+from . import popularity
+
+logger = logging.getLogger('foodapp.views')
+
+DEFAULTS = {
+    # 0 : pas de tampon, UPDATE à chaque vue
+    'FLUSH_INTERVAL': 10,
+    'MAX_PENDING': 1000,
+    'FIELD': 'views_count',
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'VIEW_COUNTER', {})}
+
+
+class ViewCounter:
+    """Accumule les vues par (modèle, pk) et les écrit par lots avec ``F() + n``."""
+
+    def __init__(self, field=None, flush_interval=None, max_pending=None):
+        config = get_config()
+        self.field = field or config['FIELD']
+        self.flush_interval = config['FLUSH_INTERVAL'] if flush_interval is None else flush_interval
+        self.max_pending = max_pending or config['MAX_PENDING']
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+
+    def increment(self, instance, n=1):
+        """Ajoute ``n`` vues à ``instance`` (écrites au prochain vidage)."""
+        key = (type(instance), instance.pk)
+        if not self.flush_interval:
+            type(instance).objects.filter(pk=instance.pk).update(**self._updates(type(instance), n))
+            return
+        with self._lock:
+            self._pending[key] += n
+            full = len(self._pending) >= self.max_pending
+        self._start_flusher()
+        if full:
+            self._wake.set()
+
+    def pending(self, model, pk):
+        with self._lock:
+            return self._pending.get((model, pk), 0)
+
+    def value(self, instance):
+        """Nombre de vues enregistré plus les vues en attente dans ce processus."""
+        return getattr(instance, self.field) + self.pending(type(instance), instance.pk)
+
+    def merge(self, instances):
+        """Ajoute les vues en attente aux objets chargés (affichage)."""
+        with self._lock:
+            pending = dict(self._pending)
+        for instance in instances:
+            delta = pending.get((type(instance), instance.pk))
+            if delta:
+                setattr(instance, self.field, getattr(instance, self.field) + delta)
+        return instances
+
+    def flush(self):
+        """Écrit les vues en attente ; renvoie le nombre d'objets mis à jour."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return 0
+
+        # Un UPDATE par modèle et par valeur d'incrément
+        groups = defaultdict(list)
+        for (model, pk), n in pending.items():
+            groups[model, n].append(pk)
+        written = set()
+        try:
+            for (model, n), pks in groups.items():
+                model.objects.filter(pk__in=pks).update(**self._updates(model, n))
+                written.add((model, n))
+        except Exception:
+            logger.exception('Échec du vidage des compteurs de vues, nouvel essai au prochain cycle')
+            # Remettre en attente ce qui n'a pas été écrit
+            with self._lock:
+                for (model, n), pks in groups.items():
+                    if (model, n) not in written:
+                        for pk in pks:
+                            self._pending[model, pk] += n
+        return sum(len(pks) for group, pks in groups.items() if group in written)
+
+    def _updates(self, model, n):
+        updates = {self.field: F(self.field) + n}
+        if popularity.is_ranked(model):
+            updates.update(popularity.increments('view', n))
+        return updates
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            finally:
+                connection.close()
+
+
+# Compteur partagé par les vues du processus
+view_counter = ViewCounter()
+
+
+def record_view(instance):
+    view_counter.increment(instance)
+
+
+def sync_views(instances):
+    """Ajuste ``views_count`` des objets affichés avec les vues pas encore écrites."""
+    return view_counter.merge(instances)
@@ -6,12 +6,14 @@ from datetime import datetime, timedelta
 # Django imports
 from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import update_session_auth_hash, authenticate, login, logout
+from django.contrib.auth import get_user_model, update_session_auth_hash, authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import PasswordChangeForm, AuthenticationForm, UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.files.storage import FileSystemStorage
-from django.db.models import Count, Q, Sum, F, Case, When, IntegerField, Prefetch
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q, Sum, F, Case, When, IntegerField, Prefetch
+from django.db.models.functions import TruncDate
 from django.http import JsonResponse, HttpResponseForbidden, HttpResponse, HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
@@ -22,10 +24,15 @@ from django.views.generic import ListView, TemplateView, UpdateView
 from formtools.wizard.views import SessionWizardView
 
 # Local application imports
+from cpp_modules.food_processor import sorted_dishes
+from . import allergens, chat_history, pairings, popularity, recommendations, similar_dishes
+from .answer_cache import cached_answer
+from .tasks import send_email
+from .view_counter import record_view, sync_views
 from .models import (
     Restaurant, Dish, Reservation, Review, Category, RestaurantAccount,
     City, UserProfile, ForumTopic, ForumMessage, SubscriptionPlan,
-    RestaurantSubscription, UserSubscription
+    RestaurantSubscription, UserSubscription, ChatSession, ChatMessage, Order, OrderItem
 )
 from .forms import (
     DishFilterForm, CurrencyConverterForm, ReservationForm,
@@ -59,9 +66,15 @@ def restaurants(request):
     if search:
         restaurants = restaurants.filter(name__icontains=search)
     
+    # Trier par popularité ou tendance si demandé (colonnes indexées)
+    sort_by = request.GET.get('sort')
+    if sort_by in popularity.SORTS:
+        restaurants = popularity.ranked(restaurants, sort_by)
+    
     context = {
         'restaurants': restaurants,
-        'cities': cities
+        'cities': cities,
+        'sort_by': sort_by,
     }
     return render(request, 'foodapp/modern_restaurants.html', context)
 
@@ -69,8 +82,12 @@ def restaurants(request):
 def dish_detail(request, dish_id):
     """Vue pour afficher les détails d'un plat spécifique"""
     dish = get_object_or_404(Dish, id=dish_id)
+    record_view(dish)
+    sync_views([dish])
     return render(request, 'foodapp/dish_detail.html', {
-        'dish': dish
+        'dish': dish,
+        'paired_dishes': pairings.paired_dishes(dish),
+        'related_dishes': similar_dishes.similar_dishes(dish),
     })
 
 def dish_list(request):
@@ -86,11 +103,21 @@ def dish_list(request):
     city_id = request.GET.get('city')
     dish_type = request.GET.get('type')
     search_query = request.GET.get('q', '')
+    # Allergènes à exclure : cochés dans le filtre et/ou ceux du profil
+    selected_mask = allergens.parse_allergen_param(request.GET.getlist('allergens'))
+    allergen_mask = selected_mask
+    use_profile_allergies = request.GET.get('my_allergies') == '1' and request.user.is_authenticated
+    if use_profile_allergies:
+        profile = UserProfile.objects.filter(user=request.user).first()
+        if profile:
+            allergen_mask |= allergens.profile_mask(profile)
     
     # Apply filters
     if city_id and city_id.isdigit():
         dishes = dishes.filter(city_id=int(city_id))
     
+    dishes = allergens.exclude_allergens(dishes, allergen_mask)
+    
     if dish_type:
         dishes = dishes.filter(type=dish_type)
         
@@ -100,15 +127,13 @@ def dish_list(request):
             Q(description__icontains=search_query)
         )
     
-    # Apply sorting
-    if sort_by == 'price_asc':
-        dishes = dishes.order_by('price')
-    elif sort_by == 'price_desc':
-        dishes = dishes.order_by('-price')
-    elif sort_by == 'rating':
-        dishes = dishes.order_by('-average_rating')
-    else:  # Default sort by name
-        dishes = dishes.order_by('name')
+    # Apply sorting: popularity/trending scores (indexed columns, per city and
+    # type), or price level (price_range), restaurant rating, or name without
+    # accents/case, via the food_processor sort (C++ when available)
+    if sort_by in popularity.SORTS:
+        dishes = popularity.ranked(dishes, sort_by)
+    else:
+        dishes = sorted_dishes(dishes, sort_by)
     
     # Prepare context
     context = {
@@ -118,6 +143,10 @@ def dish_list(request):
         'selected_type': dish_type,
         'search_query': search_query,
         'sort_by': sort_by,
+        'selected_sort': sort_by,
+        'allergy_choices': [choice for choice in UserProfile.ALLERGY_CHOICES if choice[0] in allergens.BITS],
+        'selected_allergens': allergens.allergen_names(selected_mask),
+        'use_profile_allergies': use_profile_allergies,
     }
     
     return render(request, 'foodapp/dish_list.html', context)
@@ -125,7 +154,11 @@ def dish_list(request):
 def restaurant_detail(request, restaurant_id):
     """Vue pour afficher les détails d'un restaurant spécifique"""
     restaurant = get_object_or_404(Restaurant, id=restaurant_id)
-    city_dishes = Dish.objects.filter(city=restaurant.city).order_by('-id')[:6]
+    record_view(restaurant)
+    sync_views([restaurant])
+    # Plats de la ville proches de la carte du restaurant, à défaut les derniers ajoutés
+    city_dishes = similar_dishes.similar_to_restaurant(restaurant) or Dish.objects.filter(
+        city=restaurant.city).order_by('-id')[:6]
     
     context = {
         'restaurant': restaurant,
@@ -427,13 +460,13 @@ def restaurant_stats(request):
     # Si des dates sont spécifiées, les utiliser
     if from_date:
         try:
-            start_date = datetime.datetime.strptime(from_date, '%Y-%m-%d').date()
+            start_date = datetime.strptime(from_date, '%Y-%m-%d').date()
         except ValueError:
             pass
     
     if to_date:
         try:
-            end_date = datetime.datetime.strptime(to_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(to_date, '%Y-%m-%d').date()
         except ValueError:
             pass
     
@@ -470,25 +503,20 @@ def restaurant_stats(request):
     current_date = start_date
     while current_date <= end_date:
         date_range.append(current_date)
-        current_date += datetime.timedelta(days=1)
+        current_date += timedelta(days=1)
     
     # Formater les dates pour l'affichage
     dates = [date.strftime('%d/%m') for date in date_range]
     
-    # Données de chiffre d'affaires par jour
-    revenue_data = []
-    for date in date_range:
-        daily_revenue = orders.filter(
-            order_time__date=date,
-            status__in=[Order.STATUS_DELIVERED, Order.STATUS_PAID]
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        revenue_data.append(daily_revenue)
-    
-    # Données de commandes par jour
-    orders_data = []
-    for date in date_range:
-        daily_orders = orders.filter(order_time__date=date).count()
-        orders_data.append(daily_orders)
+    # Chiffre d'affaires et commandes par jour, en une requête groupée
+    daily = {
+        row['day']: row for row in orders.annotate(day=TruncDate('order_time')).values('day').annotate(
+            count=Count('id'),
+            revenue=Sum('total_amount', filter=Q(status__in=[Order.STATUS_DELIVERED, Order.STATUS_PAID])),
+        )
+    }
+    revenue_data = [float(daily[date]['revenue'] or 0) if date in daily else 0.0 for date in date_range]
+    orders_data = [daily[date]['count'] if date in daily else 0 for date in date_range]
     
     # Répartition des ventes par catégorie de plat
     # Récupérer les articles de commande pour la période
@@ -504,9 +532,9 @@ def restaurant_stats(request):
     
     # Calculer les ventes par catégorie
     dish_categories_data = [
-        order_items.filter(dish__type='salty').aggregate(total=Sum('price'))['total'] or 0,
-        order_items.filter(dish__type='sweet').aggregate(total=Sum('price'))['total'] or 0,
-        order_items.filter(dish__type='drink').aggregate(total=Sum('price'))['total'] or 0
+        float(order_items.filter(dish__type='salty').aggregate(total=Sum('price'))['total'] or 0),
+        float(order_items.filter(dish__type='sweet').aggregate(total=Sum('price'))['total'] or 0),
+        float(order_items.filter(dish__type='drink').aggregate(total=Sum('price'))['total'] or 0)
     ]
     
     # Modes de paiement
@@ -665,13 +693,8 @@ def user_profile(request):
         # Rediriger pour éviter les soumissions multiples
         return redirect('user_profile')
     
-    # Récupérer quelques plats recommandés
-    if user_profile.is_vegan:
-        recommended_dishes = Dish.objects.filter(is_vegan=True)[:3]
-    elif user_profile.is_vegetarian:
-        recommended_dishes = Dish.objects.filter(is_vegetarian=True)[:3]
-    else:
-        recommended_dishes = Dish.objects.all().order_by('?')[:3]
+    # Plats les mieux adaptés au profil (régime, allergies, santé, objectifs)
+    recommended_dishes = recommendations.recommended_dishes(user_profile, 3)
     
     context = {
         'user_profile': user_profile,
@@ -857,17 +880,18 @@ def create_order(request):
             # Create order
             order = Order.objects.create(
                 restaurant=restaurant,
-                customer=customer,
-                status='pending',
+                user=customer,
+                status=Order.STATUS_NEW,
                 table_number=data.get('table_number', ''),
                 special_instructions=data.get('special_instructions', '')
             )
             
-            # Add order items
+            # Add order items (les plats n'ont qu'une gamme de prix : dernier prix facturé)
             total_amount = 0
+            dishes = Dish.with_last_price(Dish.objects.filter(restaurant=restaurant))
             for item in data['items']:
                 try:
-                    dish = Dish.objects.get(id=item['dish_id'], restaurant=restaurant)
+                    dish = dishes.get(id=item['dish_id'])
                     quantity = int(item.get('quantity', 1))
                     order_item = OrderItem.objects.create(
                         order=order,
@@ -893,10 +917,10 @@ def create_order(request):
             return JsonResponse({
                 'success': True,
                 'order_id': order.id,
-                'order_number': order.order_number,
+                'order_number': order.order_code,
                 'status': order.get_status_display(),
                 'total_amount': str(total_amount),
-                'created_at': order.created_at.isoformat()
+                'created_at': order.order_time.isoformat()
             })
             
     except json.JSONDecodeError:
@@ -1512,23 +1536,27 @@ def add_to_cart(request):
     try:
         data = json.loads(request.body)
         dish_id = data.get('dish_id')
-        quantity = data.get('quantity', 1)
+        quantity = int(data.get('quantity', 1))
+        if quantity < 1:
+            return JsonResponse({'success': False, 'error': 'Quantité invalide'}, status=400)
         
         # Vérifier que le plat existe
-        dish = get_object_or_404(Dish, id=dish_id)
+        dish = get_object_or_404(Dish.with_last_price(Dish.objects.all()), id=dish_id)
+        if dish.restaurant_id is None:
+            return JsonResponse({'success': False, 'error': "Ce plat n'est proposé par aucun restaurant"}, status=400)
         
-        # Récupérer ou créer le panier de l'utilisateur
-        cart, created = Order.objects.get_or_create(
-            user=request.user,
-            status=Order.STATUS_NEW,
-            defaults={'total_amount': 0}
-        )
+        # Récupérer ou créer le panier de l'utilisateur (un panier par restaurant)
+        cart = Order.objects.filter(
+            user=request.user, restaurant_id=dish.restaurant_id, status=Order.STATUS_NEW
+        ).order_by('-order_time').first()
+        if cart is None:
+            cart = Order.objects.create(user=request.user, restaurant_id=dish.restaurant_id, status=Order.STATUS_NEW)
         
         # Ajouter ou mettre à jour l'article dans le panier
         cart_item, created = OrderItem.objects.get_or_create(
             order=cart,
             dish=dish,
-            defaults={'quantity': quantity}
+            defaults={'quantity': quantity, 'price': dish.price}
         )
         
         if not created:
@@ -1541,7 +1569,11 @@ def add_to_cart(request):
         return JsonResponse({
             'success': True,
             'cart_count': cart.items.count(),
-            'cart_total': str(cart.total_amount)
+            'cart_total': str(cart.total_amount),
+            'suggestions': [
+                {'id': paired.id, 'name': paired.name, 'image_url': paired.image.url if paired.image else None}
+                for paired in pairings.paired_dishes(dish, restaurant_id=cart.restaurant_id, limit=3)
+            ],
         })
         
     except Exception as e:
@@ -1568,16 +1600,36 @@ def chat_view(request):
             )
             request.session['chat_session_id'] = str(chat_session.session_id)
 
-    # Get chat history
-    chat_history = ChatMessage.objects.filter(session=chat_session).order_by('timestamp')
+    # Latest messages only; older ones are fetched page by page (chat_history_page)
+    history, older_cursor = chat_history.history_page(chat_session)
     
     context = {
         'chat_session': chat_session,
-        'chat_history': chat_history,
+        'chat_history': history,
+        'older_cursor': older_cursor,
         'available_cities': City.objects.all(),
     }
     return render(request, 'foodapp/chat.html', context)
 
+@login_required
+def chat_history_page(request):
+    """API endpoint returning the chat messages before the ``before`` cursor"""
+    session_id = request.session.get('chat_session_id')
+    chat_session = ChatSession.objects.filter(session_id=session_id, user=request.user).first() if session_id else None
+    if chat_session is None:
+        return JsonResponse({'status': 'error', 'message': 'No active chat session'})
+
+    history, older_cursor = chat_history.history_page(chat_session, before=request.GET.get('before'))
+    return JsonResponse({
+        'status': 'success',
+        'messages': [{
+            'role': message['role'],
+            'content': message['content'],
+            'time': timezone.localtime(message['timestamp']).strftime('%H:%M'),
+        } for message in history],
+        'older_cursor': older_cursor,
+    })
+
 @csrf_exempt
 @login_required
 def chat_message(request):
@@ -1593,10 +1645,23 @@ def chat_message(request):
         if not user_input or not session_id:
             return JsonResponse({'status': 'error', 'message': 'Missing required parameters'})
 
-        # Simple response since we've removed the chatbot
+        chat_session = ChatSession.objects.get(session_id=session_id)
+        ChatMessage.objects.create(session=chat_session, role='user', content=user_input)
+
+        # Answered from the local knowledge base index (no external API),
+        # repeated questions straight from the answer cache
+        result, cached = cached_answer(user_input, language=chat_session.language, city_id=chat_session.selected_city_id)
+        ChatMessage.objects.create(
+            session=chat_session, role='assistant', content=result['response'],
+            metadata={'sources': [source['id'] for source in result['sources']], 'cached': cached},
+        )
+        # Refreshes last_interaction
+        chat_session.save(update_fields=['last_interaction'])
+
         return JsonResponse({
             'status': 'success',
-            'message': 'Chat functionality is currently unavailable.',
+            'response': result['response'],
+            'sources': result['sources'],
             'session_id': session_id
         })
 
@@ -1637,8 +1702,8 @@ def update_chat_preferences(request):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)})
 
-def send_restaurant_registration_emails(restaurant_id, owner_email, owner_first_name, username, password):
-    """Fonction pour envoyer les emails de façon asynchrone après la création du compte restaurant"""
+def send_restaurant_registration_emails(restaurant_id, owner_email, owner_first_name, username):
+    """Met en file les emails envoyés après la création du compte restaurant (voir run_workers)"""
     try:
         # Récupérer les informations nécessaires
         restaurant = Restaurant.objects.get(id=restaurant_id)
@@ -1646,37 +1711,27 @@ def send_restaurant_registration_emails(restaurant_id, owner_email, owner_first_
         # Email aux administrateurs
         admin_emails = User.objects.filter(is_superuser=True).values_list('email', flat=True)
         if admin_emails:
-            try:
-                send_mail(
-                    'Nouvelle demande de compte restaurant',
-                    f'Un nouveau restaurant "{restaurant.name}" attend votre approbation. Veuillez consulter le panneau d\'administration pour examiner la demande.',
-                    'noreply@foodflex.com',
-                    list(admin_emails),
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Erreur lors de l'envoi du mail aux admins: {str(e)}")
+            send_email.delay(
+                'Nouvelle demande de compte restaurant',
+                f'Un nouveau restaurant "{restaurant.name}" attend votre approbation. Veuillez consulter le panneau d\'administration pour examiner la demande.',
+                list(admin_emails),
+                from_email='noreply@foodflex.com',
+            )
         
         # Email au propriétaire du restaurant
-        try:
-            send_mail(
-                'Votre demande d\'inscription restaurant a été reçue',
-                f'Cher {owner_first_name},\n\n'
-                f'Votre demande d\'inscription pour "{restaurant.name}" a été reçue et est en cours d\'examen. '
-                f'Nous vous contacterons dès que votre compte sera approuvé.\n\n'
-                f'Vos identifiants de connexion :\n'
-                f'Nom d\'utilisateur : {username}\n'
-                f'Mot de passe : {password}\n\n'
-                f'Conservez ces informations en lieu sûr. Vous pourrez modifier votre mot de passe après l\'approbation.\n\n'
-                f'L\'équipe FoodFlex',
-                'noreply@foodflex.com',
-                [owner_email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Erreur lors de l'envoi du mail au restaurant: {str(e)}")
+        send_email.delay(
+            'Votre demande d\'inscription restaurant a été reçue',
+            f'Cher {owner_first_name},\n\n'
+            f'Votre demande d\'inscription pour "{restaurant.name}" a été reçue et est en cours d\'examen. '
+            f'Nous vous contacterons dès que votre compte sera approuvé.\n\n'
+            f'Votre nom d\'utilisateur : {username}\n'
+            f'Connectez-vous avec le mot de passe choisi lors de l\'inscription.\n\n'
+            f'L\'équipe FoodFlex',
+            [owner_email],
+            from_email='noreply@foodflex.com',
+        )
     except Exception as e:
-        print(f"Erreur lors de l'envoi des emails d'inscription: {str(e)}")
+        print(f"Erreur lors de la mise en file des emails d'inscription: {str(e)}")
 
 @login_required
 def restaurant_approval(request, restaurant_id, action):
@@ -1710,15 +1765,9 @@ def restaurant_approval(request, restaurant_id, action):
             message += "approuvé" if restaurant.is_approved else "rejeté"
             message += " par l'administrateur."
             
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [restaurant.owner.email],
-                fail_silently=False,
-            )
+            send_email.delay(subject, message, [restaurant.owner.email])
     except Exception as e:
-        # Ne pas échouer si l'email ne peut pas être envoyé
+        # Ne pas échouer si l'email ne peut pas être mis en file
         print(f"Erreur lors de l'envoi de l'email de notification : {e}")
     
     return redirect('admin_restaurant_detail', restaurant_id=restaurant_id)
@@ -1851,10 +1900,10 @@ def restaurant_pos(request, restaurant_id):
         return redirect('accueil')
     
     # Vérifier que le restaurant existe et appartient à l'utilisateur
-    restaurant = get_object_or_404(Restaurant, id=restaurant_id, restaurant_account=request.user.restaurant_account)
+    restaurant = get_object_or_404(Restaurant, id=restaurant_id, account=request.user.restaurant_account)
     
-    # Récupérer les plats du restaurant
-    dishes = Dish.objects.filter(restaurant=restaurant, is_available=True).order_by('type', 'name')
+    # Récupérer les plats du restaurant, avec leur dernier prix facturé
+    dishes = Dish.with_last_price(Dish.objects.filter(restaurant=restaurant)).order_by('type', 'name')
     
     # Préparer les catégories de plats pour le menu
     categories = {}
@@ -1867,13 +1916,15 @@ def restaurant_pos(request, restaurant_id):
     active_orders = Order.objects.filter(
         restaurant=restaurant,
         status__in=['new', 'preparing']
-    ).order_by('-created_at')
+    ).order_by('-order_time')
     
     context = {
         'restaurant': restaurant,
         'categories': categories,
         'active_orders': active_orders,
         'active_tab': 'pos',
+        # Suggestions « souvent commandés avec » affichées par la caisse sans requête supplémentaire
+        'dish_pairings': pairings.restaurant_pairings(restaurant.id, [dish.id for dish in dishes]),
     }
     
     return render(request, 'foodapp/restaurant_pos.html', context)
@@ -1889,37 +1940,37 @@ def kitchen_dashboard(request, restaurant_id):
         return redirect('accueil')
     
     # Vérifier que le restaurant existe et appartient à l'utilisateur
-    restaurant = get_object_or_404(Restaurant, id=restaurant_id, restaurant_account=request.user.restaurant_account)
+    restaurant = get_object_or_404(Restaurant, id=restaurant_id, account=request.user.restaurant_account)
     
-    # Récupérer les commandes par statut
+    # Récupérer les commandes par statut (les commandes n'ont que leur heure de prise)
+    today = timezone.now().date()
     new_orders = Order.objects.filter(
         restaurant=restaurant,
-        status='new'
-    ).order_by('created_at')
+        status=Order.STATUS_NEW
+    ).order_by('order_time')
     
     preparing_orders = Order.objects.filter(
         restaurant=restaurant,
-        status='preparing'
-    ).order_by('updated_at')
+        status=Order.STATUS_PREPARING
+    ).order_by('order_time')
     
     ready_orders = Order.objects.filter(
         restaurant=restaurant,
-        status='ready',
-        updated_at__date=timezone.now().date()
-    ).order_by('-updated_at')
+        status=Order.STATUS_READY,
+        order_time__date=today
+    ).order_by('-order_time')
     
     # Statistiques du jour
-    today = timezone.now().date()
     today_orders = Order.objects.filter(
         restaurant=restaurant,
-        created_at__date=today
+        order_time__date=today
     )
     
     today_stats = {
         'total_orders': today_orders.count(),
-        'new_orders': today_orders.filter(status='new').count(),
-        'preparing_orders': today_orders.filter(status='preparing').count(),
-        'completed_orders': today_orders.filter(status='completed').count(),
+        'new_orders': today_orders.filter(status=Order.STATUS_NEW).count(),
+        'preparing_orders': today_orders.filter(status=Order.STATUS_PREPARING).count(),
+        'completed_orders': today_orders.filter(status__in=[Order.STATUS_DELIVERED, Order.STATUS_PAID]).count(),
         'revenue': today_orders.filter(status__in=[Order.STATUS_DELIVERED, Order.STATUS_PAID]).aggregate(
             total=Sum('total_amount'))['total'] or 0,
     }
@@ -2173,6 +2224,8 @@ def get_dishes(request):
     - is_vegan: Filter vegan dishes
     - is_tourist_recommended: Filter tourist recommended dishes
     - search: Search in dish name and description
+    - exclude_allergens: Comma-separated allergy keys (UserProfile.ALLERGY_CHOICES) to exclude
+    - ordering: popularity or trending (decayed scores, highest first)
     - limit: Limit number of results (default: 20)
     - offset: Offset for pagination (default: 0)
     """
@@ -2186,6 +2239,8 @@ def get_dishes(request):
         is_vegan = request.GET.get('is_vegan')
         is_tourist_recommended = request.GET.get('is_tourist_recommended')
         search = request.GET.get('search', '').strip()
+        allergen_mask = allergens.parse_allergen_param(request.GET.getlist('exclude_allergens'))
+        ordering = request.GET.get('ordering')
         limit = min(int(request.GET.get('limit', 20)), 100)  # Max 100 items per page
         offset = int(request.GET.get('offset', 0))
 
@@ -2215,6 +2270,8 @@ def get_dishes(request):
         if is_tourist_recommended and is_tourist_recommended.lower() == 'true':
             dishes = dishes.filter(is_tourist_recommended=True)
             
+        dishes = allergens.exclude_allergens(dishes, allergen_mask)
+            
         if search:
             dishes = dishes.filter(
                 Q(name__icontains=search) | 
@@ -2223,9 +2280,13 @@ def get_dishes(request):
                 Q(cultural_notes__icontains=search)
             )
         
+        if ordering in popularity.SORTS:
+            dishes = popularity.ranked(dishes, ordering)
+        
         # Apply pagination
         total_count = dishes.count()
         dishes = dishes[offset:offset + limit]
+        epoch = popularity.current_epoch(cached=True)
         
         # Prepare response data
         dishes_data = []
@@ -2241,6 +2302,9 @@ def get_dishes(request):
                 'is_vegan': dish.is_vegan,
                 'is_tourist_recommended': dish.is_tourist_recommended,
                 'calories': dish.calories,
+                'allergens': dish.allergen_list(),
+                'popularity': round(popularity.current_value(dish.popularity_score, epoch), 2),
+                'trending': round(popularity.current_value(dish.trending_score, epoch, trending=True), 2),
                 'image_url': dish.image.url if dish.image else None,
                 'restaurant': {
                     'id': dish.restaurant.id if dish.restaurant else None,
@@ -2322,22 +2386,19 @@ def get_restaurants(request):
     API endpoint to return a list of restaurants as JSON.
     Supports filtering by various parameters:
     - city_id: Filter by city
-    - cuisine: Filter by cuisine type
+    - cuisine: Filter by cuisine type (searched in the description)
     - is_open: Filter by open status (true/false)
-    - has_delivery: Filter restaurants with delivery
-    - has_takeaway: Filter restaurants with takeaway
-    - search: Search in restaurant name and description
+    - search: Search in restaurant name, description and address
     - limit: Limit number of results (default: 20)
     - offset: Offset for pagination (default: 0)
-    - ordering: Field to order by (name, -name, rating, -rating, etc.)
+    - ordering: Field to order by (name, -name, rating, -rating, etc.),
+      or popularity/trending (decayed scores, highest first)
     """
     try:
         # Get query parameters
         city_id = request.GET.get('city_id')
         cuisine = request.GET.get('cuisine')
         is_open = request.GET.get('is_open')
-        has_delivery = request.GET.get('has_delivery')
-        has_takeaway = request.GET.get('has_takeaway')
         search = request.GET.get('search', '').strip()
         limit = min(int(request.GET.get('limit', 20)), 100)  # Max 100 items per page
         offset = int(request.GET.get('offset', 0))
@@ -2351,44 +2412,40 @@ def get_restaurants(request):
             restaurants = restaurants.filter(city_id=city_id)
             
         if cuisine:
-            restaurants = restaurants.filter(Q(cuisine__icontains=cuisine) | 
-                                          Q(description__icontains=cuisine))
+            restaurants = restaurants.filter(description__icontains=cuisine)
             
         if is_open and is_open.lower() in ['true', '1', 'yes']:
             restaurants = restaurants.filter(is_open=True)
         elif is_open and is_open.lower() in ['false', '0', 'no']:
             restaurants = restaurants.filter(is_open=False)
             
-        if has_delivery and has_delivery.lower() in ['true', '1', 'yes']:
-            restaurants = restaurants.filter(has_delivery=True)
-            
-        if has_takeaway and has_takeaway.lower() in ['true', '1', 'yes']:
-            restaurants = restaurants.filter(has_takeaway=True)
-            
         if search:
             restaurants = restaurants.filter(
                 Q(name__icontains=search) | 
                 Q(description__icontains=search) |
-                Q(address__icontains=search) |
-                Q(cuisine__icontains=search)
+                Q(address__icontains=search)
             )
         
+        total_count = restaurants.count()
+        # Note moyenne et nombre d'avis agrégés dans la requête de la page
+        restaurants = restaurants.select_related('city').annotate(
+            avg_rating=Avg('reviews__rating'),
+            review_count=Count('reviews'),
+        )
+        
         # Apply ordering
-        if ordering.lstrip('-') in ['name', 'rating', 'created_at']:
-            restaurants = restaurants.order_by(ordering)
+        if ordering in popularity.SORTS:
+            restaurants = popularity.ranked(restaurants, ordering)
+        elif ordering.lstrip('-') in ['name', 'rating', 'created_at']:
+            restaurants = restaurants.order_by(ordering.replace('rating', 'avg_rating'), 'id')
         
         # Apply pagination
-        total_count = restaurants.count()
         restaurants = restaurants[offset:offset + limit]
+        epoch = popularity.current_epoch(cached=True)
         
         # Prepare response data
         restaurants_data = []
         for restaurant in restaurants:
-            # Calculate average rating
-            avg_rating = restaurant.reviews.aggregate(
-                avg_rating=Avg('rating')
-            )['avg_rating'] or 0
-            
             restaurant_data = {
                 'id': restaurant.id,
                 'name': restaurant.name,
@@ -2398,9 +2455,10 @@ def get_restaurants(request):
                 'email': restaurant.email,
                 'website': restaurant.website,
                 'is_open': restaurant.is_open,
-                'cuisine': restaurant.cuisine,
-                'average_rating': round(float(avg_rating), 1),
-                'review_count': restaurant.reviews.count(),
+                'average_rating': round(float(restaurant.avg_rating or 0), 1),
+                'review_count': restaurant.review_count,
+                'popularity': round(popularity.current_value(restaurant.popularity_score, epoch), 2),
+                'trending': round(popularity.current_value(restaurant.trending_score, epoch, trending=True), 2),
                 'image_url': restaurant.image.url if restaurant.image else None,
                 'city': {
                     'id': restaurant.city.id,
@@ -4,7 +4,7 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.core.mail import send_mail
+from .tasks import send_email
 from django.db.models import Count, Avg, Q
 
 from .models import (
@@ -112,7 +112,7 @@ def update_restaurant_status(request, restaurant_id):
             
             # Envoyer un email de notification
             status_display = dict(RestaurantAccount.STATUS_CHOICES)[new_status]
-            send_mail(
+            send_email.delay(
                 f'Mise à jour du statut de votre restaurant - FoodFlex',
                 f'Bonjour {restaurant_account.user.first_name},\n\n'
                 f'Nous vous informons que le statut de votre restaurant "{restaurant_account.restaurant.name}" '
@@ -120,9 +120,8 @@ def update_restaurant_status(request, restaurant_id):
                 f'Raison: {reason or "Aucune raison fournie"}\n\n'
                 f'Pour plus d\'informations, veuillez vous connecter à votre compte.\n\n'
                 f'L\'équipe FoodFlex',
-                'noreply@foodflex.com',
                 [restaurant_account.user.email],
-                fail_silently=True,
+                from_email='noreply@foodflex.com',
             )
             
             messages.success(request, f"Le statut du restaurant a été mis à jour à {status_display}.")
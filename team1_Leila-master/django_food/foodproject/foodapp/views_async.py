@@ -0,0 +1,293 @@
+"""
+Versions asynchrones (ASGI) des API JSON en lecture seule et du flux des
+commandes en direct.
+
+Les requêtes sont projetées avec ``values()`` : aucun objet modèle n'est
+instancié et la sérialisation se fait sur des dictionnaires. Servies sous
+uvicorn/gunicorn (voir ``gunicorn.conf.py``), ces vues ne bloquent pas de
+thread pendant l'attente de la base ou du client.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db.models import Avg, Count, Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from . import allergens, popularity
+from .models import Dish, Restaurant, RestaurantAccount, Order, OrderItem
+
+DISH_FIELDS = (
+    'id', 'name', 'description', 'price_range', 'type', 'origin', 'is_vegetarian', 'is_vegan',
+    'is_tourist_recommended', 'calories', 'allergen_mask', 'popularity_score', 'trending_score', 'image',
+    'restaurant_id', 'restaurant__name', 'category_id', 'category__name', 'city_id', 'city__name',
+)
+
+RESTAURANT_FIELDS = (
+    'id', 'name', 'description', 'address', 'phone', 'email', 'website', 'is_open', 'image',
+    'city_id', 'city__name', 'created_at', 'avg_rating', 'review_count', 'popularity_score', 'trending_score',
+)
+
+LIVE_ORDERS_POLL_SECONDS = 2
+LIVE_ORDERS_MAX_SECONDS = 300
+
+
+def _media_url(path):
+    return f"{settings.MEDIA_URL}{path}" if path else None
+
+
+def _related(row, prefix):
+    if row[f'{prefix}_id'] is None:
+        return None
+    return {'id': row[f'{prefix}_id'], 'name': row[f'{prefix}__name']}
+
+
+def _page_links(request, offset, limit, total_count):
+    query = request.GET.urlencode()
+    return {
+        'next': f"{request.path}?{query}&offset={offset + limit}" if offset + limit < total_count else None,
+        'previous': f"{request.path}?{query}&offset={max(0, offset - limit)}" if offset > 0 else None,
+    }
+
+
+async def _epoch():
+    """Origine des scores, lue hors de la boucle d'événements (cache, sinon base)."""
+    return await sync_to_async(popularity.current_epoch)(cached=True)
+
+
+def _scores(row, epoch, config):
+    return {
+        'popularity': round(popularity.current_value(row['popularity_score'], epoch, config=config), 2),
+        'trending': round(popularity.current_value(row['trending_score'], epoch, trending=True, config=config), 2),
+    }
+
+
+def _is_true(value, accepted=('true',)):
+    return bool(value) and value.lower() in accepted
+
+
+async def get_dishes_async(request):
+    """
+    Équivalent asynchrone de ``views.get_dishes`` (mêmes paramètres, même
+    format de réponse).
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+        offset = int(request.GET.get('offset', 0))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    dishes = Dish.objects.all()
+    filters = {
+        'restaurant_id': request.GET.get('restaurant_id'),
+        'category_id': request.GET.get('category_id'),
+        'type': request.GET.get('dish_type'),
+        'origin': request.GET.get('origin'),
+    }
+    dishes = dishes.filter(**{field: value for field, value in filters.items() if value})
+    for flag in ('is_vegetarian', 'is_vegan', 'is_tourist_recommended'):
+        if _is_true(request.GET.get(flag)):
+            dishes = dishes.filter(**{flag: True})
+    dishes = allergens.exclude_allergens(
+        dishes, allergens.parse_allergen_param(request.GET.getlist('exclude_allergens')))
+
+    search = request.GET.get('search', '').strip()
+    if search:
+        dishes = dishes.filter(
+            Q(name__icontains=search) |
+            Q(description__icontains=search) |
+            Q(ingredients__icontains=search) |
+            Q(cultural_notes__icontains=search)
+        )
+
+    total_count = await dishes.acount()
+    ordering = request.GET.get('ordering')
+    dishes = popularity.ranked(dishes, ordering) if ordering in popularity.SORTS else dishes.order_by('id')
+    rows = dishes.values(*DISH_FIELDS)[offset:offset + limit]
+    epoch, config = await _epoch(), popularity.get_config()
+
+    results = [{
+        'id': row['id'],
+        'name': row['name'],
+        'description': row['description'],
+        'price_range': row['price_range'],
+        'type': row['type'],
+        'origin': row['origin'],
+        'is_vegetarian': row['is_vegetarian'],
+        'is_vegan': row['is_vegan'],
+        'is_tourist_recommended': row['is_tourist_recommended'],
+        'calories': row['calories'],
+        'allergens': allergens.allergen_names(row['allergen_mask']),
+        **_scores(row, epoch, config),
+        'image_url': _media_url(row['image']),
+        'restaurant': _related(row, 'restaurant'),
+        'category': _related(row, 'category'),
+        'city': _related(row, 'city'),
+    } async for row in rows]
+
+    return JsonResponse({
+        'success': True,
+        'count': len(results),
+        'total_count': total_count,
+        **_page_links(request, offset, limit, total_count),
+        'results': results,
+    })
+
+
+async def get_restaurants_async(request):
+    """
+    Équivalent asynchrone de ``views.get_restaurants`` : la note moyenne et le
+    nombre d'avis sont agrégés dans la même requête au lieu de deux requêtes
+    par restaurant.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+        offset = int(request.GET.get('offset', 0))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    restaurants = Restaurant.objects.all()
+    city_id = request.GET.get('city_id')
+    if city_id:
+        restaurants = restaurants.filter(city_id=city_id)
+
+    cuisine = request.GET.get('cuisine')
+    if cuisine:
+        restaurants = restaurants.filter(description__icontains=cuisine)
+
+    is_open = request.GET.get('is_open')
+    if _is_true(is_open, ('true', '1', 'yes')):
+        restaurants = restaurants.filter(is_open=True)
+    elif _is_true(is_open, ('false', '0', 'no')):
+        restaurants = restaurants.filter(is_open=False)
+
+    search = request.GET.get('search', '').strip()
+    if search:
+        restaurants = restaurants.filter(
+            Q(name__icontains=search) |
+            Q(description__icontains=search) |
+            Q(address__icontains=search)
+        )
+
+    total_count = await restaurants.acount()
+
+    ordering = request.GET.get('ordering', 'name')
+    if ordering in popularity.SORTS:
+        ordering = f'-{popularity.SORTS[ordering]}'
+    ordering = ordering.replace('rating', 'avg_rating')
+    if ordering.lstrip('-') not in ('name', 'avg_rating', 'created_at', *popularity.SORTS.values()):
+        ordering = 'name'
+
+    rows = restaurants.annotate(
+        avg_rating=Avg('reviews__rating'),
+        review_count=Count('reviews'),
+    ).order_by(ordering, 'id').values(*RESTAURANT_FIELDS)[offset:offset + limit]
+    epoch, config = await _epoch(), popularity.get_config()
+
+    results = [{
+        'id': row['id'],
+        'name': row['name'],
+        'description': row['description'],
+        'address': row['address'],
+        'phone': row['phone'],
+        'email': row['email'],
+        'website': row['website'],
+        'is_open': row['is_open'],
+        'average_rating': round(float(row['avg_rating'] or 0), 1),
+        'review_count': row['review_count'],
+        **_scores(row, epoch, config),
+        'image_url': _media_url(row['image']),
+        'city': _related(row, 'city'),
+        'created_at': row['created_at'].isoformat(),
+    } async for row in rows]
+
+    return JsonResponse({
+        'success': True,
+        'count': len(results),
+        'total_count': total_count,
+        **_page_links(request, offset, limit, total_count),
+        'results': results,
+    })
+
+
+async def _orders_since(restaurant_id, last_id, since):
+    """Commandes (et leurs lignes) postérieures à ``last_id``, en deux requêtes."""
+    orders = [row async for row in Order.objects.filter(
+        restaurant_id=restaurant_id, id__gt=last_id, order_time__gte=since,
+    ).order_by('id').values(
+        'id', 'order_code', 'status', 'customer_name', 'table_number', 'total_amount', 'order_time',
+    )]
+    if not orders:
+        return []
+
+    items = {}
+    async for item in OrderItem.objects.filter(order_id__in=[o['id'] for o in orders]).values(
+        'order_id', 'dish__name', 'quantity', 'price', 'notes',
+    ):
+        items.setdefault(item['order_id'], []).append({
+            'dish_name': item['dish__name'],
+            'quantity': item['quantity'],
+            'price': str(item['price']),
+            'notes': item['notes'] or '',
+        })
+
+    status_labels = dict(Order.STATUS_CHOICES)
+    return [{
+        'id': order['id'],
+        'order_number': order['order_code'],
+        'status': status_labels.get(order['status'], order['status']),
+        'status_code': order['status'],
+        'created_at': order['order_time'].isoformat(),
+        'customer_name': order['customer_name'],
+        'table_number': order['table_number'],
+        'total_amount': str(order['total_amount']),
+        'items': items.get(order['id'], []),
+    } for order in orders]
+
+
+async def restaurant_orders_stream(request):
+    """
+    Flux Server-Sent Events des nouvelles commandes du restaurant connecté.
+    Remplace le polling de ``restaurant_orders_live`` : une connexion reste
+    ouverte et ne coûte qu'une requête indexée toutes les
+    ``LIVE_ORDERS_POLL_SECONDS`` secondes. Le client se reconnecte
+    automatiquement (EventSource) après ``LIVE_ORDERS_MAX_SECONDS``.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+
+    account = await RestaurantAccount.objects.filter(
+        user_id=user.pk, is_active=True
+    ).values('restaurant_id').afirst()
+    if not account:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    restaurant_id = account['restaurant_id']
+
+    try:
+        last_id = int(request.GET.get('last_order_id') or request.headers.get('Last-Event-ID') or 0)
+    except ValueError:
+        last_id = 0
+    since = timezone.now() - timezone.timedelta(hours=24)
+
+    async def events():
+        nonlocal last_id
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LIVE_ORDERS_MAX_SECONDS
+        yield f"retry: {LIVE_ORDERS_POLL_SECONDS * 1000}\n\n"
+        while loop.time() < deadline:
+            orders = await _orders_since(restaurant_id, last_id, since)
+            if orders:
+                last_id = orders[-1]['id']
+                yield f"id: {last_id}\nevent: orders\ndata: {json.dumps(orders)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(LIVE_ORDERS_POLL_SECONDS)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
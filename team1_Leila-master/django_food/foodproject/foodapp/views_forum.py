@@ -0,0 +1,267 @@
+from datetime import datetime
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages as flash
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import HttpResponseForbidden, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import require_POST
+
+from .forms import ForumTopicForm, ForumMessageForm
+from .forum_search import load_results, query_terms, search_topics
+from .metrics import record_cache
+from .models import ForumTopic, ForumMessage, ForumCategoryStats
+from .view_counter import record_view, sync_views
+
+TOPICS_PER_PAGE = 20
+MESSAGES_PER_PAGE = 30
+# Durée de vie des fragments HTML des messages ; une modification du message
+# change sa clé, un changement d'avatar apparaît au plus tard après ce délai
+FRAGMENT_TIMEOUT = 60 * 60
+
+
+def encode_cursor(message):
+    """Curseur opaque désignant la position (created_at, id) d'un message."""
+    return urlsafe_base64_encode(f'{message.created_at.isoformat()}|{message.pk}'.encode())
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def thread_page(topic, cursor=None):
+    """
+    Messages de ``topic`` qui suivent ``cursor`` (ou les premiers), au plus
+    MESSAGES_PER_PAGE, et un indicateur de suite. Pagination par clé
+    (created_at, id) sur l'index du fil : le coût ne dépend pas de la position.
+    """
+    topic_messages = topic.messages.select_related('author', 'author__profile').order_by('created_at', 'id')
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, pk = position
+        topic_messages = topic_messages.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    page = list(topic_messages[:MESSAGES_PER_PAGE + 1])
+    return page[:MESSAGES_PER_PAGE], len(page) > MESSAGES_PER_PAGE
+
+
+def render_messages(request, topic_messages, starts_thread=False):
+    """
+    Fragments HTML des messages, lus en cache en une fois. La clé porte l'id,
+    ``updated_at`` et ce qui dépend du lecteur (droit de modifier, premier message).
+    """
+    user = request.user
+    variants = []
+    for index, message in enumerate(topic_messages):
+        can_edit = message.author_id == user.id or user.is_staff
+        is_first = starts_thread and index == 0
+        key = f'forum:message:{message.pk}:{message.updated_at.timestamp()}:{int(can_edit)}{int(is_first)}'
+        variants.append((key, message, can_edit, is_first))
+
+    cached = cache.get_many([key for key, *_ in variants])
+    fragments, rendered = [], {}
+    for key, message, can_edit, is_first in variants:
+        html = cached.get(key)
+        record_cache('forum_message', html is not None)
+        if html is None:
+            html = render_to_string('foodapp/forum/_message.html', {
+                'message': message, 'can_edit': can_edit, 'is_first': is_first,
+            })
+            rendered[key] = html
+        fragments.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered, FRAGMENT_TIMEOUT)
+    return fragments
+
+
+@login_required
+def forum_topics_list(request):
+    """Vue pour afficher la liste des sujets du forum"""
+    # Compteurs et dernier auteur sont stockés sur le sujet : une seule requête
+    # pour la page, quel que soit le nombre de sujets affichés
+    topics = ForumTopic.objects.select_related('author', 'last_message_author')
+
+    # Filtrer par catégorie si demandé
+    category = request.GET.get('category')
+    if category:
+        topics = topics.filter(category=category)
+
+    # Recherche plein texte (titres, contenus et messages) sur l'index du forum ;
+    # une requête faite uniquement de mots vides retombe sur le titre
+    search = request.GET.get('search')
+    terms = query_terms(search) if search else []
+    if search and not terms:
+        topics = topics.filter(title__icontains=search)
+
+    # Compteurs pour la sidebar : une ligne par catégorie
+    category_counts = {category_code: 0 for category_code, _ in ForumTopic.CATEGORY_CHOICES}
+    category_counts.update(ForumCategoryStats.objects.values_list('category', 'topic_count'))
+
+    if terms:
+        page = Paginator(search_topics(terms, category), TOPICS_PER_PAGE).get_page(request.GET.get('page'))
+        page.object_list = load_results(page.object_list, terms)
+    else:
+        page = Paginator(topics, TOPICS_PER_PAGE).get_page(request.GET.get('page'))
+    sync_views(page)
+
+    context = {
+        'topics': page,
+        'category': category,
+        'category_name': dict(ForumTopic.CATEGORY_CHOICES).get(category),
+        'search': search,
+        'category_counts': category_counts,
+        'total_topics': sum(category_counts.values()),
+        'recent_topics': ForumTopic.objects.select_related('author').order_by('-created_at')[:5],
+        'categories': ForumTopic.CATEGORY_CHOICES,
+    }
+
+    return render(request, 'foodapp/forum/topics_list.html', context)
+
+@login_required
+def forum_topics_by_category(request, category):
+    """Vue pour afficher les sujets d'une catégorie spécifique"""
+    # Rediriger vers la liste des sujets avec un filtre de catégorie
+    return redirect(f'{reverse("forum_topics_list")}?category={category}')
+
+@login_required
+def forum_topic_detail(request, topic_id):
+    """Vue pour afficher le détail d'un sujet et ses messages"""
+    topic = get_object_or_404(ForumTopic.objects.select_related('author'), id=topic_id)
+
+    # Vue comptée en mémoire, écrite par lots ; l'affichage inclut les vues en attente
+    record_view(topic)
+    sync_views([topic])
+
+    after = request.GET.get('after')
+    topic_messages, has_more = thread_page(topic, after)
+
+    context = {
+        'topic': topic,
+        'message_fragments': render_messages(request, topic_messages, starts_thread=not after),
+        'after': after,
+        'next_cursor': encode_cursor(topic_messages[-1]) if topic_messages else after,
+        'has_more': has_more,
+        'form': ForumMessageForm(),
+    }
+
+    return render(request, 'foodapp/forum/topic_detail.html', context)
+
+@login_required
+def forum_topic_messages(request, topic_id):
+    """Messages qui suivent le curseur ``after``, en fragments HTML (bouton « charger la suite »)"""
+    topic = get_object_or_404(ForumTopic.objects.only('id'), id=topic_id)
+    after = request.GET.get('after')
+    topic_messages, has_more = thread_page(topic, after)
+
+    return JsonResponse({
+        'html': ''.join(render_messages(request, topic_messages, starts_thread=not after)),
+        'count': len(topic_messages),
+        'next_cursor': encode_cursor(topic_messages[-1]) if topic_messages else after,
+        'has_more': has_more,
+    })
+
+@login_required
+def forum_new_topic(request):
+    """Vue pour créer un nouveau sujet"""
+    if request.method == 'POST':
+        form = ForumTopicForm(request.POST)
+        if form.is_valid():
+            topic = form.save(commit=False)
+            topic.author = request.user
+            topic.save()
+
+            # Le premier message reprend le contenu du sujet
+            ForumMessage.objects.create(topic=topic, author=request.user, content=topic.content)
+
+            return redirect('forum_topic_detail', topic_id=topic.id)
+    else:
+        form = ForumTopicForm()
+
+    context = {
+        'form': form,
+        'categories': ForumTopic.CATEGORY_CHOICES,
+    }
+
+    return render(request, 'foodapp/forum/new_topic.html', context)
+
+@login_required
+@require_POST
+def forum_reply(request, topic_id):
+    """Vue pour répondre à un sujet"""
+    topic = get_object_or_404(ForumTopic, id=topic_id)
+
+    form = ForumMessageForm(request.POST)
+    if form.is_valid():
+        message = form.save(commit=False)
+        message.author = request.user
+        message.topic = topic
+        # Met aussi à jour les compteurs et la dernière activité du sujet
+        message.save()
+    else:
+        flash.error(request, "Le message ne peut pas être vide.")
+
+    return redirect('forum_topic_detail', topic_id=topic.id)
+
+@login_required
+def forum_edit_message(request, message_id):
+    """Vue pour modifier un message"""
+    message = get_object_or_404(ForumMessage.objects.select_related('topic'), id=message_id)
+
+    # Vérifier que l'utilisateur est bien l'auteur du message
+    if message.author_id != request.user.id and not request.user.is_staff:
+        return HttpResponseForbidden("Vous n'êtes pas autorisé à modifier ce message.")
+
+    if request.method == 'POST':
+        form = ForumMessageForm(request.POST, instance=message)
+        if form.is_valid():
+            form.save()
+            return redirect('forum_topic_detail', topic_id=message.topic_id)
+    else:
+        form = ForumMessageForm(instance=message)
+
+    context = {
+        'form': form,
+        'message': message,
+        'topic': message.topic,
+    }
+
+    return render(request, 'foodapp/forum/edit_message.html', context)
+
+@login_required
+def forum_delete_message(request, message_id):
+    """Vue pour supprimer un message"""
+    message = get_object_or_404(ForumMessage.objects.select_related('topic'), id=message_id)
+    topic = message.topic
+
+    # Vérifier que l'utilisateur est bien l'auteur du message ou un administrateur
+    if message.author_id != request.user.id and not request.user.is_staff:
+        return HttpResponseForbidden("Vous n'êtes pas autorisé à supprimer ce message.")
+
+    # Le premier message porte le contenu du sujet
+    first_id = topic.messages.order_by('created_at', 'id').values_list('id', flat=True).first()
+    is_first_message = message.id == first_id
+
+    if request.method == 'POST':
+        if is_first_message:
+            # Si c'est le premier message, supprimer tout le sujet
+            topic.delete()
+            return redirect('forum_topics_list')
+        message.delete()
+        return redirect('forum_topic_detail', topic_id=topic.id)
+
+    context = {
+        'message': message,
+        'topic': topic,
+        'is_first_message': is_first_message,
+    }
+
+    return render(request, 'foodapp/forum/delete_message.html', context)
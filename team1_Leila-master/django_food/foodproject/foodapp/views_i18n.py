@@ -5,6 +5,9 @@ from django.http import HttpResponseRedirect
 from django.conf import settings
 from django.contrib import messages
 
+from .middleware import LANGUAGE_SESSION_KEY, remember_profile_language
+from .models import UserProfile
+
 def set_language_custom(request):
     """
     Custom language switching view that preserves the current page and handles user language preferences
@@ -14,17 +17,17 @@ def set_language_custom(request):
         next_page = request.POST.get('next', request.META.get('HTTP_REFERER', '/'))
         
         if language and language in dict(settings.LANGUAGES).keys():
-            # Update language in session
-            if hasattr(request, 'session'):
-                request.session[translation.LANGUAGE_SESSION_KEY] = language
-                request.session['django_language'] = language
+            # Update language in session (only if it changed, to avoid a session write)
+            if hasattr(request, 'session') and request.session.get(LANGUAGE_SESSION_KEY) != language:
+                request.session[LANGUAGE_SESSION_KEY] = language
             
             # Update language for authenticated user's profile
+            profile = None
             if hasattr(request, 'user') and request.user.is_authenticated:
-                profile = getattr(request.user, 'profile', None)
-                if profile and hasattr(profile, 'language'):
+                profile = UserProfile.objects.filter(user_id=request.user.pk).only('id', 'language').first()
+                if profile and profile.language != language:
                     profile.language = language
-                    profile.save()
+                    profile.save(update_fields=['language', 'updated_at'])
             
             # Activate the language for the current thread
             translation.activate(language)
@@ -45,6 +48,10 @@ def set_language_custom(request):
                     samesite=getattr(settings, 'LANGUAGE_COOKIE_SAMESITE', 'Lax')
                 )
             
+            # Keep the cached profile language in sync
+            if profile:
+                remember_profile_language(response, request.user, language)
+            
             # Add success message
             messages.success(request, _('Language changed successfully'))
             
@@ -0,0 +1,25 @@
+import hmac
+
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.views.decorators.http import require_GET
+
+from . import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Expose les métriques au format texte Prometheus.
+    Accès réservé au staff ou à un scrapper muni du jeton ``METRICS['TOKEN']``.
+    """
+    config = metrics.get_config()
+    if not config['ENABLED']:
+        return HttpResponseNotFound()
+
+    token = config['TOKEN']
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    has_token = bool(token) and hmac.compare_digest(auth_header, f'Bearer {token}')
+    if not has_token and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden("Accès refusé")
+
+    return HttpResponse(metrics.generate_latest(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -23,7 +23,7 @@ from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
 
 try:
-    from cpp_modules.food_processor import fast_sort_dishes
+    from cpp_modules.food_processor import fast_sort_dishes, reorder
     USE_CPP_OPTIMIZATION = True
 except ImportError:
     USE_CPP_OPTIMIZATION = False
@@ -99,8 +99,8 @@ def dish_list(request):
         # Reconvertir en QuerySet Django
         dish_ids = [dish['id'] for dish in sorted_dishes]
         dishes = Dish.objects.filter(id__in=dish_ids)
-        # Préserver l'ordre du tri C++
-        dishes = sorted(dishes, key=lambda x: dish_ids.index(x.id))
+        # Préserver l'ordre du tri C++ (table id -> position, O(n))
+        dishes = reorder(dishes, dish_ids)
     else:
         # Tri Python standard
         if sort_by == 'price_asc':
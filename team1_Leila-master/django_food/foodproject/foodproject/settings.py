@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -62,6 +63,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodapp.middleware.MetricsMiddleware',  # Métriques Prometheus (latence, SQL, templates)
+    'foodapp.middleware.QueryBudgetMiddleware',  # Budget de requêtes SQL et détection N+1
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Middleware de localisation
     'django.middleware.common.CommonMiddleware',
@@ -90,7 +93,21 @@ TEMPLATES = [
     },
 ]
 
+# Application de bureau (PyInstaller) : les templates ne changent pas entre deux
+# lancements, on les garde compilés en mémoire sans informations de débogage.
+FROZEN = getattr(sys, 'frozen', False)
+if FROZEN:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['debug'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'foodproject.wsgi.application'
+ASGI_APPLICATION = 'foodproject.asgi.application'
 
 
 # Database
@@ -104,6 +121,147 @@ DATABASES = {
 }
 
 
+# Inspection des requêtes SQL (foodapp.middleware.QueryBudgetMiddleware)
+QUERY_INSPECTOR = {
+    'ENABLED': DEBUG,
+    'DEFAULT_BUDGET': 50,
+    'BUDGETS': {
+        'accueil': 10,
+        'dish_list': 10,
+        'dish_detail': 5,
+        'restaurants': 10,
+        'restaurant_detail': 10,
+        'api_dishes': 5,
+        'api_restaurants': 5,
+    },
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'RAISE_ON_VIOLATION': False,
+    'RESPONSE_HEADER': DEBUG,
+    # Rapport JSONL pour la commande query_report, sur demande uniquement :
+    # sinon chaque requête (et chaque lancement des tests) y ajoute des lignes.
+    'REPORT_FILE': os.getenv('QUERY_REPORT_FILE') or None,
+}
+
+
+# Métriques Prometheus exposées sur /metrics (foodapp.metrics)
+# En production multi-workers, METRICS_DIR doit pointer vers un répertoire
+# partagé et vidé au démarrage du serveur.
+METRICS = {
+    'ENABLED': True,
+    'DIRECTORY': os.getenv('METRICS_DIR') or None,
+    'TOKEN': os.getenv('METRICS_TOKEN') or None,
+    'CLIENT_KINDS': {'restaurant_orders_stream': 'sse'},
+}
+
+# File de tâches en base (emails, traitements lents) : exécutée par
+# `python manage.py run_workers` (ou par un thread de l'application de bureau).
+TASK_QUEUE = {
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'LEASE_SECONDS': 300,
+    'POLL_INTERVAL': 1.0,
+    'ALWAYS_EAGER': False,
+}
+
+# Spool des emails sortants (envoi groupé, déduplication, limite de débit).
+# Pour les tests : 'BACKEND': 'django.core.mail.backends.filebased.EmailBackend'
+# et 'FILE_PATH': os.path.join(BASE_DIR, 'logs', 'mail').
+MAIL_SPOOL = {
+    'BATCH_SIZE': 100,
+    'RATE_PER_MINUTE': 600,
+    'MAX_ATTEMPTS': 3,
+    'BACKEND': os.getenv('MAIL_SPOOL_BACKEND') or None,
+    'FILE_PATH': os.getenv('MAIL_SPOOL_FILE_PATH') or None,
+}
+
+
+# Programmes C++ de cpp_integration : compilés une fois puis mis en cache
+# (build/native/, nom dérivé du hash du source et des options).
+# Les variables d'environnement CXX et CXXFLAGS ont priorité.
+NATIVE_BUILD = {
+    'CXXFLAGS': ['-std=c++17', '-O2'],
+    'CHUNK_SIZE': 1000,
+}
+
+# Chatbot : index BM25 en mémoire sur ChatbotKnowledge, resynchronisé avec la
+# base au plus toutes les REFRESH_INTERVAL secondes
+CHATBOT = {
+    'TOP_K': 3,
+    'CITY_BOOST': 1.5,
+    'REFRESH_INTERVAL': 5,
+    'ANSWER_CACHE_SIZE': 1024,
+}
+
+# Historique du chat : fenêtre affichée, archivage (manage.py chat_retention)
+# et durée de conservation des sessions
+CHAT_HISTORY = {
+    'PAGE_SIZE': 50,
+    'KEEP_MESSAGES': 200,
+    'ARCHIVE_AFTER_DAYS': 30,
+    'RETENTION_DAYS': 365,
+    'ANONYMOUS_RETENTION_DAYS': 30,
+}
+
+# Recommandations de plats (foodapp.recommendations) : N meilleurs plats par
+# utilisateur gardés en cache jusqu'à modification du profil ou du catalogue
+RECOMMENDATIONS = {
+    'TOP_N': 12,
+    'CACHE_TIMEOUT': 60 * 60,
+}
+
+# Plats souvent commandés ensemble (manage.py build_pairings, à planifier
+# chaque nuit) : TOP_K voisins par plat, paires vues dans au moins MIN_SUPPORT commandes.
+PAIRINGS = {
+    'TOP_K': 6,
+    'MIN_SUPPORT': 2,
+    'CHUNK_SIZE': 2000,
+}
+
+# Plats similaires par contenu (manage.py build_similar_dishes, à planifier :
+# seuls les plats modifiés sont recalculés ; --full pour tout le catalogue).
+SIMILAR_DISHES = {
+    'TOP_K': 6,
+    'MAX_FEATURES': 3000,
+}
+
+# Popularité et tendances (vues, commandes, avis, réservations) : demi-vies en
+# jours et poids par événement ; manage.py rebuild_popularity recalcule tout.
+POPULARITY = {
+    'HALF_LIFE_DAYS': 30,
+    'TRENDING_HALF_LIFE_DAYS': 3,
+}
+
+# Compteurs de vues (sujets du forum, plats, restaurants) : cumulés en mémoire
+# et écrits par lots toutes les FLUSH_INTERVAL secondes (0 : à chaque vue).
+VIEW_COUNTER = {
+    'FLUSH_INTERVAL': 10,
+    'MAX_PENDING': 1000,
+}
+
+# Cache partagé entre workers (REDIS_URL, voir gunicorn.conf.py). Sans Redis,
+# chaque processus a son propre cache mémoire.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Sessions : cookie signé pour les petites sessions anonymes, cache + base
+# (write-through) pour les sessions authentifiées. Avec le cache mémoire par
+# processus, les sessions serveur passent en base seule : un worker ne peut
+# pas servir la copie en cache d'une session fermée par un autre.
+SESSION_ENGINE = 'foodapp.session_engine'
+SESSION_STRATEGY = {
+    'ANONYMOUS_COOKIE': True,
+    'COOKIE_MAX_BYTES': 2048,
+    'SERVER_SIDE_PREFIXES': ('wizard_',),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
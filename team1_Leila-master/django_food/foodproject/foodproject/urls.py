@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.i18n import i18n_patterns
 from django.views.i18n import set_language
+from foodapp.views_metrics import metrics_view
 
 urlpatterns = [
     # URL pour le changement de langue
@@ -11,6 +12,7 @@ urlpatterns = [
     
     # Les URLs qui ne doivent pas être internationalisées
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     
     # Les URLs internationalisées
     path('', include('foodapp.urls')),
@@ -0,0 +1,49 @@
+"""
+Configuration gunicorn pour servir FoodFlex en production.
+
+    # ASGI (vues async, flux SSE des commandes) :
+    gunicorn foodproject.asgi:application -c gunicorn.conf.py
+
+    # WSGI classique :
+    GUNICORN_WORKER_CLASS=gthread gunicorn foodproject.wsgi:application -c gunicorn.conf.py
+
+Tous les réglages sont surchargeables par variables d'environnement. Avec
+plusieurs workers, définir REDIS_URL : le cache (sessions, réponses du
+chatbot, recommandations) est alors partagé entre les processus.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+
+# Un worker uvicorn par cœur suffit : chaque worker multiplexe des centaines de
+# connexions sur sa boucle asyncio. En gthread (WSGI), chaque requête occupe
+# un thread : prévoir workers x threads >= nombre de clients simultanés.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Les flux SSE restent ouverts jusqu'à LIVE_ORDERS_MAX_SECONDS (300 s)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 330))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycler les workers pour borner la mémoire
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = 500
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+
+
+def on_starting(server):
+    # Repartir d'un répertoire de métriques vide (foodapp.metrics)
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from foodapp.metrics import mark_process_dead
+    mark_process_dead(worker.pid, os.getenv('METRICS_DIR'))